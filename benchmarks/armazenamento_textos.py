@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark do armazenamento de respostas em `textos` (schema 2.3)
+
+Grava o mesmo corpus sintético em dois bancos:
+- referência: respostas inline em `interacoes` (schema 2.2, índice de
+  cobertura com a resposta e FTS5 com conteúdo externo)
+- atual: DatabaseManager, com respostas deduplicadas e comprimidas
+
+e compara o tamanho em disco (após VACUUM) e a latência de leitura do
+histórico e da busca textual.
+
+Uso:
+    python benchmarks/armazenamento_textos.py --interacoes 5000
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List
+
+import aiosqlite
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from corpus import Turno, gerar_turnos
+from database import busca
+from database.db_manager import DatabaseManager
+
+
+SCHEMA_REFERENCIA = """
+    CREATE TABLE interacoes (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        usuario_id TEXT NOT NULL,
+        servidor_id TEXT,
+        canal_id TEXT NOT NULL,
+        mensagem TEXT NOT NULL,
+        resposta TEXT,
+        timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        respondida_em TIMESTAMP,
+        confianca REAL,
+        tempo_resposta REAL,
+        fontes_utilizadas TEXT,
+        processada BOOLEAN DEFAULT 1
+    );
+    CREATE INDEX idx_interacoes_usuario_canal_timestamp
+        ON interacoes(usuario_id, canal_id, timestamp, mensagem, resposta, confianca);
+    CREATE INDEX idx_interacoes_timestamp ON interacoes(timestamp);
+    CREATE VIRTUAL TABLE interacoes_fts USING fts5(
+        mensagem, resposta, content='interacoes', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    );
+"""
+
+CONSULTAS_BUSCA = [
+    'princípios da administração pública', 'controle de constitucionalidade',
+    'crase', 'improbidade administrativa', 'probabilidade', 'licitações',
+]
+
+
+def tamanho_banco(caminho: str) -> int:
+    """Tamanho do arquivo após checkpoint do WAL e VACUUM"""
+    conexao = sqlite3.connect(caminho)
+    conexao.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conexao.execute("VACUUM")
+    conexao.close()
+    return os.path.getsize(caminho)
+
+
+def montar_referencia(caminho: str, turnos: List[Turno]):
+    """Banco de referência com as respostas inline"""
+    conexao = sqlite3.connect(caminho)
+    conexao.executescript(SCHEMA_REFERENCIA)
+    conexao.executemany("""
+        INSERT INTO interacoes
+        (usuario_id, servidor_id, canal_id, mensagem, resposta, respondida_em,
+         confianca, tempo_resposta, fontes_utilizadas)
+        VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP, ?, ?, ?)
+    """, [
+        (t.usuario_id, t.servidor_id, t.canal_id, t.pergunta, t.resposta,
+         t.confianca, t.tempo_resposta, ','.join(t.fontes))
+        for t in turnos
+    ])
+    conexao.execute("INSERT INTO interacoes_fts (interacoes_fts) VALUES ('rebuild')")
+    conexao.commit()
+    conexao.close()
+
+
+async def montar_atual(caminho: str, turnos: List[Turno]) -> Dict[str, float]:
+    """Banco atual, gravado pelo caminho normal do bot"""
+    db = DatabaseManager(caminho)
+    await db.inicializar()
+    for t in turnos:
+        await db.registrar_interacao(t.usuario_id, t.servidor_id, t.canal_id, t.pergunta,
+                                     t.resposta, t.confianca, t.tempo_resposta, t.fontes)
+    return await db.otimizar_textos()
+
+
+async def historico_referencia(caminho: str, usuario_id: str, canal_id: str):
+    async with aiosqlite.connect(caminho) as db:
+        cursor = await db.execute("""
+            SELECT mensagem, resposta, timestamp, confianca FROM interacoes
+            WHERE usuario_id = ? AND canal_id = ? AND resposta IS NOT NULL
+            ORDER BY timestamp DESC LIMIT 10
+        """, (usuario_id, canal_id))
+        return await cursor.fetchall()
+
+
+async def busca_referencia(caminho: str, consulta: str):
+    async with aiosqlite.connect(caminho) as db:
+        cursor = await db.execute("""
+            SELECT i.id, i.mensagem, i.resposta, bm25(interacoes_fts, 2.0, 1.0) AS rank,
+                   snippet(interacoes_fts, 1, '**', '**', '…', 24)
+            FROM interacoes_fts JOIN interacoes i ON i.id = interacoes_fts.rowid
+            WHERE interacoes_fts MATCH ? AND i.resposta IS NOT NULL
+            ORDER BY rank LIMIT 5
+        """, (busca.montar_consulta(consulta),))
+        return await cursor.fetchall()
+
+
+async def medir(funcao: Callable[[], Awaitable], repeticoes: int) -> Dict[str, float]:
+    """Mediana e p95 (ms) de uma leitura, após aquecimento"""
+    for _ in range(min(20, repeticoes)):
+        await funcao()
+    amostras = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        await funcao()
+        amostras.append((time.perf_counter() - inicio) * 1000)
+    amostras.sort()
+    return {
+        'mediana_ms': statistics.median(amostras),
+        'p95_ms': amostras[int(len(amostras) * 0.95) - 1],
+    }
+
+
+async def executar(args):
+    diretorio = tempfile.mkdtemp(prefix="bench_textos_")
+    try:
+        turnos = list(gerar_turnos(args.interacoes, repeticao=args.repeticao))
+        referencia = os.path.join(diretorio, "referencia.db")
+        atual = os.path.join(diretorio, "atual.db")
+
+        print(f"📝 Gravando {len(turnos)} turnos...")
+        montar_referencia(referencia, turnos)
+        inicio = time.perf_counter()
+        estatisticas = await montar_atual(atual, turnos)
+        print(f"   caminho do bot: {len(turnos) / (time.perf_counter() - inicio):.0f} turnos/s")
+
+        tamanho_referencia = tamanho_banco(referencia)
+        tamanho_atual = tamanho_banco(atual)
+
+        db = DatabaseManager(atual)
+        await db.inicializar()
+        rnd = random.Random(7)
+        pares = [(t.usuario_id, t.canal_id) for t in rnd.sample(turnos, min(200, len(turnos)))]
+
+        def sorteio(lista):
+            return lista[rnd.randrange(len(lista))]
+
+        leituras = {
+            'histórico': (
+                lambda: historico_referencia(referencia, *sorteio(pares)),
+                lambda: db.obter_historico_conversa(*sorteio(pares), limite=10),
+            ),
+            'busca': (
+                lambda: busca_referencia(referencia, sorteio(CONSULTAS_BUSCA)),
+                lambda: db.buscar_respostas(sorteio(CONSULTAS_BUSCA)),
+            ),
+        }
+
+        print("\n💾 Tamanho em disco (após VACUUM)")
+        print(f"   referência: {tamanho_referencia / 1024:10.0f} KB")
+        print(f"   atual:      {tamanho_atual / 1024:10.0f} KB "
+              f"({(1 - tamanho_atual / tamanho_referencia) * 100:.1f}% menor)")
+        print(f"   textos: {estatisticas['textos']} únicos para {estatisticas['referencias']} "
+              f"respostas (deduplicação {estatisticas['deduplicacao'] * 100:.1f}%), "
+              f"compressão {estatisticas['taxa_compressao']:.1f}x")
+
+        print("\n⏱️ Latência de leitura")
+        for nome, (funcao_referencia, funcao_atual) in leituras.items():
+            medida_referencia = await medir(funcao_referencia, args.repeticoes)
+            medida_atual = await medir(funcao_atual, args.repeticoes)
+            print(f"   {nome:10s} referência: mediana {medida_referencia['mediana_ms']:.2f}ms "
+                  f"p95 {medida_referencia['p95_ms']:.2f}ms | atual: mediana "
+                  f"{medida_atual['mediana_ms']:.2f}ms p95 {medida_atual['p95_ms']:.2f}ms")
+    finally:
+        shutil.rmtree(diretorio, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--interacoes', type=int, default=5000, help="Turnos gravados")
+    parser.add_argument('--repeticao', type=float, default=0.15,
+                        help="Fração de dúvidas frequentes repetidas")
+    parser.add_argument('--repeticoes', type=int, default=300, help="Leituras medidas por cenário")
+    asyncio.run(executar(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,441 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark do DatabaseManager em escala, com dados sintéticos
+
+Um gerador grava direto no SQLite (sqlite3 síncrono, transações de
+TAMANHO_TRANSACAO linhas, índices secundários de `interacoes` recriados no
+fim de cada carga) usuários, canais e turnos realistas: poucos usuários
+concentram a maior parte das perguntas, cada usuário conversa em até 3
+canais do seu servidor, os turnos se espalham pelos últimos --dias e as
+respostas vêm comprimidas de um conjunto de --respostas-distintas textos.
+O índice textual (FTS5, sem conteúdo) é preenchido junto, como faz o bot:
+a retenção desindexa cada turno removido e um índice incompleto corromperia
+o banco. Os agregados (rollups) são recalculados no fim de cada carga.
+
+O banco cresce até cada tamanho de --tamanhos e, em cada um, mede:
+- latência (p50/p99) de obter_historico_conversa e obter_estatisticas_usuario
+  com usuários e canais sorteados dos dados
+- atualizar_estatisticas_diarias em dias sorteados e limpar_dados_antigos
+  do dia mais antigo (linhas/s e tempo de lock)
+- vazão e latência de escrita de turnos completos (registrar_interacao +
+  registrar_resposta, como o bot) com cada nível de --concorrencia
+- o plano (EXPLAIN QUERY PLAN) de cada comando que esses métodos executam,
+  capturado das conexões do próprio DatabaseManager; só é impresso quando
+  muda de um tamanho para o outro
+
+Uso:
+    python benchmarks/banco_escala.py --tamanhos 100000 1000000 10000000
+    python benchmarks/banco_escala.py --gerar oraculo_10m.db --tamanhos 10000000
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import random
+import re
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Tuple
+
+import aiosqlite
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from corpus import BANCAS, LEIS, MATERIAS, gerar_resposta
+from database import rollups
+from database.db_manager import DatabaseManager
+from database.textos import ArmazemTextos, hash_texto
+
+
+# Linhas por transação na carga em massa
+TAMANHO_TRANSACAO = 100_000
+
+# Canais por servidor
+CANAIS_POR_SERVIDOR = 10
+
+# Comandos sem plano de consulta; os iniciados por "--" são internos do SQLite
+# (gatilhos e tabelas auxiliares do FTS5), assim como os que citam 'main'.
+_SEM_PLANO = re.compile(r"^\s*(--|PRAGMA|BEGIN|COMMIT|ROLLBACK|SAVEPOINT|RELEASE|CREATE|VACUUM)|'main'\.", re.I)
+
+SQL_INSERIR_INTERACAO = """
+    INSERT INTO interacoes
+    (id, usuario_id, servidor_id, canal_id, mensagem, resposta_texto_id, timestamp,
+     respondida_em, confianca, tempo_resposta, fontes_utilizadas, processada,
+     modelo, espera_fila, tempo_banco, tempo_primeiro_token, tempo_gemini,
+     tempo_validacao, tempo_envio, tokens_entrada, tokens_saida, tokens_raciocinio)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 1, ?, ?, ?, ?, ?, ?, ?, ?, ?, NULL)
+"""
+
+
+class GeradorDados:
+    """Carga em massa de usuários, textos e turnos sintéticos"""
+
+    def __init__(self, caminho: str, args):
+        self.caminho = caminho
+        self.args = args
+        self.rnd = random.Random(args.semente)
+        self.total = 0
+        self.textos: List[Tuple[int, str]] = []
+        self.perguntas: List[str] = []
+        self.perguntas_por_usuario = [0] * args.usuarios
+
+    def _conectar(self) -> sqlite3.Connection:
+        conexao = sqlite3.connect(self.caminho, isolation_level=None)
+        conexao.execute("PRAGMA synchronous = OFF")
+        conexao.execute("PRAGMA cache_size = -262144")
+        conexao.execute("PRAGMA temp_store = MEMORY")
+        return conexao
+
+    def preparar(self):
+        """Textos distintos (comprimidos como o ArmazemTextos) e perguntas"""
+        armazem = ArmazemTextos()
+        conexao = self._conectar()
+        conexao.execute("BEGIN")
+        for _ in range(self.args.respostas_distintas):
+            materia = self.rnd.choice(list(MATERIAS))
+            texto = gerar_resposta(self.rnd, materia, self.rnd.choice(MATERIAS[materia]))
+            dados = texto.encode('utf-8')
+            formato, dicionario_id, comprimido = armazem.codificar(dados)
+            cursor = conexao.execute(
+                "INSERT INTO textos (hash, formato, dicionario_id, tamanho, dados) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(hash) DO NOTHING",
+                (hash_texto(dados), formato, dicionario_id, len(dados), comprimido)
+            )
+            if cursor.rowcount:
+                self.textos.append((cursor.lastrowid, texto))
+        conexao.execute("COMMIT")
+        conexao.close()
+        for materia, temas in MATERIAS.items():
+            for tema in temas:
+                for banca in BANCAS:
+                    self.perguntas += [
+                        f"Pode explicar {tema} em {materia} para a prova da {banca}?",
+                        f"Qual a diferença entre {tema} e o que cai na {banca}?",
+                        f"O que a {banca} costuma cobrar sobre {tema}?",
+                    ]
+
+    def carregar(self, quantidade: int) -> Dict[str, float]:
+        """Acrescenta `quantidade` turnos espalhados pela janela de --dias"""
+        rnd = self.rnd
+        args = self.args
+        conexao = self._conectar()
+        indices = conexao.execute(
+            "SELECT name, sql FROM sqlite_master "
+            "WHERE type = 'index' AND tbl_name = 'interacoes' AND sql IS NOT NULL"
+        ).fetchall()
+        for nome, _ in indices:
+            conexao.execute(f"DROP INDEX {nome}")
+
+        proximo_id = (conexao.execute("SELECT COALESCE(MAX(id), 0) FROM interacoes").fetchone()[0] + 1)
+        fim = time.time()
+        passo = args.dias * 86400 / quantidade
+        inicio_janela = fim - args.dias * 86400
+        perguntas = self.perguntas
+        textos = self.textos
+        contagem = self.perguntas_por_usuario
+        modelo = 'gemini-2.5-flash'
+        leis = [lei for lei, _ in LEIS]
+
+        inicio = time.perf_counter()
+        lote, lote_busca = [], []
+        for j in range(quantidade):
+            # Poucos usuários fazem a maior parte das perguntas
+            usuario = int(args.usuarios * rnd.random() ** 3)
+            contagem[usuario] += 1
+            servidor = usuario % args.servidores
+            sorteio = rnd.random()
+            canal = servidor * CANAIS_POR_SERVIDOR + (usuario + (0 if sorteio < 0.7 else 1 if sorteio < 0.9 else 2)) % CANAIS_POR_SERVIDOR
+            momento = inicio_janela + (j + rnd.random()) * passo
+            tempo_resposta = 0.8 + 6 * sorteio
+            primeiro_token = 0.4 + sorteio
+            texto_id, texto = textos[rnd.randrange(len(textos))]
+            pergunta = perguntas[rnd.randrange(len(perguntas))]
+            lote.append((
+                proximo_id, str(100000 + usuario), str(900 + servidor), str(5000 + canal), pergunta, texto_id,
+                time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(momento)),
+                time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(momento + tempo_resposta)),
+                round(0.6 + 0.39 * rnd.random(), 3), round(tempo_resposta, 3), leis[usuario % len(leis)],
+                modelo, 0.15, 0.01, primeiro_token, primeiro_token + 1.2, 0.002,
+                tempo_resposta - primeiro_token - 1.4, 420, len(texto) // 4
+            ))
+            lote_busca.append((proximo_id, pergunta, texto))
+            proximo_id += 1
+            if len(lote) >= TAMANHO_TRANSACAO:
+                self._gravar(conexao, lote, lote_busca)
+                lote, lote_busca = [], []
+        if lote:
+            self._gravar(conexao, lote, lote_busca)
+        insercao = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        for _, sql in indices:
+            conexao.execute(sql)
+        reindexacao = time.perf_counter() - inicio
+
+        conexao.execute("BEGIN")
+        conexao.executemany("""
+            INSERT INTO usuarios (id, nome, total_interacoes) VALUES (?, ?, ?)
+            ON CONFLICT(id) DO UPDATE SET total_interacoes = excluded.total_interacoes
+        """, [(str(100000 + usuario), f"Usuário_{100000 + usuario}", total)
+              for usuario, total in enumerate(contagem) if total])
+        conexao.execute("COMMIT")
+        conexao.close()
+        self.total += quantidade
+        return {'insercao': insercao, 'reindexacao': reindexacao}
+
+    @staticmethod
+    def _gravar(conexao: sqlite3.Connection, lote: list, lote_busca: list):
+        conexao.execute("BEGIN")
+        conexao.executemany(SQL_INSERIR_INTERACAO, lote)
+        conexao.executemany("INSERT INTO interacoes_fts (rowid, mensagem, resposta) VALUES (?, ?, ?)",
+                                lote_busca)
+        conexao.execute("COMMIT")
+
+    async def recalcular_agregados(self) -> float:
+        """Rollups por hora, dia e usuário a partir de todo o histórico"""
+        inicio = time.perf_counter()
+        async with aiosqlite.connect(self.caminho) as db:
+            await rollups.recalcular_periodo(db)
+            await rollups.recalcular_usuarios(db)
+            await db.commit()
+        return time.perf_counter() - inicio
+
+
+@contextmanager
+def capturar_sql(destino: List[str]):
+    """Comandos executados pelas conexões abertas dentro do bloco (com os parâmetros)"""
+    conectar = sqlite3.connect
+
+    def conectar_rastreando(*args, **kwargs):
+        conexao = conectar(*args, **kwargs)
+        conexao.set_trace_callback(destino.append)
+        return conexao
+
+    sqlite3.connect = conectar_rastreando
+    try:
+        yield
+    finally:
+        sqlite3.connect = conectar
+
+
+def normalizar_sql(sql: str) -> str:
+    """Comando sem literais nem espaços repetidos (mesmo comando, parâmetros diferentes)"""
+    sql = re.sub(r"'(?:[^']|'')*'", "?", sql)
+    sql = re.sub(r"\b\d+(?:\.\d+)?\b", "?", sql)
+    sql = re.sub(r"\(\?(?:\s*,\s*\?)+\)", "(?, …)", sql)
+    return ' '.join(sql.split())
+
+
+def plano(conexao: sqlite3.Connection, sql: str) -> str:
+    """EXPLAIN QUERY PLAN em árvore, indentado pelo nível de cada passo"""
+    try:
+        linhas = conexao.execute(f"EXPLAIN QUERY PLAN {sql}").fetchall()
+    except sqlite3.Error as e:
+        return f"(sem plano: {e})"
+    niveis = {0: -1}
+    saida = []
+    for identificador, pai, _, detalhe in linhas:
+        niveis[identificador] = niveis.get(pai, -1) + 1
+        saida.append('  ' * niveis[identificador] + detalhe)
+    return '\n'.join(saida)
+
+
+async def planos_de(caminho: str, chamada: Callable[[], Awaitable]) -> Dict[str, str]:
+    """Planos de todos os comandos distintos que uma chamada executa"""
+    comandos: List[str] = []
+    with capturar_sql(comandos):
+        await chamada()
+    conexao = sqlite3.connect(caminho)
+    planos = {}
+    for comando in comandos:
+        if _SEM_PLANO.search(comando):
+            continue
+        chave = normalizar_sql(comando)
+        if chave not in planos:
+            arvore = plano(conexao, comando)
+            if arvore:
+                planos[chave] = arvore
+    conexao.close()
+    return planos
+
+
+async def latencias(chamadas: List[Callable[[], Awaitable]]) -> List[float]:
+    """Latência (ms) de cada chamada, em sequência"""
+    resultado = []
+    for chamada in chamadas:
+        inicio = time.perf_counter()
+        await chamada()
+        resultado.append((time.perf_counter() - inicio) * 1000)
+    return resultado
+
+
+def resumo(valores: List[float]) -> str:
+    ordenados = sorted(valores)
+    p99 = ordenados[min(len(ordenados) - 1, int(len(ordenados) * 0.99))]
+    return f"p50 {statistics.median(ordenados):8.2f}ms  p99 {p99:8.2f}ms"
+
+
+async def medir_escrita(db: DatabaseManager, escritores: int, turnos: int,
+                        respostas: List[str], rnd: random.Random) -> Tuple[float, List[float]]:
+    """Turnos completos/s e latência (ms) por turno com `escritores` simultâneos"""
+    latencia: List[float] = []
+
+    async def escritor(indice: int):
+        for k in range(turnos // escritores):
+            usuario = str(900000 + indice)
+            inicio = time.perf_counter()
+            interacao_id = await db.registrar_interacao(usuario, "999", str(9000 + indice % 10),
+                                                        f"Pergunta de carga {indice}-{k}")
+            await db.registrar_resposta(interacao_id, rnd.choice(respostas), 0.9, 2.5, ['CF/88'])
+            latencia.append((time.perf_counter() - inicio) * 1000)
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(escritor(indice) for indice in range(escritores)))
+    return len(latencia) / (time.perf_counter() - inicio), latencia
+
+
+def tamanho_arquivo(caminho: str) -> float:
+    """MB do banco com o WAL"""
+    return sum(os.path.getsize(arquivo) for arquivo in (caminho, caminho + '-wal')
+               if os.path.exists(arquivo)) / 1024 / 1024
+
+
+async def medir_tamanho(db: DatabaseManager, args, diretorio: str, rnd: random.Random,
+                        respostas: List[str]) -> Dict[str, Dict[str, str]]:
+    """Imprime as medidas do tamanho atual e devolve os planos por método"""
+    conexao = sqlite3.connect(db.db_path)
+    maior_id = conexao.execute("SELECT MAX(id) FROM interacoes").fetchone()[0]
+    amostra = []
+    while len(amostra) < args.consultas:
+        linha = conexao.execute("SELECT usuario_id, canal_id FROM interacoes WHERE id >= ? LIMIT 1",
+                                (rnd.randint(1, maior_id),)).fetchone()
+        if linha:
+            amostra.append(linha)
+    primeiro_dia, ultimo_dia = conexao.execute(
+        "SELECT MIN(substr(timestamp, 1, 10)), MAX(substr(timestamp, 1, 10)) FROM interacoes"
+    ).fetchone()
+    conexao.close()
+    dias = [date.fromisoformat(primeiro_dia) + timedelta(days=rnd.randrange(
+        (date.fromisoformat(ultimo_dia) - date.fromisoformat(primeiro_dia)).days + 1)) for _ in range(5)]
+
+    historico = await latencias([lambda u=u, c=c: db.obter_historico_conversa(u, c, limite=5)
+                                 for u, c in amostra])
+    print(f"   {'obter_historico_conversa':<32} {resumo(historico)}")
+    estatisticas = await latencias([lambda u=u: db.obter_estatisticas_usuario(u) for u, _ in amostra])
+    print(f"   {'obter_estatisticas_usuario':<32} {resumo(estatisticas)}")
+    diarias = await latencias([lambda d=d: db.atualizar_estatisticas_diarias(d) for d in dias])
+    print(f"   {'atualizar_estatisticas_diarias':<32} {resumo(diarias)}  ({len(dias)} dias)")
+
+    planos = {
+        'obter_historico_conversa': await planos_de(
+            db.db_path, lambda: db.obter_historico_conversa(*amostra[0], limite=5)),
+        'obter_estatisticas_usuario': await planos_de(
+            db.db_path, lambda: db.obter_estatisticas_usuario(amostra[0][0])),
+        'atualizar_estatisticas_diarias': await planos_de(
+            db.db_path, lambda: db.atualizar_estatisticas_diarias(dias[0])),
+    }
+
+    # Retenção do dia mais antigo da janela (a rotina diária em regime)
+    relatorios = []
+
+    async def retencao():
+        relatorios.append(await db.limpar_dados_antigos(
+            dias=args.dias - 1, diretorio_arquivo=os.path.join(diretorio, 'arquivo')))
+
+    planos['limpar_dados_antigos'] = await planos_de(db.db_path, retencao)
+    relatorio = relatorios[0]
+    if relatorio is not None:
+        print(f"   {'limpar_dados_antigos':<32} {relatorio.total_removidas} linhas em "
+              f"{relatorio.duracao:.1f}s ({relatorio.linhas_por_segundo:.0f}/s, {relatorio.lotes} lotes) | "
+              f"lock total {relatorio.tempo_bloqueio_total * 1000:.0f}ms máx "
+              f"{relatorio.tempo_bloqueio_maximo * 1000:.1f}ms")
+
+    for escritores in args.concorrencia:
+        vazao, latencia = await medir_escrita(db, escritores, args.escritas, respostas, rnd)
+        print(f"   {f'escrita, {escritores} escritor(es)':<32} {resumo(latencia)}  {vazao:7.0f} turnos/s")
+    return planos
+
+
+def imprimir_planos(planos: Dict[str, Dict[str, str]], anteriores: Dict[str, Dict[str, str]]):
+    """Planos novos ou diferentes dos do tamanho anterior"""
+    mudancas = []
+    for metodo, comandos in planos.items():
+        for sql, arvore in comandos.items():
+            if anteriores.get(metodo, {}).get(sql) != arvore:
+                mudancas.append((metodo, sql, arvore))
+    if not mudancas:
+        print("   planos: iguais aos do tamanho anterior")
+        return
+    print("   planos:")
+    for metodo, sql, arvore in mudancas:
+        print(f"     {metodo}: {sql[:150]}{'…' if len(sql) > 150 else ''}")
+        for linha in arvore.splitlines():
+            print(f"        {linha}")
+
+
+async def executar(args):
+    diretorio = tempfile.mkdtemp(prefix="bench_banco_escala_")
+    caminho = args.gerar or os.path.join(diretorio, "escala.db")
+    try:
+        if os.path.exists(caminho):
+            sys.exit(f"❌ {caminho} já existe: o gerador precisa de um banco novo")
+        db = DatabaseManager(caminho)
+        await db.inicializar()
+        gerador = GeradorDados(caminho, args)
+        gerador.preparar()
+        rnd = random.Random(args.semente + 1)
+        respostas = [gerar_resposta(rnd, materia, tema) for materia, temas in MATERIAS.items()
+                     for tema in temas]
+        print(f"📝 {args.usuarios} usuários, {args.servidores} servidores, {args.dias} dias, "
+              f"{len(gerador.textos)} respostas distintas\n")
+
+        anteriores: Dict[str, Dict[str, str]] = {}
+        for tamanho in sorted(args.tamanhos):
+            novos = tamanho - gerador.total
+            if novos <= 0:
+                continue
+            carga = gerador.carregar(novos)
+            agregados = await gerador.recalcular_agregados()
+            print(f"📦 {tamanho:_} interações (+{novos:_} em {carga['insercao']:.1f}s, "
+                  f"{novos / carga['insercao']:_.0f}/s; índices {carga['reindexacao']:.1f}s; "
+                  f"agregados {agregados:.1f}s) | {tamanho_arquivo(caminho):_.0f} MB".replace('_', '.'))
+            planos = await medir_tamanho(db, args, diretorio, rnd, respostas)
+            imprimir_planos(planos, anteriores)
+            anteriores = planos
+            print()
+        if args.gerar:
+            print(f"💾 Banco mantido em {caminho}")
+    finally:
+        shutil.rmtree(diretorio, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--tamanhos', type=int, nargs='+', default=[10_000, 100_000, 1_000_000],
+                        help="Interações no banco a cada rodada de medidas")
+    parser.add_argument('--usuarios', type=int, default=50_000, help="Usuários distintos")
+    parser.add_argument('--servidores', type=int, default=500, help="Servidores distintos")
+    parser.add_argument('--dias', type=int, default=120, help="Janela de tempo das interações")
+    parser.add_argument('--respostas-distintas', type=int, default=5000, help="Textos de resposta distintos")
+    parser.add_argument('--consultas', type=int, default=200, help="Chamadas por consulta medida")
+    parser.add_argument('--concorrencia', type=int, nargs='+', default=[1, 8, 32],
+                        help="Escritores simultâneos medidos")
+    parser.add_argument('--escritas', type=int, default=256, help="Turnos gravados por nível de concorrência")
+    parser.add_argument('--gerar', help="Mantém o banco gerado neste caminho (novo)")
+    parser.add_argument('--semente', type=int, default=42)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.CRITICAL)
+    asyncio.run(executar(args))
+
+
+if __name__ == "__main__":
+    main()
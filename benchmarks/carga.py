@@ -0,0 +1,672 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Teste de carga do bot com Discord e Gemini falsos
+
+Menções sintéticas passam pelo caminho real do OraculoBot (on_message →
+_processar_mencao: banco SQLite, cache de contextos, GeminiClient, validação
+e envio em partes); só as pontas são falsas:
+- Discord: mensagens e canais que registram quando cada reply/edit/send
+  termina, com latência de API sorteada
+- Gemini: transporte no lugar de `client.aio` que responde em streaming,
+  com latência do primeiro token lognormal, vazão de tokens, falhas no meio
+  da resposta (503) e 429 em frações configuráveis
+
+Cenários:
+- rajada: todas as menções chegam juntas (edital publicado, aviso no canal)
+- servidores: chegadas de Poisson a uma taxa fixa, espalhadas por muitos
+  servidores, canais e usuários
+- conversa: poucos usuários em conversas longas, cada pergunta depois da
+  resposta anterior (contexto em cache e histórico crescente)
+
+Para cada cenário: vazão, latência vista pelo usuário (p50/p99 até a
+primeira parte e até a resposta completa), desfechos, média por etapa
+(gravada pelo próprio bot), CPU, RSS e atraso do event loop. Não usa rede.
+
+Modo de resistência (--resistencia): dias simulados em tempo comprimido
+(--compressao segundos simulados por segundo real), com chegadas de Poisson
+a --taxa menções/s vindas de uma população rotativa (--populacao usuários,
+--canais canais; a janela de --ativos usuários percorre a população ao
+longo do teste, então quase toda chave usuário/canal é nova). As rotinas
+de manutenção do bot rodam no AgendadorManutencao com os intervalos e o
+TTL dos contextos divididos pela compressão; a retenção (em dias inteiros)
+não roda, então o banco só cresce. A cada --amostragem segundos simulados
+registra RSS, objetos do gc, contextos em cache, tamanho do banco, p50/p99
+das respostas e atraso do event loop; no fim, ajusta uma reta a cada série
+(sem o --aquecimento inicial) e termina com código 1 se alguma inclinação
+por dia simulado passar do seu limite (--limite-*, 0 desliga).
+
+Uso:
+    python benchmarks/carga.py --cenarios rajada --mencoes 300
+    python benchmarks/carga.py --cenarios servidores --taxa 20 --duracao 60 --gemini-429 0.05
+    python benchmarks/carga.py --resistencia --dias-simulados 3 --compressao 1440 --taxa 50
+"""
+
+import argparse
+import asyncio
+import gc
+import logging
+import math
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import discord
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from corpus import BANCAS, MATERIAS, gerar_resposta
+from bot.anti_alucinacao import ValidadorConfianca
+from bot.config import Config
+from bot.discord_bot import OraculoBot
+from bot.gemini_client import GeminiClient
+from database.base import ArmazenamentoBase
+from database.db_manager import DatabaseManager
+from database.fragmentacao import ArmazenamentoFragmentado
+from utils.agendador import AgendadorManutencao
+from utils.memoria import estimar_estrutura, rss_bytes
+
+
+# Caracteres por token (aproximação para o português)
+CARACTERES_POR_TOKEN = 4
+
+# Tokens por trecho do streaming
+TOKENS_POR_TRECHO = 20
+
+# Segundos simulados por dia
+DIA = 86400
+
+# Séries do modo de resistência: (campo, rótulo, unidade, divisor para a unidade)
+SERIES_RESISTENCIA = (
+    ('rss', 'RSS', 'MB', 1024 * 1024),
+    ('objetos', 'objetos do gc', 'mil', 1000),
+    ('contextos', 'contextos em cache', 'mil', 1000),
+    ('contextos_bytes', 'bytes dos contextos', 'MB', 1024 * 1024),
+    ('banco', 'banco', 'MB', 1024 * 1024),
+    ('p50', 'resposta p50', 'ms', 1),
+    ('p99', 'resposta p99', 'ms', 1),
+)
+
+# Desfecho pelo título do embed enviado no lugar da resposta
+DESFECHOS_EMBED = {
+    "⚠️ Confiança Insuficiente": 'baixa_confianca',
+    "❌ Ops! Algo deu errado": 'erro',
+    "🔮 Oráculo de Concursos - Como usar": 'ajuda',
+}
+
+
+@dataclass
+class Registro:
+    """Linha do tempo de uma menção (perf_counter)"""
+    enviada: float
+    primeira_parte: Optional[float] = None
+    ultima_parte: Optional[float] = None
+    desfecho: str = 'sem_resposta'
+
+
+class DiscordFalso:
+    """Latência das chamadas à API do Discord (exponencial em torno da média)"""
+
+    def __init__(self, rnd: random.Random, latencia_ms: float):
+        self.rnd = rnd
+        self.media = latencia_ms / 1000
+
+    async def chamada(self):
+        await asyncio.sleep(self.rnd.expovariate(1 / self.media) if self.media > 0 else 0)
+
+
+class _Digitando:
+    def __init__(self, discord_falso: DiscordFalso):
+        self.discord = discord_falso
+
+    async def __aenter__(self):
+        await self.discord.chamada()
+
+    async def __aexit__(self, *excecao):
+        return False
+
+
+class MensagemEnviada:
+    """Mensagem do bot: cada edição conta como parte entregue"""
+
+    def __init__(self, content: Optional[str], registro: Registro, discord_falso: DiscordFalso):
+        self.content = content or ''
+        self.registro = registro
+        self.discord = discord_falso
+
+    async def edit(self, content: str = None, **kwargs):
+        await self.discord.chamada()
+        self.content = content
+        self.registro.ultima_parte = time.perf_counter()
+        return self
+
+
+class CanalFalso:
+    """Canal visto por uma menção (mesmo id para todas as menções do canal)"""
+
+    def __init__(self, canal_id: int, registro: Registro, discord_falso: DiscordFalso):
+        self.id = canal_id
+        self.registro = registro
+        self.discord = discord_falso
+
+    def __str__(self):
+        return f"canal-{self.id}"
+
+    def typing(self):
+        return _Digitando(self.discord)
+
+    async def send(self, content: Optional[str] = None, embed: Optional[discord.Embed] = None, **kwargs):
+        await self.discord.chamada()
+        self.registro.ultima_parte = time.perf_counter()
+        return MensagemEnviada(content, self.registro, self.discord)
+
+
+class MensagemFalsa:
+    """Menção ao bot com o necessário para on_message e _processar_mencao"""
+
+    def __init__(self, mensagem_id: int, autor_id: int, servidor_id: int, canal_id: int,
+                 texto: str, bot_user, registro: Registro, discord_falso: DiscordFalso):
+        self.id = mensagem_id
+        self.author = SimpleNamespace(id=autor_id, bot=False, name=f"usuario-{autor_id}")
+        self.guild = SimpleNamespace(id=servidor_id)
+        self.channel = CanalFalso(canal_id, registro, discord_falso)
+        self.mentions = [bot_user]
+        self.content = f"<@{bot_user.id}> {texto}"
+        self.created_at = discord.utils.utcnow()
+        self.registro = registro
+        self.discord = discord_falso
+
+    async def reply(self, content: Optional[str] = None, embed: Optional[discord.Embed] = None, **kwargs):
+        await self.discord.chamada()
+        agora = time.perf_counter()
+        if embed is not None:
+            self.registro.desfecho = DESFECHOS_EMBED.get(embed.title, 'embed')
+        else:
+            self.registro.desfecho = 'resposta'
+            if self.registro.primeira_parte is None:
+                self.registro.primeira_parte = agora
+        self.registro.ultima_parte = agora
+        return MensagemEnviada(content, self.registro, self.discord)
+
+
+class GeminiFalso:
+    """
+    Substitui `client` do GeminiClient: `aio.models.generate_content_stream`
+    devolve trechos `GenerateContentResponse` do próprio SDK
+    """
+
+    def __init__(self, rnd: random.Random, primeiro_token_ms: float, dispersao: float,
+                 tokens_por_segundo: float, taxa_erro: float, taxa_429: float):
+        from google.genai import errors, types
+
+        self.types = types
+        self.errors = errors
+        self.rnd = rnd
+        self.primeiro_token = primeiro_token_ms / 1000
+        self.dispersao = dispersao
+        self.tokens_por_segundo = tokens_por_segundo
+        self.taxa_erro = taxa_erro
+        self.taxa_429 = taxa_429
+        self.aio = SimpleNamespace(models=self)
+
+    async def generate_content_stream(self, model: str, contents: list, config=None):
+        sorteio = self.rnd.random()
+        if sorteio < self.taxa_429:
+            await asyncio.sleep(0.05)
+            raise self.errors.ClientError(429, {'error': {
+                'code': 429, 'message': 'Resource has been exhausted (e.g. check quota).',
+                'status': 'RESOURCE_EXHAUSTED'}})
+        materia = self.rnd.choice(list(MATERIAS))
+        resposta = gerar_resposta(self.rnd, materia, self.rnd.choice(MATERIAS[materia]))
+        tokens_entrada = len(contents[0].parts[0].text) // CARACTERES_POR_TOKEN
+        falha = sorteio < self.taxa_429 + self.taxa_erro
+        return self._trechos(model, resposta, tokens_entrada, falha)
+
+    async def _trechos(self, modelo: str, resposta: str, tokens_entrada: int, falha: bool):
+        types = self.types
+        tamanho = TOKENS_POR_TRECHO * CARACTERES_POR_TOKEN
+        partes = [resposta[i:i + tamanho] for i in range(0, len(resposta), tamanho)]
+        espera = self.rnd.lognormvariate(math.log(self.primeiro_token), self.dispersao) if self.primeiro_token > 0 else 0
+        for indice, parte in enumerate(partes):
+            await asyncio.sleep(espera)
+            espera = TOKENS_POR_TRECHO / self.tokens_por_segundo
+            if falha and indice == len(partes) // 2:
+                raise self.errors.ServerError(503, {'error': {
+                    'code': 503, 'message': 'The model is overloaded.', 'status': 'UNAVAILABLE'}})
+            ultimo = indice == len(partes) - 1
+            yield types.GenerateContentResponse(
+                candidates=[types.Candidate(content=types.Content(role='model', parts=[types.Part(text=parte)]))],
+                model_version=modelo,
+                usage_metadata=types.GenerateContentResponseUsageMetadata(
+                    prompt_token_count=tokens_entrada,
+                    candidates_token_count=len(resposta) // CARACTERES_POR_TOKEN
+                ) if ultimo else None
+            )
+
+
+class Ambiente:
+    """Bot real ligado ao banco em um diretório temporário e às pontas falsas"""
+
+    def __init__(self, args, diretorio: str, nome: str):
+        self.args = args
+        self.rnd = random.Random(args.semente)
+        self.discord = DiscordFalso(self.rnd, args.latencia_discord)
+        caminho = os.path.join(diretorio, f"carga_{nome}.db")
+        self.caminho = caminho
+        if args.fragmentos > 1:
+            self.db: ArmazenamentoBase = ArmazenamentoFragmentado(caminho, args.fragmentos)
+        else:
+            self.db = DatabaseManager(caminho)
+        self.registros: List[Registro] = []
+        self.bot: Optional[OraculoBot] = None
+        self.eu = SimpleNamespace(id=1, bot=True)
+        self._proximo_id = 0
+
+    async def iniciar(self):
+        await self.db.inicializar()
+        config = Config()
+        gemini = GeminiClient(config)
+        falso = GeminiFalso(self.rnd, self.args.gemini_primeiro_token, self.args.gemini_dispersao,
+                            self.args.gemini_tokens_s, self.args.gemini_erros, self.args.gemini_429)
+        gemini.client, gemini.types = falso, falso.types
+        self.bot = OraculoBot(self.db, gemini, ValidadorConfianca(config), config)
+        self.bot._connection.user = self.eu
+
+    async def mencionar(self, usuario_id: int, servidor_id: int, canal_id: int) -> Registro:
+        """Uma menção, como o discord.py a entregaria, até a última parte enviada"""
+        self._proximo_id += 1
+        materia = self.rnd.choice(list(MATERIAS))
+        texto = (f"Pode explicar {self.rnd.choice(MATERIAS[materia])} em {materia} "
+                 f"para a prova da {self.rnd.choice(BANCAS)}?")
+        registro = Registro(enviada=time.perf_counter())
+        self.registros.append(registro)
+        mensagem = MensagemFalsa(self._proximo_id, usuario_id, servidor_id, canal_id, texto,
+                                 self.eu, registro, self.discord)
+        await self.bot.on_message(mensagem)
+        return registro
+
+    async def medias_por_etapa(self) -> Dict[str, float]:
+        """Média (ms) de cada etapa gravada pelo bot nas respostas"""
+        somas: Dict[str, List[float]] = {}
+        async for lote in self.db.iterar_interacoes():
+            for interacao in lote:
+                if interacao.desempenho is None:
+                    continue
+                for etapa in ('espera_fila', 'tempo_banco', 'tempo_primeiro_token', 'tempo_gemini',
+                              'tempo_validacao', 'tempo_envio'):
+                    valor = getattr(interacao.desempenho, etapa)
+                    if valor is not None:
+                        somas.setdefault(etapa, []).append(valor)
+        return {etapa: sum(valores) / len(valores) * 1000 for etapa, valores in somas.items()}
+
+
+async def cenario_rajada(ambiente: Ambiente, args):
+    """Todas as menções ao mesmo tempo, em poucos servidores"""
+    rnd = ambiente.rnd
+    await asyncio.gather(*(
+        ambiente.mencionar(100000 + i, 900 + rnd.randrange(4), 5000 + rnd.randrange(10))
+        for i in range(args.mencoes)
+    ))
+
+
+async def cenario_servidores(ambiente: Ambiente, args):
+    """Chegadas de Poisson a `taxa` menções/s por `duracao` segundos"""
+    rnd = ambiente.rnd
+    tarefas = []
+    fim = time.perf_counter() + args.duracao
+    while time.perf_counter() < fim:
+        await asyncio.sleep(rnd.expovariate(args.taxa))
+        servidor = rnd.randrange(args.servidores)
+        tarefas.append(asyncio.create_task(ambiente.mencionar(
+            100000 + rnd.randrange(args.servidores * 50), 900 + servidor,
+            5000 + servidor * 10 + rnd.randrange(10)
+        )))
+    await asyncio.gather(*tarefas)
+
+
+async def cenario_conversa(ambiente: Ambiente, args):
+    """Conversas longas: cada usuário pergunta de novo assim que recebe a resposta"""
+    async def conversa(usuario: int):
+        for _ in range(args.turnos):
+            await ambiente.mencionar(100000 + usuario, 900, 5000 + usuario % 3)
+
+    await asyncio.gather(*(conversa(usuario) for usuario in range(args.conversas)))
+
+
+CENARIOS: Dict[str, Callable[[Ambiente, argparse.Namespace], Awaitable[None]]] = {
+    'rajada': cenario_rajada,
+    'servidores': cenario_servidores,
+    'conversa': cenario_conversa,
+}
+
+
+async def vigiar_loop(atrasos: List[float], parar: asyncio.Event, intervalo: float = 0.01):
+    """Atraso (ms) de um timer de `intervalo` enquanto a carga roda"""
+    while not parar.is_set():
+        inicio = time.perf_counter()
+        await asyncio.sleep(intervalo)
+        atrasos.append((time.perf_counter() - inicio - intervalo) * 1000)
+
+
+def percentil(valores: List[float], p: float) -> float:
+    if not valores:
+        return float('nan')
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p))]
+
+
+async def medir(nome: str, args, diretorio: str) -> Dict[str, float]:
+    ambiente = Ambiente(args, diretorio, nome)
+    await ambiente.iniciar()
+    atrasos: List[float] = []
+    parar = asyncio.Event()
+    vigia = asyncio.create_task(vigiar_loop(atrasos, parar))
+    cpu = time.process_time()
+    inicio = time.perf_counter()
+    await CENARIOS[nome](ambiente, args)
+    duracao = time.perf_counter() - inicio
+    cpu = time.process_time() - cpu
+    parar.set()
+    await vigia
+    etapas = await ambiente.medias_por_etapa()
+    await ambiente.db.fechar()
+
+    registros = ambiente.registros
+    concluidas = [r for r in registros if r.desfecho == 'resposta']
+    desfechos: Dict[str, int] = {}
+    for registro in registros:
+        desfechos[registro.desfecho] = desfechos.get(registro.desfecho, 0) + 1
+    primeira = [(r.primeira_parte - r.enviada) * 1000 for r in concluidas]
+    completa = [(r.ultima_parte - r.enviada) * 1000 for r in concluidas]
+    return {
+        'mencoes': len(registros),
+        'duracao': duracao,
+        'respostas_por_segundo': len(concluidas) / duracao,
+        'primeira_p50': percentil(primeira, 0.5),
+        'primeira_p99': percentil(primeira, 0.99),
+        'completa_p50': percentil(completa, 0.5),
+        'completa_p99': percentil(completa, 0.99),
+        'desfechos': desfechos,
+        'etapas': etapas,
+        'cpu': cpu,
+        'rss_mb': rss_bytes() / 1024 / 1024,
+        'atraso_p99': percentil(atrasos, 0.99),
+        'atraso_max': max(atrasos, default=0.0),
+    }
+
+
+async def executar(args):
+    diretorio = tempfile.mkdtemp(prefix="bench_carga_")
+    try:
+        print(f"🤖 Gemini falso: primeiro token ~{args.gemini_primeiro_token:.0f}ms "
+              f"(dispersão {args.gemini_dispersao}), {args.gemini_tokens_s:.0f} tokens/s, "
+              f"falhas {args.gemini_erros:.0%}, 429 {args.gemini_429:.0%} | "
+              f"Discord ~{args.latencia_discord:.0f}ms por chamada\n")
+        for nome in args.cenarios:
+            resultado = await medir(nome, args, diretorio)
+            print(f"🚀 {nome}: {resultado['mencoes']} menções em {resultado['duracao']:.1f}s")
+            print(f"   vazão              {resultado['respostas_por_segundo']:7.1f} respostas/s")
+            print(f"   primeira parte     p50 {resultado['primeira_p50']:7.0f}ms  "
+                  f"p99 {resultado['primeira_p99']:7.0f}ms")
+            print(f"   resposta completa  p50 {resultado['completa_p50']:7.0f}ms  "
+                  f"p99 {resultado['completa_p99']:7.0f}ms")
+            print("   desfechos          " + " | ".join(
+                f"{desfecho} {quantidade}" for desfecho, quantidade in sorted(resultado['desfechos'].items())))
+            if resultado['etapas']:
+                print("   etapas (média)     " + " | ".join(
+                    f"{etapa.replace('tempo_', '')} {ms:.0f}ms" for etapa, ms in resultado['etapas'].items()))
+            print(f"   recursos           CPU {resultado['cpu']:.1f}s "
+                  f"({resultado['cpu'] / resultado['duracao']:.0%}) | RSS {resultado['rss_mb']:.0f} MB | "
+                  f"atraso do loop p99 {resultado['atraso_p99']:.1f}ms máx {resultado['atraso_max']:.1f}ms\n")
+    finally:
+        shutil.rmtree(diretorio, ignore_errors=True)
+
+
+@dataclass
+class Amostra:
+    """Medidas do modo de resistência em um instante do tempo simulado"""
+    dia: float
+    mencoes: int
+    rss: float
+    objetos: float
+    contextos: float
+    contextos_bytes: float
+    banco: float
+    p50: float
+    p99: float
+    atraso_p99: float
+
+
+def tamanho_banco(caminho: str) -> int:
+    """Bytes de todos os arquivos do banco (fragmentos, manifesto, WAL)"""
+    base = Path(caminho)
+    return sum(arquivo.stat().st_size for arquivo in base.parent.glob(f"{base.stem}*") if arquivo.is_file())
+
+
+def membro_populacao(rnd: random.Random, args, progresso: float):
+    """
+    Usuário, servidor e canal da janela ativa no ponto `progresso` (0 a 1)
+
+    A janela de `ativos` usuários anda pela população ao longo do teste; na
+    janela, os primeiros perguntam mais. Cada usuário fala em até 2 canais.
+    """
+    usuario = (int(args.populacao * progresso) + int(args.ativos * rnd.random() ** 2)) % args.populacao
+    canal = (usuario * 7919 + rnd.randrange(2)) % args.canais
+    return 100000 + usuario, 900 + canal % args.servidores, 5000 + canal
+
+
+def agendador_comprimido(ambiente: Ambiente, compressao: float) -> AgendadorManutencao:
+    """Rotinas do bot sobre contextos e banco, com intervalos e TTL divididos pela compressão"""
+    bot, db = ambiente.bot, ambiente.db
+    config = bot.config
+    agendador = AgendadorManutencao(
+        carga_atual=lambda: bot.mencoes_em_andamento,
+        limite_carga=config.maintenance_busy_threshold,
+        espera_adiamento=5 / compressao,
+        adiamento_maximo=600 / compressao
+    )
+    agendador.adicionar_intervalo("contextos_expirados",
+                                  lambda: bot.limpar_contextos_expirados(config.cache_ttl / compressao),
+                                  60 / compressao)
+    agendador.adicionar_intervalo("snapshot_contextos", bot.salvar_snapshot_contextos, 300 / compressao)
+    agendador.adicionar_intervalo("checkpoint_wal", db.checkpoint_wal, 300 / compressao)
+    agendador.adicionar_intervalo("estatisticas_diarias", db.atualizar_estatisticas_diarias, DIA / compressao)
+    return agendador
+
+
+def amostrar_resistencia(ambiente: Ambiente, dia: float, mencoes: int, latencias: List[float],
+                         atrasos: List[float]) -> Amostra:
+    """Mede o processo, o cache de contextos e o banco (esvazia as janelas de latência)"""
+    contextos, contextos_bytes = estimar_estrutura(ambiente.bot.contextos_ativos)
+    amostra = Amostra(
+        dia=dia,
+        mencoes=mencoes,
+        rss=rss_bytes(),
+        objetos=len(gc.get_objects()),
+        contextos=contextos,
+        contextos_bytes=contextos_bytes,
+        banco=tamanho_banco(ambiente.caminho),
+        p50=percentil(latencias, 0.5),
+        p99=percentil(latencias, 0.99),
+        atraso_p99=percentil(atrasos, 0.99),
+    )
+    latencias.clear()
+    atrasos.clear()
+    # Os registros em andamento continuam com as suas menções
+    ambiente.registros.clear()
+    return amostra
+
+
+def _ms(valor: float, largura: int) -> str:
+    """Milissegundos alinhados; '-' quando a janela não teve respostas"""
+    return f"{'-':>{largura + 2}}" if math.isnan(valor) else f"{valor:{largura}.0f}ms"
+
+
+def avaliar_resistencia(amostras: List[Amostra], args) -> bool:
+    """
+    Imprime a inclinação por dia simulado de cada série
+
+    False se alguma passou do limite ou se não houve pontos para calcular a
+    inclinação de uma série com limite: sem medida, o teste não aprova.
+    """
+    limites = {
+        'rss': args.limite_rss_mb, 'objetos': args.limite_objetos_mil,
+        'contextos': args.limite_contextos_mil, 'banco': args.limite_banco_mb, 'p99': args.limite_p99_ms,
+    }
+    consideradas = [amostra for amostra in amostras if amostra.dia >= args.dias_simulados * args.aquecimento]
+    if len(consideradas) < 3:
+        print(f"\n❌ Só {len(consideradas)} amostras depois do aquecimento (mínimo 3): "
+              f"aumente --dias-simulados ou reduza --amostragem")
+        return False
+
+    print(f"\n📈 Inclinação por dia simulado (a partir do dia {consideradas[0].dia:.2f})")
+    aprovado = True
+    for campo, rotulo, unidade, divisor in SERIES_RESISTENCIA:
+        pontos = [(amostra.dia, getattr(amostra, campo) / divisor) for amostra in consideradas
+                  if not math.isnan(getattr(amostra, campo))]
+        limite = limites.get(campo)
+        if len(pontos) < 3:
+            if limite:
+                aprovado = False
+            print(f"   {rotulo:<22} {'-':>12} {unidade}/dia  "
+                  f"{len(pontos)} pontos{' ❌' if limite else ''}")
+            continue
+        inclinacao = statistics.linear_regression(*zip(*pontos)).slope
+        if limite:
+            dentro = inclinacao <= limite
+            aprovado = aprovado and dentro
+            veredito = f"limite {limite:g} {'✅' if dentro else '❌'}"
+        else:
+            veredito = ""
+        print(f"   {rotulo:<22} {inclinacao:+12.2f} {unidade}/dia  {veredito}")
+    return aprovado
+
+
+async def resistencia(args) -> bool:
+    """Modo de resistência; True se nenhuma série cresceu além do limite"""
+    diretorio = tempfile.mkdtemp(prefix="bench_resistencia_")
+    try:
+        ambiente = Ambiente(args, diretorio, 'resistencia')
+        await ambiente.iniciar()
+        agendador = agendador_comprimido(ambiente, args.compressao)
+        agendador.iniciar()
+        atrasos: List[float] = []
+        parar = asyncio.Event()
+        vigia = asyncio.create_task(vigiar_loop(atrasos, parar))
+
+        rnd = ambiente.rnd
+        total_simulado = args.dias_simulados * DIA
+        duracao = total_simulado / args.compressao
+        intervalo_amostra = args.amostragem / args.compressao
+        latencias: List[float] = []
+        pendentes = set()
+        amostras: List[Amostra] = []
+        mencoes = 0
+
+        async def mencao(usuario: int, servidor: int, canal: int):
+            registro = await ambiente.mencionar(usuario, servidor, canal)
+            if registro.desfecho == 'resposta':
+                latencias.append((registro.ultima_parte - registro.enviada) * 1000)
+
+        print(f"⏳ {args.dias_simulados:g} dias simulados em {duracao:.0f}s ({args.compressao:g}x), "
+              f"{args.taxa:g} menções/s, população de {args.populacao} usuários em {args.canais} canais "
+              f"({args.ativos} ativos por vez)\n")
+        print(f"   {'dia':>6} {'menções':>8} {'RSS':>8} {'objetos':>9} {'contextos':>9} {'banco':>8} "
+              f"{'p50':>7} {'p99':>7} {'loop p99':>8}")
+        inicio = time.perf_counter()
+        proxima_amostra = inicio + intervalo_amostra
+        while time.perf_counter() - inicio < duracao:
+            await asyncio.sleep(rnd.expovariate(args.taxa))
+            simulado = (time.perf_counter() - inicio) * args.compressao
+            tarefa = asyncio.create_task(mencao(*membro_populacao(rnd, args, simulado / total_simulado)))
+            pendentes.add(tarefa)
+            tarefa.add_done_callback(pendentes.discard)
+            mencoes += 1
+            if time.perf_counter() >= proxima_amostra:
+                proxima_amostra += intervalo_amostra
+                amostra = amostrar_resistencia(ambiente, simulado / DIA, mencoes, latencias, atrasos)
+                amostras.append(amostra)
+                print(f"   {amostra.dia:6.2f} {amostra.mencoes:8d} {amostra.rss / 1024 / 1024:6.0f}MB "
+                      f"{amostra.objetos:9.0f} {amostra.contextos:9.0f} {amostra.banco / 1024 / 1024:6.1f}MB "
+                      f"{_ms(amostra.p50, 5)} {_ms(amostra.p99, 5)} {amostra.atraso_p99:6.1f}ms")
+
+        await asyncio.gather(*pendentes)
+        await agendador.parar()
+        parar.set()
+        await vigia
+        await ambiente.db.fechar()
+        print("\n⏰ Manutenção")
+        for nome, tarefa in agendador.estatisticas().items():
+            print(f"   {nome:<22} {tarefa['execucoes']:6d} execuções  máx "
+                  f"{tarefa['duracao_maxima'] * 1000:8.1f}ms  {tarefa['adiamentos']} adiamentos  "
+                  f"{tarefa['falhas']} falhas")
+        return avaliar_resistencia(amostras, args)
+    finally:
+        shutil.rmtree(diretorio, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--cenarios', nargs='+', choices=list(CENARIOS), default=list(CENARIOS))
+    parser.add_argument('--mencoes', type=int, default=200, help="Menções da rajada")
+    parser.add_argument('--taxa', type=float, default=10.0, help="Menções por segundo (servidores, resistência)")
+    parser.add_argument('--duracao', type=float, default=20.0, help="Segundos de chegadas (servidores)")
+    parser.add_argument('--servidores', type=int, default=100,
+                        help="Servidores distintos (servidores, resistência)")
+    parser.add_argument('--conversas', type=int, default=10, help="Usuários conversando (conversa)")
+    parser.add_argument('--turnos', type=int, default=15, help="Perguntas por conversa (conversa)")
+    parser.add_argument('--gemini-primeiro-token', type=float, default=800.0,
+                        help="Mediana (ms) até o primeiro trecho")
+    parser.add_argument('--gemini-dispersao', type=float, default=0.5,
+                        help="Sigma da lognormal do primeiro token")
+    parser.add_argument('--gemini-tokens-s', type=float, default=150.0, help="Vazão do streaming")
+    parser.add_argument('--gemini-erros', type=float, default=0.01, help="Fração com falha (503)")
+    parser.add_argument('--gemini-429', type=float, default=0.0, help="Fração com 429")
+    parser.add_argument('--latencia-discord', type=float, default=60.0,
+                        help="Média (ms) de cada chamada à API do Discord")
+    parser.add_argument('--fragmentos', type=int, default=1, help="Fragmentos do banco")
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--verbose', action='store_true', help="Mostra os logs do bot (WARNING)")
+    resistencia_args = parser.add_argument_group('resistência')
+    resistencia_args.add_argument('--resistencia', action='store_true',
+                                  help="Roda o modo de resistência no lugar dos cenários")
+    resistencia_args.add_argument('--dias-simulados', type=float, default=3.0, help="Duração simulada")
+    resistencia_args.add_argument('--compressao', type=float, default=1440.0,
+                                  help="Segundos simulados por segundo real")
+    resistencia_args.add_argument('--populacao', type=int, default=1_000_000, help="Usuários distintos")
+    resistencia_args.add_argument('--canais', type=int, default=100_000, help="Canais distintos")
+    resistencia_args.add_argument('--ativos', type=int, default=20_000, help="Usuários ativos por vez")
+    resistencia_args.add_argument('--amostragem', type=float, default=3600.0,
+                                  help="Segundos simulados entre amostras")
+    resistencia_args.add_argument('--aquecimento', type=float, default=0.25,
+                                  help="Fração inicial fora do ajuste das inclinações")
+    resistencia_args.add_argument('--limite-rss-mb', type=float, default=64.0, help="MB/dia simulado")
+    resistencia_args.add_argument('--limite-objetos-mil', type=float, default=500.0,
+                                  help="Milhares de objetos/dia simulado")
+    resistencia_args.add_argument('--limite-contextos-mil', type=float, default=5.0,
+                                  help="Milhares de contextos em cache/dia simulado")
+    resistencia_args.add_argument('--limite-banco-mb', type=float, default=0.0,
+                                  help="MB/dia simulado (0: sem limite; a retenção não roda)")
+    resistencia_args.add_argument('--limite-p99-ms', type=float, default=500.0,
+                                  help="Aumento do p99 das respostas, ms/dia simulado")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING if args.verbose else logging.CRITICAL)
+    if args.resistencia:
+        if not asyncio.run(resistencia(args)):
+            print("\n❌ Crescimento acima do limite ou série sem inclinação calculável")
+            sys.exit(1)
+        print("\n✅ Nenhuma série cresceu acima do limite")
+        return
+    asyncio.run(executar(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Corpus sintético de perguntas e respostas para os benchmarks
+Imita o formato das respostas do bot: seções em markdown, citações de lei e
+avisos fixos, com parte das perguntas repetidas (dúvidas frequentes), e
+respostas de tamanhos variados para os microbenchmarks do pós-processamento
+"""
+
+import random
+from dataclasses import dataclass
+from typing import Iterator, List, Optional, Tuple
+
+
+MATERIAS = {
+    'Direito Constitucional': [
+        'direitos fundamentais', 'controle de constitucionalidade', 'organização dos poderes',
+        'remédios constitucionais', 'processo legislativo', 'nacionalidade',
+    ],
+    'Direito Administrativo': [
+        'princípios da administração pública', 'atos administrativos', 'licitações',
+        'improbidade administrativa', 'agentes públicos', 'responsabilidade civil do Estado',
+    ],
+    'Português': [
+        'crase', 'concordância verbal', 'regência nominal', 'colocação pronominal',
+        'pontuação', 'interpretação de texto',
+    ],
+    'Raciocínio Lógico': [
+        'proposições compostas', 'equivalências lógicas', 'análise combinatória',
+        'probabilidade', 'diagramas lógicos',
+    ],
+}
+
+LEIS = [
+    ('CF/88', 250), ('Lei 8.112/90', 253), ('Lei 14.133/21', 194),
+    ('Lei 8.429/92', 25), ('Lei 9.784/99', 70), ('Lei 8.666/93', 126),
+]
+
+BANCAS = ['CESPE/CEBRASPE', 'FCC', 'FGV', 'VUNESP', 'CESGRANRIO']
+
+ABERTURAS = [
+    "Segundo a doutrina majoritária, {tema} é um dos tópicos mais cobrados em {materia}.",
+    "Em {materia}, {tema} costuma aparecer em questões de nível médio e superior.",
+    "A banca {banca} cobra {tema} com frequência, em especial a literalidade da lei.",
+]
+
+DESENVOLVIMENTOS = [
+    "Nos termos do art. {artigo} da {lei}, a regra geral admite exceções expressas.",
+    "O STF já decidiu que a interpretação deve ser restritiva quando houver limitação de direitos.",
+    "Atenção à diferença entre competência privativa e competência exclusiva.",
+    "A jurisprudência do STJ consolidou o entendimento em sede de recursos repetitivos.",
+    "A {lei} trouxe alterações relevantes sobre {tema}, especialmente no art. {artigo}.",
+    "Questões costumam trocar 'poderá' por 'deverá'; leia o enunciado com cuidado.",
+]
+
+# Trechos das respostas longas: listas, prazos, percentuais, datas, ressalvas
+# e pares de frases que o validador lê como contradição
+DETALHAMENTOS = [
+    "Requisitos básicos:\n- nacionalidade brasileira;\n- gozo dos direitos políticos;\n"
+    "- quitação com as obrigações militares e eleitorais;\n- idade mínima de 18 anos.",
+    "1. Previsão legal\n2. Competência do agente\n3. Forma prescrita\n4. Motivo e objeto lícitos",
+    "O adicional de férias corresponde a 1/3 da remuneração, e a gratificação natalina a 100% "
+    "da remuneração de dezembro, conforme o art. {artigo} da {lei}.",
+    "O prazo prescricional é de 5 anos, contado da data do fato (ex.: 15/03/2019), "
+    "salvo disposição em contrário no Decreto nº 9.739/2019.",
+    "Na prática, ou seja, no dia da prova, não confundir estabilidade com efetividade: "
+    "a estabilidade é no serviço público, a efetividade é no cargo público.",
+    "A posse é obrigatório requisito para o exercício. Em alguns casos ela é opcional "
+    "para cargos em comissão, o que gera dúvidas.",
+    "A acumulação de cargos é permitida nas hipóteses constitucionais. Fora delas é proibido "
+    "acumular, ainda que haja compatibilidade de horários.",
+    "Possivelmente a banca cobrará a jurisprudência mais recente; em geral o STF e o STJ "
+    "convergem, mas normalmente a questão segue a literalidade da CF/88, art. {artigo}.",
+    "Segundo a CLT, art. {artigo}, o regime celetista difere do estatutário quanto à "
+    "estabilidade, ao regime jurídico e à aposentadoria.",
+]
+
+AVISO = "⚠️ Confirme sempre no edital e na legislação atualizada antes da prova."
+RESPOSTA_BAIXA_CONFIANCA = (
+    "Não tenho confiança suficiente para responder com precisão. "
+    "Consulte a legislação oficial no Planalto e materiais do seu cursinho."
+)
+
+
+@dataclass
+class Turno:
+    """Pergunta e resposta sintéticas"""
+    usuario_id: str
+    servidor_id: str
+    canal_id: str
+    pergunta: str
+    resposta: str
+    confianca: float
+    tempo_resposta: float
+    fontes: List[str]
+
+
+def gerar_resposta(rnd: random.Random, materia: str, tema: str) -> str:
+    """Resposta no formato markdown usado pelo bot"""
+    lei, artigos = rnd.choice(LEIS)
+    campos = {
+        'materia': materia, 'tema': tema, 'banca': rnd.choice(BANCAS),
+        'lei': lei, 'artigo': rnd.randint(1, artigos),
+    }
+    paragrafos = [rnd.choice(ABERTURAS).format(**campos)]
+    for _ in range(rnd.randint(2, 5)):
+        campos['artigo'] = rnd.randint(1, artigos)
+        paragrafos.append(rnd.choice(DESENVOLVIMENTOS).format(**campos))
+
+    return (
+        f"📚 **{tema.capitalize()}**\n\n"
+        + "\n\n".join(paragrafos)
+        + f"\n\n**Fontes:** {lei}, art. {campos['artigo']}.\n\n{AVISO}"
+    )
+
+
+def gerar_turnos(quantidade: int, usuarios: int = 200, canais: int = 20,
+                 servidores: int = 4, repeticao: float = 0.15,
+                 semente: Optional[int] = 42) -> Iterator[Turno]:
+    """
+    Gera turnos sintéticos
+
+    Args:
+        quantidade: Número de turnos
+        usuarios: Usuários distintos
+        canais: Canais distintos
+        servidores: Servidores distintos
+        repeticao: Fração de turnos que repete uma dúvida frequente com a
+            mesma resposta (inclui a resposta padrão de baixa confiança)
+        semente: Semente do gerador (None para aleatório)
+    """
+    rnd = random.Random(semente)
+    frequentes = []
+    for materia, temas in MATERIAS.items():
+        for tema in temas:
+            frequentes.append((f"O que é {tema}?", gerar_resposta(rnd, materia, tema)))
+    frequentes.append(("Qual é a resposta da questão 37 da prova de ontem?", RESPOSTA_BAIXA_CONFIANCA))
+
+    for i in range(quantidade):
+        if rnd.random() < repeticao:
+            pergunta, resposta = rnd.choice(frequentes)
+        else:
+            materia = rnd.choice(list(MATERIAS))
+            tema = rnd.choice(MATERIAS[materia])
+            pergunta = f"Pode explicar {tema} em {materia} para a prova da {rnd.choice(BANCAS)}? ({i})"
+            resposta = gerar_resposta(rnd, materia, tema)
+
+        yield Turno(
+            usuario_id=str(100000 + rnd.randrange(usuarios)),
+            servidor_id=str(900 + rnd.randrange(servidores)),
+            canal_id=str(5000 + rnd.randrange(canais)),
+            pergunta=pergunta,
+            resposta=resposta,
+            confianca=round(rnd.uniform(0.85, 0.99), 3),
+            tempo_resposta=round(rnd.uniform(0.8, 6.0), 3),
+            fontes=[rnd.choice(LEIS)[0]],
+        )
+
+
+def gerar_respostas_variadas(quantidade: int, semente: Optional[int] = 42) -> Iterator[Tuple[str, str]]:
+    """
+    Respostas de tamanhos variados para os microbenchmarks, como (faixa, texto)
+
+    Faixas: curta (abertura, base legal e aviso, ~250 caracteres), media
+    (formato padrão do bot, ~500) e longa (formato padrão com 12 a 20
+    detalhamentos, ~2 a 4 mil, como as respostas completas do Gemini)
+    """
+    rnd = random.Random(semente)
+    for i in range(quantidade):
+        materia = rnd.choice(list(MATERIAS))
+        tema = rnd.choice(MATERIAS[materia])
+        lei, artigos = rnd.choice(LEIS)
+        faixa = ('curta', 'media', 'longa')[i % 3]
+        if faixa == 'curta':
+            abertura = rnd.choice(ABERTURAS).format(materia=materia, tema=tema, banca=rnd.choice(BANCAS))
+            yield faixa, f"📚 **{tema.capitalize()}**\n\n{abertura} Base legal: {lei}, art. {rnd.randint(1, artigos)}.\n\n{AVISO}"
+            continue
+        resposta = gerar_resposta(rnd, materia, tema)
+        if faixa == 'longa':
+            detalhes = [rnd.choice(DETALHAMENTOS).format(lei=lei, artigo=rnd.randint(1, artigos))
+                        for _ in range(rnd.randint(12, 20))]
+            # Detalhamentos antes das fontes e do aviso
+            corpo, fontes, aviso = resposta.rsplit("\n\n", 2)
+            resposta = "\n\n".join([corpo, *detalhes, fontes, aviso])
+        yield faixa, resposta
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark do pipeline de logging
+
+Registra as mesmas mensagens de uma tarefa no event loop com:
+- anterior: console e arquivo como handlers síncronos, com o formatter
+  antigo (datetime.strftime, cor e emoji montados a cada registro)
+- fila texto / fila json: configurar_logger, com console e arquivo
+  escritos pela thread do QueueListener
+
+e compara o custo por chamada para quem registra (p50/p99/máximo), os
+registros efetivamente escritos por segundo (sem os descartados, até a
+fila ser drenada), o maior atraso do event loop e a taxa de descarte da
+fila. Mede também uma chamada em
+nível desativado com f-string (interpolada sempre) e com argumentos `%`.
+
+Uso:
+    python benchmarks/logging_estruturado.py --registros 50000
+"""
+
+import argparse
+import asyncio
+import contextlib
+import logging
+import logging.handlers
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from utils import logger as modulo_logger
+from utils.logger import OraculoFormatter, configurar_logger, encerrar_logging
+
+
+class FormatterAnterior(OraculoFormatter):
+    """OraculoFormatter sem os caches de data, nível e módulo"""
+
+    def _timestamp(self, criado: float) -> str:
+        return datetime.fromtimestamp(criado).strftime('%Y-%m-%d %H:%M:%S')
+
+    def _nivel(self, nome: str) -> str:
+        nivel = nome
+        if self.usar_emojis:
+            nivel = f"{self.EMOJIS.get(nome, '')} {nivel}"
+        if self.usar_cores:
+            nivel = f"{self.CORES.get(nome, '')}{nivel}{self.CORES['RESET']}"
+        return f"{nivel:<12}"
+
+    def _modulo(self, nome: str) -> str:
+        return (f"...{nome[-17:]}" if len(nome) > 20 else nome).ljust(20)
+
+
+def configurar_anterior(nome: str, arquivo: str, console) -> logging.Logger:
+    """Console e arquivo chamados diretamente por quem registra"""
+    logger = logging.getLogger(nome)
+    for handler in logger.handlers[:]:
+        logger.removeHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    console_handler = logging.StreamHandler(console)
+    console_handler.setFormatter(FormatterAnterior())
+    arquivo_handler = logging.handlers.RotatingFileHandler(
+        arquivo, maxBytes=10 * 1024 * 1024, backupCount=5, encoding='utf-8'
+    )
+    arquivo_handler.setFormatter(FormatterAnterior(usar_cores=False))
+    logger.addHandler(console_handler)
+    logger.addHandler(arquivo_handler)
+    return logger
+
+
+def percentil(valores, p: float) -> float:
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p))]
+
+
+async def registrar(logger: logging.Logger, registros: int, rajada: int,
+                    drenar: Callable[[], None]) -> Dict[str, float]:
+    """Registra em rajadas de `rajada` mensagens, cedendo o loop entre elas"""
+    chamadas = []
+    atrasos = [0.0]
+    terminou = False
+
+    async def sentinela():
+        while not terminou:
+            inicio = time.perf_counter()
+            await asyncio.sleep(0.001)
+            atrasos.append(time.perf_counter() - inicio - 0.001)
+
+    tarefa = asyncio.create_task(sentinela())
+    await asyncio.sleep(0)
+    inicio = time.perf_counter()
+    for i in range(registros):
+        antes = time.perf_counter()
+        logger.info("💬 Processando menção de %s em #%s (%d)", "usuario#1234", "duvidas", i)
+        chamadas.append(time.perf_counter() - antes)
+        if i % rajada == rajada - 1:
+            await asyncio.sleep(0)
+    emitido = time.perf_counter() - inicio
+    terminou = True
+    await tarefa
+    # Até a última linha estar no arquivo
+    await asyncio.to_thread(drenar)
+    total = time.perf_counter() - inicio
+    return {
+        'p50_us': statistics.median(chamadas) * 1e6,
+        'p99_us': percentil(chamadas, 0.99) * 1e6,
+        'max_us': max(chamadas) * 1e6,
+        'emissao_s': emitido,
+        'total_s': total,
+        'atraso_loop_ms': max(atrasos) * 1000,
+    }
+
+
+def medir_desativado(repeticoes: int) -> Dict[str, float]:
+    """Custo (µs) de uma chamada DEBUG com o logger em INFO"""
+    logger = logging.getLogger('bench_logging.desativado')
+    logger.setLevel(logging.INFO)
+    contexto = {'usuario_id': 123456789, 'turnos': [{'pergunta': 'p' * 80, 'resposta': 'r' * 400}] * 10}
+    resultados = {}
+    for nome, chamada in (
+        ('f-string', lambda: logger.debug(f"🔍 Contexto carregado: {contexto}")),
+        ('argumentos %', lambda: logger.debug("🔍 Contexto carregado: %s", contexto)),
+    ):
+        inicio = time.perf_counter()
+        for _ in range(repeticoes):
+            chamada()
+        resultados[nome] = (time.perf_counter() - inicio) / repeticoes * 1e6
+    return resultados
+
+
+async def executar(args):
+    diretorio = tempfile.mkdtemp(prefix="bench_logging_")
+    try:
+        with open(os.devnull, 'w', encoding='utf-8') as console:
+            print(f"📝 {args.registros} registros em rajadas de {args.rajada}, "
+                  f"console em {os.devnull} e arquivo em disco\n")
+            resultados = {}
+
+            logger = configurar_anterior('bench_logging.anterior',
+                                         os.path.join(diretorio, 'anterior.log'), console)
+            resultados['anterior'] = await registrar(logger, args.registros, args.rajada, lambda: None)
+            resultados['anterior']['descartados'] = 0
+            for handler in logger.handlers:
+                handler.close()
+
+            for formato in ('texto', 'json'):
+                # O StreamHandler do console guarda o sys.stdout da configuração
+                with contextlib.redirect_stdout(console):
+                    logger = configurar_logger(
+                        nome=f'bench_logging.{formato}', nivel='INFO',
+                        arquivo_log=os.path.join(diretorio, f'{formato}.log'), formato=formato
+                    )
+                    fila = modulo_logger._ouvinte.queue
+                    descartados = fila.descartados
+                    medida = await registrar(logger, args.registros, args.rajada, encerrar_logging)
+                medida['descartados'] = fila.descartados - descartados
+                resultados[f'fila {formato}'] = medida
+
+        # Vazão conta só o que chegou ao arquivo, até encerrar_logging() drenar a fila
+        for medida in resultados.values():
+            medida['escritos_s'] = (args.registros - medida['descartados']) / medida['total_s']
+
+        print("⏱️  Custo por chamada, vazão e event loop")
+        for nome, medida in resultados.items():
+            print(f"   {nome:11s} p50 {medida['p50_us']:5.1f} µs | p99 {medida['p99_us']:6.1f} µs | "
+                  f"máx {medida['max_us']:7.0f} µs | {medida['escritos_s']:8.0f} escritos/s | "
+                  f"event loop parado até {medida['atraso_loop_ms']:5.1f} ms | "
+                  f"{medida['descartados']} descartados "
+                  f"({medida['descartados'] / args.registros:.1%})")
+        anterior, texto = resultados['anterior'], resultados['fila texto']
+        print(f"   → chamada {anterior['p50_us'] / texto['p50_us']:.1f}x mais barata (p50) "
+              f"e {anterior['p99_us'] / texto['p99_us']:.1f}x (p99) com a fila")
+
+        print("\n💤 Nível desativado (DEBUG com o logger em INFO)")
+        desativado = medir_desativado(args.repeticoes)
+        for nome, custo in desativado.items():
+            print(f"   {nome:12s} {custo:6.2f} µs/chamada")
+    finally:
+        encerrar_logging()
+        shutil.rmtree(diretorio, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--registros', type=int, default=50000, help="Registros por configuração")
+    parser.add_argument('--rajada', type=int, default=50,
+                        help="Registros entre duas passagens pelo event loop")
+    parser.add_argument('--repeticoes', type=int, default=20000,
+                        help="Chamadas na medida do nível desativado")
+    asyncio.run(executar(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark do mapeamento de linhas para modelos
+
+Lê as mesmas interações de duas formas:
+- anterior: tuplas do cursor convertidas em dataclasses sem __slots__ no
+  event loop, com a resposta descomprimida linha a linha
+- atual: row factory do DatabaseManager, montando `Interacao` (com
+  __slots__) direto na thread da conexão
+
+e compara o custo por linha, as alocações durante a leitura, a memória
+retida pelos objetos, quanto tempo o event loop fica sem atender outras
+tarefas e a serialização (json.dumps(to_dict()) x pydantic-core).
+
+Uso:
+    python benchmarks/modelos.py --interacoes 20000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import field, fields, make_dataclass
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List
+
+import aiosqlite
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from corpus import gerar_turnos
+from database.db_manager import DatabaseManager
+from database.models import DesempenhoResposta, Interacao, para_json, para_momento
+
+
+# Mesma interação, com __dict__ por instância (como antes dos slots)
+InteracaoSemSlots = make_dataclass(
+    'InteracaoSemSlots',
+    [(campo.name, campo.type, field(default=campo.default, default_factory=campo.default_factory))
+     for campo in fields(Interacao)],
+    namespace={'__post_init__': Interacao.__post_init__, 'to_dict': Interacao.to_dict},
+)
+
+SQL_INTERACOES = f"""
+    SELECT i.id, i.usuario_id, i.servidor_id, i.canal_id, i.mensagem,
+           i.timestamp, i.respondida_em, i.confianca, i.tempo_resposta,
+           i.fontes_utilizadas, i.processada, {DesempenhoResposta.COLUNAS},
+           t.formato, t.dicionario_id, t.dados
+    FROM interacoes i
+    LEFT JOIN textos t ON t.id = i.resposta_texto_id
+    ORDER BY i.id
+"""
+
+
+async def ler_anterior(db: DatabaseManager) -> List:
+    """Tuplas do cursor → dataclass por argumentos nomeados, no event loop"""
+    async with aiosqlite.connect(db.db_path) as conexao:
+        cursor = await conexao.execute(SQL_INTERACOES)
+        return [
+            InteracaoSemSlots(
+                id=row[0], usuario_id=row[1], servidor_id=row[2], canal_id=row[3],
+                mensagem=row[4], timestamp=para_momento(row[5]),
+                respondida_em=para_momento(row[6]),
+                confianca=row[7], tempo_resposta=row[8],
+                fontes_utilizadas=row[9].split(',') if row[9] else [],
+                processada=bool(row[10]),
+                resposta=await db.textos.decodificar(conexao, *row[-3:])
+            )
+            for row in await cursor.fetchall()
+        ]
+
+
+async def ler_atual(db: DatabaseManager) -> List[Interacao]:
+    """Row factory: modelos montados pelo cursor"""
+    async with aiosqlite.connect(db.db_path) as conexao:
+        return await db._buscar_modelos(conexao, db._interacao_da_linha, SQL_INTERACOES)
+
+
+async def maior_atraso_do_loop(funcao: Callable[[], Awaitable[List]]) -> float:
+    """Maior atraso (ms) de um timer de 1 ms enquanto a leitura executa"""
+    atrasos = [0.0]
+    terminou = False
+
+    async def sentinela():
+        while not terminou:
+            inicio = time.perf_counter()
+            await asyncio.sleep(0.001)
+            atrasos.append(time.perf_counter() - inicio - 0.001)
+
+    tarefa = asyncio.create_task(sentinela())
+    await asyncio.sleep(0)
+    await funcao()
+    terminou = True
+    await tarefa
+    return max(atrasos) * 1000
+
+
+async def medir_leitura(funcao: Callable[[], Awaitable[List]], repeticoes: int) -> Dict[str, float]:
+    """Melhor tempo por linha (µs), alocações da leitura e memória retida pelo resultado"""
+    linhas = len(await funcao())
+    melhor = float('inf')
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        await funcao()
+        melhor = min(melhor, time.perf_counter() - inicio)
+
+    tracemalloc.start()
+    antes = tracemalloc.take_snapshot()
+    resultado = await funcao()
+    depois = tracemalloc.take_snapshot()
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    diferenca = depois.compare_to(antes, 'filename')
+    retido = sum(item.size_diff for item in diferenca)
+    blocos = sum(item.count_diff for item in diferenca)
+    # Custo do objeto em si, sem os valores dos campos
+    objeto = sys.getsizeof(resultado[0]) + (
+        sys.getsizeof(vars(resultado[0])) if hasattr(resultado[0], '__dict__') else 0
+    )
+    del resultado
+    atraso = min([await maior_atraso_do_loop(funcao) for _ in range(3)])
+    return {
+        'linhas': linhas,
+        'us_por_linha': melhor / linhas * 1e6,
+        'bytes_retidos_por_linha': retido / linhas,
+        'blocos_por_linha': blocos / linhas,
+        'bytes_objeto': objeto,
+        'pico_kb': pico / 1024,
+        'atraso_loop_ms': atraso,
+    }
+
+
+def medir_serializacao(modelos: List, codificar: Callable, repeticoes: int) -> float:
+    """Melhor tempo por modelo (µs)"""
+    melhor = float('inf')
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        for modelo in modelos:
+            codificar(modelo)
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor / len(modelos) * 1e6
+
+
+async def executar(args):
+    diretorio = tempfile.mkdtemp(prefix="bench_modelos_")
+    try:
+        db = DatabaseManager(os.path.join(diretorio, "modelos.db"))
+        await db.inicializar()
+        turnos = gerar_turnos(args.interacoes)
+        await db.registrar_interacoes_em_lote([
+            Interacao(usuario_id=t.usuario_id, servidor_id=t.servidor_id, canal_id=t.canal_id,
+                      mensagem=t.pergunta, resposta=t.resposta, confianca=t.confianca,
+                      tempo_resposta=t.tempo_resposta, fontes_utilizadas=t.fontes)
+            for t in turnos
+        ])
+        await db.otimizar_textos()
+        print(f"📝 {args.interacoes} interações gravadas\n")
+
+        print("📖 Leitura de todas as interações")
+        resultados = {}
+        for nome, funcao in (('anterior', lambda: ler_anterior(db)), ('atual', lambda: ler_atual(db))):
+            resultados[nome] = medida = await medir_leitura(funcao, args.repeticoes)
+            print(f"   {nome:9s} {medida['us_por_linha']:6.1f} µs/linha | "
+                  f"{medida['blocos_por_linha']:5.1f} blocos e "
+                  f"{medida['bytes_retidos_por_linha']:6.0f} bytes retidos/linha "
+                  f"(objeto {medida['bytes_objeto']} bytes) | pico {medida['pico_kb']:6.0f} KB | "
+                  f"event loop parado até {medida['atraso_loop_ms']:.0f} ms")
+        anterior, atual = resultados['anterior'], resultados['atual']
+        print(f"   → pico de memória {(1 - atual['pico_kb'] / anterior['pico_kb']) * 100:.0f}% menor, "
+              f"objeto {(1 - atual['bytes_objeto'] / anterior['bytes_objeto']) * 100:.0f}% menor; "
+              f"a descompressão das respostas domina o custo por linha")
+
+        print("\n🧾 Serialização JSON")
+        modelos_anteriores = await ler_anterior(db)
+        modelos_atuais = await ler_atual(db)
+        tempo_json = medir_serializacao(
+            modelos_anteriores, lambda m: json.dumps(m.to_dict(), ensure_ascii=False), args.repeticoes
+        )
+        tempo_pydantic = medir_serializacao(modelos_atuais, para_json, args.repeticoes)
+        print(f"   json.dumps(to_dict()): {tempo_json:6.2f} µs/modelo")
+        print(f"   pydantic-core:         {tempo_pydantic:6.2f} µs/modelo "
+              f"({tempo_json / tempo_pydantic:.1f}x)")
+    finally:
+        shutil.rmtree(diretorio, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--interacoes', type=int, default=20000, help="Interações gravadas")
+    parser.add_argument('--repeticoes', type=int, default=5, help="Repetições por medida (melhor tempo)")
+    asyncio.run(executar(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Microbenchmarks do pós-processamento e da validação das respostas
+
+Mede o custo por resposta das partes de CPU de cada menção, sobre respostas
+sintéticas curtas, médias e longas (corpus.gerar_respostas_variadas):
+- GeminiClient: _processar_resposta, _extrair_fontes, _calcular_confianca
+- ValidadorConfianca: gerar_relatorio_confianca, _detectar_contradicoes
+- OraculoBot: _dividir_texto_chunks
+
+Estatística no estilo do pyperf: o número de laços de cada execução é
+calibrado para durar ao menos --tempo-minimo, há uma execução de
+aquecimento descartada e --execucoes execuções medidas, resumidas em média
+± desvio padrão e mediana. --salvar grava os valores em JSON; --comparar lê
+um arquivo salvo antes e aponta as regressões acima de --limite que também
+passam no teste t de Welch (diferenças dentro do ruído não contam),
+terminando com código 1 quando há alguma.
+
+Uso:
+    python benchmarks/pos_processamento.py --salvar base.json
+    python benchmarks/pos_processamento.py --comparar base.json --limite 0.1
+"""
+
+import argparse
+import json
+import logging
+import math
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from corpus import gerar_respostas_variadas
+from bot.anti_alucinacao import ValidadorConfianca
+from bot.config import Config
+from bot.discord_bot import OraculoBot
+from bot.gemini_client import GeminiClient
+
+
+# Versão do formato do arquivo de resultados
+VERSAO_RESULTADOS = 1
+
+# |t| de Welch acima do qual a diferença não é ruído (~95% com ~10 execuções)
+T_SIGNIFICATIVO = 2.1
+
+FAIXAS = ('curta', 'media', 'longa')
+
+
+def preparar_funcoes() -> Dict[str, Callable[[Dict[str, Any]], Any]]:
+    """Funções medidas; cada uma recebe a entrada preparada de uma resposta"""
+    config = Config()
+    gemini = GeminiClient(config)
+    validador = ValidadorConfianca(config)
+    bot = OraculoBot(None, gemini, validador, config)
+    return {
+        'GeminiClient._processar_resposta': lambda e: gemini._processar_resposta(e['texto'], e['uso']),
+        'GeminiClient._extrair_fontes': lambda e: gemini._extrair_fontes(e['texto']),
+        'GeminiClient._calcular_confianca': lambda e: gemini._calcular_confianca(e['texto']),
+        'ValidadorConfianca.gerar_relatorio_confianca':
+            lambda e: validador.gerar_relatorio_confianca(e['resposta_completa']),
+        'ValidadorConfianca._detectar_contradicoes': lambda e: validador._detectar_contradicoes(e['texto']),
+        'OraculoBot._dividir_texto_chunks': lambda e: bot._dividir_texto_chunks(e['texto']),
+    }
+
+
+def preparar_entradas(quantidade: int, gemini_processar: Callable) -> Dict[str, List[Dict[str, Any]]]:
+    """Respostas do corpus por faixa, com o uso de tokens e o dicionário já processado"""
+    entradas: Dict[str, List[Dict[str, Any]]] = {faixa: [] for faixa in FAIXAS}
+    for faixa, texto in gerar_respostas_variadas(quantidade):
+        uso = SimpleNamespace(prompt_token_count=400, candidates_token_count=len(texto) // 4,
+                              thoughts_token_count=None)
+        entrada = {'texto': texto, 'uso': uso}
+        entrada['resposta_completa'] = gemini_processar(entrada)
+        entradas[faixa].append(entrada)
+    return entradas
+
+
+def executar_vez(funcao: Callable, entradas: List[Dict[str, Any]], lacos: int) -> float:
+    """Segundos por resposta em `lacos` passadas pelas entradas"""
+    inicio = time.perf_counter()
+    for _ in range(lacos):
+        for entrada in entradas:
+            funcao(entrada)
+    return (time.perf_counter() - inicio) / (lacos * len(entradas))
+
+
+def calibrar(funcao: Callable, entradas: List[Dict[str, Any]], tempo_minimo: float) -> int:
+    """Laços para uma execução durar ao menos `tempo_minimo` (dobrando, como o pyperf)"""
+    lacos = 1
+    while executar_vez(funcao, entradas, lacos) * lacos * len(entradas) < tempo_minimo:
+        lacos *= 2
+    return lacos
+
+
+def medir(funcao: Callable, entradas: List[Dict[str, Any]], execucoes: int,
+          tempo_minimo: float) -> Dict[str, Any]:
+    lacos = calibrar(funcao, entradas, tempo_minimo)
+    executar_vez(funcao, entradas, lacos)  # Aquecimento
+    valores = [executar_vez(funcao, entradas, lacos) for _ in range(execucoes)]
+    return {
+        'valores': valores,
+        'lacos': lacos,
+        'media': statistics.fmean(valores),
+        'desvio': statistics.stdev(valores) if len(valores) > 1 else 0.0,
+        'mediana': statistics.median(valores),
+        'caracteres': round(statistics.fmean(len(entrada['texto']) for entrada in entradas)),
+    }
+
+
+def formatar_tempo(segundos: float) -> str:
+    if segundos >= 1e-3:
+        return f"{segundos * 1e3:.2f} ms"
+    if segundos >= 1e-6:
+        return f"{segundos * 1e6:.1f} µs"
+    return f"{segundos * 1e9:.0f} ns"
+
+
+def welch(base: Dict[str, Any], atual: Dict[str, Any]) -> float:
+    """Estatística t de Welch entre duas séries de valores"""
+    variancia = (base['desvio'] ** 2 / len(base['valores'])
+                 + atual['desvio'] ** 2 / len(atual['valores']))
+    if variancia == 0:
+        return math.inf if atual['media'] != base['media'] else 0.0
+    return (atual['media'] - base['media']) / math.sqrt(variancia)
+
+
+def comparar(base: Dict[str, Any], atual: Dict[str, Dict[str, Any]], limite: float) -> List[str]:
+    """Imprime a comparação com um arquivo salvo e devolve as regressões"""
+    print(f"\n📊 Comparação com {base['data']} ({base.get('commit') or 'sem commit'}, "
+          f"Python {base['python']})")
+    regressoes = []
+    for nome, resultado in atual.items():
+        anterior = base['resultados'].get(nome)
+        if anterior is None:
+            continue
+        razao = resultado['mediana'] / anterior['mediana']
+        significativo = abs(welch(anterior, resultado)) >= T_SIGNIFICATIVO
+        if razao > 1 + limite and significativo:
+            marca = "⚠️ regressão"
+            regressoes.append(nome)
+        elif razao < 1 - limite and significativo:
+            marca = "🚀 mais rápido"
+        else:
+            marca = "= sem diferença significativa"
+        print(f"   {nome:<58} {formatar_tempo(anterior['mediana']):>10} → "
+              f"{formatar_tempo(resultado['mediana']):>10} ({razao:5.2f}x) {marca}")
+    return regressoes
+
+
+def commit_atual() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=Path(__file__).parent, timeout=5).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ''
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--respostas', type=int, default=90, help="Respostas do corpus (divididas nas 3 faixas)")
+    parser.add_argument('--execucoes', type=int, default=10, help="Execuções medidas por função e faixa")
+    parser.add_argument('--tempo-minimo', type=float, default=0.05, help="Segundos mínimos por execução")
+    parser.add_argument('--funcoes', nargs='+', help="Mede só as funções cujo nome contém um destes textos")
+    parser.add_argument('--salvar', help="Grava os resultados em JSON")
+    parser.add_argument('--comparar', help="Resultados salvos antes, para apontar regressões")
+    parser.add_argument('--limite', type=float, default=0.10, help="Piora relativa que conta como regressão")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.CRITICAL)
+
+    funcoes = preparar_funcoes()
+    entradas = preparar_entradas(args.respostas, funcoes['GeminiClient._processar_resposta'])
+    if args.funcoes:
+        funcoes = {nome: funcao for nome, funcao in funcoes.items()
+                   if any(filtro in nome for filtro in args.funcoes)}
+    print(f"📝 {args.respostas} respostas, {args.execucoes} execuções de ≥ {args.tempo_minimo * 1000:.0f}ms "
+          f"por função e faixa\n")
+    print(f"   {'função':<44} {'faixa':<6} {'caract.':>7}   {'média ± desvio':>22} {'mediana':>10}")
+
+    resultados: Dict[str, Dict[str, Any]] = {}
+    for nome, funcao in funcoes.items():
+        for faixa in FAIXAS:
+            resultado = medir(funcao, entradas[faixa], args.execucoes, args.tempo_minimo)
+            resultados[f"{nome}[{faixa}]"] = resultado
+            print(f"   {nome:<44} {faixa:<6} {resultado['caracteres']:>7}   "
+                  f"{formatar_tempo(resultado['media']):>10} ± {formatar_tempo(resultado['desvio']):>9} "
+                  f"{formatar_tempo(resultado['mediana']):>10}")
+
+    dados = {
+        'versao': VERSAO_RESULTADOS,
+        'data': datetime.now().isoformat(timespec='seconds'),
+        'commit': commit_atual(),
+        'python': platform.python_version(),
+        'maquina': platform.platform(),
+        'parametros': {'respostas': args.respostas, 'execucoes': args.execucoes,
+                       'tempo_minimo': args.tempo_minimo},
+        'resultados': resultados,
+    }
+    if args.salvar:
+        Path(args.salvar).write_text(json.dumps(dados, indent=2, ensure_ascii=False), encoding='utf-8')
+        print(f"\n💾 Resultados gravados em {args.salvar}")
+
+    if args.comparar:
+        base = json.loads(Path(args.comparar).read_text(encoding='utf-8'))
+        if base.get('versao') != VERSAO_RESULTADOS:
+            sys.exit(f"❌ {args.comparar}: formato {base.get('versao')}, esperado {VERSAO_RESULTADOS}")
+        regressoes = comparar(base, resultados, args.limite)
+        if regressoes:
+            print(f"\n⚠️ {len(regressoes)} regressão(ões) acima de {args.limite:.0%}: {', '.join(regressoes)}")
+            sys.exit(1)
+        print(f"\n✅ Nenhuma regressão acima de {args.limite:.0%}")
+
+
+if __name__ == "__main__":
+    main()
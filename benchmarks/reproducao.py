@@ -0,0 +1,493 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Reprodução offline do tráfego real pelo GeminiClient e pelo ValidadorConfianca
+
+Lê as perguntas de `interacoes` (com o horário em que chegaram) de um banco
+do bot, aberto somente para leitura, e as reproduz no GeminiClient e no
+ValidadorConfianca reais, na velocidade original (--velocidade 1), acelerada
+(10) ou máxima (0, com até --concorrencia turnos simultâneos). Os IDs de
+usuário, servidor e canal viram pseudônimos (hash com uma chave aleatória por
+execução) e menções, e-mails e números longos das perguntas são mascarados;
+nenhum texto aparece no relatório.
+
+Transportes do Gemini (sem rede):
+- gravado: a resposta gravada da própria interação, com o primeiro token e a
+  duração registrados (multiplicados por --escala-latencia; 0 responde na
+  hora). Turnos sem resposta gravada continuam sem resposta.
+- falso: o GeminiFalso do teste de carga (latência lognormal, falhas, 429)
+
+Entre o turno e o GeminiClient ficam as políticas em avaliação, para medi-las
+contra a distribuição real de perguntas antes de levá-las ao bot:
+- cache de respostas aprovadas na validação, por pergunta normalizada, com
+  validade --cache-ttl no tempo do tráfego e só para perguntas sem histórico
+  de conversa (--cache-ignorar-contexto inclui as demais)
+- single-flight: perguntas iguais em andamento esperam a mesma chamada (a
+  economia cresce com a velocidade, que aumenta a sobreposição)
+
+O histórico de cada conversa é montado como no bot, com os 5 últimos turnos
+reproduzidos; o anterior ao período não é carregado.
+
+Relatório: decisões (Gemini, cache, single-flight) com taxas de acerto,
+chamadas e tokens economizados, desfechos da validação, modelos usados,
+latência (p50/p95/p99) por decisão e a latência gravada no mesmo período.
+
+Uso:
+    python benchmarks/reproducao.py --banco oraculo_concursos.db --dias 1 --velocidade 10
+    python benchmarks/reproducao.py --inicio 2026-09-01 --fim 2026-09-08 --velocidade 0 --cache-ttl 86400
+    python benchmarks/reproducao.py --transporte falso --gemini-429 0.02 --sem-single-flight
+"""
+
+import argparse
+import asyncio
+import hashlib
+import logging
+import os
+import random
+import re
+import sqlite3
+import sys
+import time
+import unicodedata
+from collections import Counter
+from contextvars import ContextVar
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional, Tuple
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from carga import CARACTERES_POR_TOKEN, TOKENS_POR_TRECHO, GeminiFalso, percentil
+from bot.anti_alucinacao import ValidadorConfianca
+from bot.config import DATABASE_SCHEMA_VERSION, Config
+from bot.gemini_client import GeminiClient
+from database import textos
+from database.models import ContextoConversa, para_momento
+from ferramentas.admin import arquivos_do_banco, conectar_leitura
+
+
+# Turnos do histórico de conversa passados ao Gemini (como no bot)
+LIMITE_HISTORICO = 5
+
+SQL_TURNOS = """
+    SELECT i.usuario_id, i.servidor_id, i.canal_id, i.mensagem, i.timestamp,
+           i.tempo_resposta, i.modelo, i.tempo_primeiro_token, i.tempo_gemini,
+           i.tokens_entrada, i.tokens_saida, t.formato, t.dicionario_id, t.dados
+    FROM interacoes i
+    LEFT JOIN textos t ON t.id = i.resposta_texto_id
+    WHERE i.timestamp >= ? AND i.timestamp < ?
+    ORDER BY i.timestamp
+    LIMIT ?
+"""
+
+# Dados pessoais que podem aparecer nas perguntas
+MASCARAS = [
+    (re.compile(r'<(?:@[!&]?|#)\d+>'), '<mencao>'),
+    (re.compile(r'[\w.+-]+@[\w-]+\.[\w.-]+'), '<email>'),
+    (re.compile(r'(?:\d[\s.\-]?){9,}'), '<numero>'),
+]
+
+# Turno em reprodução na tarefa atual (lido pelo transporte gravado)
+TURNO_ATUAL: ContextVar[Optional['Turno']] = ContextVar('turno_reproduzido', default=None)
+
+
+@dataclass
+class Turno:
+    """Pergunta gravada, já anonimizada"""
+    momento: float  # Epoch da chegada
+    usuario: str
+    servidor: Optional[str]
+    canal: str
+    pergunta: str
+    resposta: Optional[str]
+    tempo_resposta: Optional[float]
+    modelo: Optional[str]
+    primeiro_token: Optional[float]
+    tempo_gemini: Optional[float]
+    tokens_entrada: Optional[int]
+    tokens_saida: Optional[int]
+
+
+@dataclass
+class Resultado:
+    """Como um turno foi atendido na reprodução"""
+    decisao: str  # gemini, cache ou single_flight
+    desfecho: str  # enviada, baixa_confianca ou erro
+    latencia: float  # Segundos do início do processamento ao resultado validado
+    atraso_despacho: float  # Segundos além do horário previsto para começar
+    modelo: Optional[str] = None
+    tokens: int = 0
+
+
+class Anonimizador:
+    """Pseudônimos estáveis durante a execução (a chave nunca é gravada)"""
+
+    def __init__(self):
+        self.chave = os.urandom(16)
+
+    def pseudonimo(self, valor: Optional[str]) -> Optional[str]:
+        if valor is None:
+            return None
+        return hashlib.blake2b(valor.encode('utf-8'), key=self.chave, digest_size=6).hexdigest()
+
+    @staticmethod
+    def mascarar(texto: str) -> str:
+        for padrao, troca in MASCARAS:
+            texto = padrao.sub(troca, texto)
+        return texto
+
+
+def normalizar_pergunta(pergunta: str) -> str:
+    """Chave do cache: minúsculas, sem acentos, pontuação nem espaços repetidos"""
+    texto = unicodedata.normalize('NFKD', pergunta.lower())
+    texto = ''.join(caractere for caractere in texto if not unicodedata.combining(caractere))
+    return ' '.join(re.sub(r'[^\w<>]+', ' ', texto).split())
+
+
+def para_epoch(valor: str) -> float:
+    momento = para_momento(valor)
+    if momento.tzinfo is None:
+        momento = momento.replace(tzinfo=timezone.utc)
+    return momento.timestamp()
+
+
+def periodo(args) -> Tuple[str, str]:
+    """Início e fim (texto como em `interacoes.timestamp`, UTC) do tráfego reproduzido"""
+    fim = datetime.fromisoformat(args.fim) if args.fim else datetime.now(timezone.utc).replace(tzinfo=None)
+    inicio = datetime.fromisoformat(args.inicio) if args.inicio else fim - timedelta(days=args.dias)
+    return inicio.strftime('%Y-%m-%d %H:%M:%S'), fim.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def tupla_versao(versao: str) -> Tuple[int, ...]:
+    """'2.10' → (2, 10), comparável entre versões"""
+    return tuple(int(parte) for parte in versao.split('.'))
+
+
+async def exigir_schema_atual(db, arquivo: str):
+    """Encerra com orientação se o arquivo ainda não foi migrado (a leitura é somente leitura)"""
+    try:
+        cursor = await db.execute("SELECT versao FROM schema_versao")
+        versoes = [row[0] for row in await cursor.fetchall()]
+    except sqlite3.OperationalError:  # Anterior ao controle de versões
+        versoes = []
+    atual = max(versoes, key=tupla_versao, default=None)
+    if atual is None or tupla_versao(atual) < tupla_versao(DATABASE_SCHEMA_VERSION):
+        sys.exit(f"❌ {arquivo} está no schema {atual or 'anterior ao controle de versões'}; "
+                 f"a reprodução requer {DATABASE_SCHEMA_VERSION}. Inicie o bot uma vez "
+                 f"com este banco para migrá-lo")
+
+
+async def carregar_turnos(args, anonimizador: Anonimizador) -> List[Turno]:
+    """Turnos do período em ordem de chegada (todos os fragmentos do banco)"""
+    inicio, fim = periodo(args)
+    turnos: List[Turno] = []
+    for arquivo in arquivos_do_banco(args.banco):
+        armazem = textos.ArmazemTextos()
+        async with conectar_leitura(arquivo) as db:
+            await exigir_schema_atual(db, arquivo)
+            await armazem.carregar(db)
+            cursor = await db.execute(SQL_TURNOS, (inicio, fim, args.limite))
+            linhas = await cursor.fetchall()
+        for linha in linhas:
+            turnos.append(Turno(
+                momento=para_epoch(linha[4]),
+                usuario=anonimizador.pseudonimo(linha[0]),
+                servidor=anonimizador.pseudonimo(linha[1]),
+                canal=anonimizador.pseudonimo(linha[2]),
+                pergunta=anonimizador.mascarar(linha[3]),
+                resposta=armazem.descomprimir(linha[11], linha[12], linha[13]),
+                tempo_resposta=linha[5], modelo=linha[6], primeiro_token=linha[7],
+                tempo_gemini=linha[8], tokens_entrada=linha[9], tokens_saida=linha[10]
+            ))
+    turnos.sort(key=lambda turno: turno.momento)
+    return turnos[:args.limite]
+
+
+class GeminiGravado:
+    """
+    Substitui `client` do GeminiClient: devolve em streaming a resposta
+    gravada do turno em reprodução, com a latência registrada
+    """
+
+    def __init__(self, escala_latencia: float):
+        from google.genai import types
+
+        self.types = types
+        self.escala = escala_latencia
+        self.aio = SimpleNamespace(models=self)
+
+    async def generate_content_stream(self, model: str, contents: list, config=None):
+        tokens_entrada = len(contents[0].parts[0].text) // CARACTERES_POR_TOKEN
+        return self._trechos(model, TURNO_ATUAL.get(), tokens_entrada)
+
+    async def _trechos(self, modelo: str, turno: Turno, tokens_entrada: int):
+        types = self.types
+        resposta = turno.resposta or ''
+        tamanho = TOKENS_POR_TRECHO * CARACTERES_POR_TOKEN
+        partes = [resposta[i:i + tamanho] for i in range(0, len(resposta), tamanho)] or ['']
+        primeiro_token = turno.primeiro_token or 0.0
+        espera = primeiro_token * self.escala
+        intervalo = (max(0.0, (turno.tempo_gemini or 0.0) - primeiro_token) * self.escala
+                     / max(1, len(partes) - 1))
+        for indice, parte in enumerate(partes):
+            await asyncio.sleep(espera)
+            espera = intervalo
+            ultimo = indice == len(partes) - 1
+            yield types.GenerateContentResponse(
+                candidates=[types.Candidate(content=types.Content(role='model', parts=[types.Part(text=parte)]))],
+                model_version=modelo,
+                usage_metadata=types.GenerateContentResponseUsageMetadata(
+                    prompt_token_count=turno.tokens_entrada or tokens_entrada,
+                    candidates_token_count=turno.tokens_saida or len(resposta) // CARACTERES_POR_TOKEN
+                ) if ultimo else None
+            )
+
+
+class Politicas:
+    """Cache de respostas e single-flight na frente do GeminiClient"""
+
+    def __init__(self, gemini: GeminiClient, cache_ttl: float, single_flight: bool,
+                 ignorar_contexto: bool):
+        self.gemini = gemini
+        self.cache_ttl = cache_ttl
+        self.single_flight = single_flight
+        self.ignorar_contexto = ignorar_contexto
+        self.cache: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+        self.maior_cache = 0
+        self.em_andamento: Dict[str, asyncio.Future] = {}
+        self.inelegiveis = 0
+
+    def chave(self, turno: Turno, contexto: ContextoConversa) -> Optional[str]:
+        """Chave do turno, ou None se a resposta depende do histórico"""
+        if contexto.historico and not self.ignorar_contexto:
+            self.inelegiveis += 1
+            return None
+        return normalizar_pergunta(turno.pergunta)
+
+    async def gerar(self, turno: Turno, contexto: ContextoConversa,
+                    chave: Optional[str]) -> Tuple[str, Dict[str, Any]]:
+        """(decisão, resposta_completa) para o turno"""
+        if chave is not None and self.cache_ttl > 0:
+            guardado = self.cache.get(chave)
+            if guardado is not None and turno.momento - guardado[0] <= self.cache_ttl:
+                return 'cache', guardado[1]
+        if chave is None or not self.single_flight:
+            return 'gemini', await self._chamar(turno, contexto)
+
+        futuro = self.em_andamento.get(chave)
+        if futuro is not None:
+            return 'single_flight', await asyncio.shield(futuro)
+        futuro = asyncio.get_running_loop().create_future()
+        # Falhas sem ninguém esperando não viram aviso de exceção não lida
+        futuro.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self.em_andamento[chave] = futuro
+        try:
+            resultado = await self._chamar(turno, contexto)
+            futuro.set_result(resultado)
+            return 'gemini', resultado
+        except Exception as e:
+            futuro.set_exception(e)
+            raise
+        finally:
+            del self.em_andamento[chave]
+
+    def guardar(self, turno: Turno, chave: Optional[str], resultado: Dict[str, Any]):
+        """Guarda uma resposta aprovada na validação"""
+        if chave is None or self.cache_ttl <= 0:
+            return
+        self.cache[chave] = (turno.momento, resultado)
+        self.maior_cache = max(self.maior_cache, len(self.cache))
+
+    async def _chamar(self, turno: Turno, contexto: ContextoConversa) -> Dict[str, Any]:
+        TURNO_ATUAL.set(turno)
+        return await self.gemini.gerar_resposta_concurso(turno.pergunta, contexto, turno.usuario)
+
+
+class Reproducao:
+    """Despacha os turnos no ritmo escolhido e registra como cada um foi atendido"""
+
+    def __init__(self, args, turnos: List[Turno]):
+        self.args = args
+        self.turnos = turnos
+        config = Config()
+        if args.modelo:
+            config.default_model = args.modelo
+        self.gemini = GeminiClient(config)
+        if args.transporte == 'gravado':
+            transporte = GeminiGravado(args.escala_latencia)
+        else:
+            transporte = GeminiFalso(random.Random(args.semente), args.gemini_primeiro_token,
+                                     args.gemini_dispersao, args.gemini_tokens_s, args.gemini_erros,
+                                     args.gemini_429)
+        self.gemini.client, self.gemini.types = transporte, transporte.types
+        self.validador = ValidadorConfianca(config)
+        self.politicas = Politicas(self.gemini, args.cache_ttl, not args.sem_single_flight,
+                                   args.cache_ignorar_contexto)
+        self.conversas: Dict[Tuple[str, str], ContextoConversa] = {}
+        self.resultados: List[Resultado] = []
+        self.limite = asyncio.Semaphore(args.concorrencia) if args.velocidade <= 0 else None
+
+    def contexto(self, turno: Turno) -> ContextoConversa:
+        chave = (turno.usuario, turno.canal)
+        if chave not in self.conversas:
+            self.conversas[chave] = ContextoConversa(usuario_id=turno.usuario, canal_id=turno.canal,
+                                                     servidor_id=turno.servidor)
+        return self.conversas[chave]
+
+    async def atender(self, turno: Turno, previsto: float):
+        inicio = time.perf_counter()
+        contexto = self.contexto(turno)
+        chave = self.politicas.chave(turno, contexto)
+        decisao = 'gemini'
+        try:
+            decisao, resultado = await self.politicas.gerar(turno, contexto, chave)
+            confiavel = self.validador.resposta_confiavel(resultado)
+        except Exception:
+            self.resultados.append(Resultado(decisao, 'erro', time.perf_counter() - inicio,
+                                             max(0.0, inicio - previsto)))
+            return
+        if confiavel:
+            contexto.adicionar_interacao(turno.pergunta, resultado['resposta'], resultado.get('confianca'),
+                                         limite=LIMITE_HISTORICO)
+            if decisao == 'gemini':
+                self.politicas.guardar(turno, chave, resultado)
+        self.resultados.append(Resultado(
+            decisao, 'enviada' if confiavel else 'baixa_confianca', time.perf_counter() - inicio,
+            max(0.0, inicio - previsto), resultado.get('modelo_usado'),
+            (resultado.get('tokens_entrada') or 0) + (resultado.get('tokens_saida') or 0)
+        ))
+
+    async def _atender_limitado(self, turno: Turno):
+        async with self.limite:
+            await self.atender(turno, time.perf_counter())
+
+    async def executar(self) -> float:
+        """Reproduz todos os turnos; devolve a duração em segundos"""
+        await self.gemini.preparar()
+        tarefas = []
+        inicio = time.perf_counter()
+        origem = self.turnos[0].momento
+        for turno in self.turnos:
+            if self.limite is not None:
+                tarefas.append(asyncio.create_task(self._atender_limitado(turno)))
+                continue
+            previsto = inicio + (turno.momento - origem) / self.args.velocidade
+            espera = previsto - time.perf_counter()
+            if espera > 0:
+                await asyncio.sleep(espera)
+            tarefas.append(asyncio.create_task(self.atender(turno, previsto)))
+        await asyncio.gather(*tarefas)
+        return time.perf_counter() - inicio
+
+
+def linha_latencias(rotulo: str, valores: List[float]) -> str:
+    milissegundos = [valor * 1000 for valor in valores]
+    return (f"   {rotulo:<22} {len(valores):>7}  p50 {percentil(milissegundos, 0.5):8.0f}ms  "
+            f"p95 {percentil(milissegundos, 0.95):8.0f}ms  p99 {percentil(milissegundos, 0.99):8.0f}ms")
+
+
+def relatorio(reproducao: Reproducao, duracao: float):
+    args = reproducao.args
+    turnos = reproducao.turnos
+    resultados = reproducao.resultados
+    politicas = reproducao.politicas
+    total = len(resultados)
+    decisoes = Counter(resultado.decisao for resultado in resultados)
+    reaproveitadas = [resultado for resultado in resultados
+                      if resultado.decisao != 'gemini' and resultado.desfecho != 'erro']
+    elegiveis = total - politicas.inelegiveis
+
+    trafego = turnos[-1].momento - turnos[0].momento
+    print(f"▶️ {total} turnos ({trafego / 3600:.1f}h de tráfego) em {duracao:.1f}s "
+          f"({total / duracao:.1f} turnos/s)")
+    print("\n🔀 Decisões")
+    for decisao in ('gemini', 'cache', 'single_flight'):
+        print(f"   {decisao:<22} {decisoes.get(decisao, 0):>7} ({decisoes.get(decisao, 0) / total:.1%})")
+    print(f"   elegíveis              {elegiveis:>7} ({elegiveis / total:.1%}; "
+          f"{politicas.inelegiveis} com histórico de conversa)")
+    if elegiveis:
+        print(f"   acerto do cache        {decisoes.get('cache', 0) / elegiveis:.1%} dos elegíveis "
+              f"(até {politicas.maior_cache} respostas guardadas)")
+    print(f"   economia               {len(reaproveitadas)} chamadas ao Gemini "
+          f"({len(reaproveitadas) / total:.1%}), ~{sum(r.tokens for r in reaproveitadas)} tokens")
+
+    print("\n✅ Desfechos")
+    for desfecho, quantidade in Counter(resultado.desfecho for resultado in resultados).most_common():
+        print(f"   {desfecho:<22} {quantidade:>7} ({quantidade / total:.1%})")
+
+    print("\n🧠 Modelos")
+    gravados = Counter(turno.modelo for turno in turnos if turno.modelo)
+    usados = Counter(resultado.modelo for resultado in resultados
+                     if resultado.decisao == 'gemini' and resultado.modelo)
+    for modelo in sorted(set(gravados) | set(usados)):
+        print(f"   {modelo:<22} reprodução {usados.get(modelo, 0):>7} | gravado {gravados.get(modelo, 0):>7}")
+
+    print("\n⏱️ Latência (processamento até a validação)")
+    for decisao in ('gemini', 'cache', 'single_flight'):
+        valores = [r.latencia for r in resultados if r.decisao == decisao and r.desfecho != 'erro']
+        if valores:
+            print(linha_latencias(decisao, valores))
+    print(linha_latencias('todas', [r.latencia for r in resultados]))
+    gravadas = [turno.tempo_gemini for turno in turnos if turno.tempo_gemini is not None]
+    if gravadas:
+        print(linha_latencias('Gemini gravado', gravadas))
+    gravadas = [turno.tempo_resposta for turno in turnos if turno.tempo_resposta is not None]
+    if gravadas:
+        print(linha_latencias('resposta gravada', gravadas))
+    if args.velocidade > 0:
+        print(linha_latencias('atraso do despacho', [r.atraso_despacho for r in resultados]))
+
+
+async def executar(args):
+    turnos = await carregar_turnos(args, Anonimizador())
+    if not turnos:
+        inicio, fim = periodo(args)
+        sys.exit(f"❌ Nenhuma interação entre {inicio} e {fim} em {args.banco}")
+    ritmo = f"{args.velocidade:g}x" if args.velocidade > 0 else f"máxima ({args.concorrencia} simultâneos)"
+    transporte = (f"gravado (latência x{args.escala_latencia:g})" if args.transporte == 'gravado'
+                  else f"falso (~{args.gemini_primeiro_token:.0f}ms até o primeiro token)")
+    cache = f"cache {args.cache_ttl:g}s" if args.cache_ttl > 0 else "sem cache"
+    print(f"📝 {len(turnos)} turnos de {args.banco} | velocidade {ritmo} | Gemini {transporte} | "
+          f"{cache}{'' if args.sem_single_flight else ' + single-flight'}\n")
+    reproducao = Reproducao(args, turnos)
+    duracao = await reproducao.executar()
+    relatorio(reproducao, duracao)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--banco', default=Config().database_path, help="Banco do bot (único ou fragmentado)")
+    parser.add_argument('--inicio', help="Início do período (AAAA-MM-DD[ HH:MM:SS], UTC)")
+    parser.add_argument('--fim', help="Fim do período (padrão: agora)")
+    parser.add_argument('--dias', type=float, default=1.0, help="Dias antes do fim, sem --inicio")
+    parser.add_argument('--limite', type=int, default=100_000, help="Máximo de turnos reproduzidos")
+    parser.add_argument('--velocidade', type=float, default=1.0,
+                        help="Multiplicador do ritmo original (0 = máxima)")
+    parser.add_argument('--concorrencia', type=int, default=32, help="Turnos simultâneos na velocidade máxima")
+    parser.add_argument('--transporte', choices=('gravado', 'falso'), default='gravado')
+    parser.add_argument('--escala-latencia', type=float, default=1.0,
+                        help="Multiplica a latência gravada do Gemini (0 = imediata)")
+    parser.add_argument('--modelo', help="Modelo pedido ao Gemini (padrão: GEMINI_MODEL)")
+    parser.add_argument('--cache-ttl', type=float, default=3600.0,
+                        help="Validade (s, no tempo do tráfego) das respostas em cache; 0 desliga")
+    parser.add_argument('--cache-ignorar-contexto', action='store_true',
+                        help="Usa o cache também em perguntas com histórico de conversa")
+    parser.add_argument('--sem-single-flight', action='store_true', help="Desliga o single-flight")
+    parser.add_argument('--gemini-primeiro-token', type=float, default=800.0,
+                        help="Mediana (ms) até o primeiro trecho (falso)")
+    parser.add_argument('--gemini-dispersao', type=float, default=0.5,
+                        help="Sigma da lognormal do primeiro token (falso)")
+    parser.add_argument('--gemini-tokens-s', type=float, default=150.0, help="Vazão do streaming (falso)")
+    parser.add_argument('--gemini-erros', type=float, default=0.0, help="Fração com falha, 503 (falso)")
+    parser.add_argument('--gemini-429', type=float, default=0.0, help="Fração com 429 (falso)")
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--verbose', action='store_true', help="Mostra os logs do cliente (WARNING)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING if args.verbose else logging.CRITICAL)
+    asyncio.run(executar(args))
+
+
+if __name__ == "__main__":
+    main()
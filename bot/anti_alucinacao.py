@@ -10,8 +10,12 @@ import logging
 from typing import Dict, List, Any, Optional, Tuple
 from datetime import datetime
 import json
+from collections import deque
 
 from bot.config import Config
+from utils.memoria import obter_monitor_memoria
+from utils.perfilamento import perfilar
+from utils.rastreamento import rastrear, span_atual
 
 
 class ValidadorConfianca:
@@ -69,6 +73,8 @@ class ValidadorConfianca:
             'súmula', 'jurisprudência', 'stf', 'stj', 'tcu'
         ]
     
+    @perfilar()
+    @rastrear()
     def resposta_confiavel(self, resposta_completa: Dict[str, Any]) -> bool:
         """
         Avalia se uma resposta é confiável o suficiente para ser enviada
@@ -91,11 +97,11 @@ class ValidadorConfianca:
             score_final = (score_proprio * 0.7) + (confianca_gemini * 0.3)
             
             resultado_confiavel = score_final >= self.confianca_minima
+            span_atual().definir('score_final', round(score_final, 4))
             
             self.logger.info(
-                f"🔍 Validação confiança - Gemini: {confianca_gemini:.2f}, "
-                f"Próprio: {score_proprio:.2f}, Final: {score_final:.2f}, "
-                f"Confiável: {resultado_confiavel}"
+                "🔍 Validação confiança - Gemini: %.2f, Próprio: %.2f, Final: %.2f, Confiável: %s",
+                confianca_gemini, score_proprio, score_final, resultado_confiavel
             )
             
             return resultado_confiavel
@@ -121,13 +127,13 @@ class ValidadorConfianca:
         for padrao in self.padroes_alta_confianca:
             if re.search(padrao, resposta):
                 score += 0.15
-                self.logger.debug(f"🔍 Padrão alta confiança encontrado: {padrao}")
+                self.logger.debug("🔍 Padrão alta confiança encontrado: %s", padrao)
         
         # 2. Penalizar padrões de baixa confiança
         for padrao in self.padroes_baixa_confianca:
             if re.search(padrao, resposta):
                 score -= 0.2
-                self.logger.debug(f"⚠️ Padrão baixa confiança encontrado: {padrao}")
+                self.logger.debug("⚠️ Padrão baixa confiança encontrado: %s", padrao)
         
         # 3. Bonificar termos técnicos
         termos_encontrados = 0
@@ -177,7 +183,7 @@ class ValidadorConfianca:
         bonus = 0.0
         
         # Verificar se há organização (listas, tópicos)
-        if re.search(r'(?:\n|^)[\d\-\*\s*', resposta):
+        if re.search(r'(?:\n|^)[\d\-\*•]\s*', resposta):
             bonus += 0.05
         
         # Verificar se há explicação detalhada
@@ -314,6 +320,7 @@ class ValidadorConfianca:
         
         return sugestoes
     
+    @perfilar()
     def gerar_relatorio_confianca(self, resposta_completa: Dict[str, Any]) -> Dict[str, Any]:
         """
         Gera relatório completo de confiança da resposta
@@ -339,7 +346,7 @@ class ValidadorConfianca:
                 'fontes_citadas': len(fontes),
                 'termos_tecnicos': self._contar_termos_tecnicos(resposta),
                 'comprimento_resposta': len(resposta),
-                'estrutura_organizada': bool(re.search(r'(?:\n|^)[\d\-\*\s*', resposta))
+                'estrutura_organizada': bool(re.search(r'(?:\n|^)[\d\-\*•]\s*', resposta))
             },
             'riscos_identificados': riscos,
             'sugestoes_melhoria': sugestoes,
@@ -354,6 +361,10 @@ class ValidadorConfianca:
         return sum(1 for termo in self.termos_tecnicos_concursos if termo in resposta_lower)
 
 
+# Alertas guardados pelo MonitorAlucinacao
+LIMITE_ALERTAS = 100
+
+
 class MonitorAlucinacao:
     """Monitor para detectar padrões de alucinação ao longo do tempo"""
     
@@ -361,7 +372,9 @@ class MonitorAlucinacao:
         self.logger = logging.getLogger(__name__)
         self.config = config
         self.historico_scores = []
-        self.alertas_ativos = []
+        # Alertas mais recentes (o monitor vive o processo inteiro)
+        self.alertas_ativos = deque(maxlen=LIMITE_ALERTAS)
+        obter_monitor_memoria().registrar('monitor_alucinacao.alertas', self, 'alertas_ativos')
     
     def registrar_resposta(self, score: float, usuario_id: str, pergunta: str):
         """Registra uma resposta para monitoramento"""
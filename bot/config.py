@@ -15,6 +15,17 @@ class Config:
         self.gemini_api_key: str = os.getenv("GEMINI_API_KEY", "")
         self.database_path: str = os.getenv("DATABASE_PATH", "oraculo_concursos.db")
         
+        # Backend de armazenamento: sqlite (arquivo local) ou postgres (compartilhado)
+        self.database_backend: str = os.getenv("DATABASE_BACKEND", "sqlite").lower()
+        self.database_url: str = os.getenv("DATABASE_URL", "")
+        self.database_pool_min: int = int(os.getenv("DATABASE_POOL_MIN", "1"))
+        self.database_pool_max: int = int(os.getenv("DATABASE_POOL_MAX", "10"))
+        self.database_shards: int = int(os.getenv("DATABASE_SHARDS", "1"))
+        # Snapshots online do SQLite (intervalo em horas; 0 desativa)
+        self.database_backup_interval: float = float(os.getenv("DATABASE_BACKUP_INTERVAL", "24"))
+        self.database_backup_dir: str = os.getenv("DATABASE_BACKUP_DIR", "")
+        self.database_backup_keep: int = int(os.getenv("DATABASE_BACKUP_KEEP", "7"))
+        
         # Configurações de comportamento
         self.confidence_threshold: float = float(os.getenv("CONFIDENCE_THRESHOLD", "0.9"))
         self.max_response_length: int = int(os.getenv("MAX_RESPONSE_LENGTH", "2000"))
@@ -27,6 +38,52 @@ class Config:
         # Configurações de streaming
         self.enable_streaming: bool = os.getenv("ENABLE_STREAMING", "true").lower() == "true"
         self.stream_chunk_size: int = int(os.getenv("STREAM_CHUNK_SIZE", "100"))
+        
+        # Configurações de manutenção
+        self.cache_ttl: int = int(os.getenv("CACHE_TTL", "300"))
+        self.data_retention_days: int = int(os.getenv("DATA_RETENTION_DAYS", "90"))
+        self.cleanup_interval_hours: float = float(os.getenv("CLEANUP_INTERVAL", "24"))
+        self.archive_dir: str = os.getenv("DATA_ARCHIVE_DIR", "")
+        self.maintenance_busy_threshold: int = int(os.getenv("MAINTENANCE_BUSY_THRESHOLD", "1"))
+        
+        # Configurações de log (formato: texto ou json, um objeto por linha)
+        self.log_level: str = os.getenv("LOG_LEVEL", "INFO")
+        self.log_file: str = os.getenv("LOG_FILE", "")
+        self.log_rotation_mb: int = int(os.getenv("LOG_ROTATION_MB", "10"))
+        self.log_backup_count: int = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+        self.log_format: str = os.getenv("LOG_FORMAT", "texto").lower()
+        
+        # Gravador de voo do DebugLogger (eventos em memória, DEBUG do gateway opcional)
+        self.debug_buffer_events: int = int(os.getenv("DEBUG_BUFFER_EVENTS", "2000"))
+        self.debug_gateway: bool = os.getenv("DEBUG_GATEWAY", "false").lower() == "true"
+        self.debug_sampling: str = os.getenv("DEBUG_SAMPLING", "")
+        
+        # Inicialização e métricas (porta 0 desativa o endpoint)
+        self.startup_network_check: bool = os.getenv("STARTUP_NETWORK_CHECK", "true").lower() == "true"
+        self.metrics_host: str = os.getenv("METRICS_HOST", "127.0.0.1")
+        self.metrics_port: int = int(os.getenv("METRICS_PORT", "9464"))
+        
+        # Event loop: atraso que conta como travamento (pilha no log; 0 desativa) e
+        # modo de depuração que aponta E/S síncrona na thread do loop (com custo)
+        self.loop_stall_ms: int = int(os.getenv("LOOP_STALL_MS", "500"))
+        self.loop_debug: bool = os.getenv("LOOP_DEBUG", "false").lower() == "true"
+        
+        # Memória: intervalo entre medições das estruturas (0 desativa) e quadros de pilha
+        # guardados pelo tracemalloc por alocação (0 não ativa; deixa as alocações mais lentas)
+        self.memory_sample_interval: int = int(os.getenv("MEMORY_SAMPLE_INTERVAL", "300"))
+        self.memory_tracemalloc_frames: int = int(os.getenv("MEMORY_TRACEMALLOC_FRAMES", "0"))
+        
+        # Rastreamento por menção (arquivo vazio desativa; taxa = fração dos traces gravada)
+        self.trace_file: str = os.getenv("TRACE_FILE", "logs/rastreamentos.jsonl")
+        self.trace_sample_rate: float = float(os.getenv("TRACE_SAMPLE_RATE", "1.0"))
+        self.trace_rotation_mb: int = int(os.getenv("TRACE_ROTATION_MB", "10"))
+        
+        # Perfilamento: limite de chamada lenta, fração medida e capturas sob demanda
+        self.profile_slow_ms: int = int(os.getenv("PROFILE_SLOW_MS", "1000"))
+        self.profile_sample_rate: float = float(os.getenv("PROFILE_SAMPLE_RATE", "1.0"))
+        self.profile_dir: str = os.getenv("PROFILE_DIR", "logs/perfis")
+        self.profile_capture_seconds: float = float(os.getenv("PROFILE_CAPTURE_SECONDS", "30"))
+        self.profile_capture_mode: str = os.getenv("PROFILE_CAPTURE_MODE", "amostragem").lower()
     
     def is_valid(self) -> bool:
         """Valida se as configurações essenciais estão presentes"""
@@ -81,7 +138,7 @@ Lembre-se: Qualidade e precisão são mais importantes que velocidade de respost
 # Constantes do sistema
 COMMAND_PREFIXES = ["!oraculo", "!concurso", "!estudar"]
 MAX_MESSAGE_HISTORY = 50
-DATABASE_SCHEMA_VERSION = "1.0"
+DATABASE_SCHEMA_VERSION = "2.5"
 
 # Mensagens padrão em português
 MESSAGES = {
@@ -9,21 +9,42 @@ import asyncio
 import logging
 import re
 import time
+from datetime import timedelta
 from typing import Optional, Dict, Any
 
 import discord
 from discord.ext import commands
 
 from bot.gemini_client import GeminiClient
-from database.db_manager import DatabaseManager
+from database.base import ArmazenamentoBase
 from bot.anti_alucinacao import ValidadorConfianca
 from bot.config import Config
+from database.models import ContextoConversa, DesempenhoResposta, agora_utc
+from utils.metricas import obter_registro
+from utils.rastreamento import iniciar_trace, rastrear, span, span_atual
+
+
+_metricas = obter_registro()
+MENCOES = _metricas.contador('oraculo_mencoes_total', 'Menções ao bot recebidas')
+RESPOSTAS = _metricas.contador('oraculo_respostas_total', 'Respostas enviadas')
+RESPOSTAS_BAIXA_CONFIANCA = _metricas.contador(
+    'oraculo_respostas_baixa_confianca_total', 'Respostas recusadas pela validação de confiança'
+)
+ERROS = _metricas.contador('oraculo_erros_total', 'Erros ao processar menções e eventos')
+DURACAO_MENCAO = _metricas.histograma('oraculo_mencao_segundos', 'Duração total de uma menção')
+ESTAGIOS = _metricas.histograma(
+    'oraculo_mencao_estagio_segundos', 'Duração de cada etapa do processamento de uma menção',
+    ('estagio',)
+)
+CACHE_CONTEXTOS = _metricas.contador(
+    'oraculo_cache_contextos_total', 'Consultas ao cache de contextos de conversa', ('resultado',)
+)
 
 
 class OraculoBot(commands.Bot):
     """Bot principal do Oráculo de Concursos"""
     
-    def __init__(self, db_manager: DatabaseManager, gemini_client: GeminiClient, validador: ValidadorConfianca, config: Config):
+    def __init__(self, db_manager: ArmazenamentoBase, gemini_client: GeminiClient, validador: ValidadorConfianca, config: Config):
         # Configurar intents necessários
         intents = discord.Intents.default()
         intents.message_content = True  # Necessário para ler conteúdo das mensagens
@@ -44,19 +65,47 @@ class OraculoBot(commands.Bot):
         self.logger = logging.getLogger(__name__)
         
         # Cache de contexto de conversas ativas
-        self.contextos_ativos: Dict[str, Dict[str, Any]] = {}
-        
-        # Estatísticas de uso
-        self.estatisticas = {
-            'mensagens_processadas': 0,
-            'respostas_enviadas': 0,
-            'erros_ocorridos': 0,
-            'tempo_inicio': time.time()
+        self.contextos_ativos: Dict[str, ContextoConversa] = {}
+        
+        # Menções em processamento (usado para adiar a manutenção)
+        self.mencoes_em_andamento = 0
+        
+        # Estatísticas de uso (contadores em utils.metricas)
+        self.tempo_inicio = time.time()
+        self._registrar_medidores()
+    
+    def _registrar_medidores(self):
+        """Medidores calculados a cada coleta das métricas"""
+        _metricas.medidor(
+            'oraculo_fila_profundidade', 'Itens aguardando ou em processamento', ('fila',)
+        ).com('mencoes').definir_funcao(lambda: self.mencoes_em_andamento)
+        _metricas.medidor(
+            'oraculo_contextos_em_cache', 'Contextos de conversa no cache'
+        ).definir_funcao(lambda: len(self.contextos_ativos))
+        _metricas.medidor(
+            'oraculo_cache_contextos_taxa_acerto', 'Fração das consultas atendidas pelo cache de contextos'
+        ).definir_funcao(self._taxa_acerto_cache)
+    
+    @staticmethod
+    def _taxa_acerto_cache() -> float:
+        acertos = CACHE_CONTEXTOS.com('acerto').valor
+        total = acertos + CACHE_CONTEXTOS.com('falha').valor
+        return acertos / total if total else 0.0
+    
+    @property
+    def estatisticas(self) -> Dict[str, Any]:
+        """Estatísticas de uso desde o início do processo"""
+        return {
+            'mensagens_processadas': int(MENCOES.valor),
+            'respostas_enviadas': int(RESPOSTAS.valor),
+            'erros_ocorridos': int(ERROS.valor),
+            'tempo_inicio': self.tempo_inicio
         }
     
     async def setup_hook(self):
         """Configurações iniciais do bot"""
         self.logger.info("🔧 Configurando hooks do bot...")
+        await self.restaurar_contextos()
     
     async def on_ready(self):
         """Evento chamado quando o bot está pronto"""
@@ -89,18 +138,33 @@ class OraculoBot(commands.Bot):
         if message.author.bot:
             return
         
-        self.estatisticas['mensagens_processadas'] += 1
+        MENCOES.incrementar()
+        self.mencoes_em_andamento += 1
         
-        try:
-            await self._processar_mencao(message)
-        except Exception as e:
-            self.logger.error(f"❌ Erro ao processar mensagem: {e}")
-            self.estatisticas['erros_ocorridos'] += 1
-            await self._enviar_erro_generico(message)
+        # Tudo que esta menção fizer (banco, Gemini, validação, envio) fica neste trace
+        with iniciar_trace('mencao',
+                           usuario_id=str(message.author.id),
+                           canal_id=str(message.channel.id),
+                           servidor_id=str(message.guild.id) if message.guild else None,
+                           mensagem_id=str(message.id)) as trace:
+            try:
+                with DURACAO_MENCAO.medir():
+                    await self._processar_mencao(message)
+            except Exception as e:
+                self.logger.error(f"❌ Erro ao processar mensagem: {e}")
+                trace.marcar_erro(e)
+                ERROS.incrementar()
+                await self.db_manager.registrar_erro()
+                await self._enviar_erro_generico(message)
+            finally:
+                self.mencoes_em_andamento -= 1
     
     async def _processar_mencao(self, message: discord.Message):
         """Processa menção ao bot"""
-        self.logger.info(f"💬 Processando menção de {message.author} em #{message.channel}")
+        inicio = time.perf_counter()
+        # Do envio da mensagem até o evento chegar aqui (gateway e fila do event loop)
+        espera_fila = max(0.0, (discord.utils.utcnow() - message.created_at).total_seconds())
+        self.logger.info("💬 Processando menção de %s em #%s", message.author, message.channel)
         
         # Extrair texto da mensagem removendo menção
         texto_limpo = self._limpar_mencao(message.content)
@@ -109,44 +173,73 @@ class OraculoBot(commands.Bot):
             await self._enviar_ajuda(message)
             return
         
-        # Registrar interação no banco
-        await self.db_manager.registrar_interacao(
-            usuario_id=str(message.author.id),
-            servidor_id=str(message.guild.id) if message.guild else None,
-            canal_id=str(message.channel.id),
-            mensagem=texto_limpo,
-            tipo='pergunta'
-        )
+        servidor_id = str(message.guild.id) if message.guild else None
+        
+        # Registrar pergunta no banco (a resposta completa o mesmo turno)
+        with ESTAGIOS.com('registro_pergunta').medir() as registro_pergunta:
+            interacao_id = await self.db_manager.registrar_interacao(
+                usuario_id=str(message.author.id),
+                servidor_id=servidor_id,
+                canal_id=str(message.channel.id),
+                mensagem=texto_limpo
+            )
         
         # Obter contexto da conversa
-        contexto = await self._obter_contexto_conversa(message.author.id, message.channel.id)
+        with ESTAGIOS.com('contexto').medir() as obtencao_contexto:
+            contexto = await self._obter_contexto_conversa(message.author.id, message.channel.id,
+                                                           servidor_id)
         
         # Mostrar que está digitando
         async with message.channel.typing():
             try:
                 # Gerar resposta usando Gemini
-                resposta_completa = await self.gemini_client.gerar_resposta_concurso(
-                    pergunta=texto_limpo,
-                    contexto=contexto,
-                    usuario_id=str(message.author.id)
-                )
+                with ESTAGIOS.com('gemini').medir() as gemini:
+                    resposta_completa = await self.gemini_client.gerar_resposta_concurso(
+                        pergunta=texto_limpo,
+                        contexto=contexto,
+                        usuario_id=str(message.author.id)
+                    )
                 
                 # Validar confiança da resposta
-                if not self.validador.resposta_confiavel(resposta_completa):
+                with ESTAGIOS.com('validacao').medir() as validacao:
+                    confiavel = self.validador.resposta_confiavel(resposta_completa)
+                span_atual().definir('confianca', resposta_completa.get('confianca'))
+                if not confiavel:
+                    span_atual().definir('baixa_confianca', True)
+                    RESPOSTAS_BAIXA_CONFIANCA.incrementar()
                     await self._enviar_resposta_baixa_confianca(message)
                     return
                 
                 # Enviar resposta em streaming
-                await self._enviar_resposta_streaming(message, resposta_completa)
+                with ESTAGIOS.com('envio').medir() as envio:
+                    await self._enviar_resposta_streaming(message, resposta_completa)
+                
+                desempenho = DesempenhoResposta(
+                    modelo=resposta_completa.get('modelo_usado'),
+                    espera_fila=espera_fila,
+                    tempo_banco=registro_pergunta.duracao + obtencao_contexto.duracao,
+                    tempo_primeiro_token=resposta_completa.get('tempo_primeiro_token'),
+                    tempo_gemini=gemini.duracao,
+                    tempo_validacao=validacao.duracao,
+                    tempo_envio=envio.duracao,
+                    tokens_entrada=resposta_completa.get('tokens_entrada'),
+                    tokens_saida=resposta_completa.get('tokens_saida'),
+                    tokens_raciocinio=resposta_completa.get('tokens_raciocinio')
+                )
+                # Tempo que o usuário esperou: da mensagem até a resposta completa no canal
+                tempo_resposta = espera_fila + time.perf_counter() - inicio
                 
                 # Atualizar contexto
-                await self._atualizar_contexto(message.author.id, message.channel.id, 
-                                             texto_limpo, resposta_completa['resposta'])
+                with ESTAGIOS.com('registro_resposta').medir():
+                    await self._atualizar_contexto(message.author.id, message.channel.id, 
+                                                 texto_limpo, resposta_completa, interacao_id,
+                                                 servidor_id, tempo_resposta, desempenho)
                 
-                self.estatisticas['respostas_enviadas'] += 1
+                RESPOSTAS.incrementar()
                 
             except Exception as e:
                 self.logger.error(f"❌ Erro ao gerar resposta: {e}")
+                span_atual().marcar_erro(e)
                 await self._enviar_erro_generico(message)
     
     def _limpar_mencao(self, texto: str) -> str:
@@ -156,27 +249,33 @@ class OraculoBot(commands.Bot):
         # Remover espaços extras
         return texto.strip()
     
-    async def _obter_contexto_conversa(self, usuario_id: int, canal_id: int) -> Dict[str, Any]:
+    async def _obter_contexto_conversa(self, usuario_id: int, canal_id: int,
+                                       servidor_id: Optional[str] = None) -> ContextoConversa:
         """Obtém contexto da conversa do usuário"""
         chave_contexto = f"{usuario_id}_{canal_id}"
         
         # Verificar cache primeiro
         if chave_contexto in self.contextos_ativos:
+            CACHE_CONTEXTOS.com('acerto').incrementar()
+            span_atual().definir('cache_contexto', 'acerto')
             return self.contextos_ativos[chave_contexto]
+        CACHE_CONTEXTOS.com('falha').incrementar()
+        span_atual().definir('cache_contexto', 'falha')
         
         # Buscar histórico no banco
         historico = await self.db_manager.obter_historico_conversa(
             usuario_id=str(usuario_id),
             canal_id=str(canal_id),
-            limite=5  # Últimas 5 interações
+            limite=5,  # Últimas 5 interações
+            servidor_id=servidor_id
         )
         
-        contexto = {
-            'historico': historico,
-            'usuario_id': str(usuario_id),
-            'canal_id': str(canal_id),
-            'timestamp': time.time()
-        }
+        contexto = ContextoConversa(
+            usuario_id=str(usuario_id),
+            canal_id=str(canal_id),
+            historico=historico,
+            servidor_id=servidor_id
+        )
         
         # Armazenar no cache
         self.contextos_ativos[chave_contexto] = contexto
@@ -184,39 +283,72 @@ class OraculoBot(commands.Bot):
         return contexto
     
     async def _atualizar_contexto(self, usuario_id: int, canal_id: int, 
-                                 pergunta: str, resposta: str):
+                                 pergunta: str, resposta_completa: Dict[str, Any],
+                                 interacao_id: Optional[int] = None,
+                                 servidor_id: Optional[str] = None,
+                                 tempo_resposta: Optional[float] = None,
+                                 desempenho: Optional[DesempenhoResposta] = None):
         """Atualiza contexto da conversa"""
+        resposta = resposta_completa['resposta']
         chave_contexto = f"{usuario_id}_{canal_id}"
         
         if chave_contexto not in self.contextos_ativos:
-            self.contextos_ativos[chave_contexto] = {
-                'historico': [],
-                'usuario_id': str(usuario_id),
-                'canal_id': str(canal_id)
-            }
-        
-        # Adicionar nova interação ao histórico
-        nova_interacao = {
-            'pergunta': pergunta,
-            'resposta': resposta,
-            'timestamp': time.time()
-        }
-        
-        self.contextos_ativos[chave_contexto]['historico'].append(nova_interacao)
-        
-        # Manter apenas últimas 5 interações
-        if len(self.contextos_ativos[chave_contexto]['historico']) > 5:
-            self.contextos_ativos[chave_contexto]['historico'].pop(0)
+            self.contextos_ativos[chave_contexto] = ContextoConversa(
+                usuario_id=str(usuario_id),
+                canal_id=str(canal_id),
+                servidor_id=servidor_id
+            )
         
-        # Registrar resposta no banco
-        await self.db_manager.registrar_interacao(
-            usuario_id=str(usuario_id),
-            servidor_id=None,  # Será atualizado se necessário
-            canal_id=str(canal_id),
-            mensagem=resposta,
-            tipo='resposta'
+        # Adicionar nova interação ao histórico (mantendo as últimas 5)
+        self.contextos_ativos[chave_contexto].adicionar_interacao(
+            pergunta, resposta, resposta_completa.get('confianca'), limite=5
         )
+        
+        # Registrar resposta no turno da pergunta
+        if interacao_id is not None:
+            await self.db_manager.registrar_resposta(
+                interacao_id=interacao_id,
+                resposta=resposta,
+                confianca=resposta_completa.get('confianca'),
+                tempo_resposta=tempo_resposta,
+                fontes=resposta_completa.get('fontes'),
+                desempenho=desempenho
+            )
+    
+    async def limpar_contextos_expirados(self, ttl: Optional[float] = None) -> int:
+        """Remove do cache os contextos sem atividade há mais de `ttl` segundos"""
+        ttl = ttl if ttl is not None else self.config.cache_ttl
+        limite = agora_utc() - timedelta(seconds=ttl)
+        
+        expirados = [
+            chave for chave, contexto in self.contextos_ativos.items()
+            if contexto.ultimo_update < limite
+        ]
+        chaves_banco = []
+        for chave in expirados:
+            contexto = self.contextos_ativos.pop(chave)
+            chaves_banco.append((contexto.usuario_id, contexto.canal_id))
+        
+        if chaves_banco:
+            await self.db_manager.desativar_contextos(chaves_banco)
+            self.logger.debug("🧹 %d contextos expirados removidos do cache", len(expirados))
+        return len(expirados)
+    
+    async def salvar_snapshot_contextos(self) -> int:
+        """Persiste os contextos em cache para sobreviverem a um reinício"""
+        contextos = list(self.contextos_ativos.values())
+        await self.db_manager.salvar_contextos(contextos)
+        return len(contextos)
+    
+    async def restaurar_contextos(self):
+        """Recarrega no cache os contextos ainda válidos do último snapshot"""
+        contextos = await self.db_manager.carregar_contextos(self.config.cache_ttl)
+        for contexto in contextos:
+            self.contextos_ativos[f"{contexto.usuario_id}_{contexto.canal_id}"] = contexto
+        if contextos:
+            self.logger.info(f"♻️ {len(contextos)} contextos de conversa restaurados")
     
+    @rastrear()
     async def _enviar_resposta_streaming(self, message: discord.Message, 
                                        resposta_completa: Dict[str, Any]):
         """Envia resposta usando streaming para melhor UX"""
@@ -228,21 +360,25 @@ class OraculoBot(commands.Bot):
         
         # Enviar primeiro chunk
         if chunks:
-            mensagem_atual = await message.reply(chunks[0])
+            with span('discord.reply', caracteres=len(chunks[0])):
+                mensagem_atual = await message.reply(chunks[0])
             
             # Atualizar com chunks restantes
             for chunk in chunks[1:]:
                 await asyncio.sleep(0.5)  # Pequena pausa para efeito de streaming
                 try:
-                    await mensagem_atual.edit(content=mensagem_atual.content + chunk)
+                    with span('discord.edit', caracteres=len(chunk)):
+                        await mensagem_atual.edit(content=mensagem_atual.content + chunk)
                 except discord.errors.HTTPException:
                     # Se a mensagem ficou muito longa, criar nova mensagem
-                    mensagem_atual = await message.channel.send(chunk)
+                    with span('discord.send', caracteres=len(chunk)):
+                        mensagem_atual = await message.channel.send(chunk)
             
             # Adicionar fontes se disponíveis
             if fontes:
                 embed_fontes = self._criar_embed_fontes(fontes)
-                await message.channel.send(embed=embed_fontes)
+                with span('discord.send', fontes=len(fontes)):
+                    await message.channel.send(embed=embed_fontes)
     
     def _dividir_texto_chunks(self, texto: str, tamanho_chunk: int = 200) -> list:
         """Divide texto em chunks para streaming"""
@@ -363,7 +499,7 @@ class OraculoBot(commands.Bot):
     async def on_error(self, event: str, *args, **kwargs):
         """Handler global de erros"""
         self.logger.error(f"❌ Erro no evento {event}: {args}, {kwargs}")
-        self.estatisticas['erros_ocorridos'] += 1
+        ERROS.incrementar()
     
     async def close(self):
         """Finaliza o bot graciosamente"""
@@ -5,38 +5,77 @@ Cliente Gemini para o Oráculo de Concursos
 Integração com Google Gemini 2.5 para geração de respostas especializadas
 """
 
+import asyncio
 import json
 import logging
 import os
 import re
-from typing import Dict, List, Any, Optional
-
-from google import genai
-from google.genai import types
+import time
+from typing import Dict, List, Any, Optional, Tuple
 
 from bot.config import Config
+from database.models import ContextoConversa
+from utils.metricas import obter_registro
+from utils.perfilamento import perfilar
+from utils.rastreamento import rastrear, span, span_atual
+
+
+# Respostas do Gemini levam segundos: lenta é só a chamada bem acima do normal
+LIMITE_LENTO_GEMINI = 20.0
+
+TOKENS_GEMINI = obter_registro().contador(
+    'oraculo_gemini_tokens_total', 'Tokens usados nas respostas do Gemini', ('tipo',)
+)
 
 
 class GeminiClient:
-    """Cliente para integração com Google Gemini 2.5"""
+    """
+    Cliente para integração com Google Gemini 2.5
+    
+    O SDK (google-genai, cerca de 1 s para importar) só é carregado em
+    `preparar()`, em uma thread, para a inicialização seguir em paralelo.
+    """
     
     def __init__(self, config: Config):
         self.logger = logging.getLogger(__name__)
         self.config = config
+        self.client = None
+        self.types = None
+        self._preparacao: Optional[asyncio.Future] = None
         
-        # Inicializar cliente Gemini
+        # Prompt de sistema especializado em concursos
+        self.prompt_sistema = self.config.system_prompt
+    
+    async def preparar(self):
+        """Importa o SDK e cria o cliente (uma vez; chamadas concorrentes esperam a mesma)"""
+        if self.client is not None:
+            return
+        if self._preparacao is None:
+            self._preparacao = asyncio.ensure_future(asyncio.to_thread(self._criar_cliente))
+        try:
+            await asyncio.shield(self._preparacao)
+        except Exception:
+            # Permite tentar de novo na próxima chamada
+            self._preparacao = None
+            raise
+    
+    def _criar_cliente(self):
+        """Inicializar cliente Gemini (executa em thread)"""
         try:
+            from google import genai
+            from google.genai import types
+            
+            self.types = types
             self.client = genai.Client(api_key=self.config.gemini_api_key)
             self.logger.info("✅ Cliente Gemini inicializado com sucesso")
         except Exception as e:
             self.logger.error(f"❌ Erro ao inicializar cliente Gemini: {e}")
             raise
-        
-        # Prompt de sistema especializado em concursos
-        self.prompt_sistema = self.config.system_prompt
     
-    async def gerar_resposta_concurso(self, pergunta: str, contexto: Dict[str, Any>, 
-                                     usuario_id: str) -> Dict[str, Any>:
+    @perfilar(limite_lento=LIMITE_LENTO_GEMINI)
+    @rastrear()
+    async def gerar_resposta_concurso(self, pergunta: str, contexto: ContextoConversa, 
+                                     usuario_id: str) -> Dict[str, Any]:
         """
         Gera resposta especializada em concursos públicos
         
@@ -49,6 +88,11 @@ class GeminiClient:
             Dict com resposta, confiança e fontes
         """
         try:
+            # Só aparece no trace quando a menção ainda espera o SDK carregar
+            if self.client is None:
+                with span('GeminiClient.preparar'):
+                    await self.preparar()
+            
             # Preparar contexto da conversa
             contexto_formatado = self._formatar_contexto(contexto)
             
@@ -56,28 +100,29 @@ class GeminiClient:
             prompt_completo = self._criar_prompt_completo(pergunta, contexto_formatado)
             
             # Fazer requisição ao Gemini
-            response = await self._fazer_requisicao_gemini(prompt_completo)
+            texto, uso, tempo_primeiro_token = await self._fazer_requisicao_gemini(prompt_completo)
             
             # Processar resposta
-            resultado = self._processar_resposta(response)
+            resultado = self._processar_resposta(texto, uso)
+            resultado['tempo_primeiro_token'] = tempo_primeiro_token
             
-            self.logger.info(f"✅ Resposta gerada para usuário {usuario_id}")
+            self.logger.info("✅ Resposta gerada para usuário %s", usuario_id)
             return resultado
             
         except Exception as e:
             self.logger.error(f"❌ Erro ao gerar resposta: {e}")
             raise
     
-    def _formatar_contexto(self, contexto: Dict[str, Any>) -> str:
+    def _formatar_contexto(self, contexto: ContextoConversa) -> str:
         """Formata contexto da conversa para o Gemini"""
-        if not contexto.get('historico'):
+        if not contexto.historico:
             return ""
         
         contexto_str = "\n=== CONTEXTO DA CONVERSA ===\n"
         
-        for interacao in contexto['historico'][-3:]:  # Últimas 3 interações
-            contexto_str += f"USUÁRIO: {interacao.get('pergunta', '')}\n"
-            contexto_str += f"ASSISTENTE: {interacao.get('resposta', '')}\n\n"
+        for turno in contexto.obter_historico_recente(3):  # Últimas 3 interações
+            contexto_str += f"USUÁRIO: {turno.pergunta}\n"
+            contexto_str += f"ASSISTENTE: {turno.resposta}\n\n"
         
         contexto_str += "=== NOVA PERGUNTA ===\n"
         return contexto_str
@@ -95,10 +140,25 @@ Por favor, responda de forma especializada, precisa e didática sobre concursos
 Inclua fontes legais sempre que possível e seja explícito sobre o nível de confiança da informação.
 """
     
-    async def _fazer_requisicao_gemini(self, prompt: str) -> Any:
-        """Faz requisição ao Gemini"""
+    @perfilar(limite_lento=LIMITE_LENTO_GEMINI)
+    @rastrear(atributos={'gen_ai.system': 'gemini'})
+    async def _fazer_requisicao_gemini(self, prompt: str) -> Tuple[str, Any, Optional[float]]:
+        """
+        Faz requisição ao Gemini em streaming, sem bloquear o event loop
+        
+        Returns:
+            Texto completo, usage_metadata (do último trecho que o trouxe) e
+            segundos até o primeiro trecho com texto
+        """
+        types = self.types
+        trace = span_atual()
+        trace.definir('gen_ai.request.model', self.config.default_model)
+        inicio = time.perf_counter()
+        tempo_primeiro_token = None
+        partes: List[str] = []
+        uso = None
         try:
-            response = self.client.models.generate_content(
+            trechos = await self.client.aio.models.generate_content_stream(
                 model=self.config.default_model,
                 contents=[
                     types.Content(
@@ -123,19 +183,28 @@ Inclua fontes legais sempre que possível e seja explícito sobre o nível de co
                     ]
                 )
             )
+            async for trecho in trechos:
+                if trecho.text:
+                    if tempo_primeiro_token is None:
+                        tempo_primeiro_token = time.perf_counter() - inicio
+                    partes.append(trecho.text)
+                if trecho.usage_metadata is not None:
+                    uso = trecho.usage_metadata
             
-            return response
+            trace.definir('tempo_primeiro_token', tempo_primeiro_token)
+            return ''.join(partes), uso, tempo_primeiro_token
             
         except Exception as e:
             self.logger.error(f"❌ Erro na requisição Gemini: {e}")
             raise
     
-    def _processar_resposta(self, response: Any) -> Dict[str, Any>:
+    def _processar_resposta(self, texto: str, uso: Any = None) -> Dict[str, Any]:
         """Processa resposta do Gemini"""
-        if not response or not response.text:
+        if not texto or not texto.strip():
             raise ValueError("Resposta vazia do Gemini")
         
-        resposta_texto = response.text.strip()
+        resposta_texto = texto.strip()
+        tokens_entrada, tokens_saida, tokens_raciocinio = self._contabilizar_tokens(uso)
         
         # Extrair fontes mencionadas na resposta
         fontes = self._extrair_fontes(resposta_texto)
@@ -148,9 +217,29 @@ Inclua fontes legais sempre que possível e seja explícito sobre o nível de co
             'confianca': confianca,
             'fontes': fontes,
             'modelo_usado': self.config.default_model,
+            'tokens_entrada': tokens_entrada,
+            'tokens_saida': tokens_saida,
+            'tokens_raciocinio': tokens_raciocinio,
             'timestamp': self._obter_timestamp()
         }
     
+    @staticmethod
+    def _contabilizar_tokens(uso: Any) -> Tuple[Optional[int], Optional[int], Optional[int]]:
+        """Soma o uso informado pelo Gemini (usage_metadata) às métricas"""
+        if uso is None:
+            return None, None, None
+        quantidades = (uso.prompt_token_count, uso.candidates_token_count,
+                       getattr(uso, 'thoughts_token_count', None))
+        trace = span_atual()
+        # Atributos do span com os nomes das convenções gen_ai do OpenTelemetry
+        for tipo, atributo, quantidade in zip(('entrada', 'saida', 'raciocinio'),
+                                              ('input_tokens', 'output_tokens', 'reasoning_tokens'),
+                                              quantidades):
+            if quantidade:
+                TOKENS_GEMINI.com(tipo).incrementar(quantidade)
+                trace.definir(f'gen_ai.usage.{atributo}', quantidade)
+        return quantidades
+    
     def _extrair_fontes(self, texto: str) -> List[str]:
         """Extrai fontes legais mencionadas na resposta"""
         fontes = []
@@ -214,7 +303,8 @@ Inclua fontes legais sempre que possível e seja explícito sobre o nível de co
     async def validar_conexao(self) -> bool:
         """Valida se a conexão com Gemini está funcionando"""
         try:
-            response = self.client.models.generate_content(
+            await self.preparar()
+            response = await self.client.aio.models.generate_content(
                 model="gemini-2.5-flash",
                 contents="Teste de conexão. Responda apenas 'OK'."
             )
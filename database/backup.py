@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Backup online do Oráculo de Concursos
+Copia o banco SQLite em uso com a API de backup do SQLite, em passos curtos
+pausados pelo event loop, e grava snapshots comprimidos com rotação
+"""
+
+import asyncio
+import concurrent.futures
+import logging
+import os
+import sqlite3
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from utils import compressao
+
+
+# Reinícios da cópia (escritas de outras conexões) tolerados antes de
+# concluir o restante em um único passo
+MAXIMO_REINICIOS = 3
+
+FORMATO_DATA_SNAPSHOT = '%Y%m%dT%H%M%SZ'
+
+
+class _CopiaInterrompida(Exception):
+    """Sinaliza, de dentro do callback de progresso, que a cópia em passos deve parar"""
+
+
+@dataclass
+class RelatorioBackup:
+    """Resultado de uma execução do backup"""
+    arquivos: List[str] = field(default_factory=list)
+    paginas: int = 0
+    bytes_banco: int = 0
+    bytes_comprimidos: int = 0
+    passos: int = 0
+    reinicios: int = 0
+    passo_unico: bool = False  # Concluído de uma vez após reinícios demais
+    duracao: float = 0.0
+    tempo_bloqueio_total: float = 0.0
+    tempo_bloqueio_maximo: float = 0.0
+    removidos: List[str] = field(default_factory=list)
+
+    @property
+    def mb_por_segundo(self) -> float:
+        return self.bytes_banco / (1024 * 1024) / self.duracao if self.duracao > 0 else 0.0
+
+    @property
+    def taxa_compressao(self) -> float:
+        return self.bytes_banco / self.bytes_comprimidos if self.bytes_comprimidos else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Converte para dicionário"""
+        return {
+            'arquivos': self.arquivos,
+            'paginas': self.paginas,
+            'bytes_banco': self.bytes_banco,
+            'bytes_comprimidos': self.bytes_comprimidos,
+            'taxa_compressao': round(self.taxa_compressao, 2),
+            'passos': self.passos,
+            'reinicios': self.reinicios,
+            'passo_unico': self.passo_unico,
+            'duracao': round(self.duracao, 3),
+            'mb_por_segundo': round(self.mb_por_segundo, 1),
+            'tempo_bloqueio_total': round(self.tempo_bloqueio_total, 4),
+            'tempo_bloqueio_maximo': round(self.tempo_bloqueio_maximo, 4),
+            'removidos': self.removidos
+        }
+
+
+def restaurar(arquivo: str, destino: str):
+    """
+    Descomprime um snapshot em `destino`
+
+    O bot deve estar parado; `destino` não pode existir (apague ou mova o
+    banco atual, com seus arquivos -wal e -shm, antes).
+    """
+    if os.path.exists(destino):
+        raise FileExistsError(f"{destino} já existe")
+    temporario = f"{destino}.restaurando"
+    try:
+        compressao.descomprimir_arquivo(arquivo, temporario)
+        os.replace(temporario, destino)
+    finally:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+
+
+class BackupOnline:
+    """
+    Snapshot consistente de um banco em uso, sem parar o bot
+
+    Cada passo copia `paginas_por_passo` páginas segurando o lock de leitura
+    só durante o passo; entre os passos a thread da cópia espera uma pausa
+    agendada no event loop (mais longa enquanto o bot está ocupado). Se
+    escritas de outras conexões reiniciarem a cópia mais de
+    `maximo_reinicios` vezes, o restante é copiado em um único passo: no
+    modo WAL isso é só um snapshot de leitura, e as escritas continuam.
+    """
+
+    def __init__(self, db_path: str, diretorio: str, manter: int = 7,
+                 paginas_por_passo: int = 256, pausa_entre_passos: float = 0.01,
+                 ocupado: Optional[Callable[[], bool]] = None,
+                 pausa_ocupado: float = 0.5,
+                 maximo_reinicios: int = MAXIMO_REINICIOS):
+        self.db_path = db_path
+        self.diretorio = Path(diretorio)
+        self.manter = manter
+        self.paginas_por_passo = paginas_por_passo
+        self.pausa_entre_passos = pausa_entre_passos
+        self.ocupado = ocupado
+        self.pausa_ocupado = pausa_ocupado
+        self.maximo_reinicios = maximo_reinicios
+        self.logger = logging.getLogger(__name__)
+        self._cancelado = False
+
+    @property
+    def prefixo(self) -> str:
+        """Início do nome dos snapshots deste banco"""
+        return f"{Path(self.db_path).stem}-"
+
+    def snapshots(self) -> List[Path]:
+        """Snapshots existentes, do mais antigo ao mais recente"""
+        if not self.diretorio.exists():
+            return []
+        return sorted(
+            caminho for caminho in self.diretorio.glob(f"{self.prefixo}*.db.*")
+            if caminho.suffix in ('.zst', '.gz')
+        )
+
+    async def executar(self) -> RelatorioBackup:
+        """
+        Copia, verifica (quick_check), comprime e rotaciona
+
+        O snapshot só aparece com o nome final depois de gravado por inteiro.
+        """
+        self.diretorio.mkdir(parents=True, exist_ok=True)
+        momento = datetime.now(timezone.utc).strftime(FORMATO_DATA_SNAPSHOT)
+        destino = self.diretorio / f"{self.prefixo}{momento}.db{compressao.extensao()}"
+        copia = self.diretorio / f".{destino.name}.db"
+        comprimido = self.diretorio / f".{destino.name}.tmp"
+
+        relatorio = RelatorioBackup()
+        inicio = time.perf_counter()
+        self._cancelado = False
+        try:
+            await asyncio.to_thread(self._copiar, str(copia), relatorio, asyncio.get_running_loop())
+            await asyncio.to_thread(self._verificar, str(copia))
+            relatorio.bytes_comprimidos = await asyncio.to_thread(
+                compressao.comprimir_arquivo, str(copia), str(comprimido)
+            )
+            os.replace(comprimido, destino)
+        except asyncio.CancelledError:
+            # A thread da cópia para no próximo passo
+            self._cancelado = True
+            raise
+        finally:
+            for caminho in (copia, comprimido):
+                for sufixo in ('', '-wal', '-shm', '-journal'):
+                    if os.path.exists(f"{caminho}{sufixo}"):
+                        os.remove(f"{caminho}{sufixo}")
+
+        relatorio.arquivos.append(str(destino))
+        relatorio.removidos = self._rotacionar()
+        relatorio.duracao = time.perf_counter() - inicio
+
+        self.logger.info(
+            f"💾 Backup concluído: {relatorio.bytes_banco / (1024 * 1024):.1f} MB em "
+            f"{relatorio.duracao:.2f}s ({relatorio.mb_por_segundo:.1f} MB/s), "
+            f"{relatorio.passos} passos, lock máximo {relatorio.tempo_bloqueio_maximo * 1000:.1f}ms, "
+            f"compressão {relatorio.taxa_compressao:.1f}x → {destino.name}"
+        )
+        return relatorio
+
+    def _copiar(self, destino: str, relatorio: RelatorioBackup,
+                loop: asyncio.AbstractEventLoop):
+        """Cópia passo a passo (executa em thread)"""
+        origem = sqlite3.connect(self.db_path)
+        alvo = sqlite3.connect(destino)
+        estado = {'fim_pausa': time.perf_counter(), 'restantes': None}
+
+        def progresso(status: int, restantes: int, total: int):
+            self._registrar_passo(relatorio, time.perf_counter() - estado['fim_pausa'])
+            relatorio.paginas = total
+            if estado['restantes'] is not None and restantes > estado['restantes']:
+                relatorio.reinicios += 1
+                if relatorio.reinicios > self.maximo_reinicios:
+                    raise _CopiaInterrompida()
+            estado['restantes'] = restantes
+
+            if self._cancelado:
+                raise _CopiaInterrompida()
+            if restantes:
+                # A pausa é decidida no event loop; sem resposta, a cópia é abandonada
+                pausa = asyncio.run_coroutine_threadsafe(self._pausar(), loop)
+                try:
+                    pausa.result(timeout=self.pausa_ocupado + 5)
+                except concurrent.futures.TimeoutError:
+                    raise _CopiaInterrompida()
+            estado['fim_pausa'] = time.perf_counter()
+
+        try:
+            try:
+                origem.backup(alvo, pages=self.paginas_por_passo, progress=progresso)
+            except _CopiaInterrompida:
+                if self._cancelado or relatorio.reinicios <= self.maximo_reinicios:
+                    raise RuntimeError("backup interrompido")
+                # Escritas constantes: conclui em um passo sobre um snapshot de leitura
+                relatorio.passo_unico = True
+                inicio = time.perf_counter()
+                origem.backup(alvo)
+                self._registrar_passo(relatorio, time.perf_counter() - inicio)
+                relatorio.paginas = alvo.execute("PRAGMA page_count").fetchone()[0]
+        finally:
+            alvo.close()
+            origem.close()
+
+        relatorio.bytes_banco = os.path.getsize(destino)
+
+    @staticmethod
+    def _registrar_passo(relatorio: RelatorioBackup, duracao: float):
+        relatorio.passos += 1
+        relatorio.tempo_bloqueio_total += duracao
+        relatorio.tempo_bloqueio_maximo = max(relatorio.tempo_bloqueio_maximo, duracao)
+
+    async def _pausar(self):
+        """Pausa entre passos, mais longa enquanto o bot estiver ocupado"""
+        if self.ocupado and self.ocupado():
+            await asyncio.sleep(self.pausa_ocupado)
+        else:
+            await asyncio.sleep(self.pausa_entre_passos)
+
+    @staticmethod
+    def _verificar(caminho: str):
+        """Confere a estrutura da cópia antes de guardá-la (executa em thread)"""
+        conexao = sqlite3.connect(caminho)
+        try:
+            resultado = conexao.execute("PRAGMA quick_check").fetchone()[0]
+        finally:
+            conexao.close()
+        if resultado != 'ok':
+            raise RuntimeError(f"cópia inconsistente: {resultado}")
+
+    def _rotacionar(self) -> List[str]:
+        """Remove os snapshots mais antigos além dos `manter` mais recentes"""
+        antigos = self.snapshots()[:-self.manter] if self.manter > 0 else []
+        for caminho in antigos:
+            caminho.unlink()
+        return [str(caminho) for caminho in antigos]
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Contrato de armazenamento do Oráculo de Concursos
+Interface comum aos backends (SQLite e PostgreSQL) usada pelo bot
+"""
+
+from abc import ABC, abstractmethod
+from datetime import date, datetime
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+from database.backup import RelatorioBackup
+from database.models import ContextoConversa, DesempenhoResposta, Interacao, LogSistema, TurnoConversa
+from database.retencao import RelatorioRetencao
+
+
+# Percentis do relatório de desempenho (método nearest-rank)
+PERCENTIS_DESEMPENHO = (50, 95, 99)
+
+
+class ArmazenamentoBase(ABC):
+    """
+    Operações de persistência do bot
+
+    Os backends devolvem os mesmos tipos e formatos: modelos de
+    `database.models` (com datetimes ingênuos em UTC) para turnos e
+    contextos; nos dicionários de estatísticas e busca, instantes em UTC como
+    texto 'AAAA-MM-DD HH:MM:SS' e datas como 'AAAA-MM-DD'. Em caso de erro,
+    o valor padrão documentado em cada método (com o erro no log).
+    """
+
+    @abstractmethod
+    async def inicializar(self):
+        """Cria ou migra o schema; deve ser chamado antes de qualquer operação"""
+
+    @abstractmethod
+    async def registrar_usuario(self, usuario_id: str, nome: str,
+                                discriminator: Optional[str] = None,
+                                avatar_url: Optional[str] = None) -> bool:
+        """Registra ou atualiza informações do usuário"""
+
+    @abstractmethod
+    async def registrar_interacao(self, usuario_id: str, servidor_id: Optional[str],
+                                  canal_id: str, mensagem: str,
+                                  resposta: Optional[str] = None, confianca: Optional[float] = None,
+                                  tempo_resposta: Optional[float] = None,
+                                  fontes: Optional[List[str]] = None) -> Optional[int]:
+        """Registra um turno de conversa; retorna o id ou None em caso de erro"""
+
+    @abstractmethod
+    async def registrar_interacoes_em_lote(self, interacoes: List[Interacao]) -> int:
+        """
+        Grava turnos completos de uma vez (importações e cópias entre backends)
+
+        Preserva timestamps e respostas; os agregados do período são
+        recalculados ao final. Retorna quantos turnos foram gravados (0 em erro).
+        """
+
+    @abstractmethod
+    async def registrar_resposta(self, interacao_id: int, resposta: str,
+                                 confianca: Optional[float] = None,
+                                 tempo_resposta: Optional[float] = None,
+                                 fontes: Optional[List[str]] = None,
+                                 desempenho: Optional[DesempenhoResposta] = None) -> bool:
+        """Completa o turno de uma pergunta já registrada; False se não existir"""
+
+    @abstractmethod
+    async def obter_historico_conversa(self, usuario_id: str, canal_id: str, limite: int = 10,
+                                       servidor_id: Optional[str] = None) -> List[TurnoConversa]:
+        """
+        Últimos turnos respondidos, em ordem cronológica
+
+        `servidor_id` é só uma dica de roteamento para backends fragmentados;
+        o resultado é o mesmo com ou sem ele.
+        """
+
+    @abstractmethod
+    def iterar_interacoes(self, apos_id: int = 0,
+                          tamanho_lote: int = 1000) -> AsyncIterator[List[Interacao]]:
+        """Percorre todas as interações em lotes ordenados por id"""
+
+    @abstractmethod
+    async def buscar_respostas(self, consulta: str, limite: int = 5,
+                               servidor_id: Optional[str] = None,
+                               apenas_respondidas: bool = True) -> List[Dict[str, Any]]:
+        """Turnos anteriores mais relevantes para a consulta (id, pergunta, resposta, relevancia, trecho...)"""
+
+    @abstractmethod
+    async def registrar_erro(self) -> bool:
+        """Contabiliza um erro de processamento nas estatísticas da hora e do dia"""
+
+    @abstractmethod
+    async def registrar_logs(self, logs: List[LogSistema]) -> int:
+        """Grava registros de log em `logs_sistema` com um único INSERT; retorna quantos gravou (0 em erro)"""
+
+    @abstractmethod
+    async def obter_estatisticas_usuario(self, usuario_id: str) -> Dict[str, Any]:
+        """Estatísticas de uso do usuário ({} se não existir)"""
+
+    @abstractmethod
+    async def obter_estatisticas_diarias(self, data: Optional[date] = None) -> Dict[str, Any]:
+        """Estatísticas de um dia UTC ({} se não houver)"""
+
+    @abstractmethod
+    async def obter_estatisticas_horarias(self, inicio: datetime,
+                                          fim: datetime) -> List[Dict[str, Any]]:
+        """Estatísticas por hora no intervalo [inicio, fim)"""
+
+    @abstractmethod
+    async def obter_relatorio_desempenho(self, inicio: datetime,
+                                         fim: datetime) -> List[Dict[str, Any]]:
+        """
+        Latência e tokens das respostas a perguntas feitas em [inicio, fim)
+
+        Uma linha por dia UTC, modelo e servidor (nessa ordem, nulos por
+        último): data, modelo, servidor_id, respostas, tempo_resposta_pNN e
+        tempo_primeiro_token_pNN para cada percentil de PERCENTIS_DESEMPENHO
+        (nearest-rank; None sem medidas), médias de espera_fila, tempo_banco,
+        tempo_gemini, tempo_validacao e tempo_envio e as somas de
+        tokens_entrada, tokens_saida e tokens_raciocinio ([] em caso de erro).
+        """
+
+    @abstractmethod
+    async def atualizar_estatisticas_diarias(self, data: Optional[date] = None):
+        """Reconcilia as estatísticas de um dia com as interações"""
+
+    @abstractmethod
+    async def limpar_dados_antigos(self, dias: int = 90,
+                                   diretorio_arquivo: Optional[str] = None,
+                                   tamanho_lote: int = 500,
+                                   ocupado: Optional[Callable[[], bool]] = None
+                                   ) -> Optional[RelatorioRetencao]:
+        """Arquiva e remove registros mais antigos que `dias`, em lotes"""
+
+    @abstractmethod
+    async def salvar_contextos(self, contextos: List[ContextoConversa]) -> bool:
+        """Grava um snapshot dos contextos de conversa em cache"""
+
+    @abstractmethod
+    async def desativar_contextos(self, chaves: List[tuple]) -> bool:
+        """Marca contextos (usuario_id, canal_id) expirados como inativos"""
+
+    @abstractmethod
+    async def carregar_contextos(self, max_idade_segundos: float) -> List[ContextoConversa]:
+        """Contextos ativos atualizados nos últimos `max_idade_segundos`"""
+
+    async def checkpoint_wal(self, modo: str = "PASSIVE") -> Dict[str, int]:
+        """Checkpoint do journal; sem efeito em backends sem WAL local"""
+        return {}
+
+    async def otimizar_textos(self, tamanho_lote: int = 500) -> Dict[str, Any]:
+        """Manutenção da compressão de textos; sem efeito onde o servidor já comprime"""
+        return {}
+
+    async def criar_backup(self, diretorio: Optional[str] = None, manter: int = 7,
+                           ocupado: Optional[Callable[[], bool]] = None
+                           ) -> Optional[RelatorioBackup]:
+        """Snapshot comprimido do banco; None onde não há arquivo local (use pg_dump)"""
+        return None
+
+    @abstractmethod
+    async def fechar(self):
+        """Libera conexões"""
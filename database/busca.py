@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Busca textual do Oráculo de Concursos
+Índice FTS5 sobre perguntas e respostas, com consultas adaptadas ao português
+"""
+
+import logging
+import re
+import unicodedata
+from typing import List, Optional, Tuple
+
+import aiosqlite
+
+
+logger = logging.getLogger(__name__)
+
+# Palavras muito frequentes que não ajudam a ranquear
+STOPWORDS = {
+    'a', 'ao', 'aos', 'as', 'com', 'como', 'da', 'das', 'de', 'do', 'dos', 'e',
+    'ela', 'ele', 'em', 'entre', 'essa', 'esse', 'esta', 'este', 'eu', 'isso',
+    'isto', 'ja', 'mais', 'mas', 'me', 'na', 'nas', 'no', 'nos', 'o', 'os', 'ou',
+    'para', 'pela', 'pelo', 'por', 'qual', 'quais', 'quando', 'que', 'quem',
+    'se', 'sem', 'ser', 'sobre', 'sua', 'seu', 'tem', 'um', 'uma', 'voce',
+    'explique', 'oque', 'sao', 'foi', 'ha', 'pode', 'deve',
+}
+
+# Sufixos removidos para transformar o termo em prefixo (do mais longo ao mais curto)
+SUFIXOS = (
+    'amentos', 'imentos', 'amento', 'imento', 'idades', 'idade', 'mente',
+    'acoes', 'icoes', 'acao', 'icao', 'ancias', 'encias', 'ancia', 'encia',
+    'istas', 'ista', 'ismos', 'ismo', 'veis', 'vel', 'oes', 'aes', 'ais',
+    'eis', 'res', 'zes', 'es', 'as', 'os', 'a', 'o', 'e', 's',
+)
+
+TAMANHO_MINIMO_RADICAL = 4
+
+
+def _sem_acentos(texto: str) -> str:
+    """Remove acentos, como o tokenizer unicode61 com remove_diacritics 2"""
+    decomposto = unicodedata.normalize('NFKD', texto)
+    return ''.join(c for c in decomposto if not unicodedata.combining(c))
+
+
+def radical(termo: str) -> str:
+    """Radical aproximado de um termo em português ('concursos' → 'concurs')"""
+    for sufixo in SUFIXOS:
+        if termo.endswith(sufixo) and len(termo) - len(sufixo) >= TAMANHO_MINIMO_RADICAL:
+            return termo[:-len(sufixo)]
+    return termo
+
+
+def termos_relevantes(texto: str) -> List[str]:
+    """Termos da consulta sem stopwords, em minúsculas e na grafia original"""
+    termos: List[str] = []
+    for termo in re.findall(r'\w+', texto.lower()):
+        base = _sem_acentos(termo)
+        if base in STOPWORDS or (len(base) < 3 and not base.isdigit()):
+            continue
+        if termo not in termos:
+            termos.append(termo)
+    return termos
+
+
+def montar_consulta(texto: str) -> str:
+    """
+    Converte texto livre em uma expressão MATCH do FTS5
+
+    Cada termo relevante vira uma busca por prefixo do seu radical, e os
+    termos são combinados com OR para que o bm25 ranqueie por cobertura.
+    Retorna string vazia se não sobrar nenhum termo.
+    """
+    radicais = []
+    for termo in termos_relevantes(texto):
+        base = radical(_sem_acentos(termo))
+        if base not in radicais:
+            radicais.append(base)
+
+    return ' OR '.join(f'"{base}"*' for base in radicais)
+
+
+# Gatilhos da versão 2.2, quando o índice lia o texto direto de `interacoes`
+GATILHOS_ANTIGOS = ('interacoes_fts_insercao', 'interacoes_fts_remocao', 'interacoes_fts_atualizacao')
+
+TAMANHO_TRECHO = 160
+
+
+async def criar_indice_textual(db: aiosqlite.Connection) -> bool:
+    """
+    Cria a tabela FTS5 de perguntas e respostas
+
+    O índice não guarda conteúdo (content=''): as respostas ficam apenas
+    comprimidas em `textos`, e quem grava ou remove uma interação informa
+    o texto via `indexar`/`desindexar`.
+
+    Returns:
+        False se o SQLite não foi compilado com FTS5
+    """
+    try:
+        await db.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS interacoes_fts USING fts5(
+                mensagem, resposta,
+                content='',
+                tokenize='unicode61 remove_diacritics 2'
+            )
+        """)
+    except aiosqlite.OperationalError as e:
+        logger.warning(f"⚠️ FTS5 indisponível, busca textual desativada: {e}")
+        return False
+    return True
+
+
+async def indice_textual_disponivel(db: aiosqlite.Connection) -> bool:
+    """Indica se a tabela FTS existe neste banco"""
+    cursor = await db.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'interacoes_fts'"
+    )
+    return await cursor.fetchone() is not None
+
+
+async def indexar(db: aiosqlite.Connection, linhas: List[Tuple[int, str, Optional[str]]]):
+    """Adiciona turnos (id, pergunta, resposta) ao índice"""
+    await db.executemany(
+        "INSERT INTO interacoes_fts (rowid, mensagem, resposta) VALUES (?, ?, ?)", linhas
+    )
+
+
+async def desindexar(db: aiosqlite.Connection, linhas: List[Tuple[int, str, Optional[str]]]):
+    """
+    Remove turnos (id, pergunta, resposta) do índice
+
+    Num índice sem conteúdo a remoção precisa dos mesmos textos indexados.
+    """
+    await db.executemany(
+        "INSERT INTO interacoes_fts (interacoes_fts, rowid, mensagem, resposta) "
+        "VALUES ('delete', ?, ?, ?)", linhas
+    )
+
+
+def destacar_trecho(texto: Optional[str], expressao: str,
+                    tamanho: int = TAMANHO_TRECHO) -> Optional[str]:
+    """
+    Trecho do texto em torno do primeiro radical da expressão, em negrito
+
+    Substitui o snippet() do FTS5, indisponível em índices sem conteúdo.
+
+    Args:
+        texto: Texto completo
+        expressao: Expressão gerada por `montar_consulta`
+        tamanho: Tamanho aproximado do trecho
+    """
+    if not texto:
+        return None
+
+    inicio_padrao = texto[:tamanho] + ('…' if len(texto) > tamanho else '')
+    normalizado = _sem_acentos(texto.lower())
+    if len(normalizado) != len(texto):
+        # Caracteres decompostos: as posições não correspondem ao original
+        return inicio_padrao
+
+    for base in re.findall(r'"(\w+)"', expressao):
+        achado = re.search(rf'\b{re.escape(base)}\w*', normalizado)
+        if not achado:
+            continue
+        inicio = max(0, achado.start() - tamanho // 2)
+        fim = min(len(texto), inicio + tamanho)
+        trecho = (
+            texto[inicio:achado.start()] + '**' + texto[achado.start():achado.end()]
+            + '**' + texto[achado.end():fim]
+        )
+        return ('…' if inicio > 0 else '') + trecho + ('…' if fim < len(texto) else '')
+
+    return inicio_padrao
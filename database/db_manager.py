@@ -2,25 +2,111 @@
 # -*- coding: utf-8 -*-
 """
 Gerenciador de Banco de Dados do Oráculo de Concursos
-Responsável por todas as operações com SQLite
+Implementação SQLite do contrato de armazenamento
 """
 
 import aiosqlite
+import asyncio
 import logging
 import os
-from datetime import datetime, timedelta
+from dataclasses import replace
+from datetime import date, datetime, timedelta, timezone
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import AsyncIterator, Callable, List, Dict, Any, Optional
 
-from database.models import Interacao, Usuario, EstatisticaUso
+from database import busca, rollups, textos
+from database.backup import BackupOnline, RelatorioBackup
+from database.base import PERCENTIS_DESEMPENHO, ArmazenamentoBase
+from database.migrations import TAMANHO_LOTE_PADRAO, migrar
+from database.models import (
+    ContextoConversa, DesempenhoResposta, Interacao, LogSistema, TurnoConversa, Usuario,
+    EstatisticaUso, para_json
+)
+from database.retencao import POLITICAS_PADRAO, PoliticaRetencao, RelatorioRetencao, RetencaoDados
+from utils.perfilamento import perfilar
+from utils.rastreamento import rastrear
 
 
-class DatabaseManager:
+# Formato de CURRENT_TIMESTAMP do SQLite, usado em todas as colunas de tempo
+FORMATO_MOMENTO = '%Y-%m-%d %H:%M:%S'
+
+# Linhas por INSERT de logs (5 parâmetros cada; o SQLite aceita até 32766)
+_LINHAS_POR_INSERT_LOGS = 500
+
+# Span por consulta do caminho de uma menção (só dentro de um trace)
+_rastrear_banco = rastrear(atributos={'db.system': 'sqlite'})
+
+# Colunas de desempenho de uma resposta em `interacoes` e seus valores vazios
+_COLUNAS_DESEMPENHO = DesempenhoResposta.COLUNAS.split(', ')
+_SEM_DESEMPENHO = (None,) * len(_COLUNAS_DESEMPENHO)
+_ATRIBUICAO_DESEMPENHO = ', '.join(f"{coluna} = ?" for coluna in _COLUNAS_DESEMPENHO)
+
+
+def _sql_percentis(coluna: str) -> str:
+    """Nearest-rank: o menor valor cuja posição (1..n) é >= p% de n, em aritmética inteira"""
+    return ",\n".join(
+        f"MIN(CASE WHEN ordem_{coluna} * 100 >= {p} * qtd_{coluna} THEN {coluna} END) AS {coluna}_p{p}"
+        for p in PERCENTIS_DESEMPENHO
+    )
+
+
+# Sem função de percentil no SQLite: a posição de cada valor no seu grupo vem
+# de ROW_NUMBER (nulos por último) e só as linhas do resumo saem da consulta
+SQL_RELATORIO_DESEMPENHO = f"""
+    WITH turnos AS (
+        SELECT date(timestamp) AS data, modelo, servidor_id,
+               tempo_resposta, tempo_primeiro_token, espera_fila, tempo_banco,
+               tempo_gemini, tempo_validacao, tempo_envio,
+               tokens_entrada, tokens_saida, tokens_raciocinio,
+               ROW_NUMBER() OVER (grupo ORDER BY tempo_resposta IS NULL, tempo_resposta)
+                   AS ordem_tempo_resposta,
+               COUNT(tempo_resposta) OVER grupo AS qtd_tempo_resposta,
+               ROW_NUMBER() OVER (grupo ORDER BY tempo_primeiro_token IS NULL, tempo_primeiro_token)
+                   AS ordem_tempo_primeiro_token,
+               COUNT(tempo_primeiro_token) OVER grupo AS qtd_tempo_primeiro_token
+        FROM interacoes
+        WHERE timestamp >= ? AND timestamp < ? AND respondida_em IS NOT NULL
+        WINDOW grupo AS (PARTITION BY date(timestamp), modelo, servidor_id)
+    )
+    SELECT data, modelo, servidor_id, COUNT(*) AS respostas,
+           {_sql_percentis('tempo_resposta')},
+           {_sql_percentis('tempo_primeiro_token')},
+           AVG(espera_fila) AS espera_fila_media, AVG(tempo_banco) AS tempo_banco_medio,
+           AVG(tempo_gemini) AS tempo_gemini_medio, AVG(tempo_validacao) AS tempo_validacao_medio,
+           AVG(tempo_envio) AS tempo_envio_medio,
+           COALESCE(SUM(tokens_entrada), 0) AS tokens_entrada,
+           COALESCE(SUM(tokens_saida), 0) AS tokens_saida,
+           COALESCE(SUM(tokens_raciocinio), 0) AS tokens_raciocinio
+    FROM turnos
+    GROUP BY data, modelo, servidor_id
+    ORDER BY data, modelo IS NULL, modelo, servidor_id IS NULL, servidor_id
+"""
+
+
+def _momento_para_texto(momento: Optional[datetime]) -> Optional[str]:
+    """datetime (UTC ou ingênuo em UTC) → 'AAAA-MM-DD HH:MM:SS'"""
+    if momento is None:
+        return None
+    if momento.tzinfo:
+        momento = momento.astimezone(timezone.utc)
+    return momento.strftime(FORMATO_MOMENTO)
+
+
+def _texto_para_momento(texto: Optional[str]) -> Optional[datetime]:
+    """'AAAA-MM-DD HH:MM:SS' → datetime ingênuo em UTC"""
+    return datetime.fromisoformat(texto) if texto else None
+
+
+class DatabaseManager(ArmazenamentoBase):
     """Gerenciador do banco de dados SQLite"""
     
-    def __init__(self, db_path: str = "oraculo_concursos.db"):
+    def __init__(self, db_path: str = "oraculo_concursos.db",
+                 tamanho_lote_migracao: int = TAMANHO_LOTE_PADRAO):
         self.db_path = db_path
+        self.tamanho_lote_migracao = tamanho_lote_migracao
         self.logger = logging.getLogger(__name__)
+        self.textos = textos.ArmazemTextos()
+        self.busca_textual_ativa = False
         
         # Garantir que o diretório existe
         Path(db_path).parent.mkdir(parents=True, exist_ok=True)
@@ -28,132 +114,177 @@ class DatabaseManager:
     async def inicializar(self):
         """Inicializa o banco de dados e cria as tabelas"""
         try:
-            await self._criar_tabelas()
-            await self._criar_indices()
+            # Todo o schema em uma única conexão
+            async with aiosqlite.connect(self.db_path) as db:
+                await self._configurar_wal(db)
+                await self._criar_tabelas(db)
+                versao = await migrar(db, self.tamanho_lote_migracao)
+                await self._criar_indices(db)
+                await self._carregar_textos(db)
+            self.logger.info(f"📐 Schema do banco na versão {versao}")
             self.logger.info("✅ Banco de dados inicializado com sucesso")
         except Exception as e:
             self.logger.error(f"❌ Erro ao inicializar banco: {e}")
             raise
     
-    async def _criar_tabelas(self):
+    async def _configurar_wal(self, db: aiosqlite.Connection):
+        """Ativa o journal WAL: leituras não bloqueiam a escrita e vice-versa"""
+        # auto_vacuum precisa ser definido antes do primeiro CREATE TABLE,
+        # e o WAL cria o arquivo do banco
+        await db.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        await db.execute("PRAGMA journal_mode = WAL")
+    
+    async def _carregar_textos(self, db: aiosqlite.Connection):
+        """Carrega os dicionários de compressão e verifica a busca textual"""
+        await self.textos.carregar(db)
+        self.busca_textual_ativa = await busca.indice_textual_disponivel(db)
+    
+    async def _criar_tabelas(self, db: aiosqlite.Connection):
         """Cria todas as tabelas necessárias"""
-        async with aiosqlite.connect(self.db_path) as db:
-            # Tabela de usuários
-            await db.execute("""
-                CREATE TABLE IF NOT EXISTS usuarios (
-                    id TEXT PRIMARY KEY,
-                    nome TEXT NOT NULL,
-                    discriminator TEXT,
-                    avatar_url TEXT,
-                    primeiro_uso TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    ultimo_uso TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    total_interacoes INTEGER DEFAULT 0,
-                    preferencias TEXT DEFAULT '{}',
-                    ativo BOOLEAN DEFAULT 1
-                )
-            """)
-            
-            # Tabela de interações
-            await db.execute("""
-                CREATE TABLE IF NOT EXISTS interacoes (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    usuario_id TEXT NOT NULL,
-                    servidor_id TEXT,
-                    canal_id TEXT NOT NULL,
-                    mensagem TEXT NOT NULL,
-                    resposta TEXT,
-                    tipo TEXT NOT NULL CHECK (tipo IN ('pergunta', 'resposta')),
-                    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    confianca REAL,
-                    tempo_resposta REAL,
-                    fontes_utilizadas TEXT,
-                    processada BOOLEAN DEFAULT 1,
-                    FOREIGN KEY (usuario_id) REFERENCES usuarios (id)
-                )
-            """)
-            
-            # Tabela de estatísticas
-            await db.execute("""
-                CREATE TABLE IF NOT EXISTS estatisticas_uso (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    data DATE NOT NULL,
-                    total_usuarios_ativos INTEGER DEFAULT 0,
-                    total_perguntas INTEGER DEFAULT 0,
-                    total_respostas INTEGER DEFAULT 0,
-                    tempo_medio_resposta REAL DEFAULT 0.0,
-                    confianca_media REAL DEFAULT 0.0,
-                    erros_ocorridos INTEGER DEFAULT 0,
-                    UNIQUE(data)
-                )
-            """)
-            
-            # Tabela de contextos de conversa (para otimização)
-            await db.execute("""
-                CREATE TABLE IF NOT EXISTS contextos_conversa (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    usuario_id TEXT NOT NULL,
-                    canal_id TEXT NOT NULL,
-                    contexto TEXT NOT NULL,
-                    ultimo_update TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    ativo BOOLEAN DEFAULT 1,
-                    UNIQUE(usuario_id, canal_id)
-                )
-            """)
-            
-            # Tabela de logs de sistema
-            await db.execute("""
-                CREATE TABLE IF NOT EXISTS logs_sistema (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    nivel TEXT NOT NULL,
-                    modulo TEXT NOT NULL,
-                    mensagem TEXT NOT NULL,
-                    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    dados_extras TEXT
-                )
-            """)
-            
-            await db.commit()
+        # Tabela de usuários
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS usuarios (
+                id TEXT PRIMARY KEY,
+                nome TEXT NOT NULL,
+                discriminator TEXT,
+                avatar_url TEXT,
+                primeiro_uso TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                ultimo_uso TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                total_interacoes INTEGER DEFAULT 0,
+                preferencias TEXT DEFAULT '{}',
+                ativo BOOLEAN DEFAULT 1
+            )
+        """)
+        
+        # Respostas deduplicadas e comprimidas, referenciadas por interacoes
+        await textos.criar_tabelas_textos(db)
+        
+        # Tabela de interações (um turno pergunta/resposta por linha)
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS interacoes (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                usuario_id TEXT NOT NULL,
+                servidor_id TEXT,
+                canal_id TEXT NOT NULL,
+                mensagem TEXT NOT NULL,
+                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                respondida_em TIMESTAMP,
+                confianca REAL,
+                tempo_resposta REAL,
+                fontes_utilizadas TEXT,
+                processada BOOLEAN DEFAULT 1,
+                resposta_texto_id INTEGER,
+                modelo TEXT,
+                espera_fila REAL,
+                tempo_banco REAL,
+                tempo_primeiro_token REAL,
+                tempo_gemini REAL,
+                tempo_validacao REAL,
+                tempo_envio REAL,
+                tokens_entrada INTEGER,
+                tokens_saida INTEGER,
+                tokens_raciocinio INTEGER,
+                FOREIGN KEY (usuario_id) REFERENCES usuarios (id),
+                FOREIGN KEY (resposta_texto_id) REFERENCES textos (id)
+            )
+        """)
+        
+        # Tabela de estatísticas
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS estatisticas_uso (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                data DATE NOT NULL,
+                total_usuarios_ativos INTEGER DEFAULT 0,
+                total_perguntas INTEGER DEFAULT 0,
+                total_respostas INTEGER DEFAULT 0,
+                tempo_medio_resposta REAL DEFAULT 0.0,
+                confianca_media REAL DEFAULT 0.0,
+                erros_ocorridos INTEGER DEFAULT 0,
+                soma_confianca REAL DEFAULT 0.0,
+                qtd_confianca INTEGER DEFAULT 0,
+                soma_tempo_resposta REAL DEFAULT 0.0,
+                qtd_tempo_resposta INTEGER DEFAULT 0,
+                UNIQUE(data)
+            )
+        """)
+        
+        # Agregados por hora e por usuário, mantidos a cada interação
+        await rollups.criar_tabelas_rollup(db)
+        
+        # Índice textual de perguntas e respostas
+        await busca.criar_indice_textual(db)
+        
+        # Tabela de contextos de conversa (para otimização)
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS contextos_conversa (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                usuario_id TEXT NOT NULL,
+                canal_id TEXT NOT NULL,
+                contexto TEXT NOT NULL,
+                ultimo_update TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                ativo BOOLEAN DEFAULT 1,
+                servidor_id TEXT,
+                UNIQUE(usuario_id, canal_id)
+            )
+        """)
+        
+        # Tabela de logs de sistema
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS logs_sistema (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                nivel TEXT NOT NULL,
+                modulo TEXT NOT NULL,
+                mensagem TEXT NOT NULL,
+                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                dados_extras TEXT
+            )
+        """)
+        
+        await db.commit()
     
-    async def _criar_indices(self):
+    async def _criar_indices(self, db: aiosqlite.Connection):
         """Cria índices para otimização das consultas"""
         indices = [
-            "CREATE INDEX IF NOT EXISTS idx_interacoes_usuario ON interacoes(usuario_id)",
+            # Histórico na ordem da consulta (o rowid desempata); mensagem e confiança
+            # vêm da tabela: copiar as perguntas no índice dobrava o tamanho
+            "DROP INDEX IF EXISTS idx_interacoes_usuario_canal_timestamp",
+            "CREATE INDEX IF NOT EXISTS idx_interacoes_historico "
+            "ON interacoes(usuario_id, canal_id, timestamp)",
             "CREATE INDEX IF NOT EXISTS idx_interacoes_timestamp ON interacoes(timestamp)",
-            "CREATE INDEX IF NOT EXISTS idx_interacoes_tipo ON interacoes(tipo)",
+            # Usado na remoção de textos sem referência
+            "CREATE INDEX IF NOT EXISTS idx_interacoes_resposta_texto ON interacoes(resposta_texto_id)",
             "CREATE INDEX IF NOT EXISTS idx_usuarios_ultimo_uso ON usuarios(ultimo_uso)",
             "CREATE INDEX IF NOT EXISTS idx_contextos_usuario_canal ON contextos_conversa(usuario_id, canal_id)",
-            "CREATE INDEX IF NOT EXISTS idx_estatisticas_data ON estatisticas_uso(data)"
+            "CREATE INDEX IF NOT EXISTS idx_estatisticas_data ON estatisticas_uso(data)",
+            # Usado pela retenção para percorrer os logs em ordem de tempo
+            "CREATE INDEX IF NOT EXISTS idx_logs_timestamp ON logs_sistema(timestamp)",
+            # Lotes da retenção em ordem de tempo (expirados e inativos) sem ordenar a tabela
+            "CREATE INDEX IF NOT EXISTS idx_contextos_ultimo_update ON contextos_conversa(ultimo_update)",
+            "CREATE INDEX IF NOT EXISTS idx_contextos_ativo_ultimo_update "
+            "ON contextos_conversa(ativo, ultimo_update)",
+            # A chave começa por usuario_id: retenção e reconciliação filtram por data
+            "CREATE INDEX IF NOT EXISTS idx_atividade_data ON atividade_usuario_diaria(data)"
         ]
         
-        async with aiosqlite.connect(self.db_path) as db:
-            for indice in indices:
-                await db.execute(indice)
-            await db.commit()
+        for indice in indices:
+            await db.execute(indice)
+        await db.commit()
     
+    @perfilar()
+    @_rastrear_banco
     async def registrar_usuario(self, usuario_id: str, nome: str, 
                                discriminator: Optional[str] = None, avatar_url: Optional[str] = None) -> bool:
         """Registra ou atualiza informações do usuário"""
         try:
             async with aiosqlite.connect(self.db_path) as db:
-                # Verificar se usuário já existe
-                cursor = await db.execute(
-                    "SELECT id FROM usuarios WHERE id = ?", (usuario_id,)
-                )
-                existe = await cursor.fetchone()
-                
-                if existe:
-                    # Atualizar informações
-                    await db.execute("""
-                        UPDATE usuarios 
-                        SET nome = ?, discriminator = ?, avatar_url = ?, ultimo_uso = CURRENT_TIMESTAMP
-                        WHERE id = ?
-                    """, (nome, discriminator, avatar_url, usuario_id))
-                else:
-                    # Inserir novo usuário
-                    await db.execute("""
-                        INSERT INTO usuarios (id, nome, discriminator, avatar_url)
-                        VALUES (?, ?, ?, ?)
-                    """, (usuario_id, nome, discriminator, avatar_url))
+                # UPSERT: duas conexões registrando o mesmo usuário não colidem
+                await db.execute("""
+                    INSERT INTO usuarios (id, nome, discriminator, avatar_url)
+                    VALUES (?, ?, ?, ?)
+                    ON CONFLICT(id) DO UPDATE SET
+                        nome = excluded.nome, discriminator = excluded.discriminator,
+                        avatar_url = excluded.avatar_url, ultimo_uso = CURRENT_TIMESTAMP
+                """, (usuario_id, nome, discriminator, avatar_url))
                 
                 await db.commit()
                 return True
@@ -162,89 +293,389 @@ class DatabaseManager:
             self.logger.error(f"❌ Erro ao registrar usuário {usuario_id}: {e}")
             return False
     
+    @perfilar()
+    @_rastrear_banco
     async def registrar_interacao(self, usuario_id: str, servidor_id: Optional[str],
-                                 canal_id: str, mensagem: str, tipo: str,
+                                 canal_id: str, mensagem: str,
                                  resposta: Optional[str] = None, confianca: Optional[float] = None,
-                                 tempo_resposta: Optional[float] = None, fontes: Optional[List[str]] = None) -> bool:
-        """Registra uma interação do usuário"""
+                                 tempo_resposta: Optional[float] = None,
+                                 fontes: Optional[List[str]] = None) -> Optional[int]:
+        """
+        Registra um turno de conversa (pergunta e, se já houver, a resposta)
+
+        Returns:
+            ID da interação criada ou None em caso de erro
+        """
         try:
-            # Primeiro, garantir que o usuário está registrado
-            await self.registrar_usuario(usuario_id, f"Usuário_{usuario_id}")
-            
             async with aiosqlite.connect(self.db_path) as db:
+                # Usuário e contador de interações na mesma transação do turno
+                await db.execute("""
+                    INSERT INTO usuarios (id, nome, total_interacoes) VALUES (?, ?, 1)
+                    ON CONFLICT(id) DO UPDATE SET
+                        total_interacoes = total_interacoes + 1, ultimo_uso = CURRENT_TIMESTAMP
+                """, (usuario_id, f"Usuário_{usuario_id}"))
+                
                 # Inserir interação
                 fontes_json = ','.join(fontes) if fontes else None
+                momento = rollups.momento_atual()
+                respondida_em = momento if resposta is not None else None
+                texto_id = await self.textos.guardar(db, resposta) if resposta is not None else None
                 
-                await db.execute("""
+                cursor = await db.execute("""
                     INSERT INTO interacoes 
-                    (usuario_id, servidor_id, canal_id, mensagem, resposta, tipo, 
-                     confianca, tempo_resposta, fontes_utilizadas)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (usuario_id, servidor_id, canal_id, mensagem, resposta, 
-                      tipo, confianca, tempo_resposta, fontes_json))
+                    (usuario_id, servidor_id, canal_id, mensagem, resposta_texto_id, timestamp,
+                     respondida_em, confianca, tempo_resposta, fontes_utilizadas)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, (usuario_id, servidor_id, canal_id, mensagem, texto_id, momento,
+                      respondida_em, confianca, tempo_resposta, fontes_json))
+                interacao_id = cursor.lastrowid
                 
-                # Atualizar contador de interações do usuário
-                await db.execute("""
-                    UPDATE usuarios 
-                    SET total_interacoes = total_interacoes + 1, ultimo_uso = CURRENT_TIMESTAMP
+                if self.busca_textual_ativa:
+                    await busca.indexar(db, [(interacao_id, mensagem, resposta)])
+                
+                # Manter estatísticas materializadas na mesma transação
+                await rollups.contabilizar_pergunta(db, usuario_id, momento)
+                if resposta is not None:
+                    await rollups.contabilizar_resposta(db, usuario_id, momento,
+                                                        confianca, tempo_resposta)
+                
+                await db.commit()
+                return interacao_id
+                
+        except Exception as e:
+            self.logger.error(f"❌ Erro ao registrar interação: {e}")
+            return None
+    
+    async def registrar_interacoes_em_lote(self, interacoes: List[Interacao]) -> int:
+        """Grava turnos completos em uma única transação e reconcilia os agregados"""
+        if not interacoes:
+            return 0
+        try:
+            async with aiosqlite.connect(self.db_path) as db:
+                por_usuario: Dict[str, int] = {}
+                for interacao in interacoes:
+                    por_usuario[interacao.usuario_id] = por_usuario.get(interacao.usuario_id, 0) + 1
+                
+                await db.executemany(
+                    "INSERT OR IGNORE INTO usuarios (id, nome) VALUES (?, ?)",
+                    [(usuario_id, f"Usuário_{usuario_id}") for usuario_id in por_usuario]
+                )
+                
+                linhas_indice = []
+                momentos = []
+                for interacao in interacoes:
+                    momento = _momento_para_texto(interacao.timestamp) or rollups.momento_atual()
+                    momentos.append(momento)
+                    texto_id = (await self.textos.guardar(db, interacao.resposta)
+                                if interacao.resposta is not None else None)
+                    respondida_em = _momento_para_texto(interacao.respondida_em)
+                    if interacao.resposta is not None and respondida_em is None:
+                        respondida_em = momento
+                    
+                    desempenho = (interacao.desempenho.valores() if interacao.desempenho
+                                  else _SEM_DESEMPENHO)
+                    cursor = await db.execute(f"""
+                        INSERT INTO interacoes
+                        (usuario_id, servidor_id, canal_id, mensagem, resposta_texto_id, timestamp,
+                         respondida_em, confianca, tempo_resposta, fontes_utilizadas, processada,
+                         {DesempenhoResposta.COLUNAS})
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?{', ?' * len(_COLUNAS_DESEMPENHO)})
+                    """, (interacao.usuario_id, interacao.servidor_id, interacao.canal_id,
+                          interacao.mensagem, texto_id, momento, respondida_em,
+                          interacao.confianca, interacao.tempo_resposta,
+                          ','.join(interacao.fontes_utilizadas) or None, interacao.processada,
+                          *desempenho))
+                    linhas_indice.append((cursor.lastrowid, interacao.mensagem, interacao.resposta))
+                
+                if self.busca_textual_ativa:
+                    await busca.indexar(db, linhas_indice)
+                
+                await db.executemany("""
+                    UPDATE usuarios
+                    SET total_interacoes = total_interacoes + ?, ultimo_uso = CURRENT_TIMESTAMP
                     WHERE id = ?
-                """, (usuario_id,))
+                """, [(quantidade, usuario_id) for usuario_id, quantidade in por_usuario.items()])
+                
+                # Agregados do período coberto pelo lote, recalculados de uma vez
+                inicio = min(momentos)[:10]
+                fim = (date.fromisoformat(max(momentos)[:10]) + timedelta(days=1)).isoformat()
+                await rollups.recalcular_periodo(db, inicio, fim)
+                # Totais por usuário são do histórico inteiro: só soma o lote
+                await rollups.acumular_usuarios(db, [
+                    (interacao.usuario_id, interacao.resposta is not None,
+                     interacao.confianca, interacao.tempo_resposta)
+                    for interacao in interacoes
+                ])
+                
+                await db.commit()
+                return len(interacoes)
+                
+        except Exception as e:
+            self.logger.error(f"❌ Erro ao registrar interações em lote: {e}")
+            return 0
+    
+    async def iterar_interacoes(self, apos_id: int = 0,
+                                tamanho_lote: int = 1000) -> AsyncIterator[List[Interacao]]:
+        """Percorre as interações em lotes ordenados por id, com as respostas descomprimidas"""
+        ultimo_id = apos_id
+        while True:
+            async with aiosqlite.connect(self.db_path) as db:
+                lote = await self._buscar_modelos(db, self._interacao_da_linha, f"""
+                    SELECT i.id, i.usuario_id, i.servidor_id, i.canal_id, i.mensagem,
+                           i.timestamp, i.respondida_em, i.confianca, i.tempo_resposta,
+                           i.fontes_utilizadas, i.processada, {DesempenhoResposta.COLUNAS},
+                           t.formato, t.dicionario_id, t.dados
+                    FROM interacoes i
+                    LEFT JOIN textos t ON t.id = i.resposta_texto_id
+                    WHERE i.id > ?
+                    ORDER BY i.id
+                    LIMIT ?
+                """, (ultimo_id, tamanho_lote))
+            
+            if not lote:
+                return
+            # Antes do yield: quem consome pode alterar os objetos do lote
+            ultimo_id = lote[-1].id
+            yield lote
+    
+    async def _buscar_modelos(self, db: aiosqlite.Connection, fabrica: Callable,
+                              sql: str, parametros: tuple = ()) -> list:
+        """
+        Executa a consulta com `fabrica` como row_factory
+        
+        As linhas viram modelos (e as respostas são descomprimidas) na thread
+        da conexão, sem tuplas ou dicionários intermediários.
+        """
+        for tentativa in range(2):
+            db.row_factory = fabrica
+            try:
+                cursor = await db.execute(sql, parametros)
+                return await cursor.fetchall()
+            except textos.DicionarioDesconhecido:
+                if tentativa:
+                    raise
+                # Dicionário treinado por outro processo depois do carregamento
+                db.row_factory = None
+                await self.textos.carregar(db)
+            finally:
+                db.row_factory = None
+    
+    def _interacao_da_linha(self, cursor: Any, linha: tuple) -> Interacao:
+        """row_factory de Interacao.COLUNAS com a resposta comprimida (três colunas) no lugar do texto"""
+        (interacao_id, usuario_id, servidor_id, canal_id, mensagem, timestamp, respondida_em,
+         confianca, tempo_resposta, fontes, processada) = linha[:11]
+        formato, dicionario_id, dados = linha[-3:]
+        return Interacao(usuario_id, canal_id, mensagem, interacao_id, servidor_id,
+                         self.textos.descomprimir(formato, dicionario_id, dados),
+                         _texto_para_momento(timestamp), _texto_para_momento(respondida_em),
+                         confianca, tempo_resposta, fontes.split(',') if fontes else [],
+                         bool(processada), DesempenhoResposta.dos_valores(linha[11:-3]))
+    
+    def _turno_da_linha(self, cursor: Any, linha: tuple) -> TurnoConversa:
+        """row_factory do histórico (mensagem, timestamp, confianca + resposta comprimida)"""
+        mensagem, timestamp, confianca, formato, dicionario_id, dados = linha
+        return TurnoConversa(mensagem, self.textos.descomprimir(formato, dicionario_id, dados),
+                             _texto_para_momento(timestamp), confianca)
+    
+    @perfilar()
+    @_rastrear_banco
+    async def registrar_resposta(self, interacao_id: int, resposta: str,
+                                 confianca: Optional[float] = None,
+                                 tempo_resposta: Optional[float] = None,
+                                 fontes: Optional[List[str]] = None,
+                                 desempenho: Optional[DesempenhoResposta] = None) -> bool:
+        """Completa o turno de uma pergunta já registrada com a resposta enviada"""
+        try:
+            async with aiosqlite.connect(self.db_path) as db:
+                fontes_json = ','.join(fontes) if fontes else None
+                
+                cursor = await db.execute("""
+                    SELECT usuario_id, timestamp, mensagem, resposta_texto_id
+                    FROM interacoes WHERE id = ?
+                """, (interacao_id,))
+                turno = await cursor.fetchone()
+                if not turno:
+                    return False
+                
+                texto_id = await self.textos.guardar(db, resposta)
+                await db.execute(f"""
+                    UPDATE interacoes
+                    SET resposta_texto_id = ?, respondida_em = CURRENT_TIMESTAMP,
+                        confianca = ?, tempo_resposta = ?, fontes_utilizadas = ?,
+                        {_ATRIBUICAO_DESEMPENHO}
+                    WHERE id = ?
+                """, (texto_id, confianca, tempo_resposta, fontes_json,
+                      *(desempenho.valores() if desempenho else _SEM_DESEMPENHO), interacao_id))
+                
+                if self.busca_textual_ativa:
+                    resposta_anterior = (
+                        await self.textos.obter(db, turno[3]) if turno[3] is not None else None
+                    )
+                    await busca.desindexar(db, [(interacao_id, turno[2], resposta_anterior)])
+                    await busca.indexar(db, [(interacao_id, turno[2], resposta)])
+                
+                # Só contabiliza a primeira resposta do turno
+                if turno[3] is None:
+                    await rollups.contabilizar_resposta(db, turno[0], turno[1],
+                                                        confianca, tempo_resposta)
                 
                 await db.commit()
                 return True
                 
         except Exception as e:
-            self.logger.error(f"❌ Erro ao registrar interação: {e}")
+            self.logger.error(f"❌ Erro ao registrar resposta da interação {interacao_id}: {e}")
             return False
     
-    async def obter_historico_conversa(self, usuario_id: str, canal_id: str, 
-                                      limite: int = 10) -> List[Dict[str, Any]]:
-        """Obtém histórico de conversa do usuário"""
+    @perfilar()
+    @_rastrear_banco
+    async def obter_historico_conversa(self, usuario_id: str, canal_id: str, limite: int = 10,
+                                       servidor_id: Optional[str] = None) -> List[TurnoConversa]:
+        """Obtém os últimos turnos respondidos da conversa do usuário, em ordem cronológica"""
         try:
             async with aiosqlite.connect(self.db_path) as db:
-                cursor = await db.execute("""
-                    SELECT mensagem, resposta, tipo, timestamp, confianca
-                    FROM interacoes
-                    WHERE usuario_id = ? AND canal_id = ?
-                    ORDER BY timestamp DESC
+                # Últimos turnos pelo índice do histórico; a resposta comprimida
+                # vem da chave primária de `textos` na mesma consulta
+                turnos = await self._buscar_modelos(db, self._turno_da_linha, """
+                    SELECT i.mensagem, i.timestamp, i.confianca,
+                           t.formato, t.dicionario_id, t.dados
+                    FROM interacoes i
+                    JOIN textos t ON t.id = i.resposta_texto_id
+                    WHERE i.usuario_id = ? AND i.canal_id = ?
+                    ORDER BY i.timestamp DESC, i.id DESC
                     LIMIT ?
-                """, (usuario_id, canal_id, limite * 2))  # *2 porque cada pergunta gera 2 registros
+                """, (usuario_id, canal_id, limite))
+                
+                turnos.reverse()  # Ordem cronológica
+                return turnos
+                
+        except Exception as e:
+            self.logger.error(f"❌ Erro ao obter histórico: {e}")
+            return []
+    
+    @perfilar()
+    @_rastrear_banco
+    async def buscar_respostas(self, consulta: str, limite: int = 5,
+                               servidor_id: Optional[str] = None,
+                               apenas_respondidas: bool = True) -> List[Dict[str, Any]]:
+        """
+        Busca perguntas e respostas anteriores por relevância (bm25)
+        
+        Args:
+            consulta: Texto livre, normalmente a pergunta recebida
+            limite: Máximo de resultados
+            servidor_id: Restringe a um servidor
+            apenas_respondidas: Ignora turnos sem resposta
+        
+        Returns:
+            Turnos ordenados do mais para o menos relevante, com trecho destacado
+        """
+        expressao = busca.montar_consulta(consulta)
+        if not expressao:
+            return []
+        
+        filtros = ""
+        parametros: List[Any] = [expressao]
+        if apenas_respondidas:
+            filtros += " AND i.resposta_texto_id IS NOT NULL"
+        if servidor_id is not None:
+            filtros += " AND i.servidor_id = ?"
+            parametros.append(servidor_id)
+        parametros.append(limite)
+        
+        if not self.busca_textual_ativa:
+            return []
+        
+        try:
+            async with aiosqlite.connect(self.db_path) as db:
+                # A pergunta pesa o dobro da resposta no ranking
+                cursor = await db.execute(f"""
+                    SELECT i.id, i.mensagem, i.resposta_texto_id, i.confianca, i.timestamp,
+                           i.servidor_id, bm25(interacoes_fts, 2.0, 1.0) AS rank
+                    FROM interacoes_fts
+                    JOIN interacoes i ON i.id = interacoes_fts.rowid
+                    WHERE interacoes_fts MATCH ?{filtros}
+                    ORDER BY rank
+                    LIMIT ?
+                """, parametros)
                 
                 rows = await cursor.fetchall()
+                # Só os textos dos resultados finais são descomprimidos
+                respostas = await self.textos.obter_varios(db, (row[2] for row in rows))
                 
-                # Organizar em pares pergunta-resposta
-                historico = []
-                pergunta_atual = None
-                
-                for row in reversed(rows):  # Reverter para ordem cronológica
-                    if row[2] == 'pergunta':
-                        pergunta_atual = {
-                            'pergunta': row[0],
-                            'timestamp': row[3]
-                        }
-                    elif row[2] == 'resposta' and pergunta_atual:
-                        pergunta_atual.update({
-                            'resposta': row[0],
-                            'confianca': row[4]
-                        })
-                        historico.append(pergunta_atual)
-                        pergunta_atual = None
-                
-                return historico[:limite]
+                return [
+                    {
+                        'id': row[0],
+                        'pergunta': row[1],
+                        'resposta': respostas.get(row[2]),
+                        'confianca': row[3],
+                        'timestamp': row[4],
+                        'servidor_id': row[5],
+                        'relevancia': -row[6],
+                        'trecho': busca.destacar_trecho(respostas.get(row[2]), expressao)
+                    }
+                    for row in rows
+                ]
                 
         except Exception as e:
-            self.logger.error(f"❌ Erro ao obter histórico: {e}")
+            self.logger.error(f"❌ Erro na busca textual: {e}")
             return []
     
+    @perfilar()
+    @_rastrear_banco
+    async def registrar_erro(self) -> bool:
+        """Contabiliza um erro de processamento nas estatísticas da hora e do dia"""
+        try:
+            async with aiosqlite.connect(self.db_path) as db:
+                await rollups.contabilizar_erro(db, rollups.momento_atual())
+                await db.commit()
+                return True
+        except Exception as e:
+            self.logger.error(f"❌ Erro ao registrar erro nas estatísticas: {e}")
+            return False
+    
+    async def registrar_logs(self, logs: List[LogSistema]) -> int:
+        """
+        Grava registros de log em `logs_sistema`
+        
+        Um INSERT de várias linhas por bloco de `_LINHAS_POR_INSERT_LOGS`
+        (limite de parâmetros do SQLite), todos na mesma transação.
+        """
+        if not logs:
+            return 0
+        try:
+            async with aiosqlite.connect(self.db_path) as db:
+                for inicio in range(0, len(logs), _LINHAS_POR_INSERT_LOGS):
+                    bloco = logs[inicio:inicio + _LINHAS_POR_INSERT_LOGS]
+                    parametros = []
+                    for log in bloco:
+                        parametros.extend((
+                            log.nivel, log.modulo, log.mensagem, _momento_para_texto(log.timestamp),
+                            para_json(log.dados_extras) if log.dados_extras else None
+                        ))
+                    await db.execute(
+                        "INSERT INTO logs_sistema (nivel, modulo, mensagem, timestamp, dados_extras) "
+                        f"VALUES {', '.join(['(?, ?, ?, ?, ?)'] * len(bloco))}",
+                        parametros
+                    )
+                await db.commit()
+                return len(logs)
+        except Exception as e:
+            self.logger.error(f"❌ Erro ao gravar logs no banco: {e}")
+            return 0
+    
+    @perfilar()
+    @_rastrear_banco
     async def obter_estatisticas_usuario(self, usuario_id: str) -> Dict[str, Any]:
-        """Obtém estatísticas de uso do usuário"""
+        """Obtém estatísticas de uso do usuário a partir dos agregados materializados"""
         try:
             async with aiosqlite.connect(self.db_path) as db:
                 # Informações básicas do usuário
                 cursor = await db.execute("""
-                    SELECT nome, primeiro_uso, ultimo_uso, total_interacoes
-                    FROM usuarios
-                    WHERE id = ?
+                    SELECT u.nome, u.primeiro_uso, u.ultimo_uso, u.total_interacoes,
+                           e.total_perguntas, e.soma_confianca, e.qtd_confianca
+                    FROM usuarios u
+                    LEFT JOIN estatisticas_usuario e ON e.usuario_id = u.id
+                    WHERE u.id = ?
                 """, (usuario_id,))
                 
                 info_usuario = await cursor.fetchone()
@@ -252,98 +683,301 @@ class DatabaseManager:
                 if not info_usuario:
                     return {}
                 
-                # Estatísticas de interações
+                # No máximo 8 linhas da chave primária (usuario_id, data)
                 cursor = await db.execute("""
-                    SELECT 
-                        COUNT(CASE WHEN tipo = 'pergunta' THEN 1 END) as total_perguntas,
-                        AVG(CASE WHEN confianca IS NOT NULL THEN confianca END) as confianca_media,
-                        COUNT(CASE WHEN timestamp >= datetime('now', '-7 days') THEN 1 END) as interacoes_semana
-                    FROM interacoes
-                    WHERE usuario_id = ?
+                    SELECT SUM(perguntas)
+                    FROM atividade_usuario_diaria
+                    WHERE usuario_id = ? AND data >= date('now', '-7 days')
                 """, (usuario_id,))
                 
-                stats_interacoes = await cursor.fetchone()
+                interacoes_semana = (await cursor.fetchone())[0]
+                qtd_confianca = info_usuario[6] or 0
+                confianca_media = (info_usuario[5] or 0) / qtd_confianca if qtd_confianca else 0
                 
                 return {
                     'nome': info_usuario[0],
                     'primeiro_uso': info_usuario[1],
                     'ultimo_uso': info_usuario[2],
                     'total_interacoes': info_usuario[3],
-                    'total_perguntas': stats_interacoes[0] or 0,
-                    'confianca_media': round(stats_interacoes[1] or 0, 2),
-                    'interacoes_semana': stats_interacoes[2] or 0
+                    'total_perguntas': info_usuario[4] or 0,
+                    'confianca_media': round(confianca_media, 2),
+                    'interacoes_semana': interacoes_semana or 0
                 }
                 
         except Exception as e:
             self.logger.error(f"❌ Erro ao obter estatísticas do usuário: {e}")
             return {}
     
-    async def atualizar_estatisticas_diarias(self):
-        """Atualiza estatísticas diárias do sistema"""
+    async def obter_estatisticas_diarias(self, data: Optional[date] = None) -> Dict[str, Any]:
+        """Obtém as estatísticas materializadas de um dia (UTC, padrão: hoje)"""
         try:
-            hoje = datetime.now().date()
+            data = data or datetime.now(timezone.utc).date()
             
             async with aiosqlite.connect(self.db_path) as db:
-                # Calcular estatísticas do dia
+                db.row_factory = aiosqlite.Row
                 cursor = await db.execute("""
-                    SELECT 
-                        COUNT(DISTINCT usuario_id) as usuarios_ativos,
-                        COUNT(CASE WHEN tipo = 'pergunta' THEN 1 END) as total_perguntas,
-                        COUNT(CASE WHEN tipo = 'resposta' THEN 1 END) as total_respostas,
-                        AVG(CASE WHEN tempo_resposta IS NOT NULL THEN tempo_resposta END) as tempo_medio,
-                        AVG(CASE WHEN confianca IS NOT NULL THEN confianca END) as confianca_media
-                    FROM interacoes
-                    WHERE date(timestamp) = ?
-                """, (hoje,))
-                
-                stats = await cursor.fetchone()
-                
-                # Inserir ou atualizar estatísticas
-                await db.execute("""
-                    INSERT OR REPLACE INTO estatisticas_uso 
-                    (data, total_usuarios_ativos, total_perguntas, total_respostas, 
-                     tempo_medio_resposta, confianca_media)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                """, (hoje, stats[0] or 0, stats[1] or 0, stats[2] or 0, 
-                      stats[3] or 0, stats[4] or 0))
+                    SELECT data, total_usuarios_ativos, total_perguntas, total_respostas,
+                           tempo_medio_resposta, confianca_media, erros_ocorridos
+                    FROM estatisticas_uso
+                    WHERE data = ?
+                """, (data.isoformat(),))
                 
-                await db.commit()
+                row = await cursor.fetchone()
+                return dict(row) if row else {}
                 
         except Exception as e:
-            self.logger.error(f"❌ Erro ao atualizar estatísticas diárias: {e}")
+            self.logger.error(f"❌ Erro ao obter estatísticas diárias: {e}")
+            return {}
     
-    async def limpar_dados_antigos(self, dias: int = 90):
-        """Remove dados antigos para otimização"""
+    async def obter_estatisticas_horarias(self, inicio: datetime,
+                                         fim: datetime) -> List[Dict[str, Any]]:
+        """Obtém as estatísticas materializadas por hora no intervalo [inicio, fim) (UTC)"""
         try:
-            data_limite = datetime.now() - timedelta(days=dias)
-            
             async with aiosqlite.connect(self.db_path) as db:
-                # Limpar interações antigas
+                db.row_factory = aiosqlite.Row
                 cursor = await db.execute("""
-                    DELETE FROM interacoes 
-                    WHERE timestamp < ?
-                """, (data_limite,))
-                
-                removidas = cursor.rowcount
+                    SELECT hora, total_usuarios_ativos, total_perguntas, total_respostas,
+                           CASE WHEN qtd_confianca > 0
+                                THEN soma_confianca / qtd_confianca END AS confianca_media,
+                           CASE WHEN qtd_tempo_resposta > 0
+                                THEN soma_tempo_resposta / qtd_tempo_resposta END AS tempo_medio_resposta,
+                           erros_ocorridos
+                    FROM estatisticas_horarias
+                    WHERE hora >= ? AND hora < ?
+                    ORDER BY hora
+                """, (inicio.strftime('%Y-%m-%d %H:%M:%S'), fim.strftime('%Y-%m-%d %H:%M:%S')))
                 
-                # Limpar contextos inativos
-                await db.execute("""
-                    DELETE FROM contextos_conversa 
-                    WHERE ultimo_update < ? OR ativo = 0
-                """, (data_limite,))
+                return [dict(row) for row in await cursor.fetchall()]
                 
-                # Limpar logs antigos
-                await db.execute("""
-                    DELETE FROM logs_sistema 
-                    WHERE timestamp < ?
-                """, (data_limite,))
+        except Exception as e:
+            self.logger.error(f"❌ Erro ao obter estatísticas horárias: {e}")
+            return []
+    
+    async def obter_relatorio_desempenho(self, inicio: datetime,
+                                         fim: datetime) -> List[Dict[str, Any]]:
+        """Percentis de latência, médias por etapa e tokens por dia, modelo e servidor em [inicio, fim)"""
+        try:
+            async with aiosqlite.connect(self.db_path) as db:
+                db.row_factory = aiosqlite.Row
+                cursor = await db.execute(SQL_RELATORIO_DESEMPENHO,
+                                          (_momento_para_texto(inicio), _momento_para_texto(fim)))
+                return [dict(row) for row in await cursor.fetchall()]
                 
+        except Exception as e:
+            self.logger.error(f"❌ Erro ao obter relatório de desempenho: {e}")
+            return []
+    
+    async def atualizar_estatisticas_diarias(self, data: Optional[date] = None):
+        """
+        Reconcilia as estatísticas materializadas de um dia com `interacoes`
+        
+        Os agregados já são mantidos a cada escrita; esta rotina apenas os
+        recalcula a partir da faixa de timestamps do dia, usando o índice.
+        """
+        try:
+            data = data or datetime.now(timezone.utc).date()
+            inicio = data.isoformat()
+            fim = (data + timedelta(days=1)).isoformat()
+            
+            async with aiosqlite.connect(self.db_path) as db:
+                await rollups.recalcular_periodo(db, inicio, fim)
                 await db.commit()
                 
-                self.logger.info(f"🧹 Limpeza concluída: {removidas} registros removidos")
+        except Exception as e:
+            self.logger.error(f"❌ Erro ao atualizar estatísticas diárias: {e}")
+    
+    async def limpar_dados_antigos(self, dias: int = 90,
+                                   diretorio_arquivo: Optional[str] = None,
+                                   tamanho_lote: int = 500,
+                                   ocupado: Optional[Callable[[], bool]] = None
+                                   ) -> Optional[RelatorioRetencao]:
+        """
+        Remove dados antigos para otimização
+        
+        Os registros expirados são arquivados em partições comprimidas por
+        data e removidos em lotes curtos, sem bloquear as escritas do bot.
+        
+        Args:
+            dias: Dias de retenção
+            diretorio_arquivo: Destino das partições (padrão: 'arquivo' ao lado do banco)
+            tamanho_lote: Registros removidos por transação
+            ocupado: Indica se o bot está atendendo usuários (alonga as pausas)
+        
+        Returns:
+            Relatório com volume, vazão e tempo de lock, ou None em caso de erro
+        """
+        try:
+            data_limite = datetime.now(timezone.utc) - timedelta(days=dias)
+            diretorio = diretorio_arquivo or str(Path(self.db_path).parent / "arquivo")
+            
+            retencao = RetencaoDados(self.db_path, diretorio, tamanho_lote=tamanho_lote,
+                                     politicas=self._politicas_retencao(), ocupado=ocupado)
+            return await retencao.executar(data_limite)
                 
         except Exception as e:
             self.logger.error(f"❌ Erro na limpeza de dados: {e}")
+            return None
+    
+    def _politicas_retencao(self) -> List[PoliticaRetencao]:
+        """Políticas padrão, com as respostas de `interacoes` lidas de `textos`"""
+        politicas = []
+        for politica in POLITICAS_PADRAO:
+            if politica.tabela == 'interacoes':
+                politica = replace(politica, expandir=self._expandir_respostas,
+                                   antes_de_remover=self._desindexar_interacoes,
+                                   depois_de_remover=self._remover_textos_orfaos)
+            politicas.append(politica)
+        return politicas
+    
+    async def _expandir_respostas(self, db: aiosqlite.Connection, linhas: List[Dict[str, Any]]):
+        """Inclui o texto da resposta nas interações a arquivar"""
+        respostas = await self.textos.obter_varios(db, (linha['resposta_texto_id'] for linha in linhas))
+        for linha in linhas:
+            linha['resposta'] = respostas.get(linha['resposta_texto_id'])
+    
+    async def _desindexar_interacoes(self, db: aiosqlite.Connection, linhas: List[Dict[str, Any]]):
+        """Remove do índice textual as interações que serão apagadas"""
+        if self.busca_textual_ativa:
+            await busca.desindexar(db, [(linha['id'], linha['mensagem'], linha['resposta'])
+                                        for linha in linhas])
+    
+    async def _remover_textos_orfaos(self, db: aiosqlite.Connection,
+                                     linhas: List[Dict[str, Any]]) -> Dict[str, int]:
+        """Apaga as respostas que só as interações do lote referenciavam"""
+        removidos = await self.textos.remover_orfaos(db, (linha['resposta_texto_id'] for linha in linhas))
+        return {'textos': removidos}
+    
+    async def otimizar_textos(self, tamanho_lote: int = 500) -> Dict[str, Any]:
+        """
+        Treina um novo dicionário com as respostas recentes e recomprime o acervo
+        
+        A recompressão é feita em lotes curtos; ao final, dicionários que
+        nenhum texto usa mais são removidos.
+        
+        Returns:
+            Estatísticas de armazenamento dos textos após a otimização
+        """
+        try:
+            async with aiosqlite.connect(self.db_path) as db:
+                await self.textos.treinar_dicionario(db)
+                await db.commit()
+                
+                ultimo_id = 0
+                while ultimo_id is not None:
+                    ultimo_id = await self.textos.recomprimir(db, ultimo_id, tamanho_lote)
+                    await db.commit()
+                    await asyncio.sleep(0)
+                
+                await self.textos.remover_dicionarios_sem_uso(db)
+                await db.commit()
+                return await self.textos.estatisticas(db)
+                
+        except Exception as e:
+            self.logger.error(f"❌ Erro ao otimizar textos: {e}")
+            return {}
+    
+    async def checkpoint_wal(self, modo: str = "PASSIVE") -> Dict[str, int]:
+        """
+        Copia o conteúdo do WAL para o banco principal
+        
+        PASSIVE nunca espera por leitores ou escritores; TRUNCATE também
+        zera o arquivo -wal, mas pode aguardar o fim das transações.
+        """
+        try:
+            async with aiosqlite.connect(self.db_path) as db:
+                cursor = await db.execute(f"PRAGMA wal_checkpoint({modo})")
+                ocupado, paginas_wal, paginas_copiadas = await cursor.fetchone()
+                return {
+                    'ocupado': ocupado,
+                    'paginas_wal': paginas_wal,
+                    'paginas_copiadas': paginas_copiadas
+                }
+        except Exception as e:
+            self.logger.error(f"❌ Erro no checkpoint do WAL: {e}")
+            return {}
+    
+    async def criar_backup(self, diretorio: Optional[str] = None, manter: int = 7,
+                           ocupado: Optional[Callable[[], bool]] = None
+                           ) -> Optional[RelatorioBackup]:
+        """
+        Grava um snapshot comprimido do banco sem interromper o bot
+        
+        A cópia usa a API de backup online do SQLite em passos curtos,
+        intercalados com pausas no event loop; os snapshots mais antigos
+        além de `manter` são removidos.
+        
+        Args:
+            diretorio: Destino dos snapshots (padrão: 'backups' ao lado do banco)
+            manter: Quantidade de snapshots mantidos
+            ocupado: Indica se o bot está atendendo usuários (alonga as pausas)
+        
+        Returns:
+            Relatório com vazão e tempo de lock, ou None em caso de erro
+        """
+        try:
+            destino = diretorio or str(Path(self.db_path).parent / "backups")
+            backup = BackupOnline(self.db_path, destino, manter=manter, ocupado=ocupado)
+            return await backup.executar()
+                
+        except Exception as e:
+            self.logger.error(f"❌ Erro no backup do banco: {e}")
+            return None
+    
+    async def salvar_contextos(self, contextos: List[ContextoConversa]) -> bool:
+        """Grava um snapshot dos contextos de conversa em cache"""
+        if not contextos:
+            return True
+        try:
+            async with aiosqlite.connect(self.db_path) as db:
+                await db.executemany("""
+                    INSERT INTO contextos_conversa
+                    (usuario_id, canal_id, servidor_id, contexto, ultimo_update, ativo)
+                    VALUES (?, ?, ?, ?, ?, 1)
+                    ON CONFLICT(usuario_id, canal_id) DO UPDATE SET
+                        servidor_id = excluded.servidor_id,
+                        contexto = excluded.contexto,
+                        ultimo_update = excluded.ultimo_update,
+                        ativo = 1
+                """, [
+                    (contexto.usuario_id, contexto.canal_id, contexto.servidor_id,
+                     contexto.contexto_json(), _momento_para_texto(contexto.ultimo_update))
+                    for contexto in contextos
+                ])
+                await db.commit()
+                return True
+        except Exception as e:
+            self.logger.error(f"❌ Erro ao salvar contextos: {e}")
+            return False
+    
+    async def desativar_contextos(self, chaves: List[tuple]) -> bool:
+        """Marca contextos (usuario_id, canal_id) expirados como inativos"""
+        if not chaves:
+            return True
+        try:
+            async with aiosqlite.connect(self.db_path) as db:
+                await db.executemany("""
+                    UPDATE contextos_conversa SET ativo = 0
+                    WHERE usuario_id = ? AND canal_id = ?
+                """, chaves)
+                await db.commit()
+                return True
+        except Exception as e:
+            self.logger.error(f"❌ Erro ao desativar contextos: {e}")
+            return False
+    
+    async def carregar_contextos(self, max_idade_segundos: float) -> List[ContextoConversa]:
+        """Carrega os contextos ativos atualizados nos últimos `max_idade_segundos`"""
+        try:
+            limite = (datetime.now(timezone.utc) - timedelta(seconds=max_idade_segundos))
+            async with aiosqlite.connect(self.db_path) as db:
+                return await self._buscar_modelos(db, ContextoConversa.da_linha, f"""
+                    SELECT {ContextoConversa.COLUNAS}
+                    FROM contextos_conversa
+                    WHERE ativo = 1 AND ultimo_update >= ?
+                """, (_momento_para_texto(limite),))
+        except Exception as e:
+            self.logger.error(f"❌ Erro ao carregar contextos: {e}")
+            return []
     
     async def fechar(self):
         """Fecha conexões do banco de dados"""
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Seleção do backend de armazenamento do Oráculo de Concursos
+"""
+
+from bot.config import Config
+from database.base import ArmazenamentoBase
+
+
+BACKENDS = ('sqlite', 'postgres')
+
+
+def criar_armazenamento(config: Config) -> ArmazenamentoBase:
+    """
+    Cria o backend configurado em DATABASE_BACKEND
+
+    - sqlite: arquivo local em DATABASE_PATH (padrão); com DATABASE_SHARDS > 1,
+      um arquivo por grupo de servidores ao lado de DATABASE_PATH
+    - postgres: servidor em DATABASE_URL, compartilhado entre processos
+    """
+    if config.database_backend == 'postgres':
+        if not config.database_url:
+            raise ValueError("DATABASE_BACKEND=postgres requer DATABASE_URL")
+        # Importação tardia: asyncpg só é necessário com este backend
+        from database.postgres_manager import PostgresManager
+        return PostgresManager(
+            config.database_url,
+            tamanho_minimo_pool=config.database_pool_min,
+            tamanho_maximo_pool=config.database_pool_max
+        )
+
+    if config.database_backend != 'sqlite':
+        raise ValueError(
+            f"DATABASE_BACKEND inválido: {config.database_backend} (use {' ou '.join(BACKENDS)})"
+        )
+
+    if config.database_shards > 1:
+        from database.fragmentacao import ArmazenamentoFragmentado
+        return ArmazenamentoFragmentado(config.database_path, config.database_shards)
+
+    from database.db_manager import DatabaseManager
+    return DatabaseManager(config.database_path)
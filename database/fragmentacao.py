@@ -0,0 +1,633 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Fragmentação do banco SQLite por servidor do Discord
+Cada servidor grava em um arquivo próprio, escolhido pelo hash do
+`servidor_id`, de modo que escritas de servidores diferentes não disputam o
+mesmo lock de escrita; as leituras globais consultam todos os fragmentos em
+paralelo e combinam os resultados
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import shutil
+from collections import deque
+from datetime import date, datetime, timezone
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+import aiosqlite
+
+from database.backup import RelatorioBackup
+from database.base import PERCENTIS_DESEMPENHO, ArmazenamentoBase
+from database.db_manager import DatabaseManager
+from database.models import ContextoConversa, DesempenhoResposta, Interacao, LogSistema, TurnoConversa
+from database.retencao import RelatorioRetencao
+
+
+# Os ids expostos carregam o fragmento nos bits baixos: (id_local << 10) | fragmento
+BITS_FRAGMENTO = 10
+MAXIMO_FRAGMENTOS = 1 << BITS_FRAGMENTO
+_MASCARA_FRAGMENTO = MAXIMO_FRAGMENTOS - 1
+
+# Chaves de estatísticas de textos que são razões, não somas
+_RAZOES_TEXTOS = ('taxa_compressao', 'deduplicacao', 'dicionario_atual')
+
+
+def caminho_manifesto(caminho_base: str) -> Path:
+    """Arquivo que registra quantos fragmentos o banco tem"""
+    base = Path(caminho_base)
+    return base.with_name(f"{base.stem}.fragmentos.json")
+
+
+def caminho_fragmento(caminho_base: str, indice: int, total: int) -> str:
+    """Ex.: data/oraculo.db → data/oraculo.fragmento-02-de-04.db"""
+    base = Path(caminho_base)
+    return str(base.with_name(f"{base.stem}.fragmento-{indice:02d}-de-{total:02d}{base.suffix}"))
+
+
+def ler_manifesto(caminho_base: str) -> Optional[Dict[str, Any]]:
+    """Manifesto da fragmentação, ou None se o banco não for fragmentado"""
+    caminho = caminho_manifesto(caminho_base)
+    if not caminho.exists():
+        return None
+    return json.loads(caminho.read_text(encoding='utf-8'))
+
+
+def gravar_manifesto(caminho_base: str, total: int):
+    """Grava o manifesto de forma atômica (substitui o anterior de uma vez)"""
+    caminho = caminho_manifesto(caminho_base)
+    temporario = caminho.with_suffix('.tmp')
+    temporario.write_text(json.dumps({
+        'total': total,
+        'fragmentos': [Path(caminho_fragmento(caminho_base, i, total)).name for i in range(total)],
+        'atualizado_em': datetime.now(timezone.utc).isoformat(timespec='seconds')
+    }, indent=2), encoding='utf-8')
+    temporario.replace(caminho)
+
+
+def chave_roteamento(servidor_id: Optional[str], canal_id: str) -> str:
+    """Servidor da mensagem; mensagens diretas são distribuídas pelo canal"""
+    return servidor_id if servidor_id is not None else f"dm:{canal_id}"
+
+
+def indice_fragmento(chave: str, total: int) -> int:
+    """Fragmento de uma chave de roteamento (hash estável entre processos)"""
+    digest = hashlib.blake2b(chave.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big') % total
+
+
+def _percentil(ordenados: List[float], percentil: int) -> Optional[float]:
+    """Nearest-rank, como no relatório de cada fragmento"""
+    if not ordenados:
+        return None
+    return ordenados[-(-percentil * len(ordenados) // 100) - 1]
+
+
+def _media(valores: List[Optional[float]]) -> Optional[float]:
+    medidos = [valor for valor in valores if valor is not None]
+    return sum(medidos) / len(medidos) if medidos else None
+
+
+def _resumir_desempenho(data: str, modelo: Optional[str], servidor_id: Optional[str],
+                        linhas: List[tuple]) -> Dict[str, Any]:
+    """
+    Linha do relatório de desempenho a partir das respostas do grupo
+
+    Cada linha: tempo_resposta, tempo_primeiro_token, espera_fila, tempo_banco,
+    tempo_gemini, tempo_validacao, tempo_envio e os três contadores de tokens.
+    """
+    colunas = list(zip(*linhas))
+    resumo: Dict[str, Any] = {'data': data, 'modelo': modelo, 'servidor_id': servidor_id,
+                              'respostas': len(linhas)}
+    for indice, coluna in enumerate(('tempo_resposta', 'tempo_primeiro_token')):
+        ordenados = sorted(valor for valor in colunas[indice] if valor is not None)
+        for percentil in PERCENTIS_DESEMPENHO:
+            resumo[f"{coluna}_p{percentil}"] = _percentil(ordenados, percentil)
+    for indice, chave in enumerate(('espera_fila_media', 'tempo_banco_medio', 'tempo_gemini_medio',
+                                    'tempo_validacao_medio', 'tempo_envio_medio'), start=2):
+        resumo[chave] = _media(colunas[indice])
+    for indice, chave in enumerate(('tokens_entrada', 'tokens_saida', 'tokens_raciocinio'), start=7):
+        resumo[chave] = sum(valor or 0 for valor in colunas[indice])
+    return resumo
+
+
+def id_global(id_local: int, indice: int) -> int:
+    return (id_local << BITS_FRAGMENTO) | indice
+
+
+def id_local(id_global_: int) -> tuple:
+    """(id no fragmento, índice do fragmento)"""
+    return id_global_ >> BITS_FRAGMENTO, id_global_ & _MASCARA_FRAGMENTO
+
+
+class ArmazenamentoFragmentado(ArmazenamentoBase):
+    """
+    Contrato de armazenamento sobre N bancos SQLite, um por grupo de servidores
+
+    Interações, respostas, contextos e a busca com `servidor_id` vão para um
+    único fragmento; estatísticas, busca global, iteração e manutenção
+    consultam todos e combinam os resultados. Usuários ativos em mais de um
+    servidor são contados uma única vez.
+    """
+
+    def __init__(self, caminho_base: str, total: int, usar_manifesto: bool = True):
+        """
+        Args:
+            caminho_base: DATABASE_PATH; os fragmentos ficam ao lado dele
+            total: Quantidade de fragmentos
+            usar_manifesto: Confere e grava o manifesto ao inicializar (a
+                ferramenta de reparticionamento desliga para montar o destino)
+        """
+        if not 1 <= total <= MAXIMO_FRAGMENTOS:
+            raise ValueError(f"Quantidade de fragmentos deve estar entre 1 e {MAXIMO_FRAGMENTOS}")
+        self.caminho_base = caminho_base
+        self.total = total
+        self.usar_manifesto = usar_manifesto
+        self.fragmentos = [
+            DatabaseManager(caminho_fragmento(caminho_base, indice, total))
+            for indice in range(total)
+        ]
+        self.logger = logging.getLogger(__name__)
+
+    async def inicializar(self):
+        """Confere o manifesto e inicializa todos os fragmentos em paralelo"""
+        if self.usar_manifesto:
+            self._conferir_manifesto()
+        await asyncio.gather(*(fragmento.inicializar() for fragmento in self.fragmentos))
+        self.logger.info(f"🧩 Banco fragmentado em {self.total} arquivos SQLite")
+
+    def _conferir_manifesto(self):
+        """Impede abrir o banco com uma quantidade de fragmentos diferente da gravada"""
+        manifesto = ler_manifesto(self.caminho_base)
+        if manifesto is None:
+            base = Path(self.caminho_base)
+            if base.exists() and base.stat().st_size > 0:
+                raise RuntimeError(
+                    f"{base} não é fragmentado; converta-o com "
+                    f"'python ferramentas/reparticionar.py --fragmentos {self.total}'"
+                )
+            gravar_manifesto(self.caminho_base, self.total)
+        elif manifesto['total'] != self.total:
+            raise RuntimeError(
+                f"O banco tem {manifesto['total']} fragmentos e DATABASE_SHARDS={self.total}; "
+                f"use 'python ferramentas/reparticionar.py --fragmentos {self.total}'"
+            )
+
+    def _fragmento(self, servidor_id: Optional[str], canal_id: str) -> int:
+        return indice_fragmento(chave_roteamento(servidor_id, canal_id), self.total)
+
+    async def registrar_usuario(self, usuario_id: str, nome: str,
+                                discriminator: Optional[str] = None,
+                                avatar_url: Optional[str] = None) -> bool:
+        """Registra o usuário em todos os fragmentos (pode usar qualquer servidor)"""
+        resultados = await asyncio.gather(*(
+            fragmento.registrar_usuario(usuario_id, nome, discriminator, avatar_url)
+            for fragmento in self.fragmentos
+        ))
+        return all(resultados)
+
+    async def registrar_interacao(self, usuario_id: str, servidor_id: Optional[str],
+                                  canal_id: str, mensagem: str,
+                                  resposta: Optional[str] = None, confianca: Optional[float] = None,
+                                  tempo_resposta: Optional[float] = None,
+                                  fontes: Optional[List[str]] = None) -> Optional[int]:
+        """Registra o turno no fragmento do servidor"""
+        indice = self._fragmento(servidor_id, canal_id)
+        interacao_id = await self.fragmentos[indice].registrar_interacao(
+            usuario_id, servidor_id, canal_id, mensagem, resposta, confianca, tempo_resposta, fontes
+        )
+        return id_global(interacao_id, indice) if interacao_id is not None else None
+
+    async def registrar_interacoes_em_lote(self, interacoes: List[Interacao]) -> int:
+        """Divide o lote por fragmento e grava as partes em paralelo"""
+        partes: Dict[int, List[Interacao]] = {}
+        for interacao in interacoes:
+            indice = self._fragmento(interacao.servidor_id, interacao.canal_id)
+            partes.setdefault(indice, []).append(interacao)
+
+        gravadas = await asyncio.gather(*(
+            self.fragmentos[indice].registrar_interacoes_em_lote(parte)
+            for indice, parte in partes.items()
+        ))
+        return sum(gravadas)
+
+    async def registrar_resposta(self, interacao_id: int, resposta: str,
+                                 confianca: Optional[float] = None,
+                                 tempo_resposta: Optional[float] = None,
+                                 fontes: Optional[List[str]] = None,
+                                 desempenho: Optional[DesempenhoResposta] = None) -> bool:
+        """Completa o turno no fragmento indicado pelo id"""
+        local, indice = id_local(interacao_id)
+        if indice >= self.total:
+            return False
+        return await self.fragmentos[indice].registrar_resposta(
+            local, resposta, confianca, tempo_resposta, fontes, desempenho
+        )
+
+    async def obter_historico_conversa(self, usuario_id: str, canal_id: str, limite: int = 10,
+                                       servidor_id: Optional[str] = None) -> List[TurnoConversa]:
+        """
+        Histórico da conversa
+
+        Com `servidor_id` a leitura vai a um só fragmento; sem ele (mensagens
+        diretas ou chamadores que não o conhecem), todos são consultados.
+        """
+        if servidor_id is not None:
+            return await self.fragmentos[self._fragmento(servidor_id, canal_id)].obter_historico_conversa(
+                usuario_id, canal_id, limite
+            )
+
+        historicos = await asyncio.gather(*(
+            fragmento.obter_historico_conversa(usuario_id, canal_id, limite)
+            for fragmento in self.fragmentos
+        ))
+        turnos = [turno for historico in historicos for turno in historico]
+        # Ordenação estável: cada histórico já vem em ordem cronológica
+        turnos.sort(key=lambda turno: turno.timestamp)
+        return turnos[-limite:]
+
+    async def iterar_interacoes(self, apos_id: int = 0,
+                                tamanho_lote: int = 1000) -> AsyncIterator[List[Interacao]]:
+        """Intercala os fragmentos em ordem de id global"""
+        local, indice_apos = id_local(apos_id)
+        fontes = [
+            self._paginas_fragmento(indice, local if indice <= indice_apos else local - 1, tamanho_lote)
+            for indice in range(self.total)
+        ]
+        buffers: List[deque] = [deque() for _ in fontes]
+        ativos = set(range(self.total))
+
+        lote: List[Interacao] = []
+        while True:
+            for indice in list(ativos):
+                if not buffers[indice]:
+                    pagina = await anext(fontes[indice], None)
+                    if pagina is None:
+                        ativos.discard(indice)
+                    else:
+                        buffers[indice].extend(pagina)
+            if not ativos:
+                break
+
+            proximo = min(ativos, key=lambda indice: buffers[indice][0].id)
+            lote.append(buffers[proximo].popleft())
+            if len(lote) == tamanho_lote:
+                yield lote
+                lote = []
+
+        if lote:
+            yield lote
+
+    async def _paginas_fragmento(self, indice: int, apos_local: int,
+                                 tamanho_lote: int) -> AsyncIterator[List[Interacao]]:
+        async for pagina in self.fragmentos[indice].iterar_interacoes(apos_local, tamanho_lote):
+            for interacao in pagina:
+                interacao.id = id_global(interacao.id, indice)
+            yield pagina
+
+    async def buscar_respostas(self, consulta: str, limite: int = 5,
+                               servidor_id: Optional[str] = None,
+                               apenas_respondidas: bool = True) -> List[Dict[str, Any]]:
+        """
+        Busca textual
+
+        Com `servidor_id` consulta só o fragmento do servidor. Sem ele, junta
+        os melhores de cada fragmento; o bm25 de cada um usa as estatísticas
+        do próprio corpus, o que basta para ordenar resultados de busca.
+        """
+        if servidor_id is not None:
+            indices = [self._fragmento(servidor_id, '')]
+        else:
+            indices = list(range(self.total))
+
+        resultados = await asyncio.gather(*(
+            self.fragmentos[indice].buscar_respostas(consulta, limite, servidor_id, apenas_respondidas)
+            for indice in indices
+        ))
+        combinados = []
+        for indice, parcial in zip(indices, resultados):
+            for resultado in parcial:
+                combinados.append({**resultado, 'id': id_global(resultado['id'], indice)})
+        combinados.sort(key=lambda resultado: resultado['relevancia'], reverse=True)
+        return combinados[:limite]
+
+    async def registrar_erro(self) -> bool:
+        """Erros não pertencem a um servidor; ficam no primeiro fragmento"""
+        return await self.fragmentos[0].registrar_erro()
+
+    async def registrar_logs(self, logs: List[LogSistema]) -> int:
+        """Logs também ficam no primeiro fragmento"""
+        return await self.fragmentos[0].registrar_logs(logs)
+
+    async def _consultar_todos(self, sql: str, parametros: tuple = ()) -> List[List[tuple]]:
+        """Executa uma leitura em todos os fragmentos em paralelo"""
+        async def consultar(fragmento: DatabaseManager) -> List[tuple]:
+            async with aiosqlite.connect(fragmento.db_path) as db:
+                cursor = await db.execute(sql, parametros)
+                return await cursor.fetchall()
+
+        return await asyncio.gather(*(consultar(fragmento) for fragmento in self.fragmentos))
+
+    async def obter_estatisticas_usuario(self, usuario_id: str) -> Dict[str, Any]:
+        """Soma os agregados do usuário em todos os fragmentos"""
+        try:
+            resultados = await self._consultar_todos("""
+                SELECT u.nome, u.primeiro_uso, u.ultimo_uso, u.total_interacoes,
+                       e.total_perguntas, e.soma_confianca, e.qtd_confianca,
+                       (SELECT SUM(perguntas) FROM atividade_usuario_diaria a
+                        WHERE a.usuario_id = u.id AND a.data >= date('now', '-7 days'))
+                FROM usuarios u
+                LEFT JOIN estatisticas_usuario e ON e.usuario_id = u.id
+                WHERE u.id = ?
+            """, (usuario_id,))
+            linhas = [linha for resultado in resultados for linha in resultado]
+            if not linhas:
+                return {}
+
+            mais_recente = max(linhas, key=lambda linha: linha[2] or '')
+            soma_confianca = sum(linha[5] or 0 for linha in linhas)
+            qtd_confianca = sum(linha[6] or 0 for linha in linhas)
+            return {
+                'nome': mais_recente[0],
+                'primeiro_uso': min((linha[1] for linha in linhas if linha[1]), default=None),
+                'ultimo_uso': mais_recente[2],
+                'total_interacoes': sum(linha[3] or 0 for linha in linhas),
+                'total_perguntas': sum(linha[4] or 0 for linha in linhas),
+                'confianca_media': round(soma_confianca / qtd_confianca, 2) if qtd_confianca else 0,
+                'interacoes_semana': sum(linha[7] or 0 for linha in linhas)
+            }
+
+        except Exception as e:
+            self.logger.error(f"❌ Erro ao obter estatísticas do usuário: {e}")
+            return {}
+
+    async def obter_estatisticas_diarias(self, data: Optional[date] = None) -> Dict[str, Any]:
+        """Soma os agregados do dia; usuários ativos vêm da união entre fragmentos"""
+        try:
+            dia = (data or datetime.now(timezone.utc).date()).isoformat()
+            agregados, atividades = await asyncio.gather(
+                self._consultar_todos("""
+                    SELECT total_perguntas, total_respostas, erros_ocorridos,
+                           soma_confianca, qtd_confianca, soma_tempo_resposta, qtd_tempo_resposta
+                    FROM estatisticas_uso
+                    WHERE data = ?
+                """, (dia,)),
+                self._consultar_todos(
+                    "SELECT usuario_id FROM atividade_usuario_diaria WHERE data = ?", (dia,)
+                )
+            )
+            linhas = [linha for resultado in agregados for linha in resultado]
+            if not linhas:
+                return {}
+
+            somas = [sum(linha[coluna] or 0 for linha in linhas) for coluna in range(7)]
+            usuarios = {linha[0] for resultado in atividades for linha in resultado}
+            return {
+                'data': dia,
+                'total_usuarios_ativos': len(usuarios),
+                'total_perguntas': somas[0],
+                'total_respostas': somas[1],
+                'tempo_medio_resposta': somas[5] / somas[6] if somas[6] else 0.0,
+                'confianca_media': somas[3] / somas[4] if somas[4] else 0.0,
+                'erros_ocorridos': somas[2]
+            }
+
+        except Exception as e:
+            self.logger.error(f"❌ Erro ao obter estatísticas diárias: {e}")
+            return {}
+
+    async def obter_estatisticas_horarias(self, inicio: datetime,
+                                          fim: datetime) -> List[Dict[str, Any]]:
+        """Soma os agregados por hora; usuários ativos vêm da união entre fragmentos"""
+        try:
+            limites = (inicio.strftime('%Y-%m-%d %H:%M:%S'), fim.strftime('%Y-%m-%d %H:%M:%S'))
+            agregados, atividades = await asyncio.gather(
+                self._consultar_todos("""
+                    SELECT hora, total_perguntas, total_respostas, erros_ocorridos,
+                           soma_confianca, qtd_confianca, soma_tempo_resposta, qtd_tempo_resposta
+                    FROM estatisticas_horarias
+                    WHERE hora >= ? AND hora < ?
+                """, limites),
+                # Pelo índice de timestamp; só a janela consultada
+                self._consultar_todos("""
+                    SELECT DISTINCT strftime('%Y-%m-%d %H:00:00', timestamp), usuario_id
+                    FROM interacoes
+                    WHERE timestamp >= ? AND timestamp < ?
+                """, limites)
+            )
+
+            horas: Dict[str, List[float]] = {}
+            for resultado in agregados:
+                for hora, *valores in resultado:
+                    somas = horas.setdefault(hora, [0] * 7)
+                    for coluna, valor in enumerate(valores):
+                        somas[coluna] += valor or 0
+
+            usuarios: Dict[str, set] = {}
+            for resultado in atividades:
+                for hora, usuario_id in resultado:
+                    usuarios.setdefault(hora, set()).add(usuario_id)
+
+            return [
+                {
+                    'hora': hora,
+                    'total_usuarios_ativos': len(usuarios.get(hora, ())),
+                    'total_perguntas': somas[0],
+                    'total_respostas': somas[1],
+                    'confianca_media': somas[3] / somas[4] if somas[4] else None,
+                    'tempo_medio_resposta': somas[5] / somas[6] if somas[6] else None,
+                    'erros_ocorridos': somas[2]
+                }
+                for hora, somas in sorted(horas.items())
+            ]
+
+        except Exception as e:
+            self.logger.error(f"❌ Erro ao obter estatísticas horárias: {e}")
+            return []
+
+    async def obter_relatorio_desempenho(self, inicio: datetime,
+                                         fim: datetime) -> List[Dict[str, Any]]:
+        """
+        Relatório de desempenho de todos os fragmentos
+
+        Cada servidor está em um só fragmento, então seus grupos vêm prontos;
+        mensagens diretas se espalham entre fragmentos pelo canal e percentis
+        não se combinam, por isso esses grupos são recalculados a partir das
+        respostas.
+        """
+        try:
+            limites = (inicio.strftime('%Y-%m-%d %H:%M:%S'), fim.strftime('%Y-%m-%d %H:%M:%S'))
+            relatorios, diretas = await asyncio.gather(
+                asyncio.gather(*(
+                    fragmento.obter_relatorio_desempenho(inicio, fim) for fragmento in self.fragmentos
+                )),
+                self._consultar_todos("""
+                    SELECT date(timestamp), modelo, tempo_resposta, tempo_primeiro_token,
+                           espera_fila, tempo_banco, tempo_gemini, tempo_validacao, tempo_envio,
+                           tokens_entrada, tokens_saida, tokens_raciocinio
+                    FROM interacoes
+                    WHERE timestamp >= ? AND timestamp < ? AND respondida_em IS NOT NULL
+                      AND servidor_id IS NULL
+                """, limites)
+            )
+
+            grupos: Dict[tuple, List[tuple]] = {}
+            for resultado in diretas:
+                for data, modelo, *valores in resultado:
+                    grupos.setdefault((data, modelo), []).append(valores)
+
+            linhas = [linha for relatorio in relatorios for linha in relatorio
+                      if linha['servidor_id'] is not None]
+            linhas.extend(_resumir_desempenho(data, modelo, None, valores)
+                          for (data, modelo), valores in grupos.items())
+            linhas.sort(key=lambda linha: (linha['data'], linha['modelo'] is None, linha['modelo'] or '',
+                                           linha['servidor_id'] is None, linha['servidor_id'] or ''))
+            return linhas
+
+        except Exception as e:
+            self.logger.error(f"❌ Erro ao obter relatório de desempenho: {e}")
+            return []
+
+    async def atualizar_estatisticas_diarias(self, data: Optional[date] = None):
+        """Reconcilia o dia em todos os fragmentos"""
+        await asyncio.gather(*(
+            fragmento.atualizar_estatisticas_diarias(data) for fragmento in self.fragmentos
+        ))
+
+    async def limpar_dados_antigos(self, dias: int = 90,
+                                   diretorio_arquivo: Optional[str] = None,
+                                   tamanho_lote: int = 500,
+                                   ocupado: Optional[Callable[[], bool]] = None
+                                   ) -> Optional[RelatorioRetencao]:
+        """
+        Executa a retenção fragmento a fragmento e consolida os relatórios
+
+        Em sequência: a retenção já cede espaço à carga do bot, e os
+        fragmentos anexam aos mesmos arquivos de partição.
+        """
+        relatorios = []
+        for fragmento in self.fragmentos:
+            relatorio = await fragmento.limpar_dados_antigos(
+                dias, diretorio_arquivo, tamanho_lote, ocupado
+            )
+            if relatorio is None:
+                return None
+            relatorios.append(relatorio)
+
+        consolidado = RelatorioRetencao(data_limite=relatorios[0].data_limite)
+        for relatorio in relatorios:
+            for tabela, quantidade in relatorio.removidas.items():
+                consolidado.removidas[tabela] = consolidado.removidas.get(tabela, 0) + quantidade
+            for tabela, quantidade in relatorio.arquivadas.items():
+                consolidado.arquivadas[tabela] = consolidado.arquivadas.get(tabela, 0) + quantidade
+            consolidado.arquivos.extend(
+                arquivo for arquivo in relatorio.arquivos if arquivo not in consolidado.arquivos
+            )
+            consolidado.lotes += relatorio.lotes
+            consolidado.duracao += relatorio.duracao
+            consolidado.tempo_bloqueio_total += relatorio.tempo_bloqueio_total
+            consolidado.tempo_bloqueio_maximo = max(consolidado.tempo_bloqueio_maximo,
+                                                    relatorio.tempo_bloqueio_maximo)
+            consolidado.paginas_liberadas += relatorio.paginas_liberadas
+        return consolidado
+
+    async def criar_backup(self, diretorio: Optional[str] = None, manter: int = 7,
+                           ocupado: Optional[Callable[[], bool]] = None
+                           ) -> Optional[RelatorioBackup]:
+        """
+        Snapshot de cada fragmento, em sequência, e cópia do manifesto
+
+        Os fragmentos são copiados em instantes diferentes: o conjunto não é
+        um snapshot atômico entre servidores, mas cada arquivo é consistente.
+        """
+        destino = Path(diretorio or Path(self.caminho_base).parent / "backups")
+        relatorios = []
+        for fragmento in self.fragmentos:
+            relatorio = await fragmento.criar_backup(str(destino), manter, ocupado)
+            if relatorio is None:
+                return None
+            relatorios.append(relatorio)
+        if self.usar_manifesto:
+            shutil.copy2(caminho_manifesto(self.caminho_base), destino)
+
+        consolidado = RelatorioBackup()
+        for relatorio in relatorios:
+            consolidado.arquivos.extend(relatorio.arquivos)
+            consolidado.removidos.extend(relatorio.removidos)
+            consolidado.paginas += relatorio.paginas
+            consolidado.bytes_banco += relatorio.bytes_banco
+            consolidado.bytes_comprimidos += relatorio.bytes_comprimidos
+            consolidado.passos += relatorio.passos
+            consolidado.reinicios += relatorio.reinicios
+            consolidado.passo_unico = consolidado.passo_unico or relatorio.passo_unico
+            consolidado.duracao += relatorio.duracao
+            consolidado.tempo_bloqueio_total += relatorio.tempo_bloqueio_total
+            consolidado.tempo_bloqueio_maximo = max(consolidado.tempo_bloqueio_maximo,
+                                                    relatorio.tempo_bloqueio_maximo)
+        return consolidado
+
+    async def salvar_contextos(self, contextos: List[ContextoConversa]) -> bool:
+        """Grava cada contexto no fragmento do seu servidor"""
+        partes: Dict[int, List[ContextoConversa]] = {}
+        for contexto in contextos:
+            partes.setdefault(self._fragmento(contexto.servidor_id, contexto.canal_id), []).append(contexto)
+        resultados = await asyncio.gather(*(
+            self.fragmentos[indice].salvar_contextos(parte) for indice, parte in partes.items()
+        ))
+        return all(resultados)
+
+    async def desativar_contextos(self, chaves: List[tuple]) -> bool:
+        """As chaves não trazem o servidor; a atualização por chave única vai a todos"""
+        if not chaves:
+            return True
+        resultados = await asyncio.gather(*(
+            fragmento.desativar_contextos(chaves) for fragmento in self.fragmentos
+        ))
+        return all(resultados)
+
+    async def carregar_contextos(self, max_idade_segundos: float) -> List[ContextoConversa]:
+        """Contextos recentes de todos os fragmentos"""
+        resultados = await asyncio.gather(*(
+            fragmento.carregar_contextos(max_idade_segundos) for fragmento in self.fragmentos
+        ))
+        return [contexto for parcial in resultados for contexto in parcial]
+
+    async def checkpoint_wal(self, modo: str = "PASSIVE") -> Dict[str, int]:
+        """Checkpoint do WAL de cada fragmento (valores somados)"""
+        resultados = await asyncio.gather(*(
+            fragmento.checkpoint_wal(modo) for fragmento in self.fragmentos
+        ))
+        return _somar(resultados)
+
+    async def otimizar_textos(self, tamanho_lote: int = 500) -> Dict[str, Any]:
+        """Otimiza um fragmento por vez (o treino do dicionário usa CPU)"""
+        resultados = [await fragmento.otimizar_textos(tamanho_lote) for fragmento in self.fragmentos]
+        estatisticas = _somar(resultados, ignorar=_RAZOES_TEXTOS)
+        if estatisticas:
+            comprimidos = estatisticas.get('bytes_comprimidos', 0)
+            referencias = estatisticas.get('referencias', 0)
+            estatisticas['taxa_compressao'] = (
+                estatisticas.get('bytes_originais', 0) / comprimidos if comprimidos else 0.0
+            )
+            estatisticas['deduplicacao'] = (
+                1 - estatisticas.get('textos', 0) / referencias if referencias else 0.0
+            )
+        return estatisticas
+
+    async def fechar(self):
+        """Fecha todos os fragmentos"""
+        await asyncio.gather(*(fragmento.fechar() for fragmento in self.fragmentos))
+
+
+def _somar(resultados: List[Dict[str, Any]], ignorar: tuple = ()) -> Dict[str, Any]:
+    """Soma chave a chave os valores numéricos de vários fragmentos"""
+    total: Dict[str, Any] = {}
+    for resultado in resultados:
+        for chave, valor in resultado.items():
+            if chave in ignorar or not isinstance(valor, (int, float)):
+                continue
+            total[chave] = total.get(chave, 0) + valor
+    return total
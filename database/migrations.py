@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Migrações versionadas do banco de dados do Oráculo de Concursos
+Cada migração leva o schema de uma versão para a seguinte
+"""
+
+import logging
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import aiosqlite
+
+from bot.config import DATABASE_SCHEMA_VERSION
+from database import busca, rollups, textos
+
+
+# Quantidade de linhas lidas por vez ao converter tabelas existentes
+TAMANHO_LOTE_PADRAO = 1000
+
+# Versão do schema original (uma linha por pergunta e outra por resposta)
+VERSAO_INICIAL = "1.0"
+
+logger = logging.getLogger(__name__)
+
+
+def _versao_para_tupla(versao: str) -> Tuple[int, ...]:
+    """Converte '2.1' em (2, 1) para comparação"""
+    return tuple(int(parte) for parte in versao.split('.'))
+
+
+async def _colunas_da_tabela(db: aiosqlite.Connection, tabela: str) -> List[str]:
+    """Lista as colunas de uma tabela (vazia se a tabela não existir)"""
+    cursor = await db.execute(f"PRAGMA table_info({tabela})")
+    return [row[1] for row in await cursor.fetchall()]
+
+
+async def _migrar_para_turnos(db: aiosqlite.Connection, tamanho_lote: int):
+    """
+    2.0 - Converte `interacoes` para uma linha por turno (pergunta + resposta)
+
+    A tabela antiga é lida em lotes ordenados por id e as respostas são
+    pareadas com a última pergunta pendente do mesmo usuário/canal.
+    """
+    await db.execute("ALTER TABLE interacoes RENAME TO interacoes_v1")
+    await db.execute("""
+        CREATE TABLE interacoes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            usuario_id TEXT NOT NULL,
+            servidor_id TEXT,
+            canal_id TEXT NOT NULL,
+            mensagem TEXT NOT NULL,
+            resposta TEXT,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            respondida_em TIMESTAMP,
+            confianca REAL,
+            tempo_resposta REAL,
+            fontes_utilizadas TEXT,
+            processada BOOLEAN DEFAULT 1,
+            FOREIGN KEY (usuario_id) REFERENCES usuarios (id)
+        )
+    """)
+
+    insercao = """
+        INSERT INTO interacoes
+        (usuario_id, servidor_id, canal_id, mensagem, resposta, timestamp,
+         respondida_em, confianca, tempo_resposta, fontes_utilizadas)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """
+
+    # Pergunta ainda sem resposta por (usuario_id, canal_id)
+    pendentes: Dict[Tuple[str, str], list] = {}
+    ultimo_id = 0
+    turnos = 0
+    respostas_orfas = 0
+
+    while True:
+        cursor = await db.execute("""
+            SELECT id, usuario_id, servidor_id, canal_id, mensagem, tipo,
+                   timestamp, confianca, tempo_resposta, fontes_utilizadas
+            FROM interacoes_v1
+            WHERE id > ?
+            ORDER BY id
+            LIMIT ?
+        """, (ultimo_id, tamanho_lote))
+        rows = await cursor.fetchall()
+        if not rows:
+            break
+
+        lote = []
+        for (id_, usuario_id, servidor_id, canal_id, mensagem, tipo,
+             timestamp, confianca, tempo_resposta, fontes) in rows:
+            chave = (usuario_id, canal_id)
+
+            if tipo == 'pergunta':
+                # Pergunta anterior ficou sem resposta: vira turno não respondido
+                if chave in pendentes:
+                    lote.append(pendentes.pop(chave))
+                pendentes[chave] = [usuario_id, servidor_id, canal_id, mensagem,
+                                    None, timestamp, None, None, None, None]
+            elif chave in pendentes:
+                turno = pendentes.pop(chave)
+                turno[4] = mensagem
+                turno[6] = timestamp
+                turno[7] = confianca
+                turno[8] = tempo_resposta
+                turno[9] = fontes
+                lote.append(turno)
+            else:
+                respostas_orfas += 1
+
+        if lote:
+            await db.executemany(insercao, lote)
+            turnos += len(lote)
+        ultimo_id = rows[-1][0]
+
+    # Perguntas que nunca receberam resposta
+    if pendentes:
+        restantes = sorted(pendentes.values(), key=lambda turno: turno[5] or '')
+        await db.executemany(insercao, restantes)
+        turnos += len(restantes)
+
+    await db.execute("DROP TABLE interacoes_v1")
+
+    logger.info(
+        f"🔄 Interações convertidas em {turnos} turnos "
+        f"({respostas_orfas} respostas sem pergunta descartadas)"
+    )
+
+
+async def _criar_rollups(db: aiosqlite.Connection, tamanho_lote: int):
+    """2.1 - Cria e preenche as estatísticas materializadas por hora, dia e usuário"""
+    colunas = await _colunas_da_tabela(db, 'estatisticas_uso')
+    for coluna, definicao in rollups.COLUNAS_MEDIAS_DIARIAS.items():
+        if coluna not in colunas:
+            await db.execute(f"ALTER TABLE estatisticas_uso ADD COLUMN {coluna} {definicao}")
+
+    await rollups.criar_tabelas_rollup(db)
+    await rollups.recalcular_periodo(db)
+    await rollups.recalcular_usuarios(db)
+
+
+async def _criar_busca_textual(db: aiosqlite.Connection, tamanho_lote: int):
+    """
+    2.2 - Cria o índice FTS5 de perguntas e respostas
+
+    O histórico é indexado pela migração 2.3, que recria o índice sem conteúdo.
+    """
+    await busca.criar_indice_textual(db)
+
+
+async def _armazenar_textos(db: aiosqlite.Connection, tamanho_lote: int):
+    """
+    2.3 - Move as respostas para `textos` (deduplicadas e comprimidas)
+
+    Treina o primeiro dicionário com as respostas mais recentes, converte
+    `interacoes` em lotes ordenados por id, reindexa o FTS5 sem conteúdo e
+    remove a coluna `resposta`.
+    """
+    await textos.criar_tabelas_textos(db)
+    if 'resposta_texto_id' not in await _colunas_da_tabela(db, 'interacoes'):
+        await db.execute(
+            "ALTER TABLE interacoes ADD COLUMN resposta_texto_id INTEGER REFERENCES textos (id)"
+        )
+
+    # O índice da 2.2 lia o texto da própria tabela
+    for gatilho in busca.GATILHOS_ANTIGOS:
+        await db.execute(f"DROP TRIGGER IF EXISTS {gatilho}")
+    await db.execute("DROP TABLE IF EXISTS interacoes_fts")
+    indice_ativo = await busca.criar_indice_textual(db)
+
+    armazem = textos.ArmazemTextos()
+    cursor = await db.execute("""
+        SELECT resposta FROM interacoes
+        WHERE resposta IS NOT NULL
+        ORDER BY id DESC
+        LIMIT ?
+    """, (textos.AMOSTRAS_DICIONARIO_PADRAO,))
+    amostras = [row[0].encode('utf-8') for row in await cursor.fetchall()]
+    await armazem.registrar_dicionario(db, amostras)
+
+    ultimo_id = 0
+    convertidas = 0
+    while True:
+        cursor = await db.execute("""
+            SELECT id, mensagem, resposta FROM interacoes
+            WHERE id > ?
+            ORDER BY id
+            LIMIT ?
+        """, (ultimo_id, tamanho_lote))
+        rows = await cursor.fetchall()
+        if not rows:
+            break
+
+        referencias = []
+        for id_, mensagem, resposta in rows:
+            if resposta is not None:
+                referencias.append((await armazem.guardar(db, resposta), id_))
+        await db.executemany(
+            "UPDATE interacoes SET resposta_texto_id = ? WHERE id = ?", referencias
+        )
+        if indice_ativo:
+            await busca.indexar(db, rows)
+
+        convertidas += len(referencias)
+        ultimo_id = rows[-1][0]
+
+    # O índice de cobertura antigo incluía a coluna removida
+    await db.execute("DROP INDEX IF EXISTS idx_interacoes_usuario_canal_timestamp")
+    await db.execute("ALTER TABLE interacoes DROP COLUMN resposta")
+
+    estatisticas = await armazem.estatisticas(db)
+    logger.info(
+        f"🗜️ {convertidas} respostas movidas para {estatisticas['textos']} textos "
+        f"(compressão {estatisticas['taxa_compressao']:.1f}x)"
+    )
+
+
+async def _registrar_servidor_contextos(db: aiosqlite.Connection, tamanho_lote: int):
+    """2.4 - Guarda o servidor de cada contexto (roteamento entre fragmentos)"""
+    if 'servidor_id' not in await _colunas_da_tabela(db, 'contextos_conversa'):
+        await db.execute("ALTER TABLE contextos_conversa ADD COLUMN servidor_id TEXT")
+
+
+# Colunas adicionadas pela 2.5 (nulas nos turnos anteriores)
+COLUNAS_DESEMPENHO = {
+    'modelo': 'TEXT',
+    'espera_fila': 'REAL',
+    'tempo_banco': 'REAL',
+    'tempo_primeiro_token': 'REAL',
+    'tempo_gemini': 'REAL',
+    'tempo_validacao': 'REAL',
+    'tempo_envio': 'REAL',
+    'tokens_entrada': 'INTEGER',
+    'tokens_saida': 'INTEGER',
+    'tokens_raciocinio': 'INTEGER',
+}
+
+
+async def _registrar_desempenho(db: aiosqlite.Connection, tamanho_lote: int):
+    """2.5 - Modelo, tempo de cada etapa e tokens de cada resposta"""
+    colunas = await _colunas_da_tabela(db, 'interacoes')
+    for coluna, tipo in COLUNAS_DESEMPENHO.items():
+        if coluna not in colunas:
+            await db.execute(f"ALTER TABLE interacoes ADD COLUMN {coluna} {tipo}")
+
+
+# (versão de destino, descrição, função de migração)
+MIGRACOES: List[Tuple[str, str, Callable[[aiosqlite.Connection, int], Awaitable[None]]]] = [
+    ("2.0", "interações em turnos pergunta/resposta", _migrar_para_turnos),
+    ("2.1", "estatísticas materializadas por hora, dia e usuário", _criar_rollups),
+    ("2.2", "índice textual FTS5 de perguntas e respostas", _criar_busca_textual),
+    ("2.3", "respostas comprimidas e deduplicadas em textos", _armazenar_textos),
+    ("2.4", "servidor de origem dos contextos de conversa", _registrar_servidor_contextos),
+    ("2.5", "tempos por etapa e tokens de cada resposta", _registrar_desempenho),
+]
+
+
+async def _criar_tabela_versao(db: aiosqlite.Connection):
+    """Cria a tabela de controle de versões do schema"""
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS schema_versao (
+            versao TEXT PRIMARY KEY,
+            descricao TEXT,
+            aplicada_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+async def obter_versao_schema(db: aiosqlite.Connection) -> Optional[str]:
+    """
+    Obtém a versão atual do schema
+
+    Returns:
+        Versão registrada, VERSAO_INICIAL para bancos anteriores ao controle
+        de versões ou None para bancos novos
+    """
+    await _criar_tabela_versao(db)
+    cursor = await db.execute("SELECT versao FROM schema_versao")
+    versoes = [row[0] for row in await cursor.fetchall()]
+    if versoes:
+        return max(versoes, key=_versao_para_tupla)
+
+    # Bancos criados antes do controle de versões ainda têm a coluna 'tipo'
+    if 'tipo' in await _colunas_da_tabela(db, 'interacoes'):
+        return VERSAO_INICIAL
+    return None
+
+
+async def aplicar_migracoes(db_path: str, tamanho_lote: int = TAMANHO_LOTE_PADRAO) -> str:
+    """
+    Aplica as migrações pendentes até DATABASE_SCHEMA_VERSION
+
+    Cada migração roda em sua própria transação, junto com o registro da
+    nova versão, de modo que uma falha não deixa o schema pela metade.
+
+    Args:
+        db_path: Caminho do banco SQLite
+        tamanho_lote: Linhas lidas por lote ao converter dados existentes
+
+    Returns:
+        Versão do schema após as migrações
+    """
+    async with aiosqlite.connect(db_path) as db:
+        return await migrar(db, tamanho_lote)
+
+
+async def migrar(db: aiosqlite.Connection, tamanho_lote: int = TAMANHO_LOTE_PADRAO) -> str:
+    """Como aplicar_migracoes, em uma conexão já aberta (sem transação pendente)"""
+    versao_atual = await obter_versao_schema(db)
+    await db.commit()
+
+    if versao_atual is None:
+        # Banco novo: as tabelas já foram criadas na versão corrente
+        await db.execute(
+            "INSERT INTO schema_versao (versao, descricao) VALUES (?, ?)",
+            (DATABASE_SCHEMA_VERSION, "schema inicial")
+        )
+        await db.commit()
+        return DATABASE_SCHEMA_VERSION
+
+    for versao, descricao, migracao in MIGRACOES:
+        if _versao_para_tupla(versao) <= _versao_para_tupla(versao_atual):
+            continue
+        if _versao_para_tupla(versao) > _versao_para_tupla(DATABASE_SCHEMA_VERSION):
+            break
+
+        logger.info(f"🔄 Migrando schema {versao_atual} → {versao}: {descricao}")
+        try:
+            await db.execute("BEGIN")
+            await migracao(db, tamanho_lote)
+            await db.execute(
+                "INSERT INTO schema_versao (versao, descricao) VALUES (?, ?)",
+                (versao, descricao)
+            )
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
+        versao_atual = versao
+
+    return versao_atual
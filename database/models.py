@@ -3,15 +3,51 @@
 """
 Modelos de dados para o Oráculo de Concursos
 Define estruturas de dados para interações com o banco
+
+Os modelos usam __slots__ (sem __dict__ por instância) e são montados
+direto das linhas do cursor por `da_linha`, no formato de row_factory do
+sqlite3; a serialização JSON usa o pydantic-core.
 """
 
 from dataclasses import dataclass, field
-from datetime import datetime
-from typing import Optional, List, Dict, Any
-import json
+from datetime import datetime, timezone
+from typing import Any, ClassVar, Dict, List, Optional, Sequence, Union
+
+import pydantic_core
+
+
+def agora_utc() -> datetime:
+    """Instante atual em UTC, sem fuso (como as colunas de tempo do banco)"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def para_momento(valor: Union[datetime, str, float, None]) -> Optional[datetime]:
+    """Texto ISO ('AAAA-MM-DD HH:MM:SS'), epoch ou datetime → datetime"""
+    if not valor:
+        return None
+    if isinstance(valor, datetime):
+        return valor
+    if isinstance(valor, (int, float)):
+        return datetime.fromtimestamp(valor, timezone.utc).replace(tzinfo=None)
+    return datetime.fromisoformat(valor)
+
+
+def para_json(valor: Any) -> str:
+    """Serializa modelos, dicionários e datetimes (ISO 8601) em JSON UTF-8"""
+    return pydantic_core.to_json(valor).decode('utf-8')
+
 
+def de_json(texto: Union[str, bytes, None]) -> Any:
+    """JSON → objetos Python (None para texto vazio ou inválido)"""
+    if not texto:
+        return None
+    try:
+        return pydantic_core.from_json(texto)
+    except ValueError:
+        return None
 
-@dataclass
+
+@dataclass(slots=True)
 class Usuario:
     """Modelo para usuários do Discord"""
     id: str
@@ -24,6 +60,21 @@ class Usuario:
     preferencias: Dict[str, Any] = field(default_factory=dict)
     ativo: bool = True
     
+    # Ordem das colunas esperada por da_linha
+    COLUNAS: ClassVar[str] = (
+        "id, nome, discriminator, avatar_url, primeiro_uso, ultimo_uso, "
+        "total_interacoes, preferencias, ativo"
+    )
+    
+    @classmethod
+    def da_linha(cls, cursor: Any, linha: Sequence[Any]) -> 'Usuario':
+        """row_factory para consultas que selecionam `COLUNAS`"""
+        (usuario_id, nome, discriminator, avatar_url, primeiro_uso, ultimo_uso,
+         total_interacoes, preferencias, ativo) = linha
+        return cls(usuario_id, nome, discriminator, avatar_url, para_momento(primeiro_uso),
+                   para_momento(ultimo_uso), total_interacoes or 0,
+                   de_json(preferencias) or {}, bool(ativo))
+    
     def to_dict(self) -> Dict[str, Any]:
         """Converte para dicionário"""
         return {
@@ -41,53 +92,105 @@ class Usuario:
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> 'Usuario':
         """Cria instância a partir de dicionário"""
-        primeiro_uso = None
-        ultimo_uso = None
-        
-        if data.get('primeiro_uso'):
-            primeiro_uso = datetime.fromisoformat(data['primeiro_uso'])
-        if data.get('ultimo_uso'):
-            ultimo_uso = datetime.fromisoformat(data['ultimo_uso'])
-        
         return cls(
             id=data['id'],
             nome=data['nome'],
             discriminator=data.get('discriminator'),
             avatar_url=data.get('avatar_url'),
-            primeiro_uso=primeiro_uso,
-            ultimo_uso=ultimo_uso,
+            primeiro_uso=para_momento(data.get('primeiro_uso')),
+            ultimo_uso=para_momento(data.get('ultimo_uso')),
             total_interacoes=data.get('total_interacoes', 0),
             preferencias=data.get('preferencias', {}),
             ativo=data.get('ativo', True)
         )
 
 
-@dataclass
+@dataclass(slots=True)
+class DesempenhoResposta:
+    """Tempos (segundos) por etapa e tokens do Gemini de uma resposta"""
+    modelo: Optional[str] = None
+    espera_fila: Optional[float] = None  # Da mensagem no Discord ao início do processamento
+    tempo_banco: Optional[float] = None  # Registro da pergunta e histórico
+    tempo_primeiro_token: Optional[float] = None
+    tempo_gemini: Optional[float] = None
+    tempo_validacao: Optional[float] = None
+    tempo_envio: Optional[float] = None
+    tokens_entrada: Optional[int] = None
+    tokens_saida: Optional[int] = None
+    tokens_raciocinio: Optional[int] = None
+    
+    # Colunas de `interacoes`, na ordem dos campos
+    COLUNAS: ClassVar[str] = (
+        "modelo, espera_fila, tempo_banco, tempo_primeiro_token, tempo_gemini, "
+        "tempo_validacao, tempo_envio, tokens_entrada, tokens_saida, tokens_raciocinio"
+    )
+    
+    def valores(self) -> tuple:
+        """Valores na ordem de `COLUNAS`"""
+        return (self.modelo, self.espera_fila, self.tempo_banco, self.tempo_primeiro_token,
+                self.tempo_gemini, self.tempo_validacao, self.tempo_envio,
+                self.tokens_entrada, self.tokens_saida, self.tokens_raciocinio)
+    
+    @classmethod
+    def dos_valores(cls, valores: Sequence[Any]) -> Optional['DesempenhoResposta']:
+        """Inverso de `valores` (None quando nada foi medido, como em turnos antigos)"""
+        if all(valor is None for valor in valores):
+            return None
+        return cls(*valores)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Converte para dicionário"""
+        return {coluna: valor for coluna, valor in zip(self.COLUNAS.split(', '), self.valores())}
+    
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]]) -> Optional['DesempenhoResposta']:
+        """Cria instância a partir de dicionário (None para None)"""
+        if data is None:
+            return None
+        return cls.dos_valores([data.get(coluna) for coluna in cls.COLUNAS.split(', ')])
+
+
+@dataclass(slots=True)
 class Interacao:
-    """Modelo para interações do usuário"""
+    """Modelo para um turno de conversa (pergunta e resposta do bot)"""
     usuario_id: str
     canal_id: str
-    mensagem: str
-    tipo: str  # 'pergunta' ou 'resposta'
+    mensagem: str  # Pergunta do usuário
     id: Optional[int] = None
     servidor_id: Optional[str] = None
     resposta: Optional[str] = None
     timestamp: Optional[datetime] = None
+    respondida_em: Optional[datetime] = None
     confianca: Optional[float] = None
     tempo_resposta: Optional[float] = None
     fontes_utilizadas: List[str] = field(default_factory=list)
     processada: bool = True
+    desempenho: Optional[DesempenhoResposta] = None
+    
+    # Ordem das colunas esperada por da_linha (a resposta fica por último)
+    COLUNAS: ClassVar[str] = (
+        "id, usuario_id, servidor_id, canal_id, mensagem, timestamp, respondida_em, "
+        f"confianca, tempo_resposta, fontes_utilizadas, processada, {DesempenhoResposta.COLUNAS}, "
+        "resposta"
+    )
     
     def __post_init__(self):
         """Validações após inicialização"""
-        if self.tipo not in ['pergunta', 'resposta']:
-            raise ValueError(f"Tipo inválido: {self.tipo}. Deve ser 'pergunta' ou 'resposta'")
-        
         if self.confianca is not None and not (0 <= self.confianca <= 1):
             raise ValueError(f"Confiança deve estar entre 0 e 1: {self.confianca}")
         
         if self.timestamp is None:
-            self.timestamp = datetime.now()
+            self.timestamp = agora_utc()
+    
+    @classmethod
+    def da_linha(cls, cursor: Any, linha: Sequence[Any]) -> 'Interacao':
+        """row_factory para consultas que selecionam `COLUNAS`"""
+        (interacao_id, usuario_id, servidor_id, canal_id, mensagem, timestamp, respondida_em,
+         confianca, tempo_resposta, fontes, processada) = linha[:11]
+        return cls(usuario_id, canal_id, mensagem, interacao_id, servidor_id, linha[-1],
+                   para_momento(timestamp), para_momento(respondida_em), confianca,
+                   tempo_resposta, fontes.split(',') if fontes else [], bool(processada),
+                   DesempenhoResposta.dos_valores(linha[11:-1]))
     
     def to_dict(self) -> Dict[str, Any]:
         """Converte para dicionário"""
@@ -98,21 +201,18 @@ class Interacao:
             'canal_id': self.canal_id,
             'mensagem': self.mensagem,
             'resposta': self.resposta,
-            'tipo': self.tipo,
             'timestamp': self.timestamp.isoformat() if self.timestamp else None,
+            'respondida_em': self.respondida_em.isoformat() if self.respondida_em else None,
             'confianca': self.confianca,
             'tempo_resposta': self.tempo_resposta,
             'fontes_utilizadas': self.fontes_utilizadas,
-            'processada': self.processada
+            'processada': self.processada,
+            'desempenho': self.desempenho.to_dict() if self.desempenho else None
         }
     
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> 'Interacao':
         """Cria instância a partir de dicionário"""
-        timestamp = None
-        if data.get('timestamp'):
-            timestamp = datetime.fromisoformat(data['timestamp'])
-        
         return cls(
             id=data.get('id'),
             usuario_id=data['usuario_id'],
@@ -120,16 +220,54 @@ class Interacao:
             canal_id=data['canal_id'],
             mensagem=data['mensagem'],
             resposta=data.get('resposta'),
-            tipo=data['tipo'],
-            timestamp=timestamp,
+            timestamp=para_momento(data.get('timestamp')),
+            respondida_em=para_momento(data.get('respondida_em')),
             confianca=data.get('confianca'),
             tempo_resposta=data.get('tempo_resposta'),
             fontes_utilizadas=data.get('fontes_utilizadas', []),
-            processada=data.get('processada', True)
+            processada=data.get('processada', True),
+            desempenho=DesempenhoResposta.from_dict(data.get('desempenho'))
         )
 
 
-@dataclass
+@dataclass(slots=True)
+class TurnoConversa:
+    """Pergunta e resposta de um turno no histórico da conversa"""
+    pergunta: str
+    resposta: str
+    timestamp: Optional[datetime] = None
+    confianca: Optional[float] = None
+    
+    # Ordem das colunas esperada por da_linha
+    COLUNAS: ClassVar[str] = "mensagem, resposta, timestamp, confianca"
+    
+    @classmethod
+    def da_linha(cls, cursor: Any, linha: Sequence[Any]) -> 'TurnoConversa':
+        """row_factory para consultas que selecionam `COLUNAS`"""
+        pergunta, resposta, timestamp, confianca = linha
+        return cls(pergunta, resposta, para_momento(timestamp), confianca)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Converte para dicionário"""
+        return {
+            'pergunta': self.pergunta,
+            'resposta': self.resposta,
+            'timestamp': self.timestamp.isoformat() if self.timestamp else None,
+            'confianca': self.confianca
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'TurnoConversa':
+        """Cria instância a partir de dicionário (aceita snapshots antigos, com epoch)"""
+        return cls(
+            pergunta=data.get('pergunta', ''),
+            resposta=data.get('resposta', ''),
+            timestamp=para_momento(data.get('timestamp')),
+            confianca=data.get('confianca')
+        )
+
+
+@dataclass(slots=True)
 class EstatisticaUso:
     """Modelo para estatísticas de uso diário"""
     data: datetime
@@ -171,45 +309,55 @@ class EstatisticaUso:
         )
 
 
-@dataclass
+@dataclass(slots=True)
 class ContextoConversa:
     """Modelo para contexto de conversa"""
     usuario_id: str
     canal_id: str
-    contexto: Dict[str, Any]
+    historico: List[TurnoConversa] = field(default_factory=list)
     ultimo_update: Optional[datetime] = None
     ativo: bool = True
     id: Optional[int] = None
+    servidor_id: Optional[str] = None  # None em mensagens diretas
+    
+    # Ordem das colunas esperada por da_linha
+    COLUNAS: ClassVar[str] = "usuario_id, canal_id, contexto, ultimo_update, ativo, id, servidor_id"
     
     def __post_init__(self):
         """Validações após inicialização"""
         if self.ultimo_update is None:
-            self.ultimo_update = datetime.now()
+            self.ultimo_update = agora_utc()
     
-    def adicionar_interacao(self, pergunta: str, resposta: str, confianca: float = None):
-        """Adiciona nova interação ao contexto"""
-        if 'historico' not in self.contexto:
-            self.contexto['historico'] = []
-        
-        nova_interacao = {
-            'pergunta': pergunta,
-            'resposta': resposta,
-            'timestamp': datetime.now().isoformat(),
-            'confianca': confianca
-        }
-        
-        self.contexto['historico'].append(nova_interacao)
-        
-        # Manter apenas últimas 10 interações
-        if len(self.contexto['historico']) > 10:
-            self.contexto['historico'] = self.contexto['historico'][-10:]
-        
-        self.ultimo_update = datetime.now()
+    @classmethod
+    def da_linha(cls, cursor: Any, linha: Sequence[Any]) -> 'ContextoConversa':
+        """row_factory para consultas que selecionam `COLUNAS`"""
+        usuario_id, canal_id, contexto, ultimo_update, ativo, contexto_id, servidor_id = linha
+        return cls(usuario_id, canal_id, cls.historico_do_json(contexto),
+                   para_momento(ultimo_update), bool(ativo), contexto_id, servidor_id)
     
-    def obter_historico_recente(self, limite: int = 5) -> List[Dict[str, Any]]:
+    @staticmethod
+    def historico_do_json(texto: Optional[str]) -> List[TurnoConversa]:
+        """Histórico gravado na coluna `contexto` ({"historico": [...]})"""
+        dados = de_json(texto)
+        if not isinstance(dados, dict):
+            return []
+        return [TurnoConversa.from_dict(turno) for turno in dados.get('historico', [])]
+    
+    def contexto_json(self) -> str:
+        """Conteúdo da coluna `contexto`"""
+        return para_json({'historico': self.historico})
+    
+    def adicionar_interacao(self, pergunta: str, resposta: str, confianca: float = None,
+                            limite: int = 10):
+        """Adiciona nova interação ao contexto, mantendo as `limite` mais recentes"""
+        self.ultimo_update = agora_utc()
+        self.historico.append(TurnoConversa(pergunta, resposta, self.ultimo_update, confianca))
+        if len(self.historico) > limite:
+            del self.historico[:-limite]
+    
+    def obter_historico_recente(self, limite: int = 5) -> List[TurnoConversa]:
         """Obtém histórico recente de interações"""
-        historico = self.contexto.get('historico', [])
-        return historico[-limite:] if historico else []
+        return self.historico[-limite:]
     
     def to_dict(self) -> Dict[str, Any]:
         """Converte para dicionário"""
@@ -217,7 +365,8 @@ class ContextoConversa:
             'id': self.id,
             'usuario_id': self.usuario_id,
             'canal_id': self.canal_id,
-            'contexto': json.dumps(self.contexto, ensure_ascii=False),
+            'servidor_id': self.servidor_id,
+            'contexto': self.contexto_json(),
             'ultimo_update': self.ultimo_update.isoformat() if self.ultimo_update else None,
             'ativo': self.ativo
         }
@@ -225,28 +374,18 @@ class ContextoConversa:
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> 'ContextoConversa':
         """Cria instância a partir de dicionário"""
-        ultimo_update = None
-        if data.get('ultimo_update'):
-            ultimo_update = datetime.fromisoformat(data['ultimo_update'])
-        
-        contexto = {}
-        if data.get('contexto'):
-            try:
-                contexto = json.loads(data['contexto'])
-            except json.JSONDecodeError:
-                contexto = {}
-        
         return cls(
             id=data.get('id'),
             usuario_id=data['usuario_id'],
             canal_id=data['canal_id'],
-            contexto=contexto,
-            ultimo_update=ultimo_update,
+            servidor_id=data.get('servidor_id'),
+            historico=cls.historico_do_json(data.get('contexto')),
+            ultimo_update=para_momento(data.get('ultimo_update')),
             ativo=data.get('ativo', True)
         )
 
 
-@dataclass
+@dataclass(slots=True)
 class LogSistema:
     """Modelo para logs do sistema"""
     nivel: str
@@ -256,14 +395,23 @@ class LogSistema:
     dados_extras: Optional[Dict[str, Any]] = None
     id: Optional[int] = None
     
+    # Ordem das colunas esperada por da_linha
+    COLUNAS: ClassVar[str] = "nivel, modulo, mensagem, timestamp, dados_extras, id"
+    
     def __post_init__(self):
         """Validações após inicialização"""
         if self.timestamp is None:
-            self.timestamp = datetime.now()
+            self.timestamp = agora_utc()
         
         if self.nivel not in ['DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL']:
             raise ValueError(f"Nível de log inválido: {self.nivel}")
     
+    @classmethod
+    def da_linha(cls, cursor: Any, linha: Sequence[Any]) -> 'LogSistema':
+        """row_factory para consultas que selecionam `COLUNAS`"""
+        nivel, modulo, mensagem, timestamp, dados_extras, log_id = linha
+        return cls(nivel, modulo, mensagem, para_momento(timestamp), de_json(dados_extras), log_id)
+    
     def to_dict(self) -> Dict[str, Any]:
         """Converte para dicionário"""
         return {
@@ -272,28 +420,17 @@ class LogSistema:
             'modulo': self.modulo,
             'mensagem': self.mensagem,
             'timestamp': self.timestamp.isoformat() if self.timestamp else None,
-            'dados_extras': json.dumps(self.dados_extras, ensure_ascii=False) if self.dados_extras else None
+            'dados_extras': para_json(self.dados_extras) if self.dados_extras else None
         }
     
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> 'LogSistema':
         """Cria instância a partir de dicionário"""
-        timestamp = None
-        if data.get('timestamp'):
-            timestamp = datetime.fromisoformat(data['timestamp'])
-        
-        dados_extras = None
-        if data.get('dados_extras'):
-            try:
-                dados_extras = json.loads(data['dados_extras'])
-            except json.JSONDecodeError:
-                dados_extras = None
-        
         return cls(
             id=data.get('id'),
             nivel=data['nivel'],
             modulo=data['modulo'],
             mensagem=data['mensagem'],
-            timestamp=timestamp,
-            dados_extras=dados_extras
+            timestamp=para_momento(data.get('timestamp')),
+            dados_extras=de_json(data.get('dados_extras'))
         )
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Retenção de dados do Oráculo de Concursos
+Remove registros antigos em lotes pequenos, arquivando-os antes em partições
+comprimidas por data, para nunca segurar o lock de escrita por muito tempo
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import aiosqlite
+
+from utils import compressao
+
+
+@dataclass
+class PoliticaRetencao:
+    """Regra de expiração de uma tabela"""
+    tabela: str
+    coluna_tempo: str
+    chave: Optional[str] = 'id'  # None usa a chave primária (tabelas WITHOUT ROWID)
+    arquivar: bool = True
+    filtro_extra: Optional[str] = None  # Condição adicional que também expira linhas
+    somente_data: bool = False  # Coluna DATE: compara com o dia do limite, não com o instante
+    # Completa as linhas lidas antes do arquivamento (ex.: descomprime textos)
+    expandir: Optional[Callable[[aiosqlite.Connection, List[Dict[str, Any]]], Awaitable[None]]] = None
+    # Executado na transação do DELETE, antes dele (ex.: atualizar o índice textual)
+    antes_de_remover: Optional[Callable[[aiosqlite.Connection, List[Dict[str, Any]]], Awaitable[None]]] = None
+    # Executado na transação do DELETE, depois dele: apaga o que só as linhas
+    # do lote referenciavam e retorna {tabela: removidas} (ex.: textos órfãos)
+    depois_de_remover: Optional[
+        Callable[[aiosqlite.Connection, List[Dict[str, Any]]], Awaitable[Dict[str, int]]]
+    ] = None
+
+
+# Ordem de execução: dados de usuário primeiro, detalhes de agregados por último
+POLITICAS_PADRAO = [
+    PoliticaRetencao('interacoes', 'timestamp'),
+    PoliticaRetencao('logs_sistema', 'timestamp'),
+    PoliticaRetencao('contextos_conversa', 'ultimo_update', arquivar=False,
+                     filtro_extra='ativo = 0'),
+    PoliticaRetencao('atividade_usuario_diaria', 'data', chave=None, arquivar=False,
+                     somente_data=True),
+]
+
+
+@dataclass
+class RelatorioRetencao:
+    """Resultado de uma execução da retenção"""
+    data_limite: str
+    removidas: Dict[str, int] = field(default_factory=dict)
+    arquivadas: Dict[str, int] = field(default_factory=dict)
+    lotes: int = 0
+    arquivos: List[str] = field(default_factory=list)
+    duracao: float = 0.0
+    tempo_bloqueio_total: float = 0.0
+    tempo_bloqueio_maximo: float = 0.0
+    paginas_liberadas: int = 0
+
+    @property
+    def total_removidas(self) -> int:
+        return sum(self.removidas.values())
+
+    @property
+    def linhas_por_segundo(self) -> float:
+        return self.total_removidas / self.duracao if self.duracao > 0 else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Converte para dicionário"""
+        return {
+            'data_limite': self.data_limite,
+            'removidas': self.removidas,
+            'arquivadas': self.arquivadas,
+            'total_removidas': self.total_removidas,
+            'lotes': self.lotes,
+            'arquivos': self.arquivos,
+            'duracao': round(self.duracao, 3),
+            'linhas_por_segundo': round(self.linhas_por_segundo, 1),
+            'tempo_bloqueio_total': round(self.tempo_bloqueio_total, 4),
+            'tempo_bloqueio_maximo': round(self.tempo_bloqueio_maximo, 4),
+            'paginas_liberadas': self.paginas_liberadas
+        }
+
+
+def gravar_particoes(diretorio_arquivo: Path, tabela: str, coluna_tempo: str,
+                     linhas: List[Dict[str, Any]], execucao: str) -> List[str]:
+    """
+    Anexa linhas às partições diárias de uma tabela, com fsync
+
+    Cada chamada vira um quadro comprimido independente no arquivo
+    `<tabela>/data=AAAA-MM-DD/<execucao>.jsonl.<ext>`.
+
+    Returns:
+        Arquivos gravados
+    """
+    particoes: Dict[str, List[str]] = {}
+    for linha in linhas:
+        data = str(linha.get(coluna_tempo) or 'sem_data')[:10]
+        particoes.setdefault(data, []).append(json.dumps(linha, ensure_ascii=False, default=str))
+
+    arquivos = []
+    for data, conteudo in particoes.items():
+        diretorio = Path(diretorio_arquivo) / tabela / f"data={data}"
+        diretorio.mkdir(parents=True, exist_ok=True)
+        caminho = diretorio / f"{execucao}.jsonl{compressao.extensao()}"
+
+        quadro = compressao.comprimir(("\n".join(conteudo) + "\n").encode('utf-8'))
+        with open(caminho, 'ab') as arquivo:
+            arquivo.write(quadro)
+            arquivo.flush()
+            os.fsync(arquivo.fileno())
+        arquivos.append(str(caminho))
+
+    return arquivos
+
+
+class RetencaoDados:
+    """Job de retenção em lotes com arquivamento prévio"""
+
+    def __init__(self, db_path: str, diretorio_arquivo: str,
+                 tamanho_lote: int = 500, pausa_entre_lotes: float = 0.05,
+                 paginas_vacuum_por_passo: int = 256,
+                 politicas: Optional[List[PoliticaRetencao]] = None,
+                 ocupado: Optional[Callable[[], bool]] = None,
+                 pausa_ocupado: float = 1.0):
+        """
+        Args:
+            ocupado: Indica se o bot está atendendo usuários; enquanto True,
+                a pausa entre lotes passa a ser `pausa_ocupado`
+        """
+        self.db_path = db_path
+        self.diretorio_arquivo = Path(diretorio_arquivo)
+        self.tamanho_lote = tamanho_lote
+        self.pausa_entre_lotes = pausa_entre_lotes
+        self.paginas_vacuum_por_passo = paginas_vacuum_por_passo
+        self.politicas = politicas or POLITICAS_PADRAO
+        self.ocupado = ocupado
+        self.pausa_ocupado = pausa_ocupado
+        self.logger = logging.getLogger(__name__)
+
+    async def executar(self, data_limite: datetime) -> RelatorioRetencao:
+        """
+        Expira todos os registros anteriores a `data_limite`
+
+        Cada lote é lido pelo índice de tempo, gravado no arquivo (com fsync)
+        e só então removido em uma transação curta. Entre os lotes o job
+        devolve o controle ao event loop.
+        """
+        limite = data_limite.strftime('%Y-%m-%d %H:%M:%S')
+        relatorio = RelatorioRetencao(data_limite=limite)
+        execucao = datetime.now().strftime('%Y%m%d_%H%M%S')
+        inicio = time.perf_counter()
+
+        async with aiosqlite.connect(self.db_path) as db:
+            for politica in self.politicas:
+                await self._expirar_tabela(db, politica, limite, execucao, relatorio)
+
+            relatorio.paginas_liberadas = await self._vacuum_incremental(db)
+
+        relatorio.duracao = time.perf_counter() - inicio
+
+        self.logger.info(
+            f"🧹 Retenção concluída: {relatorio.total_removidas} registros em "
+            f"{relatorio.duracao:.2f}s ({relatorio.linhas_por_segundo:.0f}/s), "
+            f"lock máximo {relatorio.tempo_bloqueio_maximo * 1000:.1f}ms"
+        )
+        return relatorio
+
+    async def _expirar_tabela(self, db: aiosqlite.Connection, politica: PoliticaRetencao,
+                              limite: str, execucao: str, relatorio: RelatorioRetencao):
+        """Remove os registros expirados de uma tabela, lote a lote"""
+        if politica.chave:
+            colunas_chave = [politica.chave]
+        else:
+            colunas_chave = await self._colunas_chave(db, politica.tabela)
+
+        # 'AAAA-MM-DD' < 'AAAA-MM-DD HH:MM:SS' incluiria o próprio dia do limite,
+        # cujas interações posteriores ao instante continuam no banco
+        if politica.somente_data:
+            limite = limite[:10]
+        condicoes = [(f"{politica.coluna_tempo} < ?", (limite,))]
+        if politica.filtro_extra:
+            condicoes.append((politica.filtro_extra, ()))
+
+        removidas = 0
+        arquivadas = 0
+
+        for condicao, parametros in condicoes:
+            while True:
+                cursor = await db.execute(f"""
+                    SELECT * FROM {politica.tabela}
+                    WHERE {condicao}
+                    ORDER BY {politica.coluna_tempo}
+                    LIMIT ?
+                """, (*parametros, self.tamanho_lote))
+                colunas = [descricao[0] for descricao in cursor.description]
+                rows = await cursor.fetchall()
+                if not rows:
+                    break
+
+                linhas = [dict(zip(colunas, row)) for row in rows]
+                if politica.expandir:
+                    await politica.expandir(db, linhas)
+
+                # O arquivo precisa estar em disco antes de apagar as linhas
+                if politica.arquivar:
+                    arquivos = await asyncio.to_thread(
+                        self._gravar_particoes, politica, linhas, execucao
+                    )
+                    for arquivo in arquivos:
+                        if arquivo not in relatorio.arquivos:
+                            relatorio.arquivos.append(arquivo)
+                    arquivadas += len(linhas)
+
+                chaves = [tuple(linha[coluna] for coluna in colunas_chave) for linha in linhas]
+                condicao_chave = " AND ".join(f"{coluna} = ?" for coluna in colunas_chave)
+
+                inicio_bloqueio = time.perf_counter()
+                if politica.antes_de_remover:
+                    await politica.antes_de_remover(db, linhas)
+                await db.executemany(
+                    f"DELETE FROM {politica.tabela} WHERE {condicao_chave}", chaves
+                )
+                if politica.depois_de_remover:
+                    dependentes = await politica.depois_de_remover(db, linhas)
+                    for tabela, quantidade in dependentes.items():
+                        relatorio.removidas[tabela] = relatorio.removidas.get(tabela, 0) + quantidade
+                await db.commit()
+                tempo_bloqueio = time.perf_counter() - inicio_bloqueio
+
+                relatorio.lotes += 1
+                relatorio.tempo_bloqueio_total += tempo_bloqueio
+                relatorio.tempo_bloqueio_maximo = max(relatorio.tempo_bloqueio_maximo, tempo_bloqueio)
+                removidas += len(linhas)
+
+                # Ceder o lock e o event loop às escritas dos usuários
+                await self._pausar()
+
+        relatorio.removidas[politica.tabela] = removidas
+        if politica.arquivar:
+            relatorio.arquivadas[politica.tabela] = arquivadas
+
+    async def _pausar(self):
+        """Pausa entre lotes, mais longa enquanto o bot estiver ocupado"""
+        if self.ocupado and self.ocupado():
+            await asyncio.sleep(self.pausa_ocupado)
+        else:
+            await asyncio.sleep(self.pausa_entre_lotes)
+
+    async def _colunas_chave(self, db: aiosqlite.Connection, tabela: str) -> List[str]:
+        """Colunas da chave primária, na ordem da chave"""
+        cursor = await db.execute(f"PRAGMA table_info({tabela})")
+        colunas = [(row[5], row[1]) for row in await cursor.fetchall() if row[5] > 0]
+        return [nome for _, nome in sorted(colunas)]
+
+    def _gravar_particoes(self, politica: PoliticaRetencao, linhas: List[Dict[str, Any]],
+                          execucao: str) -> List[str]:
+        """Anexa as linhas às partições diárias da tabela (executa em thread)"""
+        return gravar_particoes(self.diretorio_arquivo, politica.tabela,
+                                politica.coluna_tempo, linhas, execucao)
+
+    async def _vacuum_incremental(self, db: aiosqlite.Connection) -> int:
+        """Devolve ao sistema as páginas livres, em passos curtos"""
+        cursor = await db.execute("PRAGMA auto_vacuum")
+        modo = (await cursor.fetchone())[0]
+        cursor = await db.execute("PRAGMA freelist_count")
+        livres = (await cursor.fetchone())[0]
+
+        if modo != 2:  # 2 = INCREMENTAL
+            if livres:
+                self.logger.info(
+                    f"ℹ️ {livres} páginas livres; auto_vacuum incremental desativado neste "
+                    f"banco (requer VACUUM para ativar)"
+                )
+            return 0
+
+        liberadas = 0
+        while livres > 0:
+            # Via execute() o sqlite3 avança o pragma um único passo (uma página);
+            # executescript() o executa até o fim
+            await db.executescript(f"PRAGMA incremental_vacuum({self.paginas_vacuum_por_passo})")
+            cursor = await db.execute("PRAGMA freelist_count")
+            restantes = (await cursor.fetchone())[0]
+            if restantes >= livres:
+                break
+            liberadas += livres - restantes
+            livres = restantes
+            await self._pausar()
+
+        return liberadas
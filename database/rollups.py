@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Estatísticas materializadas do Oráculo de Concursos
+Tabelas de agregados por hora, dia e usuário mantidas a cada interação
+"""
+
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import aiosqlite
+
+
+# Colunas de soma/contagem usadas para manter médias incrementalmente
+COLUNAS_MEDIAS_DIARIAS = {
+    'soma_confianca': 'REAL DEFAULT 0.0',
+    'qtd_confianca': 'INTEGER DEFAULT 0',
+    'soma_tempo_resposta': 'REAL DEFAULT 0.0',
+    'qtd_tempo_resposta': 'INTEGER DEFAULT 0',
+}
+
+
+def momento_atual() -> str:
+    """Instante atual em UTC no mesmo formato de CURRENT_TIMESTAMP do SQLite"""
+    return datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def hora_do_momento(momento: str) -> str:
+    """'2024-05-01 13:45:10' → '2024-05-01 13:00:00'"""
+    return f"{momento[:13]}:00:00"
+
+
+def data_do_momento(momento: str) -> str:
+    """'2024-05-01 13:45:10' → '2024-05-01'"""
+    return momento[:10]
+
+
+async def criar_tabelas_rollup(db: aiosqlite.Connection):
+    """Cria as tabelas de agregados (estatisticas_uso já existe no schema base)"""
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS estatisticas_horarias (
+            hora TIMESTAMP PRIMARY KEY,
+            total_usuarios_ativos INTEGER DEFAULT 0,
+            total_perguntas INTEGER DEFAULT 0,
+            total_respostas INTEGER DEFAULT 0,
+            soma_confianca REAL DEFAULT 0.0,
+            qtd_confianca INTEGER DEFAULT 0,
+            soma_tempo_resposta REAL DEFAULT 0.0,
+            qtd_tempo_resposta INTEGER DEFAULT 0,
+            erros_ocorridos INTEGER DEFAULT 0
+        )
+    """)
+
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS estatisticas_usuario (
+            usuario_id TEXT PRIMARY KEY,
+            total_perguntas INTEGER DEFAULT 0,
+            total_respostas INTEGER DEFAULT 0,
+            soma_confianca REAL DEFAULT 0.0,
+            qtd_confianca INTEGER DEFAULT 0,
+            soma_tempo_resposta REAL DEFAULT 0.0,
+            qtd_tempo_resposta INTEGER DEFAULT 0
+        )
+    """)
+
+    # Uma linha por usuário e dia: base para usuários ativos e atividade semanal
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS atividade_usuario_diaria (
+            usuario_id TEXT NOT NULL,
+            data DATE NOT NULL,
+            perguntas INTEGER DEFAULT 0,
+            ultima_hora TIMESTAMP,
+            PRIMARY KEY (usuario_id, data)
+        ) WITHOUT ROWID
+    """)
+
+
+async def contabilizar_pergunta(db: aiosqlite.Connection, usuario_id: str, momento: str):
+    """
+    Contabiliza uma nova pergunta nos agregados
+
+    Deve ser chamada na mesma transação que insere a interação.
+    """
+    data = data_do_momento(momento)
+    hora = hora_do_momento(momento)
+
+    cursor = await db.execute("""
+        SELECT ultima_hora FROM atividade_usuario_diaria
+        WHERE usuario_id = ? AND data = ?
+    """, (usuario_id, data))
+    atividade = await cursor.fetchone()
+
+    novo_no_dia = 1 if atividade is None else 0
+    novo_na_hora = 1 if atividade is None or atividade[0] != hora else 0
+
+    await db.execute("""
+        INSERT INTO atividade_usuario_diaria (usuario_id, data, perguntas, ultima_hora)
+        VALUES (?, ?, 1, ?)
+        ON CONFLICT(usuario_id, data) DO UPDATE SET
+            perguntas = perguntas + 1,
+            ultima_hora = MAX(ultima_hora, excluded.ultima_hora)
+    """, (usuario_id, data, hora))
+
+    await db.execute("""
+        INSERT INTO estatisticas_horarias (hora, total_usuarios_ativos, total_perguntas)
+        VALUES (?, ?, 1)
+        ON CONFLICT(hora) DO UPDATE SET
+            total_usuarios_ativos = total_usuarios_ativos + excluded.total_usuarios_ativos,
+            total_perguntas = total_perguntas + 1
+    """, (hora, novo_na_hora))
+
+    await db.execute("""
+        INSERT INTO estatisticas_uso (data, total_usuarios_ativos, total_perguntas)
+        VALUES (?, ?, 1)
+        ON CONFLICT(data) DO UPDATE SET
+            total_usuarios_ativos = total_usuarios_ativos + excluded.total_usuarios_ativos,
+            total_perguntas = total_perguntas + 1
+    """, (data, novo_no_dia))
+
+    await db.execute("""
+        INSERT INTO estatisticas_usuario (usuario_id, total_perguntas)
+        VALUES (?, 1)
+        ON CONFLICT(usuario_id) DO UPDATE SET total_perguntas = total_perguntas + 1
+    """, (usuario_id,))
+
+
+async def contabilizar_resposta(db: aiosqlite.Connection, usuario_id: str, momento: str,
+                                confianca: Optional[float] = None,
+                                tempo_resposta: Optional[float] = None):
+    """
+    Contabiliza a resposta de um turno nos agregados
+
+    `momento` é o timestamp da pergunta, para que o turno inteiro caia no
+    mesmo balde de hora/dia.
+    """
+    valores = (
+        confianca or 0.0, 1 if confianca is not None else 0,
+        tempo_resposta or 0.0, 1 if tempo_resposta is not None else 0,
+    )
+
+    await db.execute("""
+        INSERT INTO estatisticas_horarias
+        (hora, total_respostas, soma_confianca, qtd_confianca,
+         soma_tempo_resposta, qtd_tempo_resposta)
+        VALUES (?, 1, ?, ?, ?, ?)
+        ON CONFLICT(hora) DO UPDATE SET
+            total_respostas = total_respostas + 1,
+            soma_confianca = soma_confianca + excluded.soma_confianca,
+            qtd_confianca = qtd_confianca + excluded.qtd_confianca,
+            soma_tempo_resposta = soma_tempo_resposta + excluded.soma_tempo_resposta,
+            qtd_tempo_resposta = qtd_tempo_resposta + excluded.qtd_tempo_resposta
+    """, (hora_do_momento(momento), *valores))
+
+    await db.execute("""
+        INSERT INTO estatisticas_uso
+        (data, total_respostas, soma_confianca, qtd_confianca,
+         soma_tempo_resposta, qtd_tempo_resposta)
+        VALUES (?, 1, ?, ?, ?, ?)
+        ON CONFLICT(data) DO UPDATE SET
+            total_respostas = total_respostas + 1,
+            soma_confianca = soma_confianca + excluded.soma_confianca,
+            qtd_confianca = qtd_confianca + excluded.qtd_confianca,
+            soma_tempo_resposta = soma_tempo_resposta + excluded.soma_tempo_resposta,
+            qtd_tempo_resposta = qtd_tempo_resposta + excluded.qtd_tempo_resposta,
+            confianca_media = COALESCE(
+                (soma_confianca + excluded.soma_confianca)
+                / NULLIF(qtd_confianca + excluded.qtd_confianca, 0), 0.0),
+            tempo_medio_resposta = COALESCE(
+                (soma_tempo_resposta + excluded.soma_tempo_resposta)
+                / NULLIF(qtd_tempo_resposta + excluded.qtd_tempo_resposta, 0), 0.0)
+    """, (data_do_momento(momento), *valores))
+
+    await db.execute("""
+        INSERT INTO estatisticas_usuario
+        (usuario_id, total_respostas, soma_confianca, qtd_confianca,
+         soma_tempo_resposta, qtd_tempo_resposta)
+        VALUES (?, 1, ?, ?, ?, ?)
+        ON CONFLICT(usuario_id) DO UPDATE SET
+            total_respostas = total_respostas + 1,
+            soma_confianca = soma_confianca + excluded.soma_confianca,
+            qtd_confianca = qtd_confianca + excluded.qtd_confianca,
+            soma_tempo_resposta = soma_tempo_resposta + excluded.soma_tempo_resposta,
+            qtd_tempo_resposta = qtd_tempo_resposta + excluded.qtd_tempo_resposta
+    """, (usuario_id, *valores))
+
+
+async def contabilizar_erro(db: aiosqlite.Connection, momento: str):
+    """Contabiliza um erro de processamento na hora e no dia correntes"""
+    await db.execute("""
+        INSERT INTO estatisticas_horarias (hora, erros_ocorridos) VALUES (?, 1)
+        ON CONFLICT(hora) DO UPDATE SET erros_ocorridos = erros_ocorridos + 1
+    """, (hora_do_momento(momento),))
+    await db.execute("""
+        INSERT INTO estatisticas_uso (data, erros_ocorridos) VALUES (?, 1)
+        ON CONFLICT(data) DO UPDATE SET erros_ocorridos = erros_ocorridos + 1
+    """, (data_do_momento(momento),))
+
+
+async def recalcular_periodo(db: aiosqlite.Connection, inicio: Optional[str] = None,
+                             fim: Optional[str] = None):
+    """
+    Recalcula os agregados por hora e dia a partir de `interacoes`
+
+    Usa `timestamp >= inicio AND timestamp < fim`, que aproveita
+    idx_interacoes_timestamp. Sem limites, recalcula todo o histórico.
+    Os contadores de erro não são deriváveis das interações e são preservados.
+
+    Args:
+        inicio: Primeiro instante incluído (limite de dia, 'YYYY-MM-DD')
+        fim: Primeiro instante excluído (limite de dia, 'YYYY-MM-DD')
+    """
+    # O WHERE explícito evita a ambiguidade do parser entre SELECT e ON CONFLICT
+    filtro = "WHERE timestamp >= ? AND timestamp < ?" if inicio and fim else "WHERE 1"
+    parametros = (inicio, fim) if inicio and fim else ()
+    filtro_data = "WHERE data >= ? AND data < ?" if inicio and fim else ""
+    filtro_hora = "WHERE hora >= ? AND hora < ?" if inicio and fim else ""
+
+    await db.execute(f"DELETE FROM atividade_usuario_diaria {filtro_data}", parametros)
+    await db.execute(f"""
+        INSERT INTO atividade_usuario_diaria (usuario_id, data, perguntas, ultima_hora)
+        SELECT usuario_id, substr(timestamp, 1, 10), COUNT(*),
+               MAX(substr(timestamp, 1, 13)) || ':00:00'
+        FROM interacoes
+        {filtro}
+        GROUP BY usuario_id, substr(timestamp, 1, 10)
+    """, parametros)
+
+    await db.execute(f"""
+        UPDATE estatisticas_horarias
+        SET total_usuarios_ativos = 0, total_perguntas = 0, total_respostas = 0,
+            soma_confianca = 0.0, qtd_confianca = 0,
+            soma_tempo_resposta = 0.0, qtd_tempo_resposta = 0
+        {filtro_hora}
+    """, parametros)
+    await db.execute(f"""
+        INSERT INTO estatisticas_horarias
+        (hora, total_usuarios_ativos, total_perguntas, total_respostas,
+         soma_confianca, qtd_confianca, soma_tempo_resposta, qtd_tempo_resposta)
+        SELECT substr(timestamp, 1, 13) || ':00:00',
+               COUNT(DISTINCT usuario_id), COUNT(*), COUNT(respondida_em),
+               COALESCE(SUM(confianca), 0.0), COUNT(confianca),
+               COALESCE(SUM(tempo_resposta), 0.0), COUNT(tempo_resposta)
+        FROM interacoes
+        {filtro}
+        GROUP BY substr(timestamp, 1, 13)
+        ON CONFLICT(hora) DO UPDATE SET
+            total_usuarios_ativos = excluded.total_usuarios_ativos,
+            total_perguntas = excluded.total_perguntas,
+            total_respostas = excluded.total_respostas,
+            soma_confianca = excluded.soma_confianca,
+            qtd_confianca = excluded.qtd_confianca,
+            soma_tempo_resposta = excluded.soma_tempo_resposta,
+            qtd_tempo_resposta = excluded.qtd_tempo_resposta
+    """, parametros)
+
+    await db.execute(f"""
+        UPDATE estatisticas_uso
+        SET total_usuarios_ativos = 0, total_perguntas = 0, total_respostas = 0,
+            soma_confianca = 0.0, qtd_confianca = 0,
+            soma_tempo_resposta = 0.0, qtd_tempo_resposta = 0,
+            confianca_media = 0.0, tempo_medio_resposta = 0.0
+        {filtro_data}
+    """, parametros)
+    await db.execute(f"""
+        INSERT INTO estatisticas_uso
+        (data, total_usuarios_ativos, total_perguntas, total_respostas,
+         soma_confianca, qtd_confianca, soma_tempo_resposta, qtd_tempo_resposta,
+         confianca_media, tempo_medio_resposta)
+        SELECT substr(timestamp, 1, 10),
+               COUNT(DISTINCT usuario_id), COUNT(*), COUNT(respondida_em),
+               COALESCE(SUM(confianca), 0.0), COUNT(confianca),
+               COALESCE(SUM(tempo_resposta), 0.0), COUNT(tempo_resposta),
+               COALESCE(AVG(confianca), 0.0), COALESCE(AVG(tempo_resposta), 0.0)
+        FROM interacoes
+        {filtro}
+        GROUP BY substr(timestamp, 1, 10)
+        ON CONFLICT(data) DO UPDATE SET
+            total_usuarios_ativos = excluded.total_usuarios_ativos,
+            total_perguntas = excluded.total_perguntas,
+            total_respostas = excluded.total_respostas,
+            soma_confianca = excluded.soma_confianca,
+            qtd_confianca = excluded.qtd_confianca,
+            soma_tempo_resposta = excluded.soma_tempo_resposta,
+            qtd_tempo_resposta = excluded.qtd_tempo_resposta,
+            confianca_media = excluded.confianca_media,
+            tempo_medio_resposta = excluded.tempo_medio_resposta
+    """, parametros)
+
+
+def totais_por_usuario(turnos: Iterable[Tuple[str, bool, Optional[float], Optional[float]]]
+                       ) -> List[tuple]:
+    """
+    Soma turnos (usuario_id, respondida, confianca, tempo_resposta) por usuário
+
+    Retorna linhas (usuario_id, perguntas, respostas, soma_confianca, qtd_confianca,
+    soma_tempo_resposta, qtd_tempo_resposta) com a mesma regra de
+    contabilizar_pergunta/contabilizar_resposta.
+    """
+    totais: Dict[str, list] = {}
+    for usuario_id, respondida, confianca, tempo_resposta in turnos:
+        linha = totais.setdefault(usuario_id, [0, 0, 0.0, 0, 0.0, 0])
+        linha[0] += 1
+        if not respondida:
+            continue
+        linha[1] += 1
+        if confianca is not None:
+            linha[2] += confianca
+            linha[3] += 1
+        if tempo_resposta is not None:
+            linha[4] += tempo_resposta
+            linha[5] += 1
+    return [(usuario_id, *linha) for usuario_id, linha in totais.items()]
+
+
+async def acumular_usuarios(db: aiosqlite.Connection,
+                            turnos: Iterable[Tuple[str, bool, Optional[float], Optional[float]]]):
+    """
+    Soma turnos novos aos agregados por usuário
+
+    Os totais valem para o histórico inteiro e a retenção não os reduz;
+    recalcular a partir de `interacoes` perderia o que já expirou.
+    """
+    await db.executemany("""
+        INSERT INTO estatisticas_usuario
+        (usuario_id, total_perguntas, total_respostas, soma_confianca, qtd_confianca,
+         soma_tempo_resposta, qtd_tempo_resposta)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(usuario_id) DO UPDATE SET
+            total_perguntas = total_perguntas + excluded.total_perguntas,
+            total_respostas = total_respostas + excluded.total_respostas,
+            soma_confianca = soma_confianca + excluded.soma_confianca,
+            qtd_confianca = qtd_confianca + excluded.qtd_confianca,
+            soma_tempo_resposta = soma_tempo_resposta + excluded.soma_tempo_resposta,
+            qtd_tempo_resposta = qtd_tempo_resposta + excluded.qtd_tempo_resposta
+    """, totais_por_usuario(turnos))
+
+
+async def recalcular_usuarios(db: aiosqlite.Connection, usuarios: Optional[List[str]] = None):
+    """
+    Recalcula os agregados por usuário a partir de todo o histórico
+
+    Reconciliação explícita: depois da retenção, os totais passam a cobrir
+    só as interações que ainda estão na tabela.
+
+    Args:
+        usuarios: Limita o recálculo a estes usuários (padrão: todos)
+    """
+    filtro, parametros = "", []
+    if usuarios is not None:
+        filtro = f"WHERE usuario_id IN ({','.join('?' * len(usuarios))})"
+        parametros = list(usuarios)
+    await db.execute(f"DELETE FROM estatisticas_usuario {filtro}", parametros)
+    await db.execute(f"""
+        INSERT INTO estatisticas_usuario
+        (usuario_id, total_perguntas, total_respostas, soma_confianca, qtd_confianca,
+         soma_tempo_resposta, qtd_tempo_resposta)
+        SELECT usuario_id, COUNT(*), COUNT(respondida_em),
+               COALESCE(SUM(confianca), 0.0), COUNT(confianca),
+               COALESCE(SUM(tempo_resposta), 0.0), COUNT(tempo_resposta)
+        FROM interacoes
+        {filtro}
+        GROUP BY usuario_id
+    """, parametros)
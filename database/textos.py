@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Armazenamento de textos do Oráculo de Concursos
+Cada resposta é gravada uma única vez por conteúdo (hash) e comprimida com um
+dicionário treinado sobre o próprio corpus; a descompressão só acontece
+quando o texto é de fato lido
+"""
+
+import hashlib
+import logging
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import aiosqlite
+
+from utils import compressao
+
+
+# Tamanho do dicionário e quantidade de respostas usadas no treinamento
+TAMANHO_DICIONARIO_PADRAO = 64 * 1024
+AMOSTRAS_DICIONARIO_PADRAO = 2000
+
+# Abaixo disso o dicionário treinado não compensa
+MINIMO_AMOSTRAS_DICIONARIO = 100
+
+# Limite de parâmetros por consulta IN (...)
+_LOTE_CONSULTA = 500
+
+logger = logging.getLogger(__name__)
+
+
+def hash_texto(dados: bytes) -> bytes:
+    """Identidade do conteúdo: BLAKE2b de 128 bits"""
+    return hashlib.blake2b(dados, digest_size=16).digest()
+
+
+async def criar_tabelas_textos(db: aiosqlite.Connection):
+    """Cria as tabelas de textos e de dicionários de compressão"""
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS dicionarios_compressao (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            formato TEXT NOT NULL,
+            dados BLOB NOT NULL,
+            amostras INTEGER DEFAULT 0,
+            criado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS textos (
+            id INTEGER PRIMARY KEY,
+            hash BLOB NOT NULL UNIQUE,
+            formato TEXT NOT NULL,
+            dicionario_id INTEGER,
+            tamanho INTEGER NOT NULL,
+            dados BLOB NOT NULL,
+            FOREIGN KEY (dicionario_id) REFERENCES dicionarios_compressao (id)
+        )
+    """)
+    # Usado para recomprimir os textos de dicionários antigos
+    await db.execute(
+        "CREATE INDEX IF NOT EXISTS idx_textos_dicionario ON textos(dicionario_id)"
+    )
+
+
+class DicionarioDesconhecido(LookupError):
+    """Texto comprimido com um dicionário que ainda não foi carregado"""
+
+
+class ArmazemTextos:
+    """
+    Repositório de textos endereçados por conteúdo
+
+    Mantém em memória os codecs de cada dicionário; os dicionários são
+    imutáveis, então um texto sempre é lido com o mesmo com que foi gravado.
+    """
+
+    def __init__(self, nivel: int = compressao.NIVEL_PADRAO):
+        self.nivel = nivel
+        self.dicionario_atual: Optional[int] = None
+        self._codecs: Dict[Tuple[str, Optional[int]], compressao.CodecTexto] = {}
+        self._dicionarios: Dict[int, Tuple[str, bytes]] = {}
+
+    async def carregar(self, db: aiosqlite.Connection):
+        """Carrega os dicionários gravados e escolhe o mais recente do formato ativo"""
+        cursor = await db.execute(
+            "SELECT id, formato, dados FROM dicionarios_compressao ORDER BY id"
+        )
+        formato_ativo = compressao.formato_padrao()
+        for dicionario_id, formato, dados in await cursor.fetchall():
+            self._dicionarios[dicionario_id] = (formato, dados)
+            if formato == formato_ativo:
+                self.dicionario_atual = dicionario_id
+
+    def _codec(self, formato: str, dicionario_id: Optional[int]) -> compressao.CodecTexto:
+        """Codec (reutilizado) de um formato e dicionário"""
+        chave = (formato, dicionario_id)
+        codec = self._codecs.get(chave)
+        if codec is None:
+            dicionario = self._dicionarios[dicionario_id][1] if dicionario_id else None
+            codec = compressao.CodecTexto(formato, dicionario, self.nivel)
+            self._codecs[chave] = codec
+        return codec
+
+    def codificar(self, dados: bytes) -> Tuple[str, Optional[int], bytes]:
+        """
+        Comprime um texto com o dicionário atual
+
+        Returns:
+            (formato, dicionario_id, dados); textos que não encolhem ficam brutos
+        """
+        formato = compressao.formato_padrao()
+        comprimido = self._codec(formato, self.dicionario_atual).comprimir(dados)
+        if len(comprimido) >= len(dados):
+            return compressao.FORMATO_BRUTO, None, dados
+        return formato, self.dicionario_atual, comprimido
+
+    async def guardar(self, db: aiosqlite.Connection, texto: str) -> int:
+        """
+        Grava o texto se ainda não existir e retorna seu id
+
+        A deduplicação é feita pelo hash do conteúdo, antes de comprimir.
+        Deve ser chamado na mesma transação que grava a referência.
+        """
+        dados = texto.encode('utf-8')
+        identidade = hash_texto(dados)
+
+        cursor = await db.execute("SELECT id FROM textos WHERE hash = ?", (identidade,))
+        existente = await cursor.fetchone()
+        if existente:
+            return existente[0]
+
+        formato, dicionario_id, comprimido = self.codificar(dados)
+        cursor = await db.execute("""
+            INSERT INTO textos (hash, formato, dicionario_id, tamanho, dados)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(hash) DO NOTHING
+        """, (identidade, formato, dicionario_id, len(dados), comprimido))
+        if cursor.rowcount:
+            return cursor.lastrowid
+
+        # Gravado por outra conexão entre a consulta e a inserção
+        cursor = await db.execute("SELECT id FROM textos WHERE hash = ?", (identidade,))
+        return (await cursor.fetchone())[0]
+
+    async def obter(self, db: aiosqlite.Connection, texto_id: int) -> Optional[str]:
+        """Lê e descomprime um único texto"""
+        return (await self.obter_varios(db, [texto_id])).get(texto_id)
+
+    async def obter_varios(self, db: aiosqlite.Connection,
+                           ids: Iterable[Optional[int]]) -> Dict[int, str]:
+        """Lê e descomprime vários textos de uma vez (ids nulos são ignorados)"""
+        pendentes = list({texto_id for texto_id in ids if texto_id is not None})
+        textos: Dict[int, str] = {}
+
+        for inicio in range(0, len(pendentes), _LOTE_CONSULTA):
+            lote = pendentes[inicio:inicio + _LOTE_CONSULTA]
+            marcadores = ','.join('?' * len(lote))
+            cursor = await db.execute(
+                f"SELECT id, formato, dicionario_id, dados FROM textos WHERE id IN ({marcadores})",
+                lote
+            )
+            for texto_id, formato, dicionario_id, dados in await cursor.fetchall():
+                textos[texto_id] = await self.decodificar(db, formato, dicionario_id, dados)
+
+        return textos
+
+    async def decodificar(self, db: aiosqlite.Connection, formato: Optional[str],
+                          dicionario_id: Optional[int], dados: Optional[bytes]) -> Optional[str]:
+        """
+        Descomprime um texto já lido (ex.: por JOIN com `textos`)
+
+        Permite trazer o texto na mesma consulta da interação, sem uma
+        segunda ida ao banco. Retorna None para colunas nulas.
+        """
+        try:
+            return self.descomprimir(formato, dicionario_id, dados)
+        except DicionarioDesconhecido:
+            # Dicionário treinado por outro processo depois do carregamento
+            await self.carregar(db)
+            return self.descomprimir(formato, dicionario_id, dados)
+
+    def descomprimir(self, formato: Optional[str], dicionario_id: Optional[int],
+                     dados: Optional[bytes]) -> Optional[str]:
+        """
+        Versão síncrona de `decodificar`, para uso em row factories
+
+        Levanta DicionarioDesconhecido se o dicionário não estiver em memória;
+        quem chama recarrega com `carregar` e repete a leitura.
+        """
+        if dados is None:
+            return None
+        if dicionario_id and dicionario_id not in self._dicionarios:
+            raise DicionarioDesconhecido(dicionario_id)
+        return self._codec(formato, dicionario_id).descomprimir(dados).decode('utf-8')
+
+    async def registrar_dicionario(self, db: aiosqlite.Connection, amostras: List[bytes],
+                                   tamanho: int = TAMANHO_DICIONARIO_PADRAO) -> Optional[int]:
+        """
+        Treina um dicionário com as amostras e passa a usá-lo nos novos textos
+
+        Returns:
+            ID do dicionário ou None se as amostras forem insuficientes
+        """
+        if len(amostras) < MINIMO_AMOSTRAS_DICIONARIO:
+            return None
+
+        dados = compressao.treinar_dicionario(amostras, tamanho)
+        if not dados:
+            return None
+
+        formato = compressao.formato_padrao()
+        cursor = await db.execute(
+            "INSERT INTO dicionarios_compressao (formato, dados, amostras) VALUES (?, ?, ?)",
+            (formato, dados, len(amostras))
+        )
+        self._dicionarios[cursor.lastrowid] = (formato, dados)
+        self.dicionario_atual = cursor.lastrowid
+        logger.info(
+            f"🗜️ Dicionário {formato} {cursor.lastrowid} treinado com {len(amostras)} "
+            f"respostas ({len(dados) / 1024:.0f} KB)"
+        )
+        return cursor.lastrowid
+
+    async def treinar_dicionario(self, db: aiosqlite.Connection,
+                                 max_amostras: int = AMOSTRAS_DICIONARIO_PADRAO,
+                                 tamanho: int = TAMANHO_DICIONARIO_PADRAO) -> Optional[int]:
+        """Treina um novo dicionário com os textos mais recentes do banco"""
+        cursor = await db.execute(
+            "SELECT id FROM textos ORDER BY id DESC LIMIT ?", (max_amostras,)
+        )
+        ids = [row[0] for row in await cursor.fetchall()]
+        textos = await self.obter_varios(db, ids)
+        amostras = [texto.encode('utf-8') for texto in textos.values()]
+        return await self.registrar_dicionario(db, amostras, tamanho)
+
+    async def recomprimir(self, db: aiosqlite.Connection, apos_id: int = 0,
+                          limite: int = 500) -> Optional[int]:
+        """
+        Regrava com o dicionário atual o próximo lote de textos de outros dicionários
+
+        Textos brutos também são reavaliados, pois o dicionário pode fazê-los
+        encolher.
+
+        Args:
+            apos_id: Último id do lote anterior (percorre a tabela em ordem de id)
+
+        Returns:
+            Último id processado, ou None quando não há mais textos
+        """
+        if self.dicionario_atual is None:
+            return None
+
+        cursor = await db.execute("""
+            SELECT id FROM textos
+            WHERE id > ? AND dicionario_id IS NOT ?
+            ORDER BY id
+            LIMIT ?
+        """, (apos_id, self.dicionario_atual, limite))
+        ids = [row[0] for row in await cursor.fetchall()]
+        if not ids:
+            return None
+        textos = await self.obter_varios(db, ids)
+
+        atualizacoes = []
+        for texto_id, texto in textos.items():
+            formato, dicionario_id, comprimido = self.codificar(texto.encode('utf-8'))
+            if dicionario_id is not None:
+                atualizacoes.append((formato, dicionario_id, comprimido, texto_id))
+
+        await db.executemany(
+            "UPDATE textos SET formato = ?, dicionario_id = ?, dados = ? WHERE id = ?",
+            atualizacoes
+        )
+        return ids[-1]
+
+    async def remover_dicionarios_sem_uso(self, db: aiosqlite.Connection) -> int:
+        """Apaga dicionários antigos que nenhum texto usa mais"""
+        cursor = await db.execute("""
+            DELETE FROM dicionarios_compressao
+            WHERE id IS NOT ?
+              AND NOT EXISTS (SELECT 1 FROM textos t WHERE t.dicionario_id = dicionarios_compressao.id)
+        """, (self.dicionario_atual,))
+        return cursor.rowcount
+
+    async def remover_orfaos(self, db: aiosqlite.Connection, candidatos: Iterable[Optional[int]]) -> int:
+        """
+        Apaga, entre os `candidatos`, os textos que nenhuma interação referencia mais
+
+        Só consulta os ids informados (os das interações recém-removidas),
+        sem percorrer a tabela: o custo não cresce com o acervo.
+
+        Returns:
+            Quantidade de textos removidos
+        """
+        ids = sorted({texto_id for texto_id in candidatos if texto_id is not None})
+        if not ids:
+            return 0
+        cursor = await db.execute(f"""
+            DELETE FROM textos
+            WHERE id IN ({','.join('?' * len(ids))})
+              AND NOT EXISTS (SELECT 1 FROM interacoes i WHERE i.resposta_texto_id = textos.id)
+        """, ids)
+        return cursor.rowcount
+
+    async def estatisticas(self, db: aiosqlite.Connection) -> Dict[str, float]:
+        """Volume original e comprimido dos textos e taxa de deduplicação"""
+        cursor = await db.execute("""
+            SELECT COUNT(*), COALESCE(SUM(tamanho), 0), COALESCE(SUM(length(dados)), 0)
+            FROM textos
+        """)
+        quantidade, original, comprimido = await cursor.fetchone()
+        cursor = await db.execute(
+            "SELECT COUNT(resposta_texto_id) FROM interacoes"
+        )
+        referencias = (await cursor.fetchone())[0]
+        return {
+            'textos': quantidade,
+            'referencias': referencias,
+            'bytes_originais': original,
+            'bytes_comprimidos': comprimido,
+            'taxa_compressao': original / comprimido if comprimido else 0.0,
+            'deduplicacao': 1 - quantidade / referencias if referencias else 0.0,
+            'dicionario_atual': self.dicionario_atual
+        }
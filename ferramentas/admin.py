@@ -0,0 +1,468 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Administração do banco do Oráculo de Concursos
+Exporta tabelas para Arrow/Parquet em lotes de memória limitada e responde às
+consultas de uso mais comuns com computação vetorizada (pyarrow.compute)
+
+Só a camada de banco é importada (nada de discord ou google.genai), e o
+pyarrow apenas pelos subcomandos que o usam. O SQLite (único ou fragmentado)
+é aberto somente para leitura: pode ser usado com o bot em execução. As
+consultas também aceitam um arquivo exportado (--arquivo) no lugar do banco.
+
+Uso:
+    python ferramentas/admin.py exportar --destino exportacao
+    python ferramentas/admin.py exportar --tabelas interacoes usuarios --formato arrow
+    python ferramentas/admin.py perguntas --dias 30 --limite 20
+    python ferramentas/admin.py confianca --faixas 10
+    python ferramentas/admin.py latencia --dias 7
+    python ferramentas/admin.py latencia --arquivo exportacao/interacoes.parquet
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, AsyncIterator, List, Optional, Tuple
+
+import aiosqlite
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from bot.config import Config
+from database import textos
+from database.fragmentacao import BITS_FRAGMENTO, caminho_fragmento, ler_manifesto
+from database.models import para_momento
+
+
+TABELAS_EXPORTAVEIS = (
+    'interacoes', 'usuarios', 'estatisticas_uso', 'estatisticas_horarias',
+    'estatisticas_usuario', 'atividade_usuario_diaria', 'logs_sistema'
+)
+TABELAS_PADRAO = ('interacoes', 'estatisticas_uso')
+
+PERCENTIS = (0.5, 0.9, 0.95, 0.99)
+
+# Grupos parciais acumulados antes de consolidar as perguntas frequentes
+_LOTES_POR_CONSOLIDACAO = 16
+
+SQL_INTERACOES = """
+    SELECT i.id, i.usuario_id, i.servidor_id, i.canal_id, i.mensagem,
+           i.timestamp, i.respondida_em, i.confianca, i.tempo_resposta,
+           i.fontes_utilizadas, i.processada,
+           t.formato, t.dicionario_id, t.dados
+    FROM interacoes i
+    LEFT JOIN textos t ON t.id = i.resposta_texto_id
+    WHERE i.id > ?
+    ORDER BY i.id
+    LIMIT ?
+"""
+
+
+def importar_pyarrow():
+    """Importação tardia: só a exportação e as consultas precisam do pyarrow"""
+    try:
+        import pyarrow
+        import pyarrow.compute
+    except ImportError:
+        print("❌ Este comando requer o pacote 'pyarrow' (uv sync --extra analytics ou pip install pyarrow)")
+        sys.exit(1)
+    return pyarrow, pyarrow.compute
+
+
+def arquivos_do_banco(caminho_base: str) -> List[str]:
+    """Arquivos SQLite do banco, em ordem de fragmento"""
+    manifesto = ler_manifesto(caminho_base)
+    if manifesto is None:
+        return [caminho_base]
+    total = manifesto['total']
+    return [caminho_fragmento(caminho_base, indice, total) for indice in range(total)]
+
+
+def conectar_leitura(arquivo: str) -> aiosqlite.Connection:
+    """Conexão somente leitura: a ferramenta nunca altera o banco do bot"""
+    return aiosqlite.connect(f"{Path(arquivo).resolve().as_uri()}?mode=ro", uri=True)
+
+
+def tipo_arrow(pa, declarado: str):
+    """Tipo Arrow de uma coluna a partir do tipo declarado no SQLite"""
+    declarado = declarado.upper()
+    if 'INT' in declarado:
+        return pa.int64()
+    if declarado in ('REAL', 'FLOAT', 'DOUBLE'):
+        return pa.float64()
+    if declarado == 'BOOLEAN':
+        return pa.bool_()
+    if declarado in ('TIMESTAMP', 'DATETIME'):
+        # Ingênuo em UTC, como nos modelos
+        return pa.timestamp('us')
+    if declarado == 'DATE':
+        return pa.date32()
+    if declarado == 'BLOB':
+        return pa.binary()
+    return pa.string()
+
+
+def coluna_arrow(pa, pc, valores: tuple, tipo):
+    """Converte os valores de uma coluna (como vêm do SQLite) para o tipo Arrow"""
+    if pa.types.is_boolean(tipo):
+        return pc.cast(pa.array(valores, pa.int64()), tipo)
+    if pa.types.is_timestamp(tipo) or pa.types.is_date(tipo):
+        texto = pa.array(valores, pa.string())
+        try:
+            return pc.cast(texto, tipo)
+        except pa.ArrowInvalid:
+            # Formatos antigos (com fuso, epoch): um valor por vez
+            momentos = [para_momento(valor) for valor in valores]
+            if pa.types.is_date(tipo):
+                momentos = [momento.date() if momento else None for momento in momentos]
+            return pa.array(momentos, tipo)
+    return pa.array(valores, tipo)
+
+
+class GravadorColunar:
+    """Grava lotes Arrow em Parquet (zstd) ou Arrow IPC, trocando o arquivo no final"""
+
+    def __init__(self, caminho: Path, esquema, formato: str):
+        import pyarrow as pa
+        self.caminho = caminho
+        self.temporario = caminho.with_name(f".{caminho.name}.tmp")
+        if formato == 'parquet':
+            import pyarrow.parquet as pq
+            self._escritor = pq.ParquetWriter(str(self.temporario), esquema, compression='zstd')
+        else:
+            self._escritor = pa.ipc.new_file(str(self.temporario), esquema)
+        self.linhas = 0
+
+    def gravar(self, lote):
+        self._escritor.write_batch(lote)
+        self.linhas += lote.num_rows
+
+    def concluir(self):
+        self._escritor.close()
+        os.replace(self.temporario, self.caminho)
+
+    def descartar(self):
+        self._escritor.close()
+        self.temporario.unlink(missing_ok=True)
+
+
+async def esquema_tabela(db: aiosqlite.Connection, tabela: str) -> List[Tuple[str, str]]:
+    """(coluna, tipo declarado) na ordem da tabela"""
+    cursor = await db.execute(f"PRAGMA table_info({tabela})")
+    return [(linha[1], linha[2]) for linha in await cursor.fetchall()]
+
+
+def esquema_interacoes(pa):
+    return pa.schema([
+        ('id', pa.int64()), ('usuario_id', pa.string()), ('servidor_id', pa.string()),
+        ('canal_id', pa.string()), ('mensagem', pa.string()),
+        ('timestamp', pa.timestamp('us')), ('respondida_em', pa.timestamp('us')),
+        ('confianca', pa.float64()), ('tempo_resposta', pa.float64()),
+        ('fontes_utilizadas', pa.list_(pa.string())), ('processada', pa.bool_()),
+        ('resposta', pa.string()),
+    ])
+
+
+async def lotes_interacoes(arquivo: str, indice: Optional[int], tamanho_lote: int,
+                           esquema) -> AsyncIterator[Any]:
+    """
+    Interações de um arquivo em lotes Arrow, com as respostas descomprimidas
+
+    Paginação por id, uma conexão por lote (como `iterar_interacoes`): a
+    leitura não segura um snapshot do WAL durante toda a exportação.
+    """
+    pa, pc = importar_pyarrow()
+    armazem = textos.ArmazemTextos()
+    ultimo_id = 0
+    while True:
+        async with conectar_leitura(arquivo) as db:
+            if ultimo_id == 0:
+                await armazem.carregar(db)
+            cursor = await db.execute(SQL_INTERACOES, (ultimo_id, tamanho_lote))
+            linhas = await cursor.fetchall()
+            try:
+                respostas = [armazem.descomprimir(linha[11], linha[12], linha[13]) for linha in linhas]
+            except textos.DicionarioDesconhecido:
+                # Dicionário treinado pelo bot depois do carregamento
+                await armazem.carregar(db)
+                respostas = [armazem.descomprimir(linha[11], linha[12], linha[13]) for linha in linhas]
+        if not linhas:
+            return
+        ultimo_id = linhas[-1][0]
+
+        colunas = list(zip(*linhas))
+        ids = pa.array(colunas[0], pa.int64())
+        if indice is not None:
+            # Mesmo id global do ArmazenamentoFragmentado: (id_local << 10) | fragmento
+            ids = pc.add(pc.shift_left(ids, BITS_FRAGMENTO), indice)
+        yield pa.record_batch([
+            ids,
+            pa.array(colunas[1], pa.string()), pa.array(colunas[2], pa.string()),
+            pa.array(colunas[3], pa.string()), pa.array(colunas[4], pa.string()),
+            coluna_arrow(pa, pc, colunas[5], pa.timestamp('us')),
+            coluna_arrow(pa, pc, colunas[6], pa.timestamp('us')),
+            pa.array(colunas[7], pa.float64()), pa.array(colunas[8], pa.float64()),
+            pa.array([fontes.split(',') if fontes else [] for fontes in colunas[9]],
+                     pa.list_(pa.string())),
+            coluna_arrow(pa, pc, colunas[10], pa.bool_()),
+            pa.array(respostas, pa.string()),
+        ], schema=esquema)
+
+
+async def lotes_tabela(arquivo: str, tabela: str, indice: Optional[int], tamanho_lote: int,
+                       esquema) -> AsyncIterator[Any]:
+    """Demais tabelas (agregados e logs) em lotes Arrow; com fragmentos, inclui a coluna `fragmento`"""
+    pa, pc = importar_pyarrow()
+    campos = [campo for campo in esquema if campo.name != 'fragmento']
+    async with conectar_leitura(arquivo) as db:
+        cursor = await db.execute(f"SELECT {', '.join(campo.name for campo in campos)} FROM {tabela}")
+        while True:
+            linhas = await cursor.fetchmany(tamanho_lote)
+            if not linhas:
+                return
+            colunas = [coluna_arrow(pa, pc, valores, campo.type)
+                       for valores, campo in zip(zip(*linhas), campos)]
+            if indice is not None:
+                colunas.append(pa.repeat(pa.scalar(indice, pa.int16()), len(linhas)))
+            yield pa.record_batch(colunas, schema=esquema)
+
+
+async def exportar(args) -> int:
+    """Grava cada tabela em um arquivo Parquet ou Arrow, lote a lote"""
+    pa, _ = importar_pyarrow()
+    arquivos = arquivos_do_banco(args.banco)
+    ausentes = [arquivo for arquivo in arquivos if not os.path.exists(arquivo)]
+    if ausentes:
+        print(f"❌ Banco não encontrado: {ausentes}")
+        return 1
+
+    fragmentado = len(arquivos) > 1
+    destino = Path(args.destino)
+    destino.mkdir(parents=True, exist_ok=True)
+    extensao = '.parquet' if args.formato == 'parquet' else '.arrow'
+    print(f"📤 {args.banco} ({len(arquivos)} arquivo(s)) → {destino}/*{extensao}")
+
+    for tabela in args.tabelas:
+        inicio = time.perf_counter()
+        if tabela == 'interacoes':
+            esquema = esquema_interacoes(pa)
+        else:
+            async with conectar_leitura(arquivos[0]) as db:
+                colunas = await esquema_tabela(db, tabela)
+            if not colunas:
+                print(f"   ⚠️ {tabela}: tabela inexistente neste banco")
+                continue
+            campos = [(nome, tipo_arrow(pa, declarado)) for nome, declarado in colunas]
+            if fragmentado:
+                campos.append(('fragmento', pa.int16()))
+            esquema = pa.schema(campos)
+
+        caminho = destino / f"{tabela}{extensao}"
+        gravador = GravadorColunar(caminho, esquema, args.formato)
+        try:
+            for indice, arquivo in enumerate(arquivos):
+                fragmento = indice if fragmentado else None
+                if tabela == 'interacoes':
+                    lotes = lotes_interacoes(arquivo, fragmento, args.lote, esquema)
+                else:
+                    lotes = lotes_tabela(arquivo, tabela, fragmento, args.lote, esquema)
+                async for lote in lotes:
+                    gravador.gravar(lote)
+                    print(f"   📦 {tabela}: {gravador.linhas} linhas", end='\r')
+        except Exception as e:
+            gravador.descartar()
+            print(f"\n❌ Falha ao exportar {tabela}: {e}")
+            return 1
+        gravador.concluir()
+
+        duracao = time.perf_counter() - inicio
+        print(f"   📦 {tabela}: {gravador.linhas} linhas em {duracao:.1f}s "
+              f"({gravador.linhas / duracao:.0f} linhas/s) → {caminho.name} "
+              f"({caminho.stat().st_size / (1024 * 1024):.1f} MB)")
+    return 0
+
+
+async def lotes_consulta(args, colunas: List[str]) -> AsyncIterator[Any]:
+    """Lotes Arrow com `colunas` das interações do período, do banco ou de um arquivo exportado"""
+    pa, _ = importar_pyarrow()
+    limite = None
+    if args.dias:
+        limite = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=args.dias)
+
+    if args.arquivo:
+        import pyarrow.dataset as ds
+        formato = 'ipc' if args.arquivo.endswith('.arrow') else 'parquet'
+        filtro = ds.field('timestamp') >= pa.scalar(limite, pa.timestamp('us')) if limite else None
+        for lote in ds.dataset(args.arquivo, format=formato).to_batches(
+            columns=colunas, filter=filtro, batch_size=args.lote
+        ):
+            yield lote
+        return
+
+    tipos = {'mensagem': pa.string(), 'confianca': pa.float64(), 'tempo_resposta': pa.float64()}
+    sql = f"SELECT {', '.join(colunas)} FROM interacoes"
+    parametros: tuple = ()
+    if limite:
+        sql += " WHERE timestamp >= ?"
+        parametros = (limite.strftime('%Y-%m-%d %H:%M:%S'),)
+    for arquivo in arquivos_do_banco(args.banco):
+        async with conectar_leitura(arquivo) as db:
+            cursor = await db.execute(sql, parametros)
+            while True:
+                linhas = await cursor.fetchmany(args.lote)
+                if not linhas:
+                    break
+                yield pa.record_batch(
+                    [pa.array(valores, tipos[coluna]) for valores, coluna in zip(zip(*linhas), colunas)],
+                    names=colunas
+                )
+
+
+def consolidar_perguntas(pa, parciais: List[Any]):
+    """Soma as contagens parciais de cada pergunta normalizada"""
+    agregado = pa.concat_tables(parciais).group_by('pergunta').aggregate([
+        ('vezes', 'sum'), ('soma_confianca', 'sum'), ('qtd_confianca', 'sum')
+    ])
+    return pa.table({
+        'pergunta': agregado['pergunta'],
+        'vezes': agregado['vezes_sum'],
+        'soma_confianca': agregado['soma_confianca_sum'],
+        'qtd_confianca': agregado['qtd_confianca_sum'],
+    })
+
+
+async def perguntas_frequentes(args) -> int:
+    """Perguntas mais repetidas (sem diferença de caixa e espaços) e sua confiança média"""
+    pa, pc = importar_pyarrow()
+    parciais = []
+    total = 0
+    async for lote in lotes_consulta(args, ['mensagem', 'confianca']):
+        total += lote.num_rows
+        perguntas = pc.utf8_trim_whitespace(
+            pc.replace_substring_regex(pc.utf8_lower(lote.column('mensagem')), r'\s+', ' ')
+        )
+        confianca = lote.column('confianca')
+        parcial = pa.table({'pergunta': perguntas, 'confianca': confianca}).group_by('pergunta').aggregate([
+            ('pergunta', 'count'), ('confianca', 'sum'), ('confianca', 'count')
+        ])
+        parciais.append(pa.table({
+            'pergunta': parcial['pergunta'],
+            'vezes': parcial['pergunta_count'],
+            'soma_confianca': parcial['confianca_sum'],
+            'qtd_confianca': parcial['confianca_count'],
+        }))
+        # Memória limitada ao número de perguntas distintas, não de linhas
+        if len(parciais) >= _LOTES_POR_CONSOLIDACAO:
+            parciais = [consolidar_perguntas(pa, parciais)]
+
+    if not parciais:
+        print("📭 Nenhuma interação no período")
+        return 0
+    ranking = consolidar_perguntas(pa, parciais).sort_by([('vezes', 'descending')]).slice(0, args.limite)
+    print(f"❓ Perguntas mais frequentes ({total} interações{periodo(args)})")
+    for posicao, linha in enumerate(ranking.to_pylist(), 1):
+        media = (f"{linha['soma_confianca'] / linha['qtd_confianca']:.2f}"
+                 if linha['qtd_confianca'] else '  - ')
+        print(f"   {posicao:3d}. {linha['vezes']:6d}x  confiança {media}  {linha['pergunta'][:90]}")
+    return 0
+
+
+async def distribuicao_confianca(args) -> int:
+    """Histograma da confiança das respostas e a parcela abaixo do limiar configurado"""
+    pa, pc = importar_pyarrow()
+    limiar = Config().confidence_threshold
+    contagens = [0] * args.faixas
+    sem_confianca = 0
+    abaixo = 0
+    async for lote in lotes_consulta(args, ['confianca']):
+        confianca = lote.column('confianca')
+        sem_confianca += confianca.null_count
+        validas = pc.drop_null(confianca)
+        if not len(validas):
+            continue
+        faixas = pc.cast(pc.floor(pc.multiply(validas, args.faixas)), pa.int64())
+        faixas = pc.max_element_wise(pc.min_element_wise(faixas, args.faixas - 1), 0)
+        for item in pc.value_counts(faixas).to_pylist():
+            contagens[item['values']] += item['counts']
+        abaixo += pc.sum(pc.less(validas, limiar)).as_py() or 0
+
+    respondidas = sum(contagens)
+    if not respondidas:
+        print("📭 Nenhuma resposta com confiança no período")
+        return 0
+    print(f"📊 Confiança de {respondidas} respostas{periodo(args)}")
+    maior = max(contagens)
+    for faixa, quantidade in enumerate(contagens):
+        barra = '█' * round(40 * quantidade / maior)
+        print(f"   {faixa / args.faixas:.2f}–{(faixa + 1) / args.faixas:.2f} "
+              f"{quantidade:7d} {quantidade / respondidas:6.1%} {barra}")
+    print(f"   abaixo de {limiar:.2f}: {abaixo / respondidas:.1%} | sem confiança: {sem_confianca}")
+    return 0
+
+
+async def percentis_latencia(args) -> int:
+    """Percentis do tempo de resposta (segundos)"""
+    pa, pc = importar_pyarrow()
+    # 8 bytes por resposta: os quantis exatos precisam de todos os valores
+    partes = [pc.drop_null(lote.column('tempo_resposta'))
+              async for lote in lotes_consulta(args, ['tempo_resposta'])]
+    tempos = pa.chunked_array(partes, pa.float64())
+    if not len(tempos):
+        print("📭 Nenhuma resposta com tempo registrado no período")
+        return 0
+
+    quantis = pc.quantile(tempos, q=list(PERCENTIS)).to_pylist()
+    print(f"⏱️ Tempo de resposta de {len(tempos)} respostas{periodo(args)}")
+    print("   " + " | ".join(
+        f"p{percentil * 100:g} {valor:.2f}s" for percentil, valor in zip(PERCENTIS, quantis)
+    ))
+    print(f"   média {pc.mean(tempos).as_py():.2f}s | máximo {pc.max(tempos).as_py():.2f}s")
+    return 0
+
+
+def periodo(args) -> str:
+    return f", últimos {args.dias:g} dias" if args.dias else ""
+
+
+COMANDOS = {
+    'exportar': exportar,
+    'perguntas': perguntas_frequentes,
+    'confianca': distribuicao_confianca,
+    'latencia': percentis_latencia,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--banco', help="DATABASE_PATH (padrão: variável de ambiente)")
+    parser.add_argument('--lote', type=int, default=10000, help="Linhas por lote lido")
+    subcomandos = parser.add_subparsers(dest='comando', required=True)
+
+    exportacao = subcomandos.add_parser('exportar', help="Exporta tabelas para Parquet ou Arrow")
+    exportacao.add_argument('--tabelas', nargs='+', default=list(TABELAS_PADRAO),
+                            choices=TABELAS_EXPORTAVEIS)
+    exportacao.add_argument('--destino', default='exportacao', help="Diretório dos arquivos")
+    exportacao.add_argument('--formato', choices=('parquet', 'arrow'), default='parquet')
+
+    for nome, ajuda in (('perguntas', "Perguntas mais frequentes"),
+                        ('confianca', "Distribuição da confiança"),
+                        ('latencia', "Percentis do tempo de resposta")):
+        consulta = subcomandos.add_parser(nome, help=ajuda)
+        consulta.add_argument('--dias', type=float, default=30, help="Período (0: tudo)")
+        consulta.add_argument('--arquivo', help="interacoes.parquet/.arrow exportado, no lugar do banco")
+        if nome == 'perguntas':
+            consulta.add_argument('--limite', type=int, default=20)
+        if nome == 'confianca':
+            consulta.add_argument('--faixas', type=int, default=10)
+
+    args = parser.parse_args()
+    args.banco = args.banco or Config().database_path
+    sys.exit(asyncio.run(COMANDOS[args.comando](args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Verificação do contrato de armazenamento
+
+Executa a mesma sequência de operações contra um backend novo e vazio e
+confere os resultados. Todo backend (SQLite, PostgreSQL) deve passar sem
+falhas.
+
+Uso:
+    python ferramentas/contrato_armazenamento.py --backend sqlite
+    python ferramentas/contrato_armazenamento.py --backend sqlite --fragmentos 4
+    python ferramentas/contrato_armazenamento.py --backend postgres --url postgresql://...
+"""
+
+import argparse
+import asyncio
+import os
+import re
+import shutil
+import sys
+import tempfile
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import List
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from database.base import ArmazenamentoBase
+from database.models import ContextoConversa, DesempenhoResposta, Interacao, LogSistema, TurnoConversa
+
+
+FORMATO_MOMENTO = re.compile(r'^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}$')
+
+
+class Verificador:
+    """Acumula o resultado de cada verificação"""
+
+    def __init__(self):
+        self.falhas: List[str] = []
+        self.total = 0
+
+    def verificar(self, condicao: bool, descricao: str, detalhe: object = None):
+        self.total += 1
+        if condicao:
+            print(f"   ✅ {descricao}")
+        else:
+            self.falhas.append(descricao)
+            print(f"   ❌ {descricao}" + (f" ({detalhe!r})" if detalhe is not None else ""))
+
+
+async def executar_contrato(db: ArmazenamentoBase, diretorio: str) -> Verificador:
+    """Sequência de operações e verificações do contrato"""
+    v = Verificador()
+    agora = datetime.now(timezone.utc)
+
+    print("👤 Usuários e turnos")
+    v.verificar(await db.registrar_usuario('u1', 'Ana', '0001', None), "registrar_usuario")
+
+    id_direto = await db.registrar_interacao(
+        'u1', 's1', 'c1', 'O que é crase?', 'Crase é a fusão da preposição a com o artigo a.',
+        0.95, 1.5, ['Gramática']
+    )
+    v.verificar(isinstance(id_direto, int), "registrar_interacao com resposta retorna id", id_direto)
+
+    id_pendente = await db.registrar_interacao('u1', 's1', 'c1', 'Explique licitações na Lei 14.133')
+    historico = await db.obter_historico_conversa('u1', 'c1')
+    v.verificar(len(historico) == 1, "histórico ignora perguntas sem resposta", len(historico))
+
+    v.verificar(await db.registrar_resposta(id_pendente, 'Licitação é o procedimento de contratação.',
+                                            0.91, 2.5, ['Lei 14.133/21']),
+                "registrar_resposta completa o turno")
+    v.verificar(not await db.registrar_resposta(10 ** 9, 'x'), "registrar_resposta de id inexistente")
+    await db.registrar_interacao('u2', 's2', 'c2', 'Como usar o acento grave antes de horas?',
+                                 'Usa-se crase antes de horas determinadas.', 0.97, 1.0)
+
+    historico = await db.obter_historico_conversa('u1', 'c1')
+    v.verificar([turno.pergunta for turno in historico]
+                == ['O que é crase?', 'Explique licitações na Lei 14.133'],
+                "histórico em ordem cronológica", historico)
+    v.verificar(all(isinstance(turno, TurnoConversa) and turno.timestamp.tzinfo is None
+                    and abs(turno.timestamp - agora.replace(tzinfo=None)) < timedelta(minutes=1)
+                    for turno in historico),
+                "turnos com timestamps em UTC", historico[0].timestamp)
+    v.verificar(historico[1].resposta.startswith('Licitação'), "resposta registrada é devolvida")
+    v.verificar(len(await db.obter_historico_conversa('u1', 'c1', limite=1)) == 1, "limite do histórico")
+
+    print("🔎 Busca textual")
+    resultados = await db.buscar_respostas('crase')
+    v.verificar(len(resultados) == 2, "busca encontra as respostas", len(resultados))
+    v.verificar(resultados and resultados[0]['pergunta'] == 'O que é crase?',
+                "pergunta pesa mais que a resposta na relevância", resultados[:1])
+    v.verificar(all('**' in (r['trecho'] or '') for r in resultados), "trecho destaca os termos",
+                [r['trecho'] for r in resultados])
+    resultados = await db.buscar_respostas('crase', servidor_id='s2')
+    v.verificar([r['servidor_id'] for r in resultados] == ['s2'], "filtro por servidor", resultados)
+    v.verificar(await db.buscar_respostas('de a o') == [], "consulta só com stopwords")
+
+    print("📈 Estatísticas")
+    v.verificar(await db.registrar_erro(), "registrar_erro")
+    diarias = await db.obter_estatisticas_diarias()
+    esperado = {'data': agora.date().isoformat(), 'total_usuarios_ativos': 2, 'total_perguntas': 3,
+                'total_respostas': 3, 'erros_ocorridos': 1}
+    v.verificar({chave: diarias.get(chave) for chave in esperado} == esperado,
+                "estatísticas diárias incrementais", diarias)
+    v.verificar(abs(diarias.get('confianca_media', 0) - (0.95 + 0.91 + 0.97) / 3) < 1e-9,
+                "confiança média", diarias.get('confianca_media'))
+
+    horarias = await db.obter_estatisticas_horarias(agora - timedelta(hours=2), agora + timedelta(hours=1))
+    v.verificar(sum(hora['total_perguntas'] for hora in horarias) == 3
+                and all(FORMATO_MOMENTO.match(hora['hora']) for hora in horarias),
+                "estatísticas horárias", horarias)
+
+    usuario = await db.obter_estatisticas_usuario('u1')
+    v.verificar(usuario.get('total_perguntas') == 2 and usuario.get('total_interacoes') == 2
+                and usuario.get('interacoes_semana') == 2 and usuario.get('confianca_media') == 0.93,
+                "estatísticas do usuário", usuario)
+    v.verificar(await db.obter_estatisticas_usuario('inexistente') == {}, "usuário inexistente")
+
+    await db.atualizar_estatisticas_diarias()
+    reconciliadas = await db.obter_estatisticas_diarias()
+    v.verificar({chave: reconciliadas.get(chave) for chave in esperado} == esperado,
+                "reconciliação preserva agregados e erros", reconciliadas)
+
+    print("📦 Lote e iteração")
+    passado = agora - timedelta(days=5)
+    lote = [
+        Interacao(usuario_id=f'u{3 + i % 2}', servidor_id='s1', canal_id='c3',
+                  mensagem=f'Pergunta antiga {i} sobre improbidade',
+                  resposta=None if i == 4 else f'Resposta antiga {i}',
+                  timestamp=passado + timedelta(minutes=i), confianca=0.9, tempo_resposta=1.0,
+                  fontes_utilizadas=['Lei 8.429/92'],
+                  desempenho=DesempenhoResposta('modelo-lote', tempo_gemini=0.75, tokens_saida=120)
+                  if i == 0 else None)
+        for i in range(5)
+    ]
+    v.verificar(await db.registrar_interacoes_em_lote(lote) == 5, "registrar_interacoes_em_lote")
+    v.verificar(await db.registrar_interacoes_em_lote([]) == 0, "lote vazio")
+
+    antigas = await db.obter_estatisticas_diarias(passado.date())
+    v.verificar((antigas.get('total_perguntas'), antigas.get('total_respostas'),
+                 antigas.get('total_usuarios_ativos')) == (5, 4, 2),
+                "lote recalcula os agregados do período", antigas)
+    v.verificar((await db.obter_estatisticas_usuario('u3')).get('total_perguntas') == 3,
+                "lote atualiza os agregados do usuário")
+
+    todas, paginas = [], []
+    async for pagina in db.iterar_interacoes(tamanho_lote=3):
+        paginas.append(len(pagina))
+        todas.extend(pagina)
+    v.verificar(paginas == [3, 3, 2], "iterar_interacoes respeita o tamanho do lote", paginas)
+    v.verificar([i.id for i in todas] == sorted(i.id for i in todas) and len(todas) == 8,
+                "iterar_interacoes percorre tudo em ordem de id", len(todas))
+    copiadas = [i for i in todas if i.canal_id == 'c3']
+    v.verificar([i.timestamp for i in copiadas]
+                == [passado.replace(tzinfo=None, microsecond=0) + timedelta(minutes=i) for i in range(5)],
+                "timestamps do lote preservados (UTC)", [str(i.timestamp) for i in copiadas[:1]])
+    v.verificar([i.resposta for i in copiadas] == [f'Resposta antiga {i}' for i in range(4)] + [None]
+                and copiadas[0].fontes_utilizadas == ['Lei 8.429/92'],
+                "respostas e fontes preservadas")
+    v.verificar(copiadas[0].desempenho == lote[0].desempenho and copiadas[1].desempenho is None,
+                "desempenho do lote preservado", copiadas[0].desempenho)
+
+    print("💬 Contextos")
+    contexto = ContextoConversa('u1', 'c1', servidor_id='s1')
+    contexto.adicionar_interacao('p', 'r', 0.9)
+    v.verificar(await db.salvar_contextos([contexto]), "salvar_contextos")
+    v.verificar(await db.salvar_contextos([contexto]), "salvar_contextos é idempotente")
+    carregados = await db.carregar_contextos(300)
+    v.verificar(len(carregados) == 1 and carregados[0].historico == contexto.historico
+                and carregados[0].servidor_id == 's1', "carregar_contextos", carregados)
+    v.verificar(await db.desativar_contextos([('u1', 'c1')]), "desativar_contextos")
+    v.verificar(await db.carregar_contextos(300) == [], "contextos inativos não são carregados")
+
+    print("📝 Logs")
+    logs = [LogSistema('WARNING', 'contrato', f'aviso {i}', dados_extras={'i': i}) for i in range(600)]
+    logs.append(LogSistema('ERROR', 'contrato', 'erro antigo', agora - timedelta(days=4)))
+    v.verificar(await db.registrar_logs(logs) == 601, "registrar_logs grava o lote inteiro")
+    v.verificar(await db.registrar_logs([]) == 0, "lote de logs vazio")
+
+    print("🧹 Retenção")
+    relatorio = await db.limpar_dados_antigos(dias=2, diretorio_arquivo=diretorio, tamanho_lote=2)
+    v.verificar(relatorio is not None and relatorio.removidas.get('interacoes') == 5
+                and relatorio.arquivadas.get('interacoes') == 5,
+                "retenção remove e arquiva as interações antigas", relatorio and relatorio.to_dict())
+    v.verificar(relatorio is not None and relatorio.removidas.get('contextos_conversa') == 1,
+                "retenção remove contextos inativos", relatorio and relatorio.removidas)
+    v.verificar(relatorio is not None and relatorio.removidas.get('logs_sistema') == 1,
+                "retenção remove só os logs antigos", relatorio and relatorio.removidas)
+    v.verificar(relatorio is not None and relatorio.arquivos
+                and all(os.path.exists(arquivo) for arquivo in relatorio.arquivos),
+                "arquivos de retenção gravados", relatorio and relatorio.arquivos)
+    restantes = []
+    async for pagina in db.iterar_interacoes():
+        restantes.extend(pagina)
+    v.verificar(len(restantes) == 3, "interações recentes preservadas", len(restantes))
+    v.verificar(len(await db.buscar_respostas('improbidade', apenas_respondidas=False)) == 0,
+                "busca não encontra interações removidas")
+
+    print("⏱️ Desempenho")
+    # Quatro respostas em um servidor e duas mensagens diretas em canais
+    # diferentes (que, fragmentado, podem cair em fragmentos diferentes)
+    for i, (servidor_id, canal_id) in enumerate([('s9', 'c9')] * 4 + [(None, 'd5'), (None, 'd8')]):
+        interacao_id = await db.registrar_interacao('u9', servidor_id, canal_id, f'Pergunta {i}')
+        await db.registrar_resposta(interacao_id, f'Resposta {i}', 0.9, float(i + 1), desempenho=DesempenhoResposta(
+            'modelo-contrato', espera_fila=0.5, tempo_banco=0.01 * (i + 1), tempo_primeiro_token=0.1 * (i + 1),
+            tempo_gemini=1.0, tempo_validacao=0.001, tempo_envio=0.2,
+            tokens_entrada=100, tokens_saida=50 + i, tokens_raciocinio=None if i else 30
+        ))
+    turnos = {}
+    async for pagina in db.iterar_interacoes():
+        turnos.update((i.mensagem, i) for i in pagina if i.usuario_id == 'u9')
+    v.verificar(len(turnos) == 6 and turnos['Pergunta 0'].desempenho.tokens_raciocinio == 30
+                and turnos['Pergunta 0'].tempo_resposta == 1.0
+                and turnos['Pergunta 5'].desempenho.tokens_saida == 55,
+                "registrar_resposta grava tempos e tokens", turnos.get('Pergunta 0'))
+
+    relatorio = [linha for linha in await db.obter_relatorio_desempenho(agora - timedelta(hours=1),
+                                                                        agora + timedelta(hours=1))
+                 if linha['modelo'] == 'modelo-contrato']
+    v.verificar([linha['servidor_id'] for linha in relatorio] == ['s9', None],
+                "relatório agrupa por modelo e servidor", relatorio)
+    if len(relatorio) == 2:
+        servidor, diretas = relatorio
+        v.verificar((servidor['respostas'], servidor['tempo_resposta_p50'], servidor['tempo_resposta_p95'],
+                     servidor['tempo_resposta_p99']) == (4, 2.0, 4.0, 4.0),
+                    "percentis de latência (nearest-rank)", servidor)
+        v.verificar(abs(servidor['tempo_primeiro_token_p50'] - 0.2) < 1e-9
+                    and abs(servidor['tempo_banco_medio'] - 0.025) < 1e-9,
+                    "primeiro token e médias por etapa", servidor)
+        v.verificar((servidor['tokens_entrada'], servidor['tokens_saida'], servidor['tokens_raciocinio'])
+                    == (400, 206, 30), "tokens somados por grupo", servidor)
+        v.verificar((diretas['respostas'], diretas['tempo_resposta_p50'], diretas['tempo_resposta_p99'],
+                     diretas['tokens_saida']) == (2, 5.0, 6.0, 109),
+                    "mensagens diretas em um único grupo", diretas)
+    v.verificar(await db.obter_relatorio_desempenho(agora + timedelta(days=1), agora + timedelta(days=2)) == [],
+                "relatório de período sem respostas")
+
+    return v
+
+
+async def principal(args) -> int:
+    diretorio = tempfile.mkdtemp(prefix="contrato_")
+    esquema = None
+    try:
+        if args.backend == 'postgres':
+            import asyncpg
+            from database.postgres_manager import PostgresManager
+
+            esquema = f"contrato_{uuid.uuid4().hex[:8]}"
+            db = PostgresManager(args.url, esquema=esquema)
+        elif args.fragmentos > 1:
+            from database.fragmentacao import ArmazenamentoFragmentado
+
+            db = ArmazenamentoFragmentado(os.path.join(diretorio, "contrato.db"), args.fragmentos)
+        else:
+            from database.db_manager import DatabaseManager
+
+            db = DatabaseManager(os.path.join(diretorio, "contrato.db"))
+
+        await db.inicializar()
+        try:
+            verificador = await executar_contrato(db, os.path.join(diretorio, "arquivo"))
+        finally:
+            await db.fechar()
+
+        print(f"\n📋 {args.backend}: {verificador.total - len(verificador.falhas)}/"
+              f"{verificador.total} verificações aprovadas")
+        return 1 if verificador.falhas else 0
+
+    finally:
+        if esquema:
+            conexao = await asyncpg.connect(args.url)
+            await conexao.execute(f'DROP SCHEMA "{esquema}" CASCADE')
+            await conexao.close()
+        shutil.rmtree(diretorio, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--backend', choices=('sqlite', 'postgres'), default='sqlite')
+    parser.add_argument('--url', default=os.getenv('DATABASE_URL', ''),
+                        help="URL do PostgreSQL (padrão: DATABASE_URL)")
+    parser.add_argument('--fragmentos', type=int, default=1,
+                        help="SQLite fragmentado em N arquivos por servidor")
+    args = parser.parse_args()
+    if args.backend == 'postgres' and not args.url:
+        parser.error("--backend postgres requer --url ou DATABASE_URL")
+    sys.exit(asyncio.run(principal(args)))
+
+
+if __name__ == "__main__":
+    main()
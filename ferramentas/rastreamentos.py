@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Leitura dos rastreamentos gravados pelo bot (TRACE_FILE)
+
+Remonta os traces das menções a partir do JSONL no formato OTLP/JSON e
+mostra os mais lentos como uma cascata: cada span com o início relativo à
+menção, a duração, os atributos e o tempo não coberto pelos filhos
+("próprio"), para saber onde cada milissegundo de uma resposta lenta foi.
+Lê também os arquivos rotacionados (.1, .2...) quando existirem.
+
+Uso:
+    python ferramentas/rastreamentos.py --lentos 5
+    python ferramentas/rastreamentos.py --trace 4bf92f35 --arquivo logs/rastreamentos.jsonl
+"""
+
+import argparse
+import json
+import sys
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, List
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from bot.config import Config
+
+
+def _valor(atributo: Dict[str, Any]) -> Any:
+    valor = atributo['value']
+    if 'intValue' in valor:
+        return int(valor['intValue'])
+    return next(iter(valor.values()), None)
+
+
+def carregar_spans(arquivo: Path) -> Dict[str, List[Dict[str, Any]]]:
+    """Spans de `arquivo` e dos seus backups, agrupados por trace"""
+    traces: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    caminhos = sorted(arquivo.parent.glob(f"{arquivo.name}.*"), reverse=True) + [arquivo]
+    for caminho in caminhos:
+        if not caminho.exists():
+            continue
+        with open(caminho, encoding='utf-8') as entrada:
+            for linha in entrada:
+                try:
+                    requisicao = json.loads(linha)
+                except ValueError:
+                    continue  # Linha cortada por um encerramento abrupto
+                for recurso in requisicao.get('resourceSpans', []):
+                    for escopo in recurso.get('scopeSpans', []):
+                        for span in escopo.get('spans', []):
+                            span['inicio'] = int(span['startTimeUnixNano'])
+                            span['fim'] = int(span['endTimeUnixNano'])
+                            span['atributos'] = {a['key']: _valor(a) for a in span.get('attributes', [])}
+                            traces[span['traceId']].append(span)
+    return traces
+
+
+def raiz(spans: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Span sem pai (ou o mais antigo, se a raiz não foi gravada)"""
+    for span in spans:
+        if 'parentSpanId' not in span:
+            return span
+    return min(spans, key=lambda span: span['inicio'])
+
+
+def imprimir_cascata(spans: List[Dict[str, Any]]):
+    """Árvore de spans com início relativo, duração e tempo próprio (ms)"""
+    filhos = defaultdict(list)
+    for span in spans:
+        filhos[span.get('parentSpanId')].append(span)
+    topo = raiz(spans)
+    inicio = topo['inicio']
+
+    def imprimir(span: Dict[str, Any], nivel: int):
+        duracao = (span['fim'] - span['inicio']) / 1e6
+        descendentes = sorted(filhos.get(span['spanId'], []), key=lambda filho: filho['inicio'])
+        proprio = duracao - sum((filho['fim'] - filho['inicio']) / 1e6 for filho in descendentes)
+        erro = span.get('status', {}).get('message')
+        atributos = ' '.join(f"{chave}={valor}" for chave, valor in span['atributos'].items())
+        print(f"   {(span['inicio'] - inicio) / 1e6:9.1f} {duracao:9.1f} {max(proprio, 0.0):9.1f}  "
+              f"{'  ' * nivel}{span['name']}"
+              + (f"  [{atributos}]" if atributos else "")
+              + (f"  ❌ {erro}" if erro else ""))
+        for filho in descendentes:
+            imprimir(filho, nivel + 1)
+
+    print(f"🧵 trace {topo['traceId']}")
+    print(f"   {'início':>9} {'duração':>9} {'próprio':>9}  span (ms)")
+    imprimir(topo, 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--arquivo', help="Arquivo de rastreamentos (padrão: TRACE_FILE)")
+    parser.add_argument('--lentos', type=int, default=5, help="Quantidade de traces mais lentos")
+    parser.add_argument('--trace', help="Mostra só o trace com este id (ou prefixo)")
+    args = parser.parse_args()
+
+    arquivo = Path(args.arquivo or Config().trace_file)
+    if not arquivo.exists():
+        print(f"❌ Arquivo não encontrado: {arquivo}")
+        sys.exit(1)
+    traces = carregar_spans(arquivo)
+
+    if args.trace:
+        escolhidos = [spans for trace_id, spans in traces.items() if trace_id.startswith(args.trace)]
+        if not escolhidos:
+            print(f"❌ Trace não encontrado: {args.trace}")
+            sys.exit(1)
+    else:
+        escolhidos = sorted(traces.values(), key=lambda spans: raiz(spans)['fim'] - raiz(spans)['inicio'],
+                            reverse=True)[:args.lentos]
+        print(f"📊 {len(traces)} traces em {arquivo}; {len(escolhidos)} mais lentos:\n")
+
+    for spans in escolhidos:
+        imprimir_cascata(spans)
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Reparticionamento do banco SQLite por servidor
+
+Copia um banco (único ou já fragmentado) para uma nova quantidade de
+fragmentos e, ao final, troca o manifesto de uma vez. Os arquivos de origem
+não são alterados; com --remover-origem são apagados após a troca.
+
+O bot deve estar parado durante a execução. Depois, ajuste DATABASE_SHARDS
+para a nova quantidade.
+
+Uso:
+    python ferramentas/reparticionar.py --fragmentos 4
+    python ferramentas/reparticionar.py --banco data/oraculo_concursos.db --fragmentos 1
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import aiosqlite
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from bot.config import Config
+from database.base import ArmazenamentoBase
+from database.db_manager import DatabaseManager
+from database.fragmentacao import (
+    ArmazenamentoFragmentado, caminho_fragmento, caminho_manifesto,
+    gravar_manifesto, ler_manifesto
+)
+
+
+# Contextos mais antigos que isso já teriam expirado do cache do bot
+IDADE_MAXIMA_CONTEXTOS = 7 * 24 * 3600
+
+
+def arquivos_do_layout(caminho_base: str, total: int) -> List[str]:
+    """Arquivos SQLite de um layout (o próprio banco quando total é 1)"""
+    if total == 1:
+        return [caminho_base]
+    return [caminho_fragmento(caminho_base, indice, total) for indice in range(total)]
+
+
+def abrir_layout(caminho_base: str, total: int, usar_manifesto: bool) -> ArmazenamentoBase:
+    if total == 1:
+        return DatabaseManager(caminho_base)
+    return ArmazenamentoFragmentado(caminho_base, total, usar_manifesto=usar_manifesto)
+
+
+async def ler_tabela(arquivos: List[str], sql: str) -> List[tuple]:
+    linhas = []
+    for arquivo in arquivos:
+        async with aiosqlite.connect(arquivo) as db:
+            cursor = await db.execute(sql)
+            linhas.extend(await cursor.fetchall())
+    return linhas
+
+
+async def copiar_usuarios(origem: List[str], destino: List[str]) -> int:
+    """
+    Copia nome, avatar, preferências e datas de uso dos usuários
+
+    As linhas já existem nos fragmentos onde o usuário tem interações (e
+    `total_interacoes` já foi recontado); usuários sem interações vão para o
+    primeiro fragmento.
+    """
+    usuarios: Dict[str, tuple] = {}
+    for linha in await ler_tabela(origem, """
+        SELECT id, nome, discriminator, avatar_url, primeiro_uso, ultimo_uso, preferencias, ativo
+        FROM usuarios
+    """):
+        anterior = usuarios.get(linha[0])
+        if anterior is None:
+            usuarios[linha[0]] = linha
+            continue
+        # Dados cadastrais do fragmento usado por último; primeiro uso mais antigo
+        recente = linha if (linha[5] or '') > (anterior[5] or '') else anterior
+        datas = [valor for valor in (linha[4], anterior[4]) if valor]
+        usuarios[linha[0]] = recente[:4] + (min(datas) if datas else None,) + recente[5:]
+
+    encontrados = set()
+    for arquivo in destino:
+        async with aiosqlite.connect(arquivo) as db:
+            cursor = await db.execute("SELECT id FROM usuarios")
+            presentes = {row[0] for row in await cursor.fetchall()}
+            await db.executemany("""
+                UPDATE usuarios
+                SET nome = ?, discriminator = ?, avatar_url = ?, primeiro_uso = ?,
+                    ultimo_uso = ?, preferencias = ?, ativo = ?
+                WHERE id = ?
+            """, [usuario[1:] + (usuario[0],) for chave, usuario in usuarios.items() if chave in presentes])
+            await db.commit()
+            encontrados |= presentes
+
+    async with aiosqlite.connect(destino[0]) as db:
+        await db.executemany("""
+            INSERT INTO usuarios
+            (id, nome, discriminator, avatar_url, primeiro_uso, ultimo_uso, preferencias, ativo)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, [usuario for chave, usuario in usuarios.items() if chave not in encontrados])
+        await db.commit()
+    return len(usuarios)
+
+
+async def copiar_erros_e_logs(origem: List[str], destino: List[str]):
+    """Contadores de erro e logs não pertencem a um servidor: vão para o primeiro fragmento"""
+    erros_dia = await ler_tabela(
+        origem, "SELECT data, erros_ocorridos FROM estatisticas_uso WHERE erros_ocorridos > 0"
+    )
+    erros_hora = await ler_tabela(
+        origem, "SELECT hora, erros_ocorridos FROM estatisticas_horarias WHERE erros_ocorridos > 0"
+    )
+    logs = await ler_tabela(
+        origem, "SELECT nivel, modulo, mensagem, timestamp, dados_extras FROM logs_sistema ORDER BY timestamp"
+    )
+
+    async with aiosqlite.connect(destino[0]) as db:
+        await db.executemany("""
+            INSERT INTO estatisticas_uso (data, erros_ocorridos) VALUES (?, ?)
+            ON CONFLICT(data) DO UPDATE SET erros_ocorridos = erros_ocorridos + excluded.erros_ocorridos
+        """, erros_dia)
+        await db.executemany("""
+            INSERT INTO estatisticas_horarias (hora, erros_ocorridos) VALUES (?, ?)
+            ON CONFLICT(hora) DO UPDATE SET erros_ocorridos = erros_ocorridos + excluded.erros_ocorridos
+        """, erros_hora)
+        await db.executemany("""
+            INSERT INTO logs_sistema (nivel, modulo, mensagem, timestamp, dados_extras)
+            VALUES (?, ?, ?, ?, ?)
+        """, logs)
+        await db.commit()
+
+
+async def contar_interacoes(arquivos: List[str]) -> int:
+    return sum(linha[0] for linha in await ler_tabela(arquivos, "SELECT COUNT(*) FROM interacoes"))
+
+
+def remover_arquivos(arquivos: List[str]):
+    for arquivo in arquivos:
+        for sufixo in ('', '-wal', '-shm'):
+            if os.path.exists(arquivo + sufixo):
+                os.remove(arquivo + sufixo)
+
+
+async def reparticionar(args) -> int:
+    caminho_base = args.banco or Config().database_path
+    manifesto = ler_manifesto(caminho_base)
+    total_origem = manifesto['total'] if manifesto else 1
+    total_destino = args.fragmentos
+
+    if total_destino == total_origem:
+        print(f"✅ {caminho_base} já tem {total_origem} fragmento(s); nada a fazer")
+        return 0
+    if total_origem == 1 and not os.path.exists(caminho_base):
+        print(f"❌ Banco não encontrado: {caminho_base}")
+        return 1
+
+    arquivos_origem = arquivos_do_layout(caminho_base, total_origem)
+    arquivos_destino = arquivos_do_layout(caminho_base, total_destino)
+    existentes = [arquivo for arquivo in arquivos_destino if os.path.exists(arquivo)]
+    if existentes:
+        print(f"❌ Arquivos de destino já existem (execução anterior interrompida?): {existentes}")
+        return 1
+
+    print(f"🧩 {caminho_base}: {total_origem} → {total_destino} fragmento(s)")
+    inicio = time.perf_counter()
+    origem = abrir_layout(caminho_base, total_origem, usar_manifesto=True)
+    destino = abrir_layout(caminho_base, total_destino, usar_manifesto=False)
+    await origem.inicializar()
+    await destino.inicializar()
+
+    try:
+        copiadas = 0
+        async for lote in origem.iterar_interacoes(tamanho_lote=args.lote):
+            gravadas = await destino.registrar_interacoes_em_lote(lote)
+            if gravadas != len(lote):
+                raise RuntimeError(f"lote a partir do id {lote[0].id} não foi gravado")
+            copiadas += gravadas
+            print(f"   📦 {copiadas} interações copiadas", end='\r')
+        print(f"   📦 {copiadas} interações copiadas")
+
+        usuarios = await copiar_usuarios(arquivos_origem, arquivos_destino)
+        print(f"   👤 {usuarios} usuários")
+        await copiar_erros_e_logs(arquivos_origem, arquivos_destino)
+
+        contextos = await origem.carregar_contextos(IDADE_MAXIMA_CONTEXTOS)
+        await destino.salvar_contextos(contextos)
+        print(f"   💬 {len(contextos)} contextos ativos")
+
+        estatisticas = await destino.otimizar_textos()
+        if estatisticas:
+            print(f"   🗜️ textos: compressão {estatisticas['taxa_compressao']:.1f}x")
+
+        total_origem_linhas = await contar_interacoes(arquivos_origem)
+        total_destino_linhas = await contar_interacoes(arquivos_destino)
+        if total_origem_linhas != total_destino_linhas:
+            raise RuntimeError(
+                f"contagem divergente: {total_origem_linhas} na origem, {total_destino_linhas} no destino"
+            )
+    except Exception as e:
+        print(f"\n❌ Falha ao copiar: {e}; os arquivos de destino foram descartados")
+        await destino.fechar()
+        remover_arquivos(arquivos_destino)
+        return 1
+    finally:
+        await origem.fechar()
+
+    await destino.checkpoint_wal("TRUNCATE")
+    await destino.fechar()
+
+    # Troca do layout em um único passo
+    if total_destino > 1:
+        gravar_manifesto(caminho_base, total_destino)
+    else:
+        caminho_manifesto(caminho_base).unlink()
+    print(f"✅ Concluído em {time.perf_counter() - inicio:.1f}s; "
+          f"defina DATABASE_SHARDS={total_destino}")
+
+    antigos = [arquivo for arquivo in arquivos_origem if arquivo not in arquivos_destino]
+    if args.remover_origem:
+        remover_arquivos(antigos)
+        print(f"🗑️ {len(antigos)} arquivo(s) de origem removido(s)")
+    else:
+        print("📁 Arquivos de origem mantidos (apague após conferir):")
+        for arquivo in antigos:
+            print(f"   {arquivo}")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--banco', help="DATABASE_PATH (padrão: variável de ambiente)")
+    parser.add_argument('--fragmentos', type=int, required=True, help="Nova quantidade de fragmentos")
+    parser.add_argument('--lote', type=int, default=2000, help="Interações copiadas por lote")
+    parser.add_argument('--remover-origem', action='store_true',
+                        help="Apaga os arquivos antigos após a troca")
+    args = parser.parse_args()
+    if args.fragmentos < 1:
+        parser.error("--fragmentos deve ser pelo menos 1")
+    sys.exit(asyncio.run(reparticionar(args)))
+
+
+if __name__ == "__main__":
+    main()
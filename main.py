@@ -7,19 +7,32 @@ Ponto de entrada principal da aplicação
 
 import asyncio
 import logging
+import math
 import os
 import signal
 import sys
+import time
+
+# Início do processo: referência dos tempos de inicialização
+INICIO_PROCESSO = time.perf_counter()
+
 import discord
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
 
 # Adicionar o diretório raiz ao path para imports
 sys.path.append(str(Path(__file__).parent))
 
 from bot.discord_bot import OraculoBot
-from database.db_manager import DatabaseManager
-from utils.logger import configurar_logger
-from utils.debug_logger import get_debug_logger, debug_async_func, MonitorDiscord
+from database.fabrica import criar_armazenamento
+from utils.logger import configurar_logger, encerrar_logging, obter_handler_banco
+from utils.debug_logger import get_debug_logger, interpretar_amostragem, MonitorDiscord
+from utils.agendador import AgendadorManutencao
+from utils.memoria import obter_monitor_memoria
+from utils.metricas import FasesInicializacao, ServidorMetricas
+from utils.monitor_loop import MonitorLoop
+from utils.perfilamento import MODOS_CAPTURA, capturar_perfil, configurar_perfilamento
+from utils.rastreamento import configurar_rastreamento, encerrar_rastreamento
 from bot.config import Config
 from bot.gemini_client import GeminiClient
 from bot.anti_alucinacao import ValidadorConfianca
@@ -31,26 +44,56 @@ class OraculoApp:
     def __init__(self):
         self.bot = None
         self.db_manager = None
+        self.agendador = None
         self.logger = None
         self.debug = get_debug_logger()
+        self.fases = FasesInicializacao(INICIO_PROCESSO)
+        self.servidor_metricas = None
+        self.monitor_loop = None
+        self._tarefa_rede = None
+        self._tarefa_gemini = None
+        self._gateway_pronto = asyncio.Event()
+        self._inicio_conexao = None
         self._running = False
     
-    @debug_async_func
     async def inicializar(self):
         """Inicializa todos os componentes da aplicação"""
+        self.fases.registrar('imports', self.fases.decorrido())
         try:
             # Configurar logging
             self.debug.registrar_evento("INIT_START")
-            self.logger = configurar_logger()
+            with self.fases.fase('configuracao'):
+                config = Config()
+                self.logger = configurar_logger(
+                    nivel=config.log_level,
+                    arquivo_log=config.log_file or None,
+                    rotacao_mb=config.log_rotation_mb,
+                    backup_count=config.log_backup_count,
+                    formato=config.log_format
+                )
+                self.debug.configurar(
+                    capacidade=config.debug_buffer_events,
+                    debug_gateway=config.debug_gateway,
+                    amostragem=interpretar_amostragem(config.debug_sampling)
+                )
+                self.debug.instalar_despejo_em_falha()
+                configurar_rastreamento(config.trace_file, config.trace_sample_rate,
+                                        rotacao_mb=config.trace_rotation_mb)
+                configurar_perfilamento(config.profile_slow_ms / 1000, config.profile_sample_rate,
+                                        config.profile_dir)
+                # Desde já: travamentos na inicialização também aparecem
+                self.monitor_loop = MonitorLoop(config.loop_stall_ms / 1000, depuracao=config.loop_debug)
+                self.monitor_loop.iniciar()
+                self._registrar_estruturas_memoria(config)
             self.logger.info("🚀 Iniciando Oráculo de Concursos...")
             
-            # Debug do ambiente
+            # Debug do ambiente; o teste de rede segue em segundo plano
             self.debug.debug_ambiente()
-            self.debug.debug_rede()
+            if config.startup_network_check:
+                self._tarefa_rede = asyncio.create_task(self.debug.debug_rede())
             
             # Validar configurações
             self.debug.registrar_evento("CONFIG_START")
-            config = Config()
             if not config.is_valid():
                 self.debug.registrar_evento("CONFIG_INVALID")
                 if self.logger:
@@ -58,47 +101,186 @@ class OraculoApp:
                 return False
             self.debug.registrar_evento("CONFIG_VALID")
             
-            # Inicializar banco de dados
+            # O SDK do Gemini carrega em uma thread enquanto o gateway conecta;
+            # a primeira menção espera por ele se ainda não terminou
+            gemini_client = GeminiClient(config)
+            self._tarefa_gemini = asyncio.create_task(
+                self._medir_fase('gemini', gemini_client.preparar())
+            )
+            
+            # Banco e endpoint de métricas não dependem um do outro
             self.debug.registrar_evento("DB_INIT_START")
             self.logger.info("📊 Inicializando banco de dados...")
-            self.db_manager = DatabaseManager(config.database_path)
-            
-            # Testar inicialização completa do banco
-            try:
-                await self.db_manager.inicializar()
-                self.debug.registrar_evento("DB_INIT_SUCCESS")
-                self.logger.info("📊 Banco de dados inicializado com sucesso")
-            except Exception as db_error:
-                self.debug.debug_excecao(db_error, "inicialização do banco")
-                self.logger.warning("⚠️ Erro no banco, continuando sem persistência: {db_error}")
-                self.debug.registrar_evento("DB_INIT_FAILED", {"erro": str(db_error)})
-
-            # Inicializar componentes
-            gemini_client = GeminiClient(config)
+            self.db_manager = criar_armazenamento(config)
+            with self.fases.fase('componentes'):
+                await asyncio.gather(
+                    self._inicializar_banco(),
+                    self._medir_fase('metricas', self._iniciar_metricas(config))
+                )
             validador = ValidadorConfianca(config)
             
             # Inicializar bot Discord
             self.debug.registrar_evento("BOT_INIT_START")
             self.logger.info("🤖 Inicializando bot Discord...")
-            self.bot = OraculoBot(self.db_manager, gemini_client, validador, config)
-            self.config = config
-            
-            # Adicionar monitoramento ao bot
-            monitor = MonitorDiscord(self.debug)
-            monitor.monitorar_bot(self.bot)
+            with self.fases.fase('bot'):
+                self.bot = OraculoBot(self.db_manager, gemini_client, validador, config)
+                self.config = config
+                obter_monitor_memoria().registrar('bot.contextos_ativos', self.bot, 'contextos_ativos')
+                self.bot.add_listener(self._on_gateway_pronto, 'on_ready')
+                
+                # Adicionar monitoramento ao bot
+                monitor = MonitorDiscord(self.debug, self.monitor_loop)
+                monitor.monitorar_bot(self.bot)
+                
+                # Rotinas de manutenção em segundo plano
+                self.agendador = self._criar_agendador(config)
+                self.agendador.iniciar()
             
             self.debug.registrar_evento("BOT_INIT_SUCCESS")
-            self.logger.info("✅ Todos os componentes inicializados com sucesso!")
+            self.logger.info(f"✅ Todos os componentes inicializados em {self.fases.decorrido():.2f}s")
             return True
             
         except Exception as e:
             self.debug.debug_excecao(e, "inicialização da aplicação")
             if self.logger:
-                self.logger.error("❌ Erro durante inicialização: {e}")
+                self.logger.error(f"❌ Erro durante inicialização: {e}")
             else:
-                print("❌ Erro durante inicialização: {e}")
+                print(f"❌ Erro durante inicialização: {e}")
             return False
     
+    async def _medir_fase(self, nome: str, corrotina):
+        with self.fases.fase(nome):
+            try:
+                return await corrotina
+            except Exception as e:
+                # Em segundo plano ninguém espera a tarefa: registrar aqui
+                self.debug.debug_excecao(e, f"inicialização: {nome}")
+    
+    async def _inicializar_banco(self):
+        """Inicialização completa do banco; uma falha deixa o bot sem persistência"""
+        with self.fases.fase('banco'):
+            try:
+                await self.db_manager.inicializar()
+                self.debug.registrar_evento("DB_INIT_SUCCESS")
+                self.logger.info("📊 Banco de dados inicializado com sucesso")
+                # Avisos e erros passam a ser gravados em logs_sistema, em lotes
+                obter_handler_banco().set_db_manager(self.db_manager)
+            except Exception as db_error:
+                self.debug.debug_excecao(db_error, "inicialização do banco")
+                self.logger.warning(f"⚠️ Erro no banco, continuando sem persistência: {db_error}")
+                self.debug.registrar_evento("DB_INIT_FAILED", {"erro": str(db_error)})
+    
+    async def _iniciar_metricas(self, config: Config):
+        """Endpoint /metrics; sem ele (porta 0 ou ocupada) o bot segue normalmente"""
+        if config.metrics_port <= 0:
+            return
+        servidor = ServidorMetricas(host=config.metrics_host, porta=config.metrics_port)
+        servidor.registro.medidor(
+            'oraculo_fila_profundidade', 'Itens aguardando ou em processamento', ('fila',)
+        ).com('logs_banco').definir_funcao(lambda: obter_handler_banco().estatisticas()['pendentes'])
+        # A rota atende antes da fase 'bot' (self.config ainda não existe)
+        servidor.adicionar_rota('/perfil', lambda parametros: self._rota_perfil(config, parametros))
+        servidor.adicionar_rota('/memoria', self._rota_memoria)
+        try:
+            await servidor.iniciar()
+            self.servidor_metricas = servidor
+        except OSError as e:
+            self.logger.warning(f"⚠️ Endpoint de métricas indisponível em {config.metrics_host}:"
+                                f"{config.metrics_port}: {e}")
+    
+    async def _rota_perfil(self, config: Config, parametros: dict) -> str:
+        """GET /perfil?segundos=N&modo=cprofile: captura e devolve o resumo"""
+        try:
+            segundos = float(parametros.get('segundos', config.profile_capture_seconds))
+        except ValueError:
+            raise ValueError(f"segundos inválido: {parametros['segundos']!r}") from None
+        if not math.isfinite(segundos) or segundos <= 0:
+            raise ValueError(f"segundos deve ser um número positivo: {segundos:g}")
+        modo = parametros.get('modo', config.profile_capture_mode)
+        if modo not in MODOS_CAPTURA:
+            raise ValueError(f"modo inválido: {modo!r} (use {', '.join(MODOS_CAPTURA)})")
+        caminho = await capturar_perfil(segundos, modo)
+        if caminho is None:
+            return "Captura não iniciada (outra em andamento)\n"
+        return await asyncio.to_thread(caminho.read_text, encoding='utf-8')
+    
+    def _registrar_estruturas_memoria(self, config: Config):
+        """Buffers que vivem o processo inteiro, medidos pelo monitor de memória"""
+        memoria = obter_monitor_memoria()
+        # O quanto antes: alocações anteriores ao tracemalloc não aparecem nos snapshots
+        memoria.iniciar_tracemalloc(config.memory_tracemalloc_frames)
+        memoria.registrar('debug.eventos', self.debug, 'events')
+        memoria.registrar('debug.registros', self.debug, 'registros')
+        memoria.registrar('logs_banco.fila', obter_handler_banco(), 'queue')
+    
+    async def _rota_memoria(self, parametros: dict) -> str:
+        """GET /memoria?tracemalloc=1: estruturas, RSS e (com 1) um snapshot novo do tracemalloc"""
+        memoria = obter_monitor_memoria()
+        memoria.medir()
+        if parametros.get('tracemalloc') == '1':
+            await asyncio.to_thread(memoria.comparar_snapshots)
+        return memoria.relatorio()
+    
+    async def _on_gateway_pronto(self):
+        """Primeiro on_ready: fecha a contagem dos tempos de inicialização"""
+        if self._gateway_pronto.is_set():
+            return
+        if self._inicio_conexao is not None:
+            self.fases.registrar('gateway', time.perf_counter() - self._inicio_conexao)
+        total = self.fases.concluir()
+        self._gateway_pronto.set()
+        self.debug.registrar_evento("TEMPOS_INICIALIZACAO", dict(self.fases.fases))
+        self.logger.info(f"⏱️ Pronto em {total:.2f}s: {self.fases.resumo()}")
+    
+    def _criar_agendador(self, config: Config) -> AgendadorManutencao:
+        """Registra as rotinas de manutenção do banco e dos caches"""
+        agendador = AgendadorManutencao(
+            carga_atual=lambda: self.bot.mencoes_em_andamento,
+            limite_carga=config.maintenance_busy_threshold,
+            diretorio_bloqueios=str(Path(config.database_path).parent / ".locks")
+        )
+        db = self.db_manager
+        bot = self.bot
+        
+        async def reconciliar_estatisticas():
+            ontem = datetime.now(timezone.utc).date() - timedelta(days=1)
+            await db.atualizar_estatisticas_diarias(ontem)
+        
+        async def retencao():
+            await db.limpar_dados_antigos(
+                dias=config.data_retention_days,
+                diretorio_arquivo=config.archive_dir or None,
+                ocupado=agendador.ocupado
+            )
+        
+        async def backup():
+            await db.criar_backup(
+                diretorio=config.database_backup_dir or None,
+                manter=config.database_backup_keep,
+                ocupado=agendador.ocupado
+            )
+        
+        agendador.adicionar_cron("estatisticas_diarias", reconciliar_estatisticas,
+                                 "10 0 * * *", jitter=300)
+        agendador.adicionar_intervalo("retencao", retencao,
+                                      config.cleanup_interval_hours * 3600, jitter=600)
+        # Semanal: novo dicionário de compressão treinado com as respostas recentes
+        agendador.adicionar_cron("otimizar_textos", db.otimizar_textos,
+                                 "30 4 * * 0", jitter=1800)
+        if config.database_backup_interval > 0:
+            agendador.adicionar_intervalo("backup", backup,
+                                          config.database_backup_interval * 3600, jitter=600)
+        agendador.adicionar_intervalo("checkpoint_wal", db.checkpoint_wal, 300, jitter=30)
+        agendador.adicionar_intervalo("contextos_expirados", bot.limpar_contextos_expirados,
+                                      60, jitter=10)
+        agendador.adicionar_intervalo("snapshot_contextos", bot.salvar_snapshot_contextos,
+                                      300, jitter=30)
+        if config.memory_sample_interval > 0:
+            # Não adiável: a tendência de crescimento precisa de medições regulares
+            agendador.adicionar_intervalo("memoria", obter_monitor_memoria().amostrar,
+                                          config.memory_sample_interval, jitter=5, adiavel=False)
+        return agendador
+    
     async def executar(self):
         """Executa o bot principal"""
         if not await self.inicializar():
@@ -111,6 +293,12 @@ class OraculoApp:
             # Configurar handlers para shutdown graceful
             for sig in (signal.SIGTERM, signal.SIGINT):
                 signal.signal(sig, self._signal_handler)
+            # Relatório de debug sob demanda: kill -USR1 <pid>
+            if hasattr(signal, 'SIGUSR1'):
+                signal.signal(signal.SIGUSR1, self._sinal_relatorio)
+            # Perfil da thread do event loop sob demanda: kill -USR2 <pid>
+            if hasattr(signal, 'SIGUSR2'):
+                signal.signal(signal.SIGUSR2, self._sinal_perfil)
             
             # Executar o bot
             if self.bot:
@@ -121,13 +309,22 @@ class OraculoApp:
                 self.debug.debug_discord_client(self.bot)
                 
                 try:
-                    # Usar timeout estendido para conexão
+                    # O timeout vale até o gateway ficar pronto, não para a sessão inteira
                     self.debug.registrar_evento("DISCORD_START_CALL")
-                    await asyncio.wait_for(
-                        self.bot.start(self.config.discord_token),
-                        timeout=60.0  # Aumentado para 60 segundos
-                    )
-                    self.debug.registrar_evento("DISCORD_CONNECT_SUCCESS")
+                    self._inicio_conexao = time.perf_counter()
+                    sessao = asyncio.create_task(self.bot.start(self.config.discord_token))
+                    pronto = asyncio.create_task(self._gateway_pronto.wait())
+                    await asyncio.wait({sessao, pronto}, timeout=60.0,
+                                       return_when=asyncio.FIRST_COMPLETED)
+                    if not sessao.done() and not pronto.done():
+                        sessao.cancel()
+                        pronto.cancel()
+                        raise asyncio.TimeoutError()
+                    if pronto.done():
+                        self.debug.registrar_evento("DISCORD_CONNECT_SUCCESS")
+                    else:
+                        pronto.cancel()
+                    await sessao
                     
                 except asyncio.TimeoutError:
                     self.debug.registrar_evento("DISCORD_TIMEOUT")
@@ -179,6 +376,15 @@ class OraculoApp:
         # Criar task para finalização assíncrona
         asyncio.create_task(self.finalizar())
     
+    def _sinal_relatorio(self, signum, frame):
+        """Salva o relatório de debug sem parar o bot"""
+        asyncio.create_task(asyncio.to_thread(self.debug.salvar_relatorio))
+    
+    def _sinal_perfil(self, signum, frame):
+        """Captura um perfil por PROFILE_CAPTURE_SECONDS sem parar o bot"""
+        asyncio.create_task(capturar_perfil(self.config.profile_capture_seconds,
+                                            self.config.profile_capture_mode))
+    
     async def finalizar(self):
         """Finaliza todos os componentes da aplicação"""
         if not self._running:
@@ -189,9 +395,25 @@ class OraculoApp:
             self.logger.info("🔄 Finalizando Oráculo de Concursos...")
         
         try:
+            # Parar manutenção e salvar o cache antes de fechar o bot
+            if self.agendador:
+                await self.agendador.parar()
+            if self.bot:
+                await self.bot.salvar_snapshot_contextos()
+            
             # Fechar conexão do bot
             if self.bot and not self.bot.is_closed():
                 await self.bot.close()
+            if self.servidor_metricas:
+                await self.servidor_metricas.parar()
+            if self.monitor_loop:
+                await self.monitor_loop.parar()
+            for tarefa in (self._tarefa_rede, self._tarefa_gemini):
+                if tarefa and not tarefa.done():
+                    tarefa.cancel()
+            
+            # Gravar os logs pendentes antes de fechar o banco
+            await obter_handler_banco().finalizar()
             
             # Fechar conexão do banco
             if self.db_manager:
@@ -204,6 +426,10 @@ class OraculoApp:
         except Exception as e:
             if self.logger:
                 self.logger.error(f"❌ Erro durante finalização: {e}")
+        finally:
+            # Escrever o que ainda está na fila do console/arquivo e de spans
+            encerrar_rastreamento()
+            encerrar_logging()
 
 
 async def main():
@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Agendador de manutenção do Oráculo de Concursos
+Executa rotinas periódicas (cron ou intervalo) dentro do event loop do bot,
+cedendo a vez quando há menções sendo processadas
+"""
+
+import asyncio
+import logging
+import random
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+try:
+    import fcntl
+except ImportError:  # Windows: apenas o bloqueio dentro do processo
+    fcntl = None
+
+
+class ExpressaoCron:
+    """
+    Expressão cron de 5 campos (minuto hora dia mês dia-da-semana), em UTC
+
+    Suporta '*', listas ('1,15'), faixas ('1-5') e passos ('*/10', '0-30/5').
+    Dia da semana: 0 = domingo.
+    """
+
+    LIMITES = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 6)]
+
+    def __init__(self, expressao: str):
+        campos = expressao.split()
+        if len(campos) != 5:
+            raise ValueError(f"Expressão cron inválida (esperados 5 campos): {expressao}")
+
+        self.expressao = expressao
+        self.minutos, self.horas, self.dias, self.meses, self.dias_semana = [
+            self._interpretar_campo(campo, minimo, maximo)
+            for campo, (minimo, maximo) in zip(campos, self.LIMITES)
+        ]
+        self._dia_livre = campos[2] == '*'
+        self._semana_livre = campos[4] == '*'
+
+    @staticmethod
+    def _interpretar_campo(campo: str, minimo: int, maximo: int) -> Set[int]:
+        """Converte um campo cron no conjunto de valores aceitos"""
+        valores: Set[int] = set()
+        for parte in campo.split(','):
+            faixa, _, passo = parte.partition('/')
+            if faixa == '*':
+                inicio, fim = minimo, maximo
+            elif '-' in faixa:
+                inicio, fim = (int(valor) for valor in faixa.split('-'))
+            else:
+                inicio = fim = int(faixa)
+                if passo:
+                    fim = maximo
+
+            if inicio < minimo or fim > maximo or inicio > fim:
+                raise ValueError(f"Campo cron fora dos limites: {campo}")
+            valores.update(range(inicio, fim + 1, int(passo) if passo else 1))
+        return valores
+
+    def _dia_aceito(self, momento: datetime) -> bool:
+        """Regra do cron: com dia e dia da semana restritos, basta um casar"""
+        dia_semana = (momento.weekday() + 1) % 7
+        casa_dia = momento.day in self.dias
+        casa_semana = dia_semana in self.dias_semana
+        if self._dia_livre or self._semana_livre:
+            return casa_dia and casa_semana
+        return casa_dia or casa_semana
+
+    def proximo(self, apos: datetime) -> datetime:
+        """Primeiro instante estritamente posterior a `apos` que casa com a expressão"""
+        momento = apos.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limite = momento + timedelta(days=366 * 4)
+
+        while momento < limite:
+            if momento.month not in self.meses or not self._dia_aceito(momento):
+                momento = (momento + timedelta(days=1)).replace(hour=0, minute=0)
+                continue
+            if momento.hour not in self.horas:
+                momento = (momento + timedelta(hours=1)).replace(minute=0)
+                continue
+            if momento.minute not in self.minutos:
+                momento += timedelta(minutes=1)
+                continue
+            return momento
+
+        raise ValueError(f"Expressão cron nunca dispara: {self.expressao}")
+
+
+@dataclass
+class TarefaAgendada:
+    """Rotina registrada no agendador e suas estatísticas de execução"""
+    nome: str
+    funcao: Callable[[], Awaitable[Any]]
+    intervalo: Optional[float] = None
+    cron: Optional[ExpressaoCron] = None
+    jitter: float = 0.0
+    adiavel: bool = True  # Pode ser adiada enquanto o bot está ocupado
+    execucoes: int = 0
+    falhas: int = 0
+    ignoradas: int = 0  # Disparos pulados por já haver execução em andamento
+    adiamentos: int = 0
+    duracao_total: float = 0.0
+    duracao_maxima: float = 0.0
+    ultima_duracao: Optional[float] = None
+    ultima_execucao: Optional[datetime] = None
+    proxima_execucao: Optional[datetime] = None
+    ultimo_erro: Optional[str] = None
+    em_execucao: bool = False
+
+    def calcular_proxima(self, agora: datetime) -> datetime:
+        """Próximo disparo, já com o jitter aleatório aplicado"""
+        if self.cron:
+            base = self.cron.proximo(agora)
+        else:
+            base = agora + timedelta(seconds=self.intervalo)
+        return base + timedelta(seconds=random.uniform(0, self.jitter))
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Converte para dicionário"""
+        return {
+            'nome': self.nome,
+            'agenda': self.cron.expressao if self.cron else f"a cada {self.intervalo:.0f}s",
+            'execucoes': self.execucoes,
+            'falhas': self.falhas,
+            'ignoradas': self.ignoradas,
+            'adiamentos': self.adiamentos,
+            'duracao_media': self.duracao_total / self.execucoes if self.execucoes else None,
+            'duracao_maxima': self.duracao_maxima,
+            'ultima_duracao': self.ultima_duracao,
+            'ultima_execucao': self.ultima_execucao.isoformat() if self.ultima_execucao else None,
+            'proxima_execucao': self.proxima_execucao.isoformat() if self.proxima_execucao else None,
+            'ultimo_erro': self.ultimo_erro,
+            'em_execucao': self.em_execucao
+        }
+
+
+class AgendadorManutencao:
+    """Agendador assíncrono de rotinas de manutenção"""
+
+    def __init__(self, carga_atual: Optional[Callable[[], int]] = None,
+                 limite_carga: int = 1, espera_adiamento: float = 5.0,
+                 adiamento_maximo: float = 600.0,
+                 diretorio_bloqueios: Optional[str] = None):
+        """
+        Args:
+            carga_atual: Retorna quantas menções estão em processamento
+            limite_carga: A partir desta carga as rotinas adiáveis esperam
+            espera_adiamento: Intervalo entre verificações de carga
+            adiamento_maximo: Tempo máximo que uma rotina pode ser adiada
+            diretorio_bloqueios: Diretório dos arquivos de lock entre processos
+        """
+        self.logger = logging.getLogger(__name__)
+        self.carga_atual = carga_atual
+        self.limite_carga = limite_carga
+        self.espera_adiamento = espera_adiamento
+        self.adiamento_maximo = adiamento_maximo
+        self.diretorio_bloqueios = Path(diretorio_bloqueios) if diretorio_bloqueios else None
+        self.tarefas: Dict[str, TarefaAgendada] = {}
+        self._tasks: List[asyncio.Task] = []
+
+    def adicionar_intervalo(self, nome: str, funcao: Callable[[], Awaitable[Any]],
+                            segundos: float, jitter: float = 0.0,
+                            adiavel: bool = True) -> TarefaAgendada:
+        """Registra uma rotina executada a cada `segundos` (+ jitter)"""
+        tarefa = TarefaAgendada(nome=nome, funcao=funcao, intervalo=segundos,
+                                jitter=jitter, adiavel=adiavel)
+        self.tarefas[nome] = tarefa
+        return tarefa
+
+    def adicionar_cron(self, nome: str, funcao: Callable[[], Awaitable[Any]],
+                       expressao: str, jitter: float = 0.0,
+                       adiavel: bool = True) -> TarefaAgendada:
+        """Registra uma rotina disparada por expressão cron (UTC, + jitter)"""
+        tarefa = TarefaAgendada(nome=nome, funcao=funcao, cron=ExpressaoCron(expressao),
+                                jitter=jitter, adiavel=adiavel)
+        self.tarefas[nome] = tarefa
+        return tarefa
+
+    def ocupado(self) -> bool:
+        """Indica se o bot está processando menções acima do limite"""
+        return bool(self.carga_atual) and self.carga_atual() >= self.limite_carga
+
+    def iniciar(self):
+        """Inicia um laço por rotina no event loop corrente"""
+        if self._tasks:
+            return
+        if self.diretorio_bloqueios:
+            self.diretorio_bloqueios.mkdir(parents=True, exist_ok=True)
+
+        for tarefa in self.tarefas.values():
+            self._tasks.append(asyncio.create_task(self._laco(tarefa), name=f"manutencao:{tarefa.nome}"))
+        self.logger.info(f"⏰ Agendador de manutenção iniciado com {len(self.tarefas)} rotinas")
+
+    async def parar(self):
+        """Cancela os laços; rotinas em execução são interrompidas"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+        self.logger.info("⏰ Agendador de manutenção finalizado")
+
+    async def executar_agora(self, nome: str) -> bool:
+        """Executa uma rotina imediatamente (fora da agenda), respeitando o bloqueio"""
+        return await self._executar(self.tarefas[nome])
+
+    def estatisticas(self) -> Dict[str, Dict[str, Any]]:
+        """Estatísticas de execução de todas as rotinas"""
+        return {nome: tarefa.to_dict() for nome, tarefa in self.tarefas.items()}
+
+    async def _laco(self, tarefa: TarefaAgendada):
+        """Aguarda o próximo disparo, cede a vez se o bot estiver ocupado e executa"""
+        while True:
+            tarefa.proxima_execucao = tarefa.calcular_proxima(datetime.now(timezone.utc))
+            espera = (tarefa.proxima_execucao - datetime.now(timezone.utc)).total_seconds()
+            await asyncio.sleep(max(0.0, espera))
+
+            if tarefa.adiavel:
+                adiado = 0.0
+                while self.ocupado() and adiado < self.adiamento_maximo:
+                    tarefa.adiamentos += 1
+                    await asyncio.sleep(self.espera_adiamento)
+                    adiado += self.espera_adiamento
+
+            await self._executar(tarefa)
+
+    async def _executar(self, tarefa: TarefaAgendada) -> bool:
+        """Executa a rotina uma vez, registrando duração e falhas"""
+        if tarefa.em_execucao:
+            tarefa.ignoradas += 1
+            return False
+
+        arquivo_lock = self._adquirir_lock_processo(tarefa.nome)
+        if arquivo_lock is False:
+            tarefa.ignoradas += 1
+            self.logger.debug(f"⏰ {tarefa.nome} em execução em outro processo; disparo ignorado")
+            return False
+
+        tarefa.em_execucao = True
+        inicio = time.perf_counter()
+        try:
+            await tarefa.funcao()
+            return True
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            tarefa.falhas += 1
+            tarefa.ultimo_erro = str(e)
+            self.logger.error(f"❌ Erro na rotina de manutenção {tarefa.nome}: {e}")
+            return False
+        finally:
+            duracao = time.perf_counter() - inicio
+            tarefa.em_execucao = False
+            tarefa.execucoes += 1
+            tarefa.ultima_duracao = duracao
+            tarefa.duracao_total += duracao
+            tarefa.duracao_maxima = max(tarefa.duracao_maxima, duracao)
+            tarefa.ultima_execucao = datetime.now(timezone.utc)
+            if arquivo_lock:
+                arquivo_lock.close()
+            self.logger.debug(f"⏰ Rotina {tarefa.nome} executada em {duracao:.3f}s")
+
+    def _adquirir_lock_processo(self, nome: str):
+        """
+        Lock de arquivo para que só um processo execute a rotina por vez
+
+        Returns:
+            Arquivo aberto (liberado ao fechar), None sem lock entre
+            processos ou False se outro processo detém o lock
+        """
+        if not self.diretorio_bloqueios or fcntl is None:
+            return None
+
+        arquivo = open(self.diretorio_bloqueios / f"{nome}.lock", 'w')
+        try:
+            fcntl.flock(arquivo.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            arquivo.close()
+            return False
+        return arquivo
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Compressão de dados do Oráculo de Concursos
+Usa zstd (`zstandard`, dependência do projeto); gzip/zlib só se o pacote faltar
+"""
+
+import gzip
+import os
+import shutil
+import threading
+import zlib
+from typing import List, Optional
+
+try:
+    import zstandard
+except ImportError:  # Rede de segurança: instalação sem o pacote declarado
+    zstandard = None
+
+
+# Assinaturas usadas para identificar o formato ao descomprimir
+_MAGICO_ZSTD = b'\x28\xb5\x2f\xfd'
+_MAGICO_GZIP = b'\x1f\x8b'
+
+NIVEL_PADRAO = 3
+
+# Leitura em blocos ao comprimir arquivos inteiros
+_TAMANHO_BLOCO_ARQUIVO = 1024 * 1024
+
+
+def zstd_disponivel() -> bool:
+    """Indica se a compressão zstd está disponível"""
+    return zstandard is not None
+
+
+def extensao() -> str:
+    """Extensão dos arquivos gerados pelo compressor ativo"""
+    return '.zst' if zstandard else '.gz'
+
+
+def comprimir(dados: bytes, nivel: int = NIVEL_PADRAO) -> bytes:
+    """
+    Comprime um bloco de bytes em um quadro independente
+
+    Quadros zstd e membros gzip podem ser concatenados em um mesmo arquivo,
+    o que permite anexar lotes sem reescrever o que já foi gravado.
+    """
+    if zstandard:
+        return zstandard.ZstdCompressor(level=nivel).compress(dados)
+    return gzip.compress(dados, compresslevel=min(9, max(1, nivel * 2)))
+
+
+def descomprimir(dados: bytes) -> bytes:
+    """Descomprime dados zstd ou gzip (um ou mais quadros concatenados)"""
+    if dados.startswith(_MAGICO_ZSTD):
+        if not zstandard:
+            raise RuntimeError("Dados em zstd, mas o pacote 'zstandard' não está instalado")
+        leitor = zstandard.ZstdDecompressor().stream_reader(dados, read_across_frames=True)
+        return leitor.read()
+    if dados.startswith(_MAGICO_GZIP):
+        return gzip.decompress(dados)
+    raise ValueError("Formato de compressão desconhecido")
+
+
+def comprimir_arquivo(origem: str, destino: str, nivel: int = NIVEL_PADRAO) -> int:
+    """
+    Comprime um arquivo em fluxo (memória constante), com fsync no destino
+
+    Returns:
+        Tamanho do arquivo comprimido
+    """
+    with open(origem, 'rb') as entrada, open(destino, 'wb') as saida:
+        if zstandard:
+            # O tamanho conhecido vai no cabeçalho do quadro
+            compressor = zstandard.ZstdCompressor(level=nivel)
+            compressor.copy_stream(entrada, saida, size=os.fstat(entrada.fileno()).st_size)
+        else:
+            with gzip.GzipFile(fileobj=saida, mode='wb',
+                               compresslevel=min(9, max(1, nivel * 2))) as gz:
+                shutil.copyfileobj(entrada, gz, _TAMANHO_BLOCO_ARQUIVO)
+        saida.flush()
+        os.fsync(saida.fileno())
+        return saida.tell()
+
+
+def descomprimir_arquivo(origem: str, destino: str):
+    """Descomprime em fluxo um arquivo zstd ou gzip gerado por `comprimir_arquivo`"""
+    with open(origem, 'rb') as entrada, open(destino, 'wb') as saida:
+        magico = entrada.read(4)
+        entrada.seek(0)
+        if magico.startswith(_MAGICO_ZSTD):
+            if not zstandard:
+                raise RuntimeError("Arquivo em zstd, mas o pacote 'zstandard' não está instalado")
+            zstandard.ZstdDecompressor().copy_stream(entrada, saida)
+        elif magico.startswith(_MAGICO_GZIP):
+            with gzip.GzipFile(fileobj=entrada, mode='rb') as gz:
+                shutil.copyfileobj(gz, saida, _TAMANHO_BLOCO_ARQUIVO)
+        else:
+            raise ValueError("Formato de compressão desconhecido")
+        saida.flush()
+        os.fsync(saida.fileno())
+
+
+# Formatos de blocos de texto comprimidos individualmente
+FORMATO_BRUTO = 'bruto'
+FORMATO_ZLIB = 'zlib'
+FORMATO_ZSTD = 'zstd'
+
+# A janela do zlib limita o dicionário útil a 32 KB
+TAMANHO_MAXIMO_DICIONARIO_ZLIB = 32 * 1024
+
+
+def formato_padrao() -> str:
+    """Formato usado para novos blocos de texto"""
+    return FORMATO_ZSTD if zstandard else FORMATO_ZLIB
+
+
+def treinar_dicionario(amostras: List[bytes], tamanho: int = 64 * 1024) -> Optional[bytes]:
+    """
+    Gera um dicionário de compressão a partir de amostras do próprio corpus
+
+    Com zstd usa o treinamento nativo (COVER); com zlib monta um dicionário
+    pré-definido com as amostras mais recentes, limitado à janela de 32 KB.
+
+    Returns:
+        Bytes do dicionário ou None se as amostras forem insuficientes
+    """
+    if not amostras:
+        return None
+
+    if zstandard:
+        try:
+            return zstandard.train_dictionary(tamanho, amostras).as_bytes()
+        except zstandard.ZstdError:
+            return None
+
+    limite = min(tamanho, TAMANHO_MAXIMO_DICIONARIO_ZLIB)
+    dicionario = b''.join(amostras)[-limite:]
+    return dicionario or None
+
+
+class CodecTexto:
+    """
+    Compressor de textos curtos com dicionário opcional (reutilizável)
+
+    Pode ser usado de várias threads (as row factories do SQLite rodam na
+    thread de cada conexão); os objetos do zstd não são thread-safe.
+    """
+
+    def __init__(self, formato: str, dicionario: Optional[bytes] = None,
+                 nivel: int = NIVEL_PADRAO):
+        self.formato = formato
+        self.dicionario = dicionario
+        self.nivel = nivel
+        self._trava = threading.Lock()
+
+        if formato == FORMATO_ZSTD:
+            if not zstandard:
+                raise RuntimeError("Formato zstd requer o pacote 'zstandard'")
+            dicionario_zstd = zstandard.ZstdCompressionDict(dicionario) if dicionario else None
+            self._compressor = zstandard.ZstdCompressor(level=nivel, dict_data=dicionario_zstd)
+            self._descompressor = zstandard.ZstdDecompressor(dict_data=dicionario_zstd)
+
+    def comprimir(self, dados: bytes) -> bytes:
+        if self.formato == FORMATO_ZSTD:
+            with self._trava:
+                return self._compressor.compress(dados)
+        if self.formato == FORMATO_ZLIB:
+            if self.dicionario:
+                compressor = zlib.compressobj(level=min(9, self.nivel * 2), zdict=self.dicionario)
+            else:
+                compressor = zlib.compressobj(level=min(9, self.nivel * 2))
+            return compressor.compress(dados) + compressor.flush()
+        return dados
+
+    def descomprimir(self, dados: bytes) -> bytes:
+        if self.formato == FORMATO_ZSTD:
+            with self._trava:
+                return self._descompressor.decompress(dados)
+        if self.formato == FORMATO_ZLIB:
+            if self.dicionario:
+                descompressor = zlib.decompressobj(zdict=self.dicionario)
+            else:
+                descompressor = zlib.decompressobj()
+            return descompressor.decompress(dados) + descompressor.flush()
+        return dados
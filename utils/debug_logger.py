@@ -7,72 +7,227 @@ Logging detalhado para investigação de problemas
 
 import asyncio
 import logging
+import logging.handlers
 import os
 import sys
+import threading
 import time
 import traceback
+from collections import deque
 from datetime import datetime
 from pathlib import Path
 from typing import Any, Dict, Optional
 
 import discord
 
+from utils.metricas import obter_registro
+
+
+# Eventos (e registros de log) guardados em memória; os mais antigos saem
+CAPACIDADE_PADRAO = 2000
+
+# Relatórios de debug mantidos em logs/; os mais antigos são removidos
+MAXIMO_RELATORIOS = 10
+
+# Tamanho máximo de cada texto guardado nos dados de um evento
+LIMITE_TEXTO_EVENTO = 4000
+
+# Arquivo do log de gateway (só com debug_gateway): tamanho e backups
+ROTACAO_GATEWAY_MB = 10
+BACKUPS_GATEWAY = 3
+
+# Loggers das bibliotecas capturados pelo gravador
+LOGGERS_GATEWAY = ('discord', 'asyncio')
+
+
+def interpretar_amostragem(texto: str) -> Dict[str, int]:
+    """
+    Converte "discord.gateway=100,asyncio=10" em {logger: N}
+    
+    Cada logger (e seus filhos) guarda 1 de cada N registros abaixo de WARNING.
+    """
+    taxas = {}
+    for item in texto.split(','):
+        if '=' not in item:
+            continue
+        nome, taxa = item.split('=', 1)
+        try:
+            taxas[nome.strip()] = max(1, int(taxa))
+        except ValueError:
+            continue
+    return taxas
+
+
+class FiltroAmostragem(logging.Filter):
+    """Deixa passar 1 de cada N registros por logger; WARNING e acima passam sempre"""
+    
+    def __init__(self, taxas: Optional[Dict[str, int]] = None):
+        super().__init__()
+        self.taxas = taxas or {}
+        self.descartados = 0
+        self._contadores: Dict[str, int] = {}
+        self._taxa_por_logger: Dict[str, int] = {}
+        self._ultimo_registro: Optional[logging.LogRecord] = None
+        self._ultima_decisao = True
+    
+    def _taxa(self, nome: str) -> int:
+        taxa = self._taxa_por_logger.get(nome)
+        if taxa is None:
+            # O prefixo mais específico vence: "discord.gateway" antes de "discord"
+            taxa = 1
+            partes = nome.split('.')
+            for fim in range(len(partes), 0, -1):
+                prefixo = '.'.join(partes[:fim])
+                if prefixo in self.taxas:
+                    taxa = self.taxas[prefixo]
+                    break
+            self._taxa_por_logger[nome] = taxa
+        return taxa
+    
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        taxa = self._taxa(record.name)
+        if taxa == 1:
+            return True
+        # Buffer e arquivo do gateway compartilham o filtro: uma decisão por registro
+        if record is self._ultimo_registro:
+            return self._ultima_decisao
+        contador = self._contadores.get(record.name, 0)
+        self._contadores[record.name] = contador + 1
+        decisao = contador % taxa == 0
+        if not decisao:
+            self.descartados += 1
+        self._ultimo_registro, self._ultima_decisao = record, decisao
+        return decisao
+
+
+class HandlerGravador(logging.Handler):
+    """
+    Guarda registros de log no buffer circular do DebugLogger
+    
+    A mensagem só é formatada quando o relatório é gerado.
+    """
+    
+    def __init__(self, registros: deque):
+        super().__init__()
+        self.registros = registros
+    
+    def handle(self, record: logging.LogRecord) -> bool:
+        # deque.append é atômico: sem o lock do Handler
+        if not self.filter(record):
+            return False
+        self.emit(record)
+        return True
+    
+    def emit(self, record: logging.LogRecord):
+        texto_excecao = None
+        if record.exc_info:
+            texto_excecao = ''.join(traceback.format_exception(*record.exc_info))
+        self.registros.append(
+            (record.created, record.levelname, record.name, record.msg, record.args, texto_excecao)
+        )
+
+
+def _limitar(dados: Dict[str, Any]) -> Dict[str, Any]:
+    """Corta textos longos para o buffer não reter saídas inteiras"""
+    return {
+        chave: (f"{valor[:LIMITE_TEXTO_EVENTO]}... [+{len(valor) - LIMITE_TEXTO_EVENTO}]"
+                if isinstance(valor, str) and len(valor) > LIMITE_TEXTO_EVENTO else valor)
+        for chave, valor in dados.items()
+    }
+
 
 class DebugLogger:
-    """Logger especializado para debug do bot Discord"""
+    """
+    Logger especializado para debug do bot Discord
     
-    def __init__(self, nome: str = "oraculo_debug"):
+    Funciona como gravador de voo: eventos e registros de log das bibliotecas
+    ficam em buffers circulares de tamanho fixo e só vão para o disco no
+    relatório (sob demanda, no encerramento ou em uma falha). O DEBUG do
+    gateway do discord.py só é capturado com `debug_gateway`.
+    """
+    
+    def __init__(self, nome: str = "oraculo_debug", capacidade: int = CAPACIDADE_PADRAO,
+                 debug_gateway: bool = False, amostragem: Optional[Dict[str, int]] = None,
+                 diretorio: str = "logs"):
         self.nome = nome
         self.logger = logging.getLogger(nome)
         self.start_time = time.time()
-        self.events = []
+        self.diretorio = Path(diretorio)
+        self.events: deque = deque(maxlen=capacidade)
+        self.registros: deque = deque(maxlen=capacidade)
+        self.total_eventos = 0
+        self.debug_gateway = debug_gateway
+        self.filtro_amostragem = FiltroAmostragem(amostragem)
+        self.handler_gravador = HandlerGravador(self.registros)
+        self.handler_gravador.addFilter(self.filtro_amostragem)
+        self._handler_gateway: Optional[logging.Handler] = None
         
         # Configurar logger de debug
         self._configurar_logger()
         
+    def configurar(self, capacidade: Optional[int] = None, debug_gateway: Optional[bool] = None,
+                   amostragem: Optional[Dict[str, int]] = None):
+        """Aplica as configurações lidas depois da criação (Config)"""
+        if capacidade is not None and capacidade != self.events.maxlen:
+            # Os buffers novos começam com os eventos mais recentes dos antigos
+            self.events = deque(self.events, maxlen=capacidade)
+            self.registros = deque(self.registros, maxlen=capacidade)
+            self.handler_gravador.registros = self.registros
+        if amostragem is not None:
+            self.filtro_amostragem.taxas = amostragem
+            self.filtro_amostragem._taxa_por_logger.clear()
+        if debug_gateway is not None and debug_gateway != self.debug_gateway:
+            self.debug_gateway = debug_gateway
+            self._configurar_logger()
+        
     def _configurar_logger(self):
-        """Configura logger com máximo detalhamento"""
+        """Console para o logger de debug; bibliotecas capturadas pelo gravador"""
         # Remover handlers existentes
         for handler in self.logger.handlers[:]:
             self.logger.removeHandler(handler)
         
-        # Configurar nível máximo
-        self.logger.setLevel(logging.DEBUG)
+        # Os eventos detalhados ficam no buffer; o console recebe DEBUG só no modo gateway
+        nivel = logging.DEBUG if self.debug_gateway else logging.INFO
+        self.logger.setLevel(nivel)
         
         # Handler para console
         console_handler = logging.StreamHandler(sys.stdout)
-        console_handler.setLevel(logging.DEBUG)
-        
-        # Handler para arquivo
-        log_dir = Path("logs")
-        log_dir.mkdir(exist_ok=True)
-        
-        file_handler = logging.FileHandler(
-            log_dir / f"debug_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log",
-            encoding='utf-8'
-        )
-        file_handler.setLevel(logging.DEBUG)
+        console_handler.setLevel(nivel)
         
         # Formato detalhado
         formatter = logging.Formatter(
             '[%(asctime)s] %(levelname)s [%(name)s:%(lineno)d] %(message)s',
             datefmt='%Y-%m-%d %H:%M:%S'
         )
-        
         console_handler.setFormatter(formatter)
-        file_handler.setFormatter(formatter)
-        
         self.logger.addHandler(console_handler)
-        self.logger.addHandler(file_handler)
-        
-        # Configurar loggers do discord.py para DEBUG
-        discord_logger = logging.getLogger('discord')
-        discord_logger.setLevel(logging.DEBUG)
-        discord_logger.addHandler(file_handler)
         
-        asyncio_logger = logging.getLogger('asyncio')
-        asyncio_logger.setLevel(logging.DEBUG)
-        asyncio_logger.addHandler(file_handler)
+        # Arquivo do gateway, com rotação: só quando pedido explicitamente
+        if self._handler_gateway:
+            for nome_logger in LOGGERS_GATEWAY:
+                logging.getLogger(nome_logger).removeHandler(self._handler_gateway)
+            self._handler_gateway.close()
+            self._handler_gateway = None
+        if self.debug_gateway:
+            self.diretorio.mkdir(exist_ok=True)
+            self._handler_gateway = logging.handlers.RotatingFileHandler(
+                self.diretorio / "debug_gateway.log",
+                maxBytes=ROTACAO_GATEWAY_MB * 1024 * 1024,
+                backupCount=BACKUPS_GATEWAY,
+                encoding='utf-8'
+            )
+            self._handler_gateway.setFormatter(formatter)
+            self._handler_gateway.addFilter(self.filtro_amostragem)
+        
+        for nome_logger in LOGGERS_GATEWAY:
+            logger_biblioteca = logging.getLogger(nome_logger)
+            # Sem debug_gateway, o nível herdado (WARNING) é mantido
+            logger_biblioteca.setLevel(logging.DEBUG if self.debug_gateway else logging.NOTSET)
+            logger_biblioteca.addHandler(self.handler_gravador)
+            if self._handler_gateway:
+                logger_biblioteca.addHandler(self._handler_gateway)
         
     def registrar_evento(self, evento: str, dados: Optional[Dict[str, Any]] = None):
         """Registra evento com timestamp para análise de timeline"""
@@ -81,11 +236,44 @@ class DebugLogger:
             'timestamp': timestamp,
             'tempo_relativo': timestamp - self.start_time,
             'evento': evento,
-            'dados': dados or {}
+            'dados': _limitar(dados) if dados else {}
         }
         
         self.events.append(evento_data)
-        self.logger.debug(f"EVENTO: {evento} | Tempo: {evento_data['tempo_relativo']:.3f}s | Dados: {dados}")
+        self.total_eventos += 1
+        self.logger.debug("EVENTO: %s | Tempo: %.3fs | Dados: %s",
+                          evento, evento_data['tempo_relativo'], dados)
+        
+    def instalar_despejo_em_falha(self):
+        """Salva o relatório quando uma exceção não tratada encerra o processo ou uma thread"""
+        excepthook_anterior = sys.excepthook
+        threading_excepthook_anterior = threading.excepthook
+        
+        def excepthook(tipo, valor, tb):
+            self._despejar_falha(valor, "exceção não tratada", tb)
+            excepthook_anterior(tipo, valor, tb)
+        
+        def threading_excepthook(args):
+            if args.exc_value is not None:
+                thread = args.thread.name if args.thread else '?'
+                self._despejar_falha(args.exc_value, f"thread {thread}", args.exc_traceback)
+            threading_excepthook_anterior(args)
+        
+        sys.excepthook = excepthook
+        threading.excepthook = threading_excepthook
+        
+    def _despejar_falha(self, excecao: BaseException, contexto: str, tb):
+        try:
+            self.registrar_evento("FALHA", {
+                'tipo': type(excecao).__name__,
+                'mensagem': str(excecao),
+                'contexto': contexto,
+                'stack_trace': ''.join(traceback.format_exception(type(excecao), excecao, tb))
+            })
+            self.salvar_relatorio(f"debug_falha_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt")
+        except Exception:
+            # O hook original ainda precisa rodar
+            pass
         
     def debug_ambiente(self):
         """Registra informações do ambiente"""
@@ -103,31 +291,42 @@ class DebugLogger:
         self.registrar_evento("DEBUG_AMBIENTE", info_ambiente)
         return info_ambiente
         
-    def debug_rede(self):
-        """Testa conectividade básica"""
-        import subprocess
+    async def debug_rede(self, host: str = 'discord.com', tentativas: int = 3,
+                         timeout: float = 3.0) -> Dict[str, Any]:
+        """
+        Testa conectividade básica sem bloquear o event loop
+        
+        Resolve o DNS e mede a conexão TCP na porta 443 (no lugar de
+        nslookup e ping, que bloqueavam a inicialização por até 15 s).
+        """
+        loop = asyncio.get_running_loop()
+        info_rede: Dict[str, Any] = {'host': host}
         
         try:
-            # Teste de DNS
-            result_dns = subprocess.run(['nslookup', 'discord.com'], 
-                                      capture_output=True, text=True, timeout=5)
-            
-            # Teste de conectividade
-            result_ping = subprocess.run(['ping', '-c', '3', 'discord.com'], 
-                                       capture_output=True, text=True, timeout=10)
+            inicio = time.perf_counter()
+            enderecos = await asyncio.wait_for(loop.getaddrinfo(host, 443), timeout)
+            info_rede['dns_lookup'] = True
+            info_rede['dns_ms'] = round((time.perf_counter() - inicio) * 1000, 1)
+            info_rede['enderecos'] = sorted({endereco[4][0] for endereco in enderecos})[:4]
             
-            info_rede = {
-                'dns_lookup': result_dns.returncode == 0,
-                'ping_success': result_ping.returncode == 0,
-                'dns_output': result_dns.stdout[:200] if result_dns.stdout else '',
-                'ping_output': result_ping.stdout[:200] if result_ping.stdout else ''
-            }
+            latencias = []
+            for _ in range(tentativas):
+                inicio = time.perf_counter()
+                try:
+                    _, escritor = await asyncio.wait_for(asyncio.open_connection(host, 443), timeout)
+                except (OSError, asyncio.TimeoutError):
+                    continue
+                latencias.append(round((time.perf_counter() - inicio) * 1000, 1))
+                escritor.close()
+            info_rede['tcp_443'] = bool(latencias)
+            info_rede['latencias_ms'] = latencias
             
         except Exception as e:
-            info_rede = {
-                'erro': str(e),
+            info_rede.update({
+                'dns_lookup': False,
+                'erro': f"{type(e).__name__}: {e}",
                 'teste_executado': False
-            }
+            })
         
         self.registrar_evento("DEBUG_REDE", info_rede)
         return info_rede
@@ -151,48 +350,70 @@ class DebugLogger:
         
     def debug_excecao(self, excecao: Exception, contexto: str = ""):
         """Registra exceção com stack trace completo"""
+        stack_trace = traceback.format_exc()
         erro_data = {
             'tipo': type(excecao).__name__,
             'mensagem': str(excecao),
             'contexto': contexto,
-            'stack_trace': traceback.format_exc()
+            'stack_trace': stack_trace
         }
         
         self.registrar_evento("EXCECAO", erro_data)
-        self.logger.error(f"EXCEÇÃO em {contexto}: {type(excecao).__name__}: {excecao}")
-        self.logger.error(f"Stack trace:\n{traceback.format_exc()}")
+        self.logger.error("EXCEÇÃO em %s: %s: %s", contexto, type(excecao).__name__, excecao)
+        self.logger.error("Stack trace:\n%s", stack_trace)
         
     def gerar_relatorio(self) -> str:
         """Gera relatório completo de debug"""
+        # Cópias dos buffers (list(deque) é atômica): o relatório pode ser gerado em outra thread
+        eventos = list(self.events)
+        registros = list(self.registros)
+        
         relatorio = []
         relatorio.append("=" * 80)
         relatorio.append("RELATÓRIO DE DEBUG - ORÁCULO DE CONCURSOS")
         relatorio.append("=" * 80)
         relatorio.append(f"Gerado em: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
         relatorio.append(f"Duração da sessão: {time.time() - self.start_time:.2f} segundos")
-        relatorio.append(f"Total de eventos: {len(self.events)}")
+        relatorio.append(f"Total de eventos: {self.total_eventos} "
+                         f"(últimos {len(eventos)} de no máximo {self.events.maxlen} guardados)")
+        relatorio.append(f"Registros de log das bibliotecas: últimos {len(registros)} "
+                         f"(gateway em DEBUG: {'sim' if self.debug_gateway else 'não'}, "
+                         f"{self.filtro_amostragem.descartados} descartados por amostragem)")
         relatorio.append("")
         
         # Timeline de eventos
         relatorio.append("TIMELINE DE EVENTOS:")
         relatorio.append("-" * 40)
-        for evento in self.events:
+        for evento in eventos:
             relatorio.append(f"[{evento['tempo_relativo']:8.3f}s] {evento['evento']}")
             if evento['dados']:
                 for key, value in evento['dados'].items():
                     relatorio.append(f"    {key}: {value}")
         
+        if registros:
+            relatorio.append("")
+            relatorio.append("ÚLTIMOS REGISTROS DE LOG (discord, asyncio):")
+            relatorio.append("-" * 40)
+            for criado, nivel, nome, msg, args, texto_excecao in registros:
+                try:
+                    mensagem = str(msg) % args if args else str(msg)
+                except Exception:
+                    mensagem = f"{msg} {args}"
+                relatorio.append(f"[{criado - self.start_time:8.3f}s] {nivel} [{nome}] {mensagem}")
+                if texto_excecao:
+                    relatorio.append(texto_excecao.rstrip())
+        
         relatorio.append("")
         relatorio.append("=" * 80)
         
         return "\n".join(relatorio)
         
     def salvar_relatorio(self, arquivo: Optional[str] = None) -> str:
-        """Salva relatório em arquivo"""
+        """Salva relatório em arquivo, mantendo só os MAXIMO_RELATORIOS mais recentes"""
         if not arquivo:
             arquivo = f"debug_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
         
-        caminho = Path("logs") / arquivo
+        caminho = self.diretorio / arquivo
         caminho.parent.mkdir(exist_ok=True)
         
         relatorio = self.gerar_relatorio()
@@ -200,46 +421,97 @@ class DebugLogger:
         with open(caminho, 'w', encoding='utf-8') as f:
             f.write(relatorio)
         
-        self.logger.info(f"Relatório de debug salvo em: {caminho}")
+        antigos = sorted(caminho.parent.glob("debug_*.txt"), key=lambda c: c.stat().st_mtime)
+        for antigo in antigos[:-MAXIMO_RELATORIOS]:
+            antigo.unlink(missing_ok=True)
+        
+        self.logger.info("Relatório de debug salvo em: %s", caminho)
         return str(caminho)
 
 
+class HandlerHeartbeat(logging.Handler):
+    """Avisos de heartbeat do gateway (loop travado ou rede lenta) como eventos do monitor"""
+    
+    def __init__(self, monitor: 'MonitorDiscord'):
+        super().__init__(logging.WARNING)
+        self.monitor = monitor
+    
+    def emit(self, record: logging.LogRecord):
+        mensagem = str(record.msg)
+        if 'heartbeat blocked' in mensagem:
+            self.monitor.registrar('DISCORD_HEARTBEAT_BLOQUEADO', 'heartbeat_bloqueado')
+        elif 'behind' in mensagem:
+            self.monitor.registrar('DISCORD_HEARTBEAT_ATRASADO', 'heartbeat_atrasado',
+                                   {'latency': record.args[-1] if record.args else None})
+
+
 class MonitorDiscord:
-    """Monitor específico para eventos Discord"""
+    """
+    Monitor específico para eventos Discord
+    
+    Usa listeners (não substitui os handlers do bot) e, com um MonitorLoop,
+    anexa a cada evento de gateway o último travamento do event loop, para
+    correlacionar desconexões e avisos de heartbeat com travamentos.
+    """
     
-    def __init__(self, debug_logger: DebugLogger):
+    def __init__(self, debug_logger: DebugLogger, monitor_loop=None):
         self.debug = debug_logger
-        
+        self.monitor_loop = monitor_loop
+        self.eventos = obter_registro().contador(
+            'oraculo_gateway_eventos_total', 'Eventos do gateway do Discord', ('evento',)
+        )
+        self.handler_heartbeat = HandlerHeartbeat(self)
+    
+    def registrar(self, evento: str, rotulo: str, dados: Optional[Dict[str, Any]] = None):
+        """Evento no gravador e no contador, com o travamento recente do loop"""
+        dados = dict(dados or {})
+        if self.monitor_loop is not None:
+            dados['travamento_recente'] = self.monitor_loop.travamento_recente()
+        self.eventos.com(rotulo).incrementar()
+        self.debug.registrar_evento(evento, dados)
+    
     def monitorar_bot(self, bot):
         """Adiciona monitoramento a um bot Discord"""
         
-        # Monitorar eventos principais
-        @bot.event
+        # Listeners somam-se aos handlers do bot (@bot.event substituiria on_ready)
         async def on_connect():
-            self.debug.registrar_evento("DISCORD_CONNECT", {
+            self.registrar("DISCORD_CONNECT", 'conexao', {
                 'latency': bot.latency,
                 'user': str(bot.user) if bot.user else 'None'
             })
-            
-        @bot.event  
+        
         async def on_ready():
-            self.debug.registrar_evento("DISCORD_READY", {
+            self.registrar("DISCORD_READY", 'pronto', {
                 'user': str(bot.user),
                 'guilds': len(bot.guilds),
                 'latency': bot.latency
             })
-            
-        @bot.event
+        
+        async def on_resumed():
+            self.registrar("DISCORD_RESUMED", 'retomada', {'latency': bot.latency})
+        
         async def on_disconnect():
-            self.debug.registrar_evento("DISCORD_DISCONNECT")
-            
-        @bot.event
+            self.registrar("DISCORD_DISCONNECT", 'desconexao')
+        
+        for listener in (on_connect, on_ready, on_resumed, on_disconnect):
+            bot.add_listener(listener, listener.__name__)
+        
+        # on_error não passa pelos listeners: encadeado com o handler do bot
+        on_error_bot = bot.on_error
+        
         async def on_error(event, *args, **kwargs):
-            self.debug.registrar_evento("DISCORD_ERROR", {
+            self.registrar("DISCORD_ERROR", 'erro', {
                 'event': event,
                 'args': str(args)[:200],
                 'kwargs': str(kwargs)[:200]
             })
+            await on_error_bot(event, *args, **kwargs)
+        
+        bot.on_error = on_error
+        
+        gateway = logging.getLogger('discord.gateway')
+        if self.handler_heartbeat not in gateway.handlers:
+            gateway.addHandler(self.handler_heartbeat)
 
 
 # Singleton global para debug
@@ -252,37 +524,3 @@ def get_debug_logger() -> DebugLogger:
         _debug_instance = DebugLogger()
     return _debug_instance
 
-
-# Decorator para debug de funções
-def debug_func(func):
-    """Decorator para debug automático de funções"""
-    def wrapper(*args, **kwargs):
-        debug = get_debug_logger()
-        debug.registrar_evento(f"FUNC_START", {'function': func.__name__})
-        
-        try:
-            result = func(*args, **kwargs)
-            debug.registrar_evento(f"FUNC_END", {'function': func.__name__, 'success': True})
-            return result
-        except Exception as e:
-            debug.debug_excecao(e, f"função {func.__name__}")
-            raise
-            
-    return wrapper
-
-
-def debug_async_func(func):
-    """Decorator para debug de funções assíncronas"""
-    async def wrapper(*args, **kwargs):
-        debug = get_debug_logger()
-        debug.registrar_evento(f"ASYNC_FUNC_START", {'function': func.__name__})
-        
-        try:
-            result = await func(*args, **kwargs)
-            debug.registrar_evento(f"ASYNC_FUNC_END", {'function': func.__name__, 'success': True})
-            return result
-        except Exception as e:
-            debug.debug_excecao(e, f"função assíncrona {func.__name__}")
-            raise
-            
-    return wrapper
\ No newline at end of file
@@ -5,13 +5,28 @@ Sistema de Logging do Oráculo de Concursos
 Configuração centralizada de logs com rotação e formatação personalizada
 """
 
+import asyncio
+import atexit
+import copy
 import logging
 import logging.handlers
 import os
+import queue
 import sys
-from datetime import datetime
+import threading
+import time
+from contextvars import ContextVar
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import Optional
+from typing import Dict, List, Optional
+
+from pydantic_core import to_json
+
+try:
+    from utils.rastreamento import span_atual
+except ImportError:
+    # Módulo executado isolado (teste no fim do arquivo)
+    from rastreamento import span_atual
 
 
 class OraculoFormatter(logging.Formatter):
@@ -40,29 +55,43 @@ class OraculoFormatter(logging.Formatter):
         super().__init__()
         self.usar_cores = usar_cores and hasattr(sys.stderr, 'isatty') and sys.stderr.isatty()
         self.usar_emojis = usar_emojis
+        # Partes que se repetem entre registros: segundo formatado, nível e módulo
+        self._segundo = (None, '')
+        self._niveis: Dict[str, str] = {}
+        self._modulos: Dict[str, str] = {}
+    
+    def _timestamp(self, criado: float) -> str:
+        """Data e hora local, formatada uma vez por segundo"""
+        segundo, texto = self._segundo
+        if int(criado) != segundo:
+            texto = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(int(criado)))
+            self._segundo = (int(criado), texto)
+        return texto
+    
+    def _nivel(self, nome: str) -> str:
+        """Nível com cor e emoji"""
+        nivel = self._niveis.get(nome)
+        if nivel is None:
+            nivel = nome
+            if self.usar_emojis:
+                nivel = f"{self.EMOJIS.get(nome, '')} {nivel}"
+            if self.usar_cores:
+                nivel = f"{self.CORES.get(nome, '')}{nivel}{self.CORES['RESET']}"
+            nivel = f"{nivel:<12}"
+            self._niveis[nome] = nivel
+        return nivel
+    
+    def _modulo(self, nome: str) -> str:
+        """Módulo (limitado a 20 caracteres)"""
+        modulo = self._modulos.get(nome)
+        if modulo is None:
+            modulo = f"...{nome[-17:]}" if len(nome) > 20 else nome
+            modulo = modulo.ljust(20)
+            self._modulos[nome] = modulo
+        return modulo
     
     def format(self, record: logging.LogRecord) -> str:
         """Formatar registro de log"""
-        # Timestamp
-        timestamp = datetime.fromtimestamp(record.created).strftime('%Y-%m-%d %H:%M:%S')
-        
-        # Nível com cor e emoji
-        nivel = record.levelname
-        if self.usar_emojis:
-            emoji = self.EMOJIS.get(nivel, '')
-            nivel = f"{emoji} {nivel}"
-        
-        if self.usar_cores:
-            cor = self.CORES.get(record.levelname, '')
-            reset = self.CORES['RESET']
-            nivel = f"{cor}{nivel}{reset}"
-        
-        # Módulo (limitado a 20 caracteres)
-        modulo = record.name
-        if len(modulo) > 20:
-            modulo = f"...{modulo[-17:]}"
-        modulo = modulo.ljust(20)
-        
         # Mensagem
         mensagem = record.getMessage()
         
@@ -70,79 +99,326 @@ class OraculoFormatter(logging.Formatter):
         extras = ""
         if hasattr(record, 'extra_info'):
             extras = f" [{record.extra_info}]"
+        if hasattr(record, 'trace_id'):
+            extras += f" [trace {record.trace_id[:8]}]"
         
         # Formatação final
-        log_line = f"{timestamp} | {nivel:<12} | {modulo} | {mensagem}{extras}"
+        log_line = (f"{self._timestamp(record.created)} | {self._nivel(record.levelname)} | "
+                    f"{self._modulo(record.name)} | {mensagem}{extras}")
         
-        # Adicionar exceção se existir
+        # Adicionar exceção se existir (já formatada quando o registro passou pela fila)
         if record.exc_info:
             log_line += f"\n{self.formatException(record.exc_info)}"
+        elif record.exc_text:
+            log_line += f"\n{record.exc_text}"
         
         return log_line
 
 
-class DatabaseLogHandler(logging.Handler):
-    """Handler personalizado para salvar logs no banco de dados"""
+# Atributos de todo LogRecord; os demais vieram de `extra=` e entram no JSON
+_ATRIBUTOS_REGISTRO = frozenset(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class FormatadorJSON(logging.Formatter):
+    """
+    Um objeto JSON por linha, para coleta por ferramentas de log
     
-    def __init__(self, db_manager=None):
+    Campos fixos: ts (UTC, ISO 8601 com milissegundos), nivel, logger e msg;
+    `exc` com o traceback e qualquer atributo passado em `extra=`.
+    """
+    
+    def __init__(self):
         super().__init__()
-        self.db_manager = db_manager
-        self.buffer = []  # Buffer para logs quando DB não está disponível
-        self.max_buffer = 100
+        self._segundo = (None, '')
     
-    def emit(self, record: logging.LogRecord):
-        """Emite log para o banco de dados"""
-        try:
-            if self.db_manager:
-                # Tentar salvar no banco
-                self._salvar_no_banco(record)
-                
-                # Processar buffer se existir
-                if self.buffer:
-                    self._processar_buffer()
-            else:
-                # Adicionar ao buffer
-                self._adicionar_ao_buffer(record)
-                
-        except Exception:
-            # Em caso de erro, adicionar ao buffer
-            self._adicionar_ao_buffer(record)
-    
-    def _salvar_no_banco(self, record: logging.LogRecord):
-        """Salva log no banco de dados (implementação futura)"""
-        # TODO: Implementar salvamento assíncrono no banco
-        pass
-    
-    def _adicionar_ao_buffer(self, record: logging.LogRecord):
-        """Adiciona log ao buffer"""
-        if len(self.buffer) >= self.max_buffer:
-            self.buffer.pop(0)  # Remove o mais antigo
-        
-        self.buffer.append({
+    def _timestamp(self, criado: float) -> str:
+        segundo, texto = self._segundo
+        if int(criado) != segundo:
+            texto = time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(int(criado)))
+            self._segundo = (int(criado), texto)
+        return f"{texto}.{int(criado * 1000) % 1000:03d}Z"
+    
+    def format(self, record: logging.LogRecord) -> str:
+        dados = {
+            'ts': self._timestamp(record.created),
             'nivel': record.levelname,
-            'modulo': record.name,
-            'mensagem': record.getMessage(),
-            'timestamp': datetime.fromtimestamp(record.created),
-            'dados_extras': getattr(record, 'extra_info', None)
-        })
-    
-    def _processar_buffer(self):
-        """Processa logs em buffer"""
-        for log_entry in self.buffer:
-            try:
-                # TODO: Salvar no banco
-                pass
-            except Exception:
-                break  # Para de processar se houver erro
+            'logger': record.name,
+            'msg': record.getMessage()
+        }
+        for chave, valor in record.__dict__.items():
+            if chave not in _ATRIBUTOS_REGISTRO:
+                dados[chave] = valor
+        if record.exc_info:
+            dados['exc'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            dados['exc'] = record.exc_text
+        return to_json(dados, fallback=str).decode('utf-8')
+
+
+class HandlerFila(logging.handlers.QueueHandler):
+    """
+    Entrega os registros ao `QueueListener` que escreve no console e no arquivo
+    
+    Na thread de quem registra só acontece a interpolação dos argumentos (e a
+    formatação de tracebacks, que não podem atravessar threads); data, cores
+    e JSON ficam com a thread do listener.
+    """
+    
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = _FORMATADOR_EXCECOES.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+_FORMATADOR_EXCECOES = logging.Formatter()
+
+
+class OuvinteLogs(logging.handlers.QueueListener):
+    """QueueListener que avisa no console e no arquivo quando a fila descartou registros"""
+    
+    def __init__(self, fila: 'FilaLogs', *handlers: logging.Handler):
+        super().__init__(fila, *handlers, respect_handler_level=True)
+        self._descartados = 0
+    
+    def handle(self, record: logging.LogRecord):
+        descartados = self.queue.descartados
+        if descartados != self._descartados:
+            aviso = logging.makeLogRecord({
+                'name': __name__, 'levelno': logging.WARNING, 'levelname': 'WARNING',
+                'msg': f"⚠️ {descartados - self._descartados} registros de log descartados (fila cheia)"
+            })
+            self._descartados = descartados
+            super().handle(aviso)
+        super().handle(record)
+
+# Formatos de saída de configurar_logger
+FORMATOS_LOG = ('texto', 'json')
+
+# Pacotes da aplicação (os módulos registram em logging.getLogger(__name__))
+PACOTES_APLICACAO = ('bot', 'database', 'utils')
+
+# Registros mantidos na fila enquanto o banco não os grava
+LIMITE_FILA_LOGS = 10000
+
+# Registros por INSERT e espera máxima para completar um lote (segundos)
+TAMANHO_LOTE_LOGS = 200
+INTERVALO_LOTE_LOGS = 2.0
+
+# Espera pela gravação de um lote antes de considerá-lo perdido (segundos)
+TIMEOUT_GRAVACAO_LOGS = 30.0
+
+_NIVEIS_BANCO = ('DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL')
+
+# Encerra o gravador de logs (colocado na fila por `parar`)
+_FIM = None
+
+
+class FilaLogs(queue.Queue):
+    """
+    Fila limitada que descarta o registro mais antigo quando cheia
+    
+    `put` nunca bloqueia quem registra o log; os descartes são contados.
+    """
+    
+    def __init__(self, limite: int = LIMITE_FILA_LOGS):
+        super().__init__()
+        self.limite = limite
+        self.descartados = 0
+    
+    def _put(self, item):
+        if len(self.queue) >= self.limite:
+            self.queue.popleft()
+            self.descartados += 1
+        self.queue.append(item)
+
+
+def _dados_extras(registro: logging.LogRecord) -> Optional[Dict[str, str]]:
+    """Contexto e trace do registro para a coluna dados_extras"""
+    dados = {chave: getattr(registro, chave) for chave in ('extra_info', 'trace_id', 'span_id')
+             if hasattr(registro, chave)}
+    return dados or None
+
+
+class GravadorLogsEmLote:
+    """
+    Consumidor da fila de logs: grava em `logs_sistema` um lote por vez
+    
+    Executa em thread própria; cada lote é gravado pelo `registrar_logs` do
+    armazenamento, agendado no event loop do bot, e a thread espera o
+    resultado. Um lote fecha com `tamanho_lote` registros ou depois de
+    `intervalo` segundos do primeiro.
+    """
+    
+    def __init__(self, fila: FilaLogs, db_manager, loop: asyncio.AbstractEventLoop,
+                 tamanho_lote: int = TAMANHO_LOTE_LOGS,
+                 intervalo: float = INTERVALO_LOTE_LOGS):
+        self.fila = fila
+        self.db_manager = db_manager
+        self.loop = loop
+        self.tamanho_lote = tamanho_lote
+        self.intervalo = intervalo
+        self.gravados = 0
+        self.perdidos = 0
+        self.lotes = 0
+        self._descartes_registrados = 0
+        self._thread: Optional[threading.Thread] = None
+    
+    def iniciar(self):
+        self._thread = threading.Thread(target=self._executar, name="gravador-logs", daemon=True)
+        self._thread.start()
+    
+    def parar(self):
+        """Grava o que restou na fila e encerra a thread (bloqueia até terminar)"""
+        if self._thread is None:
+            return
+        self.fila.put_nowait(_FIM)
+        self._thread.join()
+        self._thread = None
+    
+    def _executar(self):
+        encerrar = False
+        while not encerrar:
+            lote = []
+            item = self.fila.get()
+            limite = time.monotonic() + self.intervalo
+            while item is not _FIM:
+                lote.append(item)
+                if len(lote) >= self.tamanho_lote:
+                    break
+                try:
+                    item = self.fila.get(timeout=max(0.0, limite - time.monotonic()))
+                except queue.Empty:
+                    break
+            encerrar = item is _FIM
+            if encerrar:
+                # Esvazia o que chegou antes do pedido de parada
+                while True:
+                    try:
+                        restante = self.fila.get_nowait()
+                    except queue.Empty:
+                        break
+                    if restante is not _FIM:
+                        lote.append(restante)
+            self._gravar(lote)
+    
+    def _gravar(self, registros: List[logging.LogRecord]):
+        # Importação tardia: o módulo também é executado isolado (teste abaixo)
+        from database.models import LogSistema
+        
+        logs = [
+            LogSistema(
+                nivel=registro.levelname if registro.levelname in _NIVEIS_BANCO else 'WARNING',
+                modulo=registro.name,
+                mensagem=registro.getMessage(),
+                timestamp=datetime.fromtimestamp(registro.created, timezone.utc).replace(tzinfo=None),
+                dados_extras=_dados_extras(registro)
+            )
+            for registro in registros
+        ]
+        descartados = self.fila.descartados - self._descartes_registrados
+        if descartados:
+            self._descartes_registrados += descartados
+            logs.append(LogSistema(
+                nivel='WARNING', modulo=__name__,
+                mensagem=f"⚠️ {descartados} registros de log descartados (fila cheia)",
+                dados_extras={'descartados': descartados, 'total_descartados': self.fila.descartados}
+            ))
+        if not logs:
+            return
         
-        # Limpar buffer processado
-        self.buffer.clear()
+        try:
+            futuro = asyncio.run_coroutine_threadsafe(self.db_manager.registrar_logs(logs), self.loop)
+            gravados = futuro.result(timeout=TIMEOUT_GRAVACAO_LOGS)
+        except Exception:
+            # Loop encerrado ou banco indisponível: o lote é perdido, não reenfileirado
+            gravados = 0
+        self.lotes += 1
+        self.gravados += gravados
+        self.perdidos += len(logs) - gravados
+
+
+class DatabaseLogHandler(logging.handlers.QueueHandler):
+    """
+    Handler que envia logs para `logs_sistema` sem bloquear quem registra
+    
+    `emit` só formata o registro e o coloca em uma fila limitada (os mais
+    antigos são descartados quando ela enche); um `GravadorLogsEmLote`
+    grava a fila no banco em lotes. Antes de `set_db_manager`, a fila
+    guarda os registros do início da aplicação.
+    """
+    
+    def __init__(self, db_manager=None, limite: int = LIMITE_FILA_LOGS,
+                 tamanho_lote: int = TAMANHO_LOTE_LOGS,
+                 intervalo: float = INTERVALO_LOTE_LOGS):
+        super().__init__(FilaLogs(limite))
+        self.tamanho_lote = tamanho_lote
+        self.intervalo = intervalo
+        self.gravador: Optional[GravadorLogsEmLote] = None
+        if db_manager:
+            self.set_db_manager(db_manager)
     
     def set_db_manager(self, db_manager):
-        """Define o gerenciador de banco de dados"""
-        self.db_manager = db_manager
-        if self.buffer:
-            self._processar_buffer()
+        """
+        Começa a gravar no armazenamento `db_manager`
+        
+        Deve ser chamado de dentro do event loop que executa o armazenamento.
+        """
+        if self.gravador:
+            self.gravador.parar()
+        self.gravador = GravadorLogsEmLote(self.queue, db_manager, asyncio.get_running_loop(),
+                                           self.tamanho_lote, self.intervalo)
+        self.gravador.iniciar()
+    
+    async def finalizar(self):
+        """Grava os registros pendentes; chamar antes de fechar o armazenamento"""
+        if self.gravador:
+            # A thread agenda as últimas gravações neste loop: esperar fora dele
+            await asyncio.to_thread(self.gravador.parar)
+    
+    def estatisticas(self) -> Dict[str, int]:
+        """Contadores da fila e do gravador"""
+        gravador = self.gravador
+        return {
+            'pendentes': self.queue.qsize(),
+            'descartados': self.queue.descartados,
+            'gravados': gravador.gravados if gravador else 0,
+            'perdidos': gravador.perdidos if gravador else 0,
+            'lotes': gravador.lotes if gravador else 0
+        }
+
+
+_handler_banco: Optional[DatabaseLogHandler] = None
+
+
+def obter_handler_banco() -> DatabaseLogHandler:
+    """Handler de logs no banco compartilhado por todos os loggers configurados"""
+    global _handler_banco
+    if _handler_banco is None:
+        _handler_banco = DatabaseLogHandler()
+        _handler_banco.setLevel(logging.WARNING)  # Apenas warnings e erros no banco
+    return _handler_banco
+
+
+# Thread que escreve no console e no arquivo (criada por configurar_logger)
+_ouvinte: Optional[OuvinteLogs] = None
+
+
+def encerrar_logging():
+    """Escreve os registros ainda na fila e para a thread do console/arquivo"""
+    global _ouvinte
+    if _ouvinte is not None:
+        _ouvinte.stop()
+        for handler in _ouvinte.handlers:
+            handler.close()
+        _ouvinte = None
+
+
+atexit.register(encerrar_logging)
 
 
 def configurar_logger(nome: str = 'oraculo_concursos', 
@@ -151,10 +427,14 @@ def configurar_logger(nome: str = 'oraculo_concursos',
                      usar_cores: bool = True,
                      usar_emojis: bool = True,
                      rotacao_mb: int = 10,
-                     backup_count: int = 5) -> logging.Logger:
+                     backup_count: int = 5,
+                     formato: str = 'texto') -> logging.Logger:
     """
     Configura o sistema de logging do Oráculo de Concursos
     
+    Console e arquivo ficam atrás de uma fila: quem registra só interpola a
+    mensagem, e a formatação e a escrita acontecem em uma thread separada.
+    
     Args:
         nome: Nome do logger
         nivel: Nível de log (DEBUG, INFO, WARNING, ERROR, CRITICAL)
@@ -163,10 +443,16 @@ def configurar_logger(nome: str = 'oraculo_concursos',
         usar_emojis: Se deve usar emojis nos logs
         rotacao_mb: Tamanho máximo do arquivo em MB
         backup_count: Número de backups a manter
+        formato: 'texto' (legível) ou 'json' (um objeto por linha)
     
     Returns:
         Logger configurado
     """
+    global _ouvinte
+    
+    # Reconfiguração: esvazia a fila anterior antes de trocar os handlers
+    encerrar_logging()
+    
     # Criar logger principal
     logger = logging.getLogger(nome)
     
@@ -179,13 +465,18 @@ def configurar_logger(nome: str = 'oraculo_concursos',
     logger.setLevel(numeric_level)
     
     # Formatter personalizado
-    formatter = OraculoFormatter(usar_cores=usar_cores, usar_emojis=usar_emojis)
+    if formato == 'json':
+        formatter = file_formatter = FormatadorJSON()
+    else:
+        formatter = OraculoFormatter(usar_cores=usar_cores, usar_emojis=usar_emojis)
+        # Formatter sem cores para arquivo
+        file_formatter = OraculoFormatter(usar_cores=False, usar_emojis=usar_emojis)
     
     # Handler para console
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setLevel(numeric_level)
     console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
+    handlers = [console_handler]
     
     # Handler para arquivo (se especificado)
     if arquivo_log:
@@ -199,27 +490,39 @@ def configurar_logger(nome: str = 'oraculo_concursos',
             backupCount=backup_count,
             encoding='utf-8'
         )
-        
-        # Formatter sem cores para arquivo
-        file_formatter = OraculoFormatter(usar_cores=False, usar_emojis=usar_emojis)
         file_handler.setFormatter(file_formatter)
         file_handler.setLevel(numeric_level)
-        logger.addHandler(file_handler)
+        handlers.append(file_handler)
+    
+    # Console e arquivo são escritos pela thread do listener
+    fila = FilaLogs(LIMITE_FILA_LOGS)
+    _ouvinte = OuvinteLogs(fila, *handlers)
+    _ouvinte.start()
+    handler_fila = HandlerFila(fila)
+    logger.addHandler(handler_fila)
     
     # Handler para banco de dados
-    db_handler = DatabaseLogHandler()
-    db_handler.setLevel(logging.WARNING)  # Apenas warnings e erros no banco
+    db_handler = obter_handler_banco()
     logger.addHandler(db_handler)
     
+    # Os módulos da aplicação usam logging.getLogger(__name__): seus avisos
+    # também vão para o banco e, como antes, para o console
+    for pacote in PACOTES_APLICACAO:
+        logger_pacote = logging.getLogger(pacote)
+        for handler in logger_pacote.handlers[:]:
+            logger_pacote.removeHandler(handler)
+        logger_pacote.addHandler(handler_fila)
+        logger_pacote.addHandler(db_handler)
+    
     # Evitar propagação para o logger raiz
     logger.propagate = False
     
     # Log de inicialização
     logger.info("🚀 Sistema de logging inicializado")
-    logger.info(f"📊 Nível de log configurado: {nivel}")
+    logger.info("📊 Nível de log configurado: %s (formato %s)", nivel, formato)
     
     if arquivo_log:
-        logger.info(f"📁 Logs salvos em: {arquivo_log}")
+        logger.info("📁 Logs salvos em: %s", arquivo_log)
     
     return logger
 
@@ -237,27 +540,54 @@ def obter_logger(nome: str) -> logging.Logger:
     return logging.getLogger(f'oraculo_concursos.{nome}')
 
 
+# Contexto extra (log_com_contexto) da tarefa atual
+_contexto_log: ContextVar[Optional[str]] = ContextVar('oraculo_contexto_log', default=None)
+
+
+def _instalar_fabrica_registros():
+    """
+    Fábrica de LogRecord que copia o contexto e o trace da tarefa atual
+    
+    Instalada uma vez; o valor vem de ContextVars, então registros de
+    menções concorrentes levam cada um o seu contexto.
+    """
+    anterior = logging.getLogRecordFactory()
+    if getattr(anterior, 'oraculo', False):
+        return
+    
+    def fabrica(*args, **kwargs):
+        record = anterior(*args, **kwargs)
+        contexto = _contexto_log.get()
+        if contexto is not None:
+            record.extra_info = contexto
+        span = span_atual()
+        if span.trace_id is not None:
+            record.trace_id = span.trace_id
+            record.span_id = span.span_id
+        return record
+    
+    fabrica.oraculo = True
+    logging.setLogRecordFactory(fabrica)
+
+
+_instalar_fabrica_registros()
+
+
 class LogContextManager:
     """Context manager para adicionar informações extras aos logs"""
     
     def __init__(self, logger: logging.Logger, extra_info: str):
         self.logger = logger
         self.extra_info = extra_info
-        self.old_factory = None
+        self._token = None
     
     def __enter__(self):
-        self.old_factory = logging.getLogRecordFactory()
-        
-        def record_factory(*args, **kwargs):
-            record = self.old_factory(*args, **kwargs)
-            record.extra_info = self.extra_info
-            return record
-        
-        logging.setLogRecordFactory(record_factory)
+        # Só o contexto da tarefa atual muda (não a fábrica global de registros)
+        self._token = _contexto_log.set(self.extra_info)
         return self.logger
     
     def __exit__(self, exc_type, exc_val, exc_tb):
-        logging.setLogRecordFactory(self.old_factory)
+        _contexto_log.reset(self._token)
 
 
 def log_com_contexto(logger: logging.Logger, contexto: str):
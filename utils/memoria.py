@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Memória do Oráculo de Concursos
+Tamanho das estruturas que vivem o processo inteiro, RSS e diferenças entre
+snapshots do tracemalloc, para ver o crescimento bem antes de faltar memória
+
+Cada estrutura é registrada com o objeto dono e o nome do atributo (o dono
+fica em uma referência fraca e o atributo é lido a cada medição, então
+buffers recriados continuam medidos). A estimativa de bytes percorre uma
+amostra de até AMOSTRA_ITENS itens e extrapola para o total; as medições
+rodam no event loop, onde as estruturas são alteradas.
+
+O tracemalloc é opcional (deixa cada alocação mais lenta): com ele ativo,
+cada amostragem compara um snapshot com o anterior e guarda os locais que
+mais cresceram.
+"""
+
+import asyncio
+import gc
+import logging
+import queue
+import resource
+import sys
+import time
+import tracemalloc
+import weakref
+from collections import deque
+from itertools import islice
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from utils.metricas import obter_registro
+
+
+# Itens medidos por estrutura (o resto é extrapolado)
+AMOSTRA_ITENS = 200
+
+# Profundidade máxima percorrida dentro de cada item
+PROFUNDIDADE_MAXIMA = 6
+
+# Medições guardadas por estrutura para a tendência (a 5 min: 24 h)
+HISTORICO_MEDICOES = 288
+
+# Locais listados na diferença entre snapshots do tracemalloc
+TOP_TRACEMALLOC = 15
+
+_metricas = obter_registro()
+ITENS_ESTRUTURAS = _metricas.medidor(
+    'oraculo_memoria_estrutura_itens', 'Itens em cada estrutura registrada', ('estrutura',)
+)
+BYTES_ESTRUTURAS = _metricas.medidor(
+    'oraculo_memoria_estrutura_bytes', 'Estimativa de bytes de cada estrutura registrada', ('estrutura',)
+)
+RSS = _metricas.medidor('oraculo_memoria_rss_bytes', 'Memória residente do processo')
+TRACEMALLOC_BYTES = _metricas.medidor(
+    'oraculo_memoria_tracemalloc_bytes', 'Memória alocada rastreada pelo tracemalloc'
+)
+TRACEMALLOC_CRESCIMENTO = _metricas.medidor(
+    'oraculo_memoria_tracemalloc_crescimento_bytes',
+    'Soma do crescimento dos principais locais entre os dois últimos snapshots'
+)
+
+logger = logging.getLogger(__name__)
+
+# Tipos sem referências para outros objetos (o getsizeof já é o total)
+_ATOMICOS = (str, bytes, bytearray, int, float, bool, complex, type(None), datetime)
+
+
+def rss_bytes() -> int:
+    """Memória residente atual (Linux); fora dele, o pico informado pelo getrusage"""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * resource.getpagesize()
+    except (OSError, ValueError, IndexError):
+        pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return pico if sys.platform == 'darwin' else pico * 1024
+
+
+def tamanho_profundo(objeto: Any, vistos: Optional[set] = None, profundidade: int = 0) -> int:
+    """Bytes de `objeto` e do que ele referencia (cada objeto contado uma vez)"""
+    if vistos is None:
+        vistos = set()
+    if id(objeto) in vistos:
+        return 0
+    vistos.add(id(objeto))
+    tamanho = sys.getsizeof(objeto)
+    if isinstance(objeto, _ATOMICOS) or profundidade >= PROFUNDIDADE_MAXIMA:
+        return tamanho
+    proximo = profundidade + 1
+    if isinstance(objeto, dict):
+        for chave, valor in objeto.items():
+            tamanho += tamanho_profundo(chave, vistos, proximo) + tamanho_profundo(valor, vistos, proximo)
+    elif isinstance(objeto, (list, tuple, set, frozenset, deque)):
+        for item in objeto:
+            tamanho += tamanho_profundo(item, vistos, proximo)
+    else:
+        atributos = getattr(objeto, '__dict__', None)
+        if atributos is not None:
+            tamanho += tamanho_profundo(atributos, vistos, proximo)
+        for classe in type(objeto).__mro__:
+            for nome in getattr(classe, '__slots__', ()):
+                valor = getattr(objeto, nome, None)
+                if valor is not None:
+                    tamanho += tamanho_profundo(valor, vistos, proximo)
+    return tamanho
+
+
+def _amostra(conteudo: Any) -> Tuple[int, list]:
+    """Total de itens e uma amostra espaçada (pares chave/valor em dicionários)"""
+    total = len(conteudo)
+    passo = max(1, total // AMOSTRA_ITENS)
+    itens = conteudo.items() if isinstance(conteudo, dict) else conteudo
+    return total, list(islice(itens, 0, None, passo))
+
+
+def estimar_estrutura(estrutura: Any) -> Tuple[int, int]:
+    """(itens, bytes estimados) de um contêiner, medindo uma amostra dos itens"""
+    if isinstance(estrutura, queue.Queue):
+        # Filas recebem itens de outras threads: a amostra é copiada sob o lock delas
+        conteudo = estrutura.queue
+        with estrutura.mutex:
+            total, amostra = _amostra(conteudo)
+    else:
+        conteudo = estrutura
+        total, amostra = _amostra(conteudo)
+    base = sys.getsizeof(conteudo)
+    if not total:
+        return 0, base
+    vistos = {id(conteudo)}
+    if isinstance(conteudo, dict):
+        medidos = sum(tamanho_profundo(chave, vistos) + tamanho_profundo(valor, vistos)
+                      for chave, valor in amostra)
+    else:
+        medidos = sum(tamanho_profundo(item, vistos) for item in amostra)
+    return total, base + int(medidos * total / len(amostra))
+
+
+class _Estrutura:
+    """Estrutura registrada: dono (referência fraca), atributo e histórico"""
+
+    __slots__ = ('dono', 'atributo', 'historico')
+
+    def __init__(self, dono: Any, atributo: str):
+        self.dono = weakref.ref(dono)
+        self.atributo = atributo
+        # (momento, itens, bytes)
+        self.historico: Deque[Tuple[float, int, int]] = deque(maxlen=HISTORICO_MEDICOES)
+
+    def tendencia(self) -> Optional[Tuple[float, float]]:
+        """Crescimento por hora (itens, bytes) entre a primeira e a última medição"""
+        if len(self.historico) < 2:
+            return None
+        (inicio, itens_inicio, bytes_inicio), (fim, itens_fim, bytes_fim) = self.historico[0], self.historico[-1]
+        horas = (fim - inicio) / 3600
+        if horas <= 0:
+            return None
+        return (itens_fim - itens_inicio) / horas, (bytes_fim - bytes_inicio) / horas
+
+
+class MonitorMemoria:
+    """Estruturas registradas, RSS e diferenças do tracemalloc"""
+
+    def __init__(self):
+        self.estruturas: Dict[str, _Estrutura] = {}
+        self.ultima_medicao: Dict[str, Dict[str, Any]] = {}
+        self.diferencas: List[Dict[str, Any]] = []
+        self.momento_diferencas: Optional[datetime] = None
+        self._snapshot: Optional[tracemalloc.Snapshot] = None
+
+    def registrar(self, nome: str, dono: Any, atributo: str):
+        """Mede `dono.<atributo>` como `nome` enquanto o dono existir"""
+        self.estruturas[nome] = _Estrutura(dono, atributo)
+
+    def iniciar_tracemalloc(self, quadros: int):
+        """Ativa o tracemalloc guardando `quadros` níveis de pilha por alocação (0 não ativa)"""
+        if quadros > 0 and not tracemalloc.is_tracing():
+            tracemalloc.start(quadros)
+            logger.info("🧠 tracemalloc ativo (%d quadros por alocação)", quadros)
+
+    def medir(self) -> Dict[str, Dict[str, Any]]:
+        """Mede as estruturas e o RSS e atualiza as métricas (chamar no event loop)"""
+        agora = time.time()
+        medicao = {}
+        for nome, estrutura in list(self.estruturas.items()):
+            dono = estrutura.dono()
+            if dono is None:
+                # Dono coletado: a estrutura deixa de existir
+                del self.estruturas[nome]
+                ITENS_ESTRUTURAS.remover(nome)
+                BYTES_ESTRUTURAS.remover(nome)
+                continue
+            try:
+                itens, tamanho = estimar_estrutura(getattr(dono, estrutura.atributo))
+            except Exception as e:
+                logger.warning(f"⚠️ Erro ao medir {nome}: {e}")
+                continue
+            estrutura.historico.append((agora, itens, tamanho))
+            ITENS_ESTRUTURAS.com(nome).definir(itens)
+            BYTES_ESTRUTURAS.com(nome).definir(tamanho)
+            tendencia = estrutura.tendencia()
+            medicao[nome] = {
+                'itens': itens,
+                'bytes': tamanho,
+                'itens_por_hora': round(tendencia[0], 1) if tendencia else None,
+                'bytes_por_hora': round(tendencia[1]) if tendencia else None
+            }
+        RSS.definir(rss_bytes())
+        if tracemalloc.is_tracing():
+            TRACEMALLOC_BYTES.definir(tracemalloc.get_traced_memory()[0])
+        self.ultima_medicao = medicao
+        return medicao
+
+    def comparar_snapshots(self, top: int = TOP_TRACEMALLOC) -> List[Dict[str, Any]]:
+        """
+        Snapshot do tracemalloc comparado ao anterior: locais que mais cresceram
+
+        Bloqueia enquanto copia os rastros (chamar em uma thread); vazio sem
+        tracemalloc ou na primeira chamada.
+        """
+        if not tracemalloc.is_tracing():
+            return []
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+        ))
+        anterior, self._snapshot = self._snapshot, snapshot
+        if anterior is None:
+            return []
+        diferencas = [
+            {'local': f"{estatistica.traceback[0].filename}:{estatistica.traceback[0].lineno}",
+             'crescimento_bytes': estatistica.size_diff, 'bytes': estatistica.size,
+             'blocos': estatistica.count, 'crescimento_blocos': estatistica.count_diff}
+            for estatistica in snapshot.compare_to(anterior, 'lineno')[:top]
+            if estatistica.size_diff > 0
+        ]
+        self.diferencas = diferencas
+        self.momento_diferencas = datetime.now()
+        TRACEMALLOC_CRESCIMENTO.definir(sum(item['crescimento_bytes'] for item in diferencas))
+        return diferencas
+
+    async def amostrar(self):
+        """Rotina periódica: estruturas no loop, snapshot do tracemalloc em uma thread"""
+        self.medir()
+        if tracemalloc.is_tracing():
+            diferencas = await asyncio.to_thread(self.comparar_snapshots)
+            if diferencas:
+                logger.info("🧠 Maior crescimento desde o último snapshot: %s",
+                            ', '.join(f"{item['local']} +{item['crescimento_bytes'] / 1024:.0f} KB"
+                                      for item in diferencas[:3]))
+
+    def relatorio(self) -> str:
+        """Texto com RSS, estruturas, tendências e o último top do tracemalloc"""
+        medicao = self.ultima_medicao or self.medir()
+        linhas = [f"RSS: {rss_bytes() / 1024 / 1024:.1f} MB | objetos rastreados pelo gc: {len(gc.get_objects())}"]
+        if tracemalloc.is_tracing():
+            atual, pico = tracemalloc.get_traced_memory()
+            linhas.append(f"tracemalloc: {atual / 1024 / 1024:.1f} MB (pico {pico / 1024 / 1024:.1f} MB)")
+        linhas += ["", f"{'estrutura':<28} {'itens':>9} {'KB':>10} {'itens/h':>9} {'KB/h':>9}"]
+        for nome, dados in sorted(medicao.items(), key=lambda item: -item[1]['bytes']):
+            itens_hora = '-' if dados['itens_por_hora'] is None else f"{dados['itens_por_hora']:+.0f}"
+            kb_hora = '-' if dados['bytes_por_hora'] is None else f"{dados['bytes_por_hora'] / 1024:+.1f}"
+            linhas.append(f"{nome:<28} {dados['itens']:>9} {dados['bytes'] / 1024:>10.1f} "
+                          f"{itens_hora:>9} {kb_hora:>9}")
+        if self.diferencas:
+            linhas += ["", f"tracemalloc: maior crescimento entre os dois últimos snapshots "
+                           f"({self.momento_diferencas:%Y-%m-%d %H:%M:%S})"]
+            for item in self.diferencas:
+                linhas.append(f"  {item['crescimento_bytes'] / 1024:+10.1f} KB "
+                              f"({item['crescimento_blocos']:+d} blocos)  {item['local']}")
+        return '\n'.join(linhas) + '\n'
+
+
+_monitor: Optional[MonitorMemoria] = None
+
+
+def obter_monitor_memoria() -> MonitorMemoria:
+    """Monitor de memória global da aplicação"""
+    global _monitor
+    if _monitor is None:
+        _monitor = MonitorMemoria()
+    return _monitor
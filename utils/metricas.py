@@ -0,0 +1,394 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Métricas do Oráculo de Concursos
+Contadores, medidores e histogramas em memória, exportados no formato de
+texto do Prometheus por um endpoint HTTP local
+"""
+
+import asyncio
+import logging
+import math
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+
+# Limites (segundos) dos histogramas de latência: de 1 ms a 1 min
+LIMITES_LATENCIA = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                    1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Intervalo (segundos) entre duas amostras do atraso do event loop
+INTERVALO_ATRASO_LOOP = 0.5
+
+TIPO_CONTEUDO = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escapar(valor: str) -> str:
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _numero(valor: float) -> str:
+    if valor == math.inf:
+        return '+Inf'
+    if isinstance(valor, int) or float(valor).is_integer():
+        return str(int(valor))
+    return repr(float(valor))
+
+
+class _Serie:
+    """Um valor de uma métrica (uma combinação de rótulos)"""
+
+    __slots__ = ('valor', 'funcao')
+
+    def __init__(self):
+        self.valor = 0.0
+        self.funcao: Optional[Callable[[], float]] = None
+
+    def incrementar(self, quantidade: float = 1):
+        self.valor += quantidade
+
+    def decrementar(self, quantidade: float = 1):
+        self.valor -= quantidade
+
+    def definir(self, valor: float):
+        self.valor = valor
+
+    def definir_funcao(self, funcao: Callable[[], float]):
+        """Valor calculado na coleta (tamanho de fila, de cache...)"""
+        self.funcao = funcao
+
+    def ler(self) -> float:
+        return self.funcao() if self.funcao else self.valor
+
+
+class _Cronometro:
+    """Context manager que observa a duração do bloco (mais barato que @contextmanager)"""
+
+    __slots__ = ('serie', 'inicio', 'duracao')
+
+    def __init__(self, serie: '_SerieHistograma'):
+        self.serie = serie
+        self.duracao = 0.0
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *excecao):
+        # Fica disponível para quem também precisa do valor (`with ... as cronometro`)
+        self.duracao = time.perf_counter() - self.inicio
+        self.serie.observar(self.duracao)
+        return False
+
+
+class _SerieHistograma:
+    """Contagens por faixa, soma e total de um histograma"""
+
+    __slots__ = ('limites', 'contagens', 'soma')
+
+    def __init__(self, limites: Tuple[float, ...]):
+        self.limites = limites
+        self.contagens = [0] * (len(limites) + 1)
+        self.soma = 0.0
+
+    def observar(self, valor: float):
+        self.contagens[bisect_left(self.limites, valor)] += 1
+        self.soma += valor
+
+    def medir(self) -> _Cronometro:
+        """Observa a duração do bloco (segundos)"""
+        return _Cronometro(self)
+
+
+class Metrica:
+    """
+    Métrica com rótulos opcionais
+
+    As séries são criadas no primeiro uso de cada combinação de rótulos
+    (`com(...)`) e atualizadas sem lock: todas as atualizações acontecem na
+    thread do event loop, e uma coleta concorrente no pior caso lê um valor
+    de uma amostra atrás.
+    """
+
+    tipo = 'untyped'
+
+    def __init__(self, nome: str, ajuda: str, rotulos: Sequence[str] = ()):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.rotulos = tuple(rotulos)
+        self._series: Dict[Tuple[str, ...], object] = {}
+        # Métrica sem rótulos: uma série única, usada pelos atalhos abaixo
+        self._unica = self.com() if not self.rotulos else None
+
+    def _nova_serie(self):
+        return _Serie()
+
+    def com(self, *valores: str, **rotulos: str):
+        """Série de uma combinação de rótulos (posicionais ou nomeados)"""
+        chave = valores if valores else tuple(str(rotulos[nome]) for nome in self.rotulos)
+        serie = self._series.get(chave)
+        if serie is None:
+            if len(chave) != len(self.rotulos):
+                raise ValueError(f"{self.nome}: rótulos esperados {self.rotulos}")
+            serie = self._series.setdefault(tuple(str(valor) for valor in chave), self._nova_serie())
+        return serie
+
+    def remover(self, *valores: str):
+        """Deixa de exportar a série de uma combinação de rótulos"""
+        self._series.pop(tuple(str(valor) for valor in valores), None)
+
+    def _rotulos_texto(self, chave: Tuple[str, ...], extra: str = '') -> str:
+        pares = [f'{nome}="{_escapar(valor)}"' for nome, valor in zip(self.rotulos, chave)]
+        if extra:
+            pares.append(extra)
+        return '{' + ','.join(pares) + '}' if pares else ''
+
+    def exportar(self) -> List[str]:
+        linhas = [f"# HELP {self.nome} {self.ajuda}", f"# TYPE {self.nome} {self.tipo}"]
+        for chave, serie in list(self._series.items()):
+            try:
+                valor = serie.ler()
+            except Exception:
+                continue
+            linhas.append(f"{self.nome}{self._rotulos_texto(chave)} {_numero(valor)}")
+        return linhas
+
+
+class Contador(Metrica):
+    """Valor que só cresce (eventos, tokens...)"""
+
+    tipo = 'counter'
+
+    def incrementar(self, quantidade: float = 1):
+        self._unica.valor += quantidade
+
+    @property
+    def valor(self) -> float:
+        return self._unica.valor
+
+
+class Medidor(Metrica):
+    """Valor que sobe e desce, definido diretamente ou calculado na coleta"""
+
+    tipo = 'gauge'
+
+    def definir(self, valor: float):
+        self._unica.valor = valor
+
+    def incrementar(self, quantidade: float = 1):
+        self._unica.valor += quantidade
+
+    def decrementar(self, quantidade: float = 1):
+        self._unica.valor -= quantidade
+
+    def definir_funcao(self, funcao: Callable[[], float]):
+        self._unica.funcao = funcao
+
+
+class Histograma(Metrica):
+    """Distribuição de valores em faixas fixas (latências, tamanhos)"""
+
+    tipo = 'histogram'
+
+    def __init__(self, nome: str, ajuda: str, rotulos: Sequence[str] = (),
+                 limites: Sequence[float] = LIMITES_LATENCIA):
+        self.limites = tuple(sorted(limites))
+        super().__init__(nome, ajuda, rotulos)
+
+    def _nova_serie(self):
+        return _SerieHistograma(self.limites)
+
+    def observar(self, valor: float):
+        self._unica.observar(valor)
+
+    def medir(self) -> _Cronometro:
+        return self._unica.medir()
+
+    def exportar(self) -> List[str]:
+        linhas = [f"# HELP {self.nome} {self.ajuda}", f"# TYPE {self.nome} {self.tipo}"]
+        for chave, serie in list(self._series.items()):
+            contagens = list(serie.contagens)
+            acumulado = 0
+            for limite, contagem in zip(self.limites + (math.inf,), contagens):
+                acumulado += contagem
+                rotulos = self._rotulos_texto(chave, f'le="{_numero(limite)}"')
+                linhas.append(f"{self.nome}_bucket{rotulos} {acumulado}")
+            rotulos = self._rotulos_texto(chave)
+            linhas.append(f"{self.nome}_sum{rotulos} {_numero(serie.soma)}")
+            linhas.append(f"{self.nome}_count{rotulos} {acumulado}")
+        return linhas
+
+
+class RegistroMetricas:
+    """Conjunto de métricas da aplicação; registrar de novo um nome devolve a existente"""
+
+    def __init__(self):
+        self._metricas: Dict[str, Metrica] = {}
+
+    def _registrar(self, classe, nome: str, *args, **kwargs):
+        metrica = self._metricas.get(nome)
+        if metrica is None:
+            metrica = self._metricas.setdefault(nome, classe(nome, *args, **kwargs))
+        if not isinstance(metrica, classe):
+            raise ValueError(f"Métrica {nome} já registrada como {metrica.tipo}")
+        return metrica
+
+    def contador(self, nome: str, ajuda: str, rotulos: Sequence[str] = ()) -> Contador:
+        return self._registrar(Contador, nome, ajuda, rotulos)
+
+    def medidor(self, nome: str, ajuda: str, rotulos: Sequence[str] = ()) -> Medidor:
+        return self._registrar(Medidor, nome, ajuda, rotulos)
+
+    def histograma(self, nome: str, ajuda: str, rotulos: Sequence[str] = (),
+                   limites: Sequence[float] = LIMITES_LATENCIA) -> Histograma:
+        return self._registrar(Histograma, nome, ajuda, rotulos, limites)
+
+    def exportar(self) -> str:
+        """Todas as métricas no formato de texto do Prometheus"""
+        linhas = []
+        for metrica in list(self._metricas.values()):
+            linhas.extend(metrica.exportar())
+        return '\n'.join(linhas) + '\n'
+
+
+# Registro global da aplicação
+_registro: Optional[RegistroMetricas] = None
+
+
+def obter_registro() -> RegistroMetricas:
+    """Obtém o registro global de métricas"""
+    global _registro
+    if _registro is None:
+        _registro = RegistroMetricas()
+    return _registro
+
+
+class FasesInicializacao:
+    """
+    Duração de cada fase da inicialização, até o gateway ficar pronto
+
+    Os tempos são contados a partir de `inicio` (o começo do processo, em
+    time.perf_counter()) e exportados como `oraculo_inicializacao_segundos`.
+    """
+
+    def __init__(self, inicio: Optional[float] = None,
+                 registro: Optional[RegistroMetricas] = None):
+        self.inicio = inicio if inicio is not None else time.perf_counter()
+        self.fases: Dict[str, float] = {}
+        self._medidor = (registro or obter_registro()).medidor(
+            'oraculo_inicializacao_segundos',
+            'Duração de cada fase da inicialização (total: até o gateway ficar pronto)',
+            ('fase',)
+        )
+
+    def registrar(self, fase: str, duracao: float):
+        self.fases[fase] = duracao
+        self._medidor.com(fase).definir(duracao)
+
+    @contextmanager
+    def fase(self, nome: str) -> Iterator[None]:
+        """Mede o bloco como a fase `nome`"""
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.registrar(nome, time.perf_counter() - inicio)
+
+    def decorrido(self) -> float:
+        return time.perf_counter() - self.inicio
+
+    def concluir(self) -> float:
+        """Registra o total (chamar quando o gateway estiver pronto)"""
+        total = self.decorrido()
+        self.registrar('total', total)
+        return total
+
+    def resumo(self) -> str:
+        return ' | '.join(f"{fase} {duracao:.2f}s" for fase, duracao in self.fases.items())
+
+
+async def monitorar_atraso_loop(histograma: Histograma,
+                                intervalo: float = INTERVALO_ATRASO_LOOP,
+                                batida: Optional[Callable[[float], None]] = None):
+    """
+    Observa quanto um sleep de `intervalo` atrasa (tempo em que o loop esteve ocupado)
+
+    `batida`, se informada, recebe cada atraso medido (ver utils.monitor_loop).
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        inicio = loop.time()
+        await asyncio.sleep(intervalo)
+        atraso = max(0.0, loop.time() - inicio - intervalo)
+        histograma.observar(atraso)
+        if batida is not None:
+            batida(atraso)
+
+
+class ServidorMetricas:
+    """
+    Endpoint HTTP mínimo para o Prometheus: GET /metrics
+
+    Atende no próprio event loop; a coleta só percorre os valores em memória.
+    Outras rotas de administração (texto puro) podem ser adicionadas com
+    `adicionar_rota`; recebem os parâmetros da query string e sinalizam
+    parâmetros inválidos com ValueError (400).
+    """
+
+    def __init__(self, registro: Optional[RegistroMetricas] = None,
+                 host: str = '127.0.0.1', porta: int = 9464):
+        self.registro = registro or obter_registro()
+        self.host = host
+        self.porta = porta
+        self.logger = logging.getLogger(__name__)
+        self._servidor: Optional[asyncio.base_events.Server] = None
+        self._rotas: Dict[str, Callable[[Dict[str, str]], Awaitable[str]]] = {}
+
+    def adicionar_rota(self, caminho: str, funcao: Callable[[Dict[str, str]], Awaitable[str]]):
+        """GET `caminho` responde com o texto devolvido por `funcao(parametros)`"""
+        self._rotas[caminho] = funcao
+
+    async def iniciar(self):
+        """Abre a porta (o atraso do event loop é medido pelo MonitorLoop)"""
+        self._servidor = await asyncio.start_server(self._atender, self.host, self.porta)
+        self.logger.info(f"📈 Métricas em http://{self.host}:{self.porta}/metrics")
+
+    async def parar(self):
+        if self._servidor:
+            self._servidor.close()
+            await self._servidor.wait_closed()
+            self._servidor = None
+
+    async def _atender(self, leitor: asyncio.StreamReader, escritor: asyncio.StreamWriter):
+        try:
+            requisicao = await asyncio.wait_for(leitor.readline(), timeout=5)
+            # Cabeçalhos: ignorados, lidos até a linha em branco
+            while (await asyncio.wait_for(leitor.readline(), timeout=5)).strip():
+                pass
+            partes = requisicao.decode('latin-1').split()
+            url = urlsplit(partes[1]) if len(partes) >= 2 and partes[0] == 'GET' else None
+            if url is not None and url.path in ('/', '/metrics'):
+                status, corpo = '200 OK', self.registro.exportar().encode('utf-8')
+            elif url is not None and url.path in self._rotas:
+                try:
+                    texto = await self._rotas[url.path](dict(parse_qsl(url.query)))
+                    status, corpo = '200 OK', texto.encode('utf-8')
+                except ValueError as e:
+                    status, corpo = '400 Bad Request', f"{e}\n".encode('utf-8')
+                except Exception as e:
+                    self.logger.error(f"❌ Erro em {url.path}: {e}")
+                    status, corpo = '500 Internal Server Error', f"{e}\n".encode('utf-8')
+            else:
+                status, corpo = '404 Not Found', b'use /metrics\n'
+            escritor.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: {TIPO_CONTEUDO}\r\n"
+                f"Content-Length: {len(corpo)}\r\nConnection: close\r\n\r\n".encode('latin-1') + corpo
+            )
+            await escritor.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            escritor.close()
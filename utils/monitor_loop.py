@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Saúde do event loop do Oráculo de Concursos
+Atraso de agendamento, pilha das chamadas que travam o loop e, em modo de
+depuração, E/S síncrona executada na thread do loop
+
+Uma tarefa no loop bate a cada INTERVALO_ATRASO_LOOP e observa o atraso da
+batida no histograma `oraculo_event_loop_atraso_segundos`. Uma thread vigia
+as batidas: quando uma atrasa mais que o limite, o loop está preso em alguma
+chamada, e a pilha da thread do loop naquele instante mostra qual. Como a
+vigia roda em outra thread, a pilha é lida durante o travamento, não depois.
+
+O modo de depuração (opcional, com custo) liga o modo debug do asyncio
+(callbacks lentos no log) e um audit hook que aponta abrir arquivos,
+dormir, criar processos e conectar sockets bloqueantes na thread do loop.
+"""
+
+import asyncio
+import logging
+import sys
+import sysconfig
+import threading
+import time
+import traceback
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from utils.metricas import INTERVALO_ATRASO_LOOP, monitorar_atraso_loop, obter_registro
+
+
+# Atraso (segundos) a partir do qual o loop é considerado travado
+LIMITE_TRAVAMENTO_PADRAO = 0.5
+
+# Quadros da pilha guardados por travamento
+PROFUNDIDADE_PILHA = 30
+
+# Eventos de auditoria que bloqueiam a thread que os executa
+EVENTOS_BLOQUEANTES = frozenset({
+    'open', 'time.sleep', 'subprocess.Popen', 'os.system', 'os.exec', 'os.posix_spawn',
+    'socket.connect', 'socket.getaddrinfo', 'socket.gethostbyname', 'sqlite3.connect',
+    'shutil.copyfile', 'shutil.rmtree', 'os.scandir', 'os.listdir'
+})
+
+_metricas = obter_registro()
+ATRASO_LOOP = _metricas.histograma(
+    'oraculo_event_loop_atraso_segundos',
+    'Atraso de um timer no event loop (tempo em que o loop ficou ocupado)'
+)
+TRAVAMENTOS = _metricas.contador(
+    'oraculo_event_loop_travamentos_total', 'Vezes em que o event loop ficou travado além do limite'
+)
+IO_SINCRONO = _metricas.contador(
+    'oraculo_event_loop_io_sincrono_total', 'E/S síncrona na thread do event loop (modo de depuração)',
+    ('evento',)
+)
+
+_ESTE_ARQUIVO = __file__
+_BIBLIOTECA_PADRAO = sysconfig.get_paths()['stdlib']
+_PACOTES = (sysconfig.get_paths()['purelib'], sysconfig.get_paths()['platlib'])
+
+
+def _externo(arquivo: str) -> bool:
+    """Quadro que não aponta o culpado: importlib, biblioteca padrão ou este módulo"""
+    return (arquivo.startswith('<') or arquivo == _ESTE_ARQUIVO
+            or (arquivo.startswith(_BIBLIOTECA_PADRAO) and not arquivo.startswith(_PACOTES)))
+
+
+def _local_chamada(quadro) -> str:
+    """
+    Quem pediu a operação: o primeiro quadro da aplicação ou de um pacote
+    (não da biblioteca padrão) ou, dentro de um import, a linha do import
+    mais externo (uma cascata de imports é um único local)
+    """
+    local = None
+    while quadro is not None:
+        arquivo = quadro.f_code.co_filename
+        if arquivo.startswith('<frozen importlib'):
+            local = None
+        elif local is None and not _externo(arquivo):
+            local = f"{Path(arquivo).name}:{quadro.f_lineno} ({quadro.f_code.co_qualname})"
+        quadro = quadro.f_back
+    return local or '?'
+
+
+class MonitorLoop:
+    """Atraso do event loop, travamentos com pilha e E/S síncrona no loop"""
+
+    def __init__(self, limite_travamento: float = LIMITE_TRAVAMENTO_PADRAO,
+                 intervalo: float = INTERVALO_ATRASO_LOOP, depuracao: bool = False):
+        self.limite_travamento = limite_travamento
+        self.intervalo = intervalo
+        self.depuracao = depuracao
+        self.logger = logging.getLogger(__name__)
+        self.travamentos = 0
+        self.ultimo_travamento: Optional[Dict[str, Any]] = None
+        self._ultima_batida = 0.0
+        self._pilha_travamento: Optional[str] = None
+        self._thread_loop: Optional[int] = None
+        self._tarefa: Optional[asyncio.Task] = None
+        self._vigia: Optional[threading.Thread] = None
+        self._parar = threading.Event()
+        self._auditando = False
+        self._hook_instalado = False
+        self._reportados: set = set()
+        self._reportando = threading.local()
+
+    def iniciar(self):
+        """Começa a bater no loop atual e a vigiar em uma thread (chamar dentro do loop)"""
+        loop = asyncio.get_running_loop()
+        self._thread_loop = threading.get_ident()
+        self._ultima_batida = time.perf_counter()
+        self._parar.clear()
+        self._tarefa = asyncio.create_task(monitorar_atraso_loop(ATRASO_LOOP, self.intervalo,
+                                                                 self._batida))
+        if self.limite_travamento > 0:
+            self._vigia = threading.Thread(target=self._vigiar, name='vigia-event-loop', daemon=True)
+            self._vigia.start()
+        if self.depuracao:
+            loop.set_debug(True)
+            loop.slow_callback_duration = self.limite_travamento or LIMITE_TRAVAMENTO_PADRAO
+            if not self._hook_instalado:
+                # Audit hooks não podem ser removidos: o hook consulta _auditando
+                sys.addaudithook(self._auditar)
+                self._hook_instalado = True
+            self._auditando = True
+            self.logger.warning("🔍 Modo de depuração do event loop ativo (E/S síncrona e callbacks lentos)")
+
+    async def parar(self):
+        self._parar.set()
+        self._auditando = False
+        if self._tarefa:
+            self._tarefa.cancel()
+            self._tarefa = None
+        if self._vigia:
+            await asyncio.to_thread(self._vigia.join, 1)
+            self._vigia = None
+
+    def _batida(self, atraso: float):
+        """Chamado no loop a cada intervalo; fecha o travamento em andamento"""
+        self._ultima_batida = time.perf_counter()
+        pilha, self._pilha_travamento = self._pilha_travamento, None
+        if atraso < self.limite_travamento or self.limite_travamento <= 0:
+            return
+        TRAVAMENTOS.incrementar()
+        self.travamentos += 1
+        self.ultimo_travamento = {'duracao_ms': round(atraso * 1000, 1), 'momento': time.time(),
+                                  'pilha': pilha}
+        self.logger.warning("🧊 Event loop travado por %.0f ms%s", atraso * 1000,
+                            "" if pilha else " (pilha não capturada)")
+
+    def _vigiar(self):
+        """Thread: captura a pilha do loop quando uma batida atrasa além do limite"""
+        verificacao = min(self.intervalo, self.limite_travamento) / 2
+        capturada_em = None
+        while not self._parar.wait(verificacao):
+            batida = self._ultima_batida
+            atraso = time.perf_counter() - batida - self.intervalo
+            if atraso < self.limite_travamento or capturada_em == batida:
+                continue
+            # Uma captura por travamento (até a próxima batida)
+            capturada_em = batida
+            quadro = sys._current_frames().get(self._thread_loop)
+            if quadro is None:
+                continue
+            pilha = ''.join(traceback.format_stack(quadro, limit=PROFUNDIDADE_PILHA))
+            self._pilha_travamento = pilha
+            self.logger.warning("🧊 Event loop travado há %.0f ms em %s\n%s", atraso * 1000,
+                                _local_chamada(quadro), pilha.rstrip())
+            from utils.debug_logger import get_debug_logger
+            get_debug_logger().registrar_evento("LOOP_TRAVADO", {
+                'atraso_ms': round(atraso * 1000, 1), 'local': _local_chamada(quadro), 'pilha': pilha
+            })
+
+    def _auditar(self, evento: str, argumentos: tuple):
+        """Audit hook: E/S síncrona na thread do loop enquanto ele roda"""
+        if (evento not in EVENTOS_BLOQUEANTES or not self._auditando
+                or threading.get_ident() != self._thread_loop
+                or getattr(self._reportando, 'ativo', False)
+                or asyncio._get_running_loop() is None):
+            return
+        # Sockets não bloqueantes (os do próprio asyncio) não travam o loop
+        if evento == 'socket.connect' and argumentos and argumentos[0].getblocking() is False:
+            return
+        quadro = sys._getframe(1)
+        # Código-fonte lido pelo linecache para montar tracebacks (inclusive os do modo debug)
+        if evento == 'open' and any(q.f_code.co_filename.endswith('linecache.py')
+                                    for q in (quadro, quadro.f_back) if q is not None):
+            return
+        # O contador vê toda ocorrência; log e flight recorder, só o primeiro por local
+        IO_SINCRONO.com(evento).incrementar()
+        local = _local_chamada(quadro)
+        if (evento, local) in self._reportados:
+            return
+        self._reportados.add((evento, local))
+        self._reportando.ativo = True
+        try:
+            pilha = ''.join(traceback.format_stack(quadro, limit=PROFUNDIDADE_PILHA))
+            self.logger.warning("🚧 E/S síncrona no event loop: %s em %s\n%s", evento, local, pilha.rstrip())
+            from utils.debug_logger import get_debug_logger
+            get_debug_logger().registrar_evento("IO_SINCRONO_NO_LOOP", {
+                'evento': evento, 'local': local, 'argumentos': str(argumentos)[:200]
+            })
+        finally:
+            self._reportando.ativo = False
+
+    def travamento_recente(self) -> Optional[Dict[str, Any]]:
+        """Último travamento (duração e há quantos segundos), para correlacionar eventos"""
+        if self.ultimo_travamento is None:
+            return None
+        return {'duracao_ms': self.ultimo_travamento['duracao_ms'],
+                'ha_segundos': round(time.time() - self.ultimo_travamento['momento'], 1)}
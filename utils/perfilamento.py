@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Perfilamento do Oráculo de Concursos
+Histograma de latência por função, registro de chamadas lentas e captura de
+perfil sob demanda (cProfile ou amostragem de pilhas) por alguns segundos
+
+`perfilar` decora funções síncronas e async; `medir` cronometra um bloco.
+As durações vão para `oraculo_funcao_segundos{funcao=...}`; chamadas acima
+do limite viram um aviso no log e um evento no relatório de debug. Com
+`taxa_amostragem` < 1, só essa fração das chamadas é medida (o histograma
+passa a ser uma amostra).
+
+A captura roda sobre a thread do event loop: o cProfile registra cada
+chamada (custo alto, números exatos); a amostragem lê a pilha da thread a
+cada INTERVALO_AMOSTRAGEM de outra thread (custo baixo, inclui o tempo
+parado em chamadas bloqueantes) e grava as pilhas no formato "collapsed"
+aceito pelo flamegraph.pl e pelo speedscope.
+"""
+
+import asyncio
+import cProfile
+import functools
+import inspect
+import io
+import logging
+import pstats
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+from utils.metricas import obter_registro
+
+
+# Chamadas mais demoradas que isto (segundos) são registradas como lentas
+LIMITE_LENTO_PADRAO = 1.0
+
+# Duração padrão de uma captura (segundos) e limite aceito
+DURACAO_CAPTURA_PADRAO = 30.0
+DURACAO_CAPTURA_MAXIMA = 600.0
+
+# Intervalo entre duas leituras da pilha na captura por amostragem (segundos)
+INTERVALO_AMOSTRAGEM = 0.005
+
+MODOS_CAPTURA = ('amostragem', 'cprofile')
+
+# Capturas mantidas no diretório; as mais antigas são removidas
+MAXIMO_CAPTURAS = 10
+
+# Funções listadas no resumo de uma captura
+LINHAS_RESUMO = 40
+
+_metricas = obter_registro()
+DURACAO_FUNCOES = _metricas.histograma(
+    'oraculo_funcao_segundos', 'Duração das chamadas às funções perfiladas', ('funcao',)
+)
+CHAMADAS_LENTAS = _metricas.contador(
+    'oraculo_funcao_lentas_total', 'Chamadas acima do limite de lentidão', ('funcao',)
+)
+ERROS_FUNCOES = _metricas.contador(
+    'oraculo_funcao_erros_total', 'Chamadas às funções perfiladas que levantaram exceção', ('funcao',)
+)
+
+logger = logging.getLogger(__name__)
+
+_limite_lento = LIMITE_LENTO_PADRAO
+_taxa_amostragem = 1.0
+_diretorio = Path('logs/perfis')
+_captura_em_andamento = False
+_aleatorio = random.random
+
+
+def configurar_perfilamento(limite_lento: float = LIMITE_LENTO_PADRAO, taxa_amostragem: float = 1.0,
+                            diretorio: Optional[str] = None):
+    """
+    Ajusta os padrões de todas as funções perfiladas
+
+    Args:
+        limite_lento: Segundos a partir dos quais uma chamada é lenta (0 desativa)
+        taxa_amostragem: Fração das chamadas medida
+        diretorio: Onde as capturas de perfil são gravadas
+    """
+    global _limite_lento, _taxa_amostragem, _diretorio
+    _limite_lento = max(0.0, limite_lento)
+    _taxa_amostragem = max(0.0, min(1.0, taxa_amostragem))
+    if diretorio:
+        _diretorio = Path(diretorio)
+
+
+class _Perfil:
+    """Séries de uma função perfilada (criadas uma vez, na decoração)"""
+
+    __slots__ = ('nome', 'limite_lento', 'duracao', 'lentas', 'erros')
+
+    def __init__(self, nome: str, limite_lento: Optional[float]):
+        self.nome = nome
+        self.limite_lento = limite_lento
+        self.duracao = DURACAO_FUNCOES.com(nome)
+        self.lentas = CHAMADAS_LENTAS.com(nome)
+        self.erros = ERROS_FUNCOES.com(nome)
+
+    def registrar(self, duracao: float, erro: bool):
+        self.duracao.observar(duracao)
+        if erro:
+            self.erros.incrementar()
+        limite = self.limite_lento if self.limite_lento is not None else _limite_lento
+        if limite and duracao >= limite:
+            self.lentas.incrementar()
+            logger.warning("🐢 %s levou %.0f ms (limite %.0f ms)", self.nome, duracao * 1000,
+                           limite * 1000)
+            # Importado aqui: o debug_logger carrega o discord.py, desnecessário para as ferramentas
+            from utils.debug_logger import get_debug_logger
+            get_debug_logger().registrar_evento("CHAMADA_LENTA", {
+                'funcao': self.nome, 'duracao_ms': round(duracao * 1000, 1), 'erro': erro
+            })
+
+
+class _Medicao:
+    """Context manager de `medir` (mais barato que @contextmanager)"""
+
+    __slots__ = ('perfil', 'inicio', 'duracao')
+
+    def __init__(self, perfil: _Perfil):
+        self.perfil = perfil
+        self.duracao = 0.0
+
+    def __enter__(self) -> '_Medicao':
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.duracao = time.perf_counter() - self.inicio
+        self.perfil.registrar(self.duracao, exc_type is not None)
+        return False
+
+
+_perfis: Dict[tuple, _Perfil] = {}
+
+
+def medir(nome: str, limite_lento: Optional[float] = None) -> _Medicao:
+    """Cronometra um bloco como uma função perfilada chamada `nome`"""
+    perfil = _perfis.get((nome, limite_lento))
+    if perfil is None:
+        perfil = _perfis[(nome, limite_lento)] = _Perfil(nome, limite_lento)
+    return _Medicao(perfil)
+
+
+def perfilar(nome: Optional[str] = None, limite_lento: Optional[float] = None) -> Callable:
+    """
+    Decorator: mede cada chamada da função (síncrona ou async)
+
+    Args:
+        nome: Rótulo `funcao` das métricas (padrão: Classe.metodo)
+        limite_lento: Segundos para a chamada ser lenta (padrão: o global)
+    """
+    def decorator(func: Callable) -> Callable:
+        perfil = _Perfil(nome or func.__qualname__, limite_lento)
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def wrapper_async(*args, **kwargs):
+                if _taxa_amostragem < 1.0 and _aleatorio() >= _taxa_amostragem:
+                    return await func(*args, **kwargs)
+                erro = False
+                inicio = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                except Exception:
+                    erro = True
+                    raise
+                finally:
+                    perfil.registrar(time.perf_counter() - inicio, erro)
+            return wrapper_async
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _taxa_amostragem < 1.0 and _aleatorio() >= _taxa_amostragem:
+                return func(*args, **kwargs)
+            erro = False
+            inicio = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            except Exception:
+                erro = True
+                raise
+            finally:
+                perfil.registrar(time.perf_counter() - inicio, erro)
+        return wrapper
+    return decorator
+
+
+class AmostradorPilhas:
+    """Lê a pilha de uma thread em intervalos fixos e conta as pilhas vistas"""
+
+    def __init__(self, thread_id: int, intervalo: float = INTERVALO_AMOSTRAGEM):
+        self.thread_id = thread_id
+        self.intervalo = intervalo
+        self.pilhas: Counter = Counter()
+        self.amostras = 0
+        self._rotulos: Dict[object, str] = {}
+
+    def _rotulo(self, codigo) -> str:
+        rotulo = self._rotulos.get(codigo)
+        if rotulo is None:
+            rotulo = self._rotulos[codigo] = (
+                f"{codigo.co_qualname} ({Path(codigo.co_filename).name}:{codigo.co_firstlineno})"
+            )
+        return rotulo
+
+    def executar(self, segundos: float):
+        """Amostra por `segundos` (bloqueia: chamar em outra thread)"""
+        # Com o intervalo padrão do GIL (5 ms), o amostrador quase só acorda quando a
+        # thread observada libera o GIL por conta própria (no select do loop) e o
+        # código Python entre dois selects some do perfil; durante a captura, a
+        # troca forçada acontece bem antes do fim de cada trecho
+        intervalo_gil = sys.getswitchinterval()
+        sys.setswitchinterval(min(intervalo_gil, self.intervalo / 25))
+        try:
+            fim = time.perf_counter() + segundos
+            while time.perf_counter() < fim:
+                quadro = sys._current_frames().get(self.thread_id)
+                if quadro is not None:
+                    rotulos = []
+                    while quadro is not None:
+                        rotulos.append(self._rotulo(quadro.f_code))
+                        quadro = quadro.f_back
+                    self.pilhas[';'.join(reversed(rotulos))] += 1
+                    self.amostras += 1
+                time.sleep(self.intervalo)
+        finally:
+            sys.setswitchinterval(intervalo_gil)
+
+    def resumo(self, linhas: int = LINHAS_RESUMO) -> str:
+        """Funções com mais amostras próprias (no topo da pilha) e totais"""
+        proprias: Counter = Counter()
+        totais: Counter = Counter()
+        for pilha, quantidade in self.pilhas.items():
+            quadros = pilha.split(';')
+            proprias[quadros[-1]] += quantidade
+            for quadro in set(quadros):
+                totais[quadro] += quantidade
+        total = max(self.amostras, 1)
+        saida = [f"{self.amostras} amostras a cada {self.intervalo * 1000:.0f} ms", "",
+                 f"{'próprio':>8} {'total':>8}  função"]
+        for quadro, quantidade in proprias.most_common(linhas):
+            saida.append(f"{quantidade / total:8.1%} {totais[quadro] / total:8.1%}  {quadro}")
+        return '\n'.join(saida)
+
+
+def _remover_antigas(diretorio: Path):
+    resumos = sorted(diretorio.glob("perfil_*.txt"), key=lambda caminho: caminho.stat().st_mtime)
+    for antigo in resumos[:-MAXIMO_CAPTURAS]:
+        for arquivo in diretorio.glob(f"{antigo.stem}.*"):
+            arquivo.unlink(missing_ok=True)
+
+
+def _gravar(base: Path, cabecalho: str, resumo: str, gravar_dados: Callable[[Path], None]) -> Path:
+    base.parent.mkdir(parents=True, exist_ok=True)
+    gravar_dados(base)
+    caminho = base.with_suffix('.txt')
+    caminho.write_text(f"{cabecalho}\n\n{resumo}\n", encoding='utf-8')
+    _remover_antigas(base.parent)
+    return caminho
+
+
+async def capturar_perfil(segundos: float = DURACAO_CAPTURA_PADRAO,
+                          modo: str = 'amostragem') -> Optional[Path]:
+    """
+    Perfila a thread do event loop por `segundos`
+
+    Grava em PROFILE_DIR o resumo (.txt) e os dados completos: .prof do
+    cProfile (pstats, snakeviz) ou .folded da amostragem (flamegraph.pl,
+    speedscope). Retorna o caminho do resumo; None se o modo for inválido
+    ou outra captura estiver em andamento.
+    """
+    global _captura_em_andamento
+    if modo not in MODOS_CAPTURA:
+        logger.warning("⚠️ Modo de captura desconhecido: %s (use %s)", modo, ', '.join(MODOS_CAPTURA))
+        return None
+    if _captura_em_andamento:
+        logger.warning("⚠️ Captura de perfil já em andamento")
+        return None
+
+    segundos = max(0.1, min(segundos, DURACAO_CAPTURA_MAXIMA))
+    base = _diretorio / f"perfil_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{modo}"
+    cabecalho = (f"Perfil ({modo}) da thread do event loop por {segundos:.1f}s, "
+                 f"iniciado em {datetime.now():%Y-%m-%d %H:%M:%S}")
+    _captura_em_andamento = True
+    logger.info("🔬 Capturando perfil (%s) por %.1fs", modo, segundos)
+    try:
+        if modo == 'cprofile':
+            # Ativado aqui, na thread do loop: só ela é perfilada
+            perfil = cProfile.Profile()
+            perfil.enable()
+            try:
+                await asyncio.sleep(segundos)
+            finally:
+                perfil.disable()
+
+            def resumir() -> Path:
+                saida = io.StringIO()
+                pstats.Stats(perfil, stream=saida).sort_stats('cumulative').print_stats(LINHAS_RESUMO)
+                return _gravar(base, cabecalho, saida.getvalue().strip(),
+                               lambda base: perfil.dump_stats(base.with_suffix('.prof')))
+        else:
+            amostrador = AmostradorPilhas(threading.get_ident())
+            await asyncio.to_thread(amostrador.executar, segundos)
+
+            def gravar_pilhas(base: Path):
+                with open(base.with_suffix('.folded'), 'w', encoding='utf-8') as saida:
+                    for pilha, quantidade in amostrador.pilhas.most_common():
+                        saida.write(f"{pilha} {quantidade}\n")
+
+            def resumir() -> Path:
+                return _gravar(base, cabecalho, amostrador.resumo(), gravar_pilhas)
+
+        caminho = await asyncio.to_thread(resumir)
+        logger.info("🔬 Perfil salvo em: %s", caminho)
+        return caminho
+
+    except Exception as e:
+        logger.error(f"❌ Erro ao capturar perfil: {e}")
+        return None
+    finally:
+        _captura_em_andamento = False
@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Rastreamento de requisições do Oráculo de Concursos
+Trace por menção e spans por etapa (banco, Gemini, validação, envio),
+guardados em contextvars e exportados em JSONL no formato OTLP/JSON
+
+O span atual fica em uma ContextVar: cada tarefa do asyncio (e cada
+`asyncio.to_thread`) trabalha sobre uma cópia do contexto de quem a criou,
+então menções processadas ao mesmo tempo nunca trocam de trace. Fora de um
+trace, `span()` e `rastrear` não criam nada (uma leitura da ContextVar).
+"""
+
+import atexit
+import functools
+import inspect
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from pydantic_core import to_json
+
+
+# Spans concluídos aguardando a thread de exportação
+LIMITE_FILA_SPANS = 10000
+
+# Spans por linha do arquivo (um ExportTraceServiceRequest por linha)
+LOTE_EXPORTACAO = 500
+
+ROTACAO_RASTREAMENTOS_MB = 10
+BACKUPS_RASTREAMENTOS = 3
+
+SERVICO = 'oraculo-concursos'
+
+# Códigos de status do OTLP
+_STATUS_OK = 1
+_STATUS_ERRO = 2
+
+_span_atual: ContextVar[Optional['Span']] = ContextVar('oraculo_span_atual', default=None)
+
+logger = logging.getLogger(__name__)
+
+# Identificadores não precisam de aleatoriedade criptográfica (evita uma syscall por span)
+_bits = random.getrandbits
+
+
+def _valor_otlp(valor: Any) -> Dict[str, Any]:
+    """AnyValue do OTLP/JSON (inteiros de 64 bits vão como texto)"""
+    if isinstance(valor, bool):
+        return {'boolValue': valor}
+    if isinstance(valor, int):
+        return {'intValue': str(valor)}
+    if isinstance(valor, float):
+        return {'doubleValue': valor}
+    return {'stringValue': str(valor)}
+
+
+class Span:
+    """Uma etapa cronometrada de um trace; usado com `with`"""
+
+    __slots__ = ('trace_id', 'span_id', 'pai_id', 'nome', 'inicio_ns', 'fim_ns',
+                 'atributos', 'erro', '_token')
+
+    def __init__(self, nome: str, trace_id: str, pai_id: Optional[str],
+                 atributos: Optional[Dict[str, Any]] = None):
+        self.trace_id = trace_id
+        self.span_id = '%016x' % _bits(64)
+        self.pai_id = pai_id
+        self.nome = nome
+        self.inicio_ns = 0
+        self.fim_ns = 0
+        self.atributos = atributos if atributos is not None else {}
+        self.erro: Optional[str] = None
+        self._token = None
+
+    def definir(self, chave: str, valor: Any):
+        """Adiciona um atributo (None é ignorado)"""
+        if valor is not None:
+            self.atributos[chave] = valor
+
+    def marcar_erro(self, erro: BaseException):
+        """Status de erro para uma exceção tratada dentro do span"""
+        self.erro = f"{type(erro).__name__}: {erro}"
+
+    @property
+    def duracao(self) -> float:
+        """Duração em segundos (até agora, se ainda aberto)"""
+        return ((self.fim_ns or time.time_ns()) - self.inicio_ns) / 1e9
+
+    def __enter__(self) -> 'Span':
+        self._token = _span_atual.set(self)
+        self.inicio_ns = time.time_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.fim_ns = time.time_ns()
+        if exc_type is not None and self.erro is None:
+            self.erro = f"{exc_type.__name__}: {exc_val}"
+        _span_atual.reset(self._token)
+        self._token = None
+        if _exportador is not None:
+            _exportador.exportar(self)
+        return False
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Span no formato OTLP/JSON"""
+        dados = {
+            'traceId': self.trace_id,
+            'spanId': self.span_id,
+            'name': self.nome,
+            'kind': 2 if self.pai_id is None else 1,  # SERVER na raiz, INTERNAL nas etapas
+            'startTimeUnixNano': str(self.inicio_ns),
+            'endTimeUnixNano': str(self.fim_ns),
+            'attributes': [{'key': chave, 'value': _valor_otlp(valor)}
+                           for chave, valor in self.atributos.items()],
+            'status': ({'code': _STATUS_ERRO, 'message': self.erro} if self.erro
+                       else {'code': _STATUS_OK})
+        }
+        if self.pai_id is not None:
+            dados['parentSpanId'] = self.pai_id
+        return dados
+
+
+class _SpanNulo:
+    """Span de quando não há trace (ou ele não foi amostrado): não registra nada"""
+
+    __slots__ = ()
+
+    trace_id = span_id = pai_id = None
+
+    def definir(self, chave: str, valor: Any):
+        pass
+
+    def marcar_erro(self, erro: BaseException):
+        pass
+
+    def __enter__(self) -> '_SpanNulo':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+
+_SPAN_NULO = _SpanNulo()
+
+
+class ExportadorJSONL:
+    """
+    Grava spans concluídos em um arquivo JSONL com rotação por tamanho
+
+    Cada linha é um ExportTraceServiceRequest do OTLP/JSON com um lote de
+    spans (o receiver `otlpjsonfile` do OpenTelemetry Collector lê o arquivo
+    como está). Quem encerra um span só enfileira; a serialização e a
+    escrita ficam com uma thread. Com a fila cheia, o span é descartado.
+    """
+
+    def __init__(self, caminho: str, rotacao_mb: int = ROTACAO_RASTREAMENTOS_MB,
+                 backups: int = BACKUPS_RASTREAMENTOS):
+        self.caminho = Path(caminho)
+        self.limite_bytes = rotacao_mb * 1024 * 1024
+        self.backups = backups
+        self.fila: queue.SimpleQueue = queue.SimpleQueue()
+        self.exportados = 0
+        self.descartados = 0
+        self._recurso = {'attributes': [{'key': 'service.name', 'value': {'stringValue': SERVICO}}]}
+        self.caminho.parent.mkdir(parents=True, exist_ok=True)
+        self._arquivo = open(self.caminho, 'a', encoding='utf-8')
+        self._thread = threading.Thread(target=self._executar, name='exportador-rastreamentos',
+                                        daemon=True)
+        self._thread.start()
+
+    def exportar(self, span: Span):
+        if self.fila.qsize() >= LIMITE_FILA_SPANS:
+            self.descartados += 1
+        else:
+            self.fila.put(span)
+
+    def _executar(self):
+        encerrar = False
+        while not encerrar:
+            lote: List[Span] = []
+            item = self.fila.get()
+            while True:
+                if item is None:
+                    encerrar = True
+                    break
+                lote.append(item)
+                if len(lote) >= LOTE_EXPORTACAO:
+                    break
+                try:
+                    item = self.fila.get_nowait()
+                except queue.Empty:
+                    break
+            if lote:
+                self._gravar(lote)
+        self._arquivo.close()
+
+    def _gravar(self, lote: List[Span]):
+        requisicao = {'resourceSpans': [{
+            'resource': self._recurso,
+            'scopeSpans': [{'scope': {'name': __name__},
+                            'spans': [span.to_dict() for span in lote]}]
+        }]}
+        try:
+            self._arquivo.write(to_json(requisicao, fallback=str).decode('utf-8') + '\n')
+            self._arquivo.flush()
+            self.exportados += len(lote)
+            if self.limite_bytes and self._arquivo.tell() >= self.limite_bytes:
+                self._rotacionar()
+        except Exception as e:
+            self.descartados += len(lote)
+            logger.warning(f"⚠️ Erro ao gravar rastreamentos: {e}")
+
+    def _rotacionar(self):
+        self._arquivo.close()
+        for indice in range(self.backups - 1, 0, -1):
+            origem = self.caminho.with_name(f"{self.caminho.name}.{indice}")
+            if origem.exists():
+                os.replace(origem, self.caminho.with_name(f"{self.caminho.name}.{indice + 1}"))
+        if self.backups > 0:
+            os.replace(self.caminho, self.caminho.with_name(f"{self.caminho.name}.1"))
+        else:
+            self.caminho.unlink()
+        self._arquivo = open(self.caminho, 'a', encoding='utf-8')
+
+    def encerrar(self):
+        """Grava os spans pendentes e fecha o arquivo"""
+        if self._thread.is_alive():
+            self.fila.put(None)
+            self._thread.join(timeout=5)
+
+
+_exportador: Optional[ExportadorJSONL] = None
+_taxa_amostragem = 1.0
+
+
+def configurar_rastreamento(arquivo: Optional[str], taxa_amostragem: float = 1.0,
+                            rotacao_mb: int = ROTACAO_RASTREAMENTOS_MB) -> Optional[ExportadorJSONL]:
+    """
+    Ativa a exportação de spans para `arquivo` (vazio ou None desativa)
+
+    `taxa_amostragem` é a fração dos traces registrada (decidida no início
+    de cada trace; os spans de um trace amostrado são todos registrados).
+    """
+    global _exportador, _taxa_amostragem
+    encerrar_rastreamento()
+    _taxa_amostragem = max(0.0, min(1.0, taxa_amostragem))
+    if arquivo:
+        _exportador = ExportadorJSONL(arquivo, rotacao_mb=rotacao_mb)
+    return _exportador
+
+
+def encerrar_rastreamento():
+    """Grava os spans pendentes e desativa a exportação"""
+    global _exportador
+    if _exportador is not None:
+        _exportador.encerrar()
+        _exportador = None
+
+
+atexit.register(encerrar_rastreamento)
+
+
+def _sem_vazios(atributos: Dict[str, Any]) -> Dict[str, Any]:
+    return {chave: valor for chave, valor in atributos.items() if valor is not None}
+
+
+def iniciar_trace(nome: str, **atributos):
+    """Span raiz de um novo trace (nulo sem exportador ou fora da amostra)"""
+    if _exportador is None or (_taxa_amostragem < 1.0 and random.random() >= _taxa_amostragem):
+        return _SPAN_NULO
+    return Span(nome, '%032x' % _bits(128), None, _sem_vazios(atributos))
+
+
+def span(nome: str, **atributos):
+    """Span filho do span atual (nulo fora de um trace)"""
+    atual = _span_atual.get()
+    if atual is None:
+        return _SPAN_NULO
+    return Span(nome, atual.trace_id, atual.span_id, _sem_vazios(atributos))
+
+
+def span_atual():
+    """Span ativo neste contexto (o nulo fora de um trace)"""
+    atual = _span_atual.get()
+    return _SPAN_NULO if atual is None else atual
+
+
+def rastrear(nome: Optional[str] = None, atributos: Optional[Dict[str, Any]] = None) -> Callable:
+    """
+    Decorator: executa a função (síncrona ou async) dentro de um span
+
+    Args:
+        nome: Nome do span (padrão: Classe.metodo)
+        atributos: Atributos fixos do span (ex.: {'db.system': 'sqlite'})
+    """
+    def decorator(func: Callable) -> Callable:
+        nome_span = nome or func.__qualname__
+        fixos = atributos or {}
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def wrapper_async(*args, **kwargs):
+                atual = _span_atual.get()
+                if atual is None:
+                    return await func(*args, **kwargs)
+                with Span(nome_span, atual.trace_id, atual.span_id, dict(fixos)):
+                    return await func(*args, **kwargs)
+            return wrapper_async
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            atual = _span_atual.get()
+            if atual is None:
+                return func(*args, **kwargs)
+            with Span(nome_span, atual.trace_id, atual.span_id, dict(fixos)):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator